@@ -8,6 +8,7 @@ import json
 import io
 from functools import reduce
 from scout.config import FilePaths as fp
+from scout.utils import DataIndex
 
 
 class EIAData(object):
@@ -187,6 +188,14 @@ class CommercialTranslationDicts(object):
                                 }
 
 
+# Fields by which the rows of the commercial building energy and floor space
+# (DBOUT), service demand (SDOUT), and thermal load components data are
+# indexed (see utils.DataIndex)
+db_index_fields = ('Label', 'Division', 'BldgType', 'EndUse', 'Fuel')
+sd_index_fields = ('r', 'b', 's', 'f')
+load_index_fields = ('CDIV', 'BLDG', 'ENDUSE')
+
+
 def json_interpreter(key_series):
     """Convert strings in JSON database into codes for data extraction.
 
@@ -288,10 +297,10 @@ def sd_mseg_percent(sd_array, sel, yrs):
     where the end use has available service demand data.
 
     Args:
-        sd_array (numpy.ndarray): Service demand data for commercial
-            building equipment, specified by technology, building
-            vintage, performance level, and the other microsegment
-            parameters that appear in 'sel'.
+        sd_array (DataIndex): An index of the service demand data for
+            commercial building equipment, specified by technology,
+            building vintage, performance level, and the other
+            microsegment parameters that appear in 'sel'.
         sel (list): A list of integers that specifies the desired
             census division, building type, end use, and fuel type.
         yrs (list): A list of integers representing the range of years
@@ -309,10 +318,7 @@ def sd_mseg_percent(sd_array, sel, yrs):
 
     # Filter service demand data based on the specified census
     # division, building type, end use, and fuel type
-    filtered = sd_array[np.all([sd_array['r'] == sel[0],
-                                sd_array['b'] == sel[1],
-                                sd_array['s'] == sel[2],
-                                sd_array['f'] == sel[3]], axis=0)]
+    filtered = sd_array.select(sel[0], sel[1], sel[2], sel[3])
 
     # Initialize list of rows to remove from 'filtered' based on a
     # regex search of the 'Description' text
@@ -434,10 +440,10 @@ def catg_data_selector(db_array, sel, section_label, yrs):
     if applicable, end use/MEL type, and fuel type.
 
     Args:
-        db_array (numpy.ndarray): An array of commercial building data,
-            including total energy use by end use/fuel type and all
-            MELs types, new and surviving square footage, and other
-            parameters.
+        db_array (DataIndex): An index of the array of commercial
+            building data, including total energy use by end use/fuel
+            type and all MELs types, new and surviving square footage,
+            and other parameters.
         sel (list): A list of integers that specifies the desired
             census division, building type, end use, and fuel type.
         section_label (str): The name of the particular data to be extracted.
@@ -459,25 +465,17 @@ def catg_data_selector(db_array, sel, section_label, yrs):
     # using a different method since multiple numeric indices for fuel type
     # are combined together
     if 'SurvFloorTotal' in section_label or 'CMNewFloorSpace' in section_label:
-        filtered = db_array[np.all([db_array['Label'] == section_label,
-                                    db_array['Division'] == sel[0],
-                                    db_array['BldgType'] == sel[1]], axis=0)]
+        filtered = db_array.select(section_label, sel[0], sel[1])
     elif isinstance(sel[3], tuple):  # Tuple of fuel type codes present
-        filtered = db_array[np.all([db_array['Label'] == section_label,
-                                    db_array['Division'] == sel[0],
-                                    db_array['BldgType'] == sel[1],
-                                    db_array['EndUse'] == sel[2]], axis=0)]
-        filtered = filtered[np.isin(filtered['Fuel'], sel[3])]
+        filtered = db_array.select(
+            section_label, sel[0], sel[1], sel[2], sel[3])
         # Sum over all fuel types selected
         tyr = np.unique(filtered['Year'])
         filtered = np.array([(i, filtered[filtered['Year'] == i]['Amount'].sum()) for i in tyr],
                             dtype=[('Year', 'i4'), ('Amount', 'f8')])
     else:
-        filtered = db_array[np.all([db_array['Label'] == section_label,
-                                    db_array['Division'] == sel[0],
-                                    db_array['BldgType'] == sel[1],
-                                    db_array['EndUse'] == sel[2],
-                                    db_array['Fuel'] == sel[3]], axis=0)]
+        filtered = db_array.select(
+            section_label, sel[0], sel[1], sel[2], sel[3])
 
     # Adjust years reported based on the pivot year
     filtered['Year'] = filtered['Year'] + UsefulVars().pivot_year
@@ -515,15 +513,16 @@ def data_handler(db_array, sd_array, load_array, key_series, sd_end_uses, yrs):
     TBTU (10^12 BTU) to MMBTU (10^6 BTU.)
 
     Args:
-        db_array (numpy.ndarray): An array of commercial building data,
-            including total energy use by end use/fuel type and all
-            MELs types, new and surviving square footage, and other
-            parameters.
-        sd_array (numpy.ndarray): Service demand data for commercial
-            building equipment, given by technology and performance level.
-        load_array (numpy.ndarray): Thermal load components data
-            (i.e., energy exchange between buildings and their
-            surroundings through walls, foundations, etc.) for
+        db_array (DataIndex): An index of the array of commercial
+            building data, including total energy use by end use/fuel
+            type and all MELs types, new and surviving square footage,
+            and other parameters.
+        sd_array (DataIndex): An index of the service demand data for
+            commercial building equipment, given by technology and
+            performance level.
+        load_array (DataIndex): An index of the thermal load
+            components data (i.e., energy exchange between buildings and
+            their surroundings through walls, foundations, etc.) for
             commercial buildings, specified by census division,
             building type, and heating/cooling season.
         key_series (list): The set of strings that describe the
@@ -576,11 +575,8 @@ def data_handler(db_array, sd_array, load_array, key_series, sd_end_uses, yrs):
         # and building type (note that in the case of these thermal
         # load microsegments, the final field in idx_series has the
         # text to select the correct thermal load component column)
-        tl_multiplier = load_array[np.all([
-            load_array['CDIV'] == idx_series[0],
-            load_array['BLDG'] == idx_series[1],
-            load_array['ENDUSE'] == idx_series[2]],
-            axis=0)][idx_series[-1]]
+        tl_multiplier = load_array.select(
+            idx_series[0], idx_series[1], idx_series[2])[idx_series[-1]]
         # N.B. tl_multiplier is a 1x1 numpy array
 
         # Multiply together the thermal load multiplier and energy use
@@ -1313,9 +1309,14 @@ def main():
                                                        'w') as jso:
             msjson = json.load(jsi)
 
-            # Proceed recursively through database structure
-            result = walk(catg_data, serv_data, load_data,
-                          serv_data_end_uses, msjson, years)
+            # Proceed recursively through database structure; index the
+            # input data arrays once up front such that the data for each
+            # microsegment are looked up directly
+            result = walk(
+                DataIndex(catg_data, db_index_fields, sort_rows=True),
+                DataIndex(serv_data, sd_index_fields, sort_rows=True),
+                DataIndex(load_data, load_index_fields, sort_rows=True),
+                serv_data_end_uses, msjson, years)
 
             # Clean up double-counted unspecified and other energy use
             result = double_count_cleanup(result)
@@ -40,6 +40,8 @@ class FilePaths:
     GENERATED = _parent_dir / "generated"
     ECM_COMP = GENERATED / "ecm_competition_data"
     EFF_FS_SPLIT = GENERATED / "eff_fs_splt_data"
+    # Per-region baseline data, shared by all generated directories (see set_paths)
+    MSEGS_STORE = GENERATED / "msegs_store"
     INPUTS = _parent_dir / "inputs"
     RESULTS = _parent_dir / "results"
     PLOTS = RESULTS / "plots"
@@ -295,6 +297,14 @@ class Config:
                     "`retrofit_multiplier` and `retrofit_mult_year` must be specified if"
                     " `retrofit_type` is 'increasing'.")
 
+            # parallel preparation
+            if args.workers < 1:
+                raise ValueError("The `workers` argument must be an integer of 1 or greater.")
+
+            # input distribution sampling
+            if args.nsamples < 2:
+                raise ValueError("The `nsamples` argument must be an integer of 2 or greater.")
+
             # fugitive emissions
             if ("typical refrigerant" in args.fugitive_emissions and
                     "low-gwp refrigerant" in args.fugitive_emissions):
@@ -5,27 +5,36 @@ import re
 import itertools
 import json
 from collections import OrderedDict
-from os import getcwd, stat
+from os import getcwd, stat, close
+from pathlib import Path
 import copy
 import warnings
 from urllib.parse import urlparse
 import gzip
 import pickle
+import hashlib
+import shutil
+import tempfile
 from functools import reduce  # forward compatibility for Python 3
 import operator
-from ast import literal_eval
 import math
 import pandas as pd
 import time
-from pathlib import Path
 import argparse
-from scout.ecm_prep_args import ecm_args
-from scout.ecm_prep_vars import UsefulVars, UsefulInputFiles
-from scout.utils import JsonIO, PrintFormat as fmt
+from scout.ecm_prep_args import ecm_args, non_result_opts
+from scout.ecm_prep_vars import UsefulVars, UsefulInputFiles, MeasureVars
+from scout.utils import JsonIO, PrintFormat as fmt, MsegKey, CompDataIO, StageProfiler, \
+    KeyValTree, SectorShapesIO
 from scout.config import LogConfig, FilePaths as fp
 import traceback
 import logging
+import multiprocessing
+import sys
+from concurrent.futures import ProcessPoolExecutor
 logger = logging.getLogger(__name__)
+# Stage timings, counts, and peak memory of the current ecm_prep run (see the 'profile'
+# option); disabled by default
+profiler = StageProfiler()
 
 
 class ECMPrepHelper:
@@ -186,18 +195,279 @@ class ECMPrepHelper:
                                 pass
         return msegs
 
+    # Hashes of previously hashed files, by file path, size, and modification time
+    file_hashes = {}
+
+    # User options that have no bearing on prepared measure results
+    non_result_opts = non_result_opts
+
+    @staticmethod
+    def file_hash(filepath):
+        """Find the SHA-256 hash of a file's contents.
+
+        Note:
+            Hashes are reused for files that have already been hashed in the
+            current session (or in a previous run, see load_file_hashes) and
+            have not since been modified.
+
+        Args:
+            filepath (pathlib.Path): Path to the file to hash.
+
+        Returns:
+            Hexadecimal digest of the file contents.
+        """
+        file_stat = stat(filepath)
+        hash_key = (str(filepath), file_stat.st_size, file_stat.st_mtime_ns)
+        if hash_key not in ECMPrepHelper.file_hashes:
+            hasher = hashlib.sha256()
+            with open(filepath, "rb") as handle:
+                for chunk in iter(lambda: handle.read(1 << 20), b""):
+                    hasher.update(chunk)
+            ECMPrepHelper.file_hashes[hash_key] = hasher.hexdigest()
+        return ECMPrepHelper.file_hashes[hash_key]
+
+    @staticmethod
+    def load_file_hashes(filepath):
+        """Import hashes of input files recorded by previous runs.
+
+        Args:
+            filepath (pathlib.Path): JSON of [size, modification time, hash] by file path.
+        """
+        try:
+            stored = JsonIO.load_json(filepath)
+        except (FileNotFoundError, ValueError):
+            return
+        for path, (size, mtime_ns, digest) in stored.items():
+            ECMPrepHelper.file_hashes.setdefault((path, size, mtime_ns), digest)
+
+    @staticmethod
+    def dump_file_hashes(filepath):
+        """Export the latest hash of each hashed input file for reuse by later runs.
+
+        Args:
+            filepath (pathlib.Path): JSON of [size, modification time, hash] by file path.
+        """
+        stored = {}
+        for (path, size, mtime_ns), digest in ECMPrepHelper.file_hashes.items():
+            # Keep only the hash for the file's current size and modification time
+            try:
+                path_stat = stat(path)
+            except FileNotFoundError:
+                continue
+            if [size, mtime_ns] == [path_stat.st_size, path_stat.st_mtime_ns]:
+                stored[path] = [size, mtime_ns, digest]
+        JsonIO.dump_json(stored, filepath)
+
+    @staticmethod
+    def meas_def_hash(meas_dict):
+        """Find the SHA-256 hash of a measure definition's contents.
+
+        Note:
+            The hash reflects the measure definition data rather than the
+            formatting of the JSON file the definition is stored in.
+
+        Args:
+            meas_dict (dict): Measure definition.
+
+        Returns:
+            Hexadecimal digest of the measure definition.
+        """
+        return hashlib.sha256(json.dumps(
+            meas_dict, sort_keys=True).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def input_files_hash(handyfiles):
+        """Find a combined SHA-256 hash of the input data used to prepare measures.
+
+        Args:
+            handyfiles (object): Input files of use across Measure methods.
+
+        Returns:
+            Hexadecimal digest of the baseline stock/energy, cost/performance/
+            lifetime, cost conversion, and (if available) time sensitive
+            valuation input data.
+        """
+        in_files = [handyfiles.msegs_in, handyfiles.msegs_cpl_in,
+                    handyfiles.cost_convert_in, handyfiles.cbecs_sf_byvint]
+        # Add time sensitive valuation data files that are used for the
+        # current regional breakout, in whichever form (JSON or gzipped) exist
+        for tsv_file in [
+                handyfiles.tsv_load_data, handyfiles.tsv_cost_data,
+                handyfiles.tsv_carbon_data, handyfiles.tsv_cost_data_nonfs,
+                handyfiles.tsv_carbon_data_nonfs]:
+            if tsv_file is not None:
+                in_files.extend([x for x in [tsv_file, tsv_file.with_suffix(".gz")] if
+                                 x.exists() and x not in in_files])
+        hasher = hashlib.sha256()
+        for in_file in [x for x in in_files if x.exists()]:
+            hasher.update(in_file.name.encode("utf-8"))
+            hasher.update(ECMPrepHelper.file_hash(in_file).encode("utf-8"))
+        return hasher.hexdigest()
+
+    @staticmethod
+    def find_meas_regions(meas_dicts, handyvars):
+        """Find the regions that a set of measure definitions apply to.
+
+        Args:
+            meas_dicts (list): Measure definitions to prepare.
+            handyvars (object): Global variables of use across Measure methods.
+
+        Returns:
+            Set of region names, or None if any measure applies to all regions.
+        """
+        regions = set()
+        for m in meas_dicts:
+            cz = m.get("climate_zone")
+            # Measures that apply to all regions (or have invalid region inputs,
+            # which are flagged later during measure preparation) require data
+            # for all regions
+            if cz is None or cz == "all" or "all" in cz:
+                return None
+            if isinstance(cz, str):
+                cz = [cz]
+            for reg in cz:
+                # Expand any 'warm climates' or 'cold climates' region inputs
+                if reg in handyvars.warm_cold_regs.keys():
+                    regions.update(handyvars.warm_cold_regs[reg])
+                else:
+                    regions.add(reg)
+        return regions
+
+    @staticmethod
+    def load_region_data(data_in, store_dir, regions=None, years_ig=None):
+        """Load baseline data broken out by region, for a subset of regions.
+
+        Notes:
+            The first time a given version of a baseline data file is loaded,
+            its data are written out to a separate file per region, in a folder
+            named for the hash of the original file (and, if applicable, the
+            years that internal gains are aggregated across), such that
+            subsequent loads only read the data for the regions of interest.
+            An index records the size and modification time of the original
+            file as of its last hash, such that the file is only hashed again
+            when either changes. All files in the store are written to a
+            temporary file first and then renamed, such that concurrent ecm_prep
+            runs that share the store never read partially written data.
+
+        Args:
+            data_in (pathlib.Path): Baseline data file (JSON or gzipped JSON),
+                with regions as top-level keys.
+            store_dir (pathlib.Path): Folder in which to store per-region data.
+            regions (set): Regions to load data for; if None, load all regions.
+            years_ig (list): If not None, aggregate internal gains components
+                in the data across these years (see add_internal_gains_aggregate).
+
+        Returns:
+            Dict of baseline data for the regions of interest.
+        """
+        store = store_dir / data_in.name.split(".")[0]
+        store.mkdir(parents=True, exist_ok=True)
+        index_file = store / "index.json"
+        try:
+            index = JsonIO.load_json(index_file)
+        except (FileNotFoundError, ValueError):
+            index = {}
+        # Only hash the original file when its size or modification time differ
+        # from those recorded when it was last hashed
+        data_stat = stat(data_in)
+        data_stamp = [data_stat.st_size, data_stat.st_mtime_ns]
+        if index.get("stamp") == data_stamp:
+            data_hash = index["hash"]
+        else:
+            data_hash = ECMPrepHelper.file_hash(data_in)
+            ECMPrepHelper.dump_store_file(
+                {"source": data_in.name, "hash": data_hash, "stamp": data_stamp},
+                index_file, JsonIO.dump_json)
+        # Per-region data are stored separately for each version of the original
+        # file and each set of years that internal gains are aggregated across
+        version = data_hash
+        if years_ig is not None:
+            version += "-ig-" + hashlib.sha256(json.dumps(
+                [str(x) for x in years_ig]).encode("utf-8")).hexdigest()[:16]
+        version_dir = store / version
+        # Per-region data for the current version are complete once the list of
+        # regions is written; load only the regions of interest
+        try:
+            version_regions = JsonIO.load_json(version_dir / "regions.json")
+        except (FileNotFoundError, ValueError):
+            version_regions = None
+        if version_regions is not None:
+            data = {}
+            for reg in version_regions:
+                if regions is None or reg in regions:
+                    with open(version_dir / (reg + ".pkl"), "rb") as handle:
+                        data[reg] = pickle.load(handle)
+            return data
+
+        # Otherwise, load the original data file in full
+        if data_in.suffix == ".gz":
+            with gzip.GzipFile(data_in, 'r') as zip_ref:
+                data = json.loads(zip_ref.read().decode('utf-8'))
+        else:
+            data = JsonIO.load_json(data_in)
+        # Aggregate internal gains components (people + equipment only)
+        # into a single 'internal gains' node for heating/secondary heating/cooling
+        # demand microsegments. This prevents downstream double counting once logic
+        # skips originals when aggregate present.
+        if years_ig is not None:
+            try:
+                data = ECMPrepHelper.add_internal_gains_aggregate(data, years_ig)
+                logger.info("Applied internal gains aggregation (people + equipment)")
+            except Exception as e:
+                logger.warning(
+                    f"Internal gains aggregation failed; proceeding without aggregation: {e}")
+        # Remove per-region data for earlier versions of the original file
+        for old_dir in store.iterdir():
+            if old_dir.is_dir() and not old_dir.name.startswith(data_hash):
+                shutil.rmtree(old_dir, ignore_errors=True)
+        # Write out data by region, followed by the list of regions
+        version_dir.mkdir(exist_ok=True)
+        for reg, reg_data in data.items():
+            ECMPrepHelper.dump_store_file(
+                reg_data, version_dir / (reg + ".pkl"),
+                lambda x, pth: pth.write_bytes(pickle.dumps(x, -1)))
+        ECMPrepHelper.dump_store_file(
+            list(data.keys()), version_dir / "regions.json", JsonIO.dump_json)
+
+        if regions is not None:
+            data = {reg: reg_data for reg, reg_data in data.items() if reg in regions}
+        return data
+
+    @staticmethod
+    def dump_store_file(data, filepath, dump):
+        """Write a file in the per-region data store via a temporary file.
+
+        Args:
+            data: Data to write.
+            filepath (pathlib.Path): File to write.
+            dump (function): Function that writes data to a given file path.
+        """
+        handle, tmp_name = tempfile.mkstemp(dir=filepath.parent, suffix=".tmp")
+        close(handle)
+        tmp_pth = Path(tmp_name)
+        try:
+            dump(data, tmp_pth)
+            tmp_pth.replace(filepath)
+        except BaseException:
+            tmp_pth.unlink(missing_ok=True)
+            raise
+
     @staticmethod
-    def prep_error(meas_name, handyvars, handyfiles):
+    def prep_error(meas_name, handyvars, handyfiles, err_dets=None):
         """Prepare and write out error messages for skipped measures/packages.
 
         Args:
             meas_name (str): Measure or package name.
             handyvars (object): Global variables of use across Measure methods.
             handyfiles (object): Input files of use across Measure methods.
+            err_dets (str, optional): Error traceback captured elsewhere (e.g., in
+                a worker process); if None, the traceback of the exception currently
+                being handled is used.
         """
         # # Complete the update to the console for each measure being processed
         # Pull full error traceback
-        err_dets = traceback.format_exc()
+        if err_dets is None:
+            err_dets = traceback.format_exc()
         # Construct error message to write out
         err_msg = (f"\nECM '{meas_name}' produced the following exception that prevented its "
                    f"preperation: \n{str(err_dets)}\n")
@@ -519,9 +789,10 @@ class Measure(object):
                 self.usr_opts["health_costs"] = "Uniform EE-high"
         self.eff_fs_splt = {a_s: {} for a_s in handyvars.adopt_schemes_prep}
         self.sector_shapes = None
-        # Deep copy handy vars to avoid any dependence of changes to these vars
-        # across other measures that use them
-        self.handyvars = copy.deepcopy(handyvars)
+        # Share a single instance of the handy vars across all measures;
+        # attributes the measure overwrites (e.g., panel shares) are stored
+        # on a lightweight per-measure view rather than on the shared vars
+        self.handyvars = MeasureVars(handyvars)
         # Set the rate of baseline retrofitting for ECM stock-and-flow calcs
         try:
             # Check first to see whether pulling up retrofit rate errors
@@ -537,10 +808,11 @@ class Measure(object):
             elif type(self.retro_rate) is list and isinstance(
                     self.retro_rate[0], str):
                 # Sample measure retrofit rate values
+                rnd_gen = numpy.random.default_rng(self.gen_rand_seed())
                 self.retro_rate = {
                     yr: self.rand_list_gen(
-                        self.retro_rate, self.handyvars.nsamples) for yr in
-                    self.handyvars.aeo_years}
+                        self.retro_rate, self.handyvars.nsamples, rnd_gen)
+                    for yr in self.handyvars.aeo_years}
             # Raise error in case where input is incorrectly specified
             else:
                 raise ValueError(
@@ -1086,7 +1358,7 @@ class Measure(object):
         # performance, and or lifetime with for consistency across all
         # microsegments that contribute to the measure's master microsegment
         if self.handyvars.nsamples is not None:
-            rnd_sd = numpy.random.randint(10000)
+            rnd_sd = self.gen_rand_seed()
 
         # Initialize a counter of key chains that yield "stock" and "energy"
         # keys in the baseline data dict; that have valid stock/energy data;
@@ -1167,8 +1439,8 @@ class Measure(object):
                 grid_regions = copy.deepcopy(self.climate_zone)
             for a_s in self.handyvars.adopt_schemes_run:
                 self.sector_shapes[a_s] = {reg: {yr: {
-                    "baseline": [0 for x in range(8760)],
-                    "efficient": [0 for x in range(8760)]} for yr in
+                    "baseline": numpy.zeros(8760),
+                    "efficient": numpy.zeros(8760)} for yr in
                     self.handyvars.aeo_years_summary} for reg in grid_regions}
 
         # Find all possible microsegment key chains.  First, determine all
@@ -1425,6 +1697,12 @@ class Measure(object):
         # upgrade costs and these need to be reset for future microsegment measure cost updates
         meas_incent_flag, elec_infr_flag = ("" for n in range(2))
 
+        # Initialize flattened sums of contributing microsegment stock, energy,
+        # carbon, cost, and lifetime information across all key chains, by
+        # adoption scheme; these sums are added to the master microsegment
+        # once the loop through key chains is complete
+        master_sums = {}
+
         # Loop through discovered key chains to find needed performance/cost
         # and stock/energy information for measure
         for ind, mskeys in enumerate(ms_iterable):
@@ -2887,7 +3165,7 @@ class Measure(object):
                 # microsegments, the numpy arrays yielded by the random number
                 # generator for these measure parameters and microsegments
                 # will also be identical)
-                numpy.random.seed(rnd_sd)
+                rnd_gen = numpy.random.default_rng(rnd_sd)
 
                 # If the measure performance/cost/lifetime variable is list
                 # with distribution information, sample values accordingly
@@ -2895,7 +3173,7 @@ class Measure(object):
                                                               str):
                     # Sample measure performance values
                     perf_meas = self.rand_list_gen(
-                        perf_meas, self.handyvars.nsamples)
+                        perf_meas, self.handyvars.nsamples, rnd_gen)
                     # Set any measure performance values less than zero to
                     # zero, for cases where performance isn't relative
                     if perf_units != 'relative savings (constant)' and \
@@ -2915,7 +3193,7 @@ class Measure(object):
                                                               str):
                     # Sample measure cost values
                     cost_meas = self.rand_list_gen(
-                        cost_meas, self.handyvars.nsamples)
+                        cost_meas, self.handyvars.nsamples, rnd_gen)
                     # Set any measure cost values less than zero to zero
                     if any(cost_meas < 0) is True:
                         cost_meas[numpy.where(cost_meas < 0)] = 0
@@ -2923,7 +3201,7 @@ class Measure(object):
                                                               str):
                     # Sample measure lifetime values
                     life_meas = self.rand_list_gen(
-                        life_meas, self.handyvars.nsamples)
+                        life_meas, self.handyvars.nsamples, rnd_gen)
                     # Set any measure lifetime values in list less than zero
                     # to 1
                     if any(life_meas < 0) is True:
@@ -2948,42 +3226,13 @@ class Measure(object):
                 # and later remove any associated secondary microsegments
                 if mskeys[0] == "primary":
                     try:
-                        # Set baseline performance; try for case where baseline
-                        # performance is broken out by new and existing
-                        # vintage; given an exception, expect a single set of
-                        # values across both vintages
-                        try:
-                            # Typical performance level
-                            perf_base = base_cpl["performance"]["typical"][
-                                mskeys[-1]]
-                            # Try to pull 'best' tier performance data alongside 'typical'.
-                            # If it doesn't work, set typical and best to the same levels.
-                            try:
-                                perf_base_best = base_cpl["performance"]["best"][
-                                    mskeys[-1]]
-                            except KeyError:
-                                perf_base_best = base_cpl["performance"]["typical"][
-                                    mskeys[-1]]
-                        except KeyError:
-                            # Typical performance level
-                            perf_base = base_cpl["performance"]["typical"]
-                            # Try to pull 'best' tier performance data alongside 'typical'.
-                            # If it doesn't work, set typical and best to the same levels.
-                            try:
-                                perf_base_best = base_cpl["performance"]["best"]
-                            except KeyError:
-                                perf_base_best = base_cpl["performance"]["typical"]
-                        # Ensure that retrieved best performance is by year; if not set to typical
-                        if not isinstance(perf_base_best, dict):
-                            perf_base_best = perf_base
-                        # Set baseline performance units
-                        perf_base_units = base_cpl["performance"]["units"]
-                        # Invert dishwasher baseline perf. units to match units
-                        # in the underlying EIA data, which are not currently
-                        # handled by the baseline CPL data prep routine * NOTE:
-                        # should be addressed via GH issue #393
-                        if "dishwasher" in mskeys:
-                            perf_base_units = "cycle/kWh"
+                        # Pull finalized baseline cost, performance, and lifetime data for the
+                        # current microsegment, which are shared across measures
+                        base_cpl_fin = self.fin_base_cpl(base_cpl, mskeys, bldg_sect)
+                        # Set baseline performance (before any corrections to lighting
+                        # performance values) and performance units
+                        perf_base, perf_base_best, perf_base_units = [base_cpl_fin[x] for x in [
+                            "performance", "performance (best)", "performance units"]]
 
                         # Identify reference case measures that are specified as add-ons (e.g.,
                         # add-ons with performance and cost of zero) and flag as reference case
@@ -3007,9 +3256,6 @@ class Measure(object):
 
                         # Pull out typical cost data before incentives
                         if "incentives" in base_cpl["installed cost"].keys():
-                            # Set baseline costs before incentives dict
-                            cost_base_init = base_cpl["installed cost"][
-                                "before incentives"]
                             # Remove incentives in the case that the user has suppressed all
                             # incentives. Ensure that non ref. case add-on measures (e.g., controls)
                             # are not assigned incentives that are meant for equipment replacements
@@ -3061,8 +3307,6 @@ class Measure(object):
                                     i_units_meas = (
                                         "" for n in range(4))
                         else:
-                            # Set baseline costs
-                            cost_base_init = base_cpl["installed cost"]
                             # No incentives data
                             cost_incentives, cost_incentives_meas, \
                                 i_units_base, \
@@ -3104,68 +3348,26 @@ class Measure(object):
                         else:
                             incent_mod_base, incent_mod_swtch = ([] for n in range(2))
 
-                        # In some cases, typical cost data will be split
-                        # further by new vs. existing keys; handle accordingly
-                        # and finalize costs (before incentives). Note: deep copy is
-                        # necessary to ensure that subsequent modification of base costs
-                        # for incentives does not change original data (before incentives)
-                        if mskeys[-1] in cost_base_init["typical"].keys():
-                            cost_base = copy.deepcopy(cost_base_init["typical"][mskeys[-1]])
-                        else:
-                            cost_base = copy.deepcopy(cost_base_init["typical"])
-                        # Set baseline cost units
-                        cost_base_units = cost_base_init["units"]
-
-                        # Set baseline lifetime
-                        life_base = base_cpl["lifetime"]["average"]
-                        # Extend baseline lifetime to dict broken out by
-                        # year if necessary
-                        if type(base_cpl["lifetime"]["average"]) in [
-                                float, int]:
-                            life_base = {yr: life_base for
-                                         yr in self.handyvars.aeo_years}
-
                         # Check for cases where baseline data are available but
-                        # set to zero, "NA", or 999 values (excepting cases
-                        # where baseline cost is expected to be zero). In such
-                        # cases, raise a ValueError after checking to ensure
-                        # that all baseline data are invalid
-
-                        # Installed cost
-                        if any([((("lighting" in mskeys and (isinstance(
-                            x[1], float) and round(x[1]) in [0, 999])) or
-                            x[1] in [0, "NA", 999]) and mskeys[-2] not in
-                            self.handyvars.zero_cost_tech) for x in
-                                cost_base.items()]):
-                            # If some years have valid cost data, take the max
-                            # from those years and extend across the full
-                            # time horizon (cases like commercial lighting
-                            # sometimes have typical CPL data that declines to
-                            # zero with declining stock)
-                            mx_cb = round(max([
-                                x[1] for x in cost_base.items() if
-                                x[1] != "NA"]))
-                            if mx_cb not in [0, 999]:
-                                cost_base = {yr: mx_cb for yr
-                                             in self.handyvars.aeo_years}
-                            else:
-                                raise ValueError
-                        # Performance (typical and best)
-                        perf_base, perf_base_best = [
-                            self.fix_lgt_perf_vals(x, mskeys) for x in [perf_base, perf_base_best]]
-                        # Lifetime
-                        if any([z[1] in [0, "NA"] for z in life_base.items()]):
-                            # If some years have valid lifetime data, take
-                            # the max from those years and extend across the
-                            # full time horizon
-                            mx_lf = round(max([
-                                x[1] for x in life_base.items() if
-                                x[1] != "NA"]))
-                            if mx_lf not in [0, 999]:
-                                life_base = {yr: mx_lf for yr
-                                             in self.handyvars.aeo_years}
-                            else:
-                                raise ValueError
+                        # set to zero, "NA", or 999 values (see fin_base_cpl); in
+                        # such cases, raise the error found when finalizing the data,
+                        # carrying over any performance values that were corrected
+                        # before the error was found
+                        if base_cpl_fin["error"] is not None:
+                            perf_base, perf_base_best = [base_cpl_fin.get(x, y) for x, y in [
+                                ("performance (final)", perf_base),
+                                ("performance (best, final)", perf_base_best)]]
+                            raise base_cpl_fin["error"].with_traceback(
+                                base_cpl_fin["error traceback"])
+                        # Set finalized baseline costs (before incentives), cost units,
+                        # performance, and lifetime. Note: a copy of the costs is
+                        # necessary to ensure that subsequent modification of base costs
+                        # for incentives does not change the shared data
+                        cost_base = copy.copy(base_cpl_fin["installed cost"])
+                        cost_base_units, perf_base, perf_base_best, life_base = [
+                            base_cpl_fin[x] for x in [
+                                "installed cost units", "performance (final)",
+                                "performance (best, final)", "lifetime"]]
 
                         # Handle case where measure units do not equal
                         # baseline units and baseline units cannot be
@@ -3240,20 +3442,17 @@ class Measure(object):
                                 0, "relative savings (constant)"]
 
                         # If the baseline technology is a heat pump in the
-                        # residential sector, account for the fact that EIA
-                        # divides all existing heat pump costs by 2 when
-                        # separately considered across the heating and cooling
-                        # services. For new construction, EIA puts the full
-                        # cost in heating and zeroes out cooling (as we also
+                        # residential sector, baseline costs have been multiplied
+                        # by 2 in finalizing the baseline data to account for the
+                        # fact that EIA divides all existing heat pump costs by 2
+                        # when separately considered across the heating and cooling
+                        # services (see fin_base_cpl). For new construction, EIA puts
+                        # the full cost in heating and zeroes out cooling (as we also
                         # do above)
                         if bldg_sect == "residential" and (
                                 mskeys[-1] == "existing" and
                                 (mskeys[-2] is not None and
                                  "HP" in mskeys[-2])):
-                            # Multiply heat pump baseline cost units by 2
-                            # to account for EIA heat pump cost handling
-                            cost_base = {yr: cost_base[yr] * 2 for yr in
-                                         self.handyvars.aeo_years}
                             # Warn the user about the modification to EIA's
                             # baseline cost data (and stock data, which is
                             # also multiplied by 2 below) for this segment
@@ -3269,14 +3468,6 @@ class Measure(object):
                                     "in the raw EIA data)",
                                     "warning",
                                     logger)
-                        # Adjust residential baseline lighting lifetimes to
-                        # reflect the fact that input data assume 24 h/day of
-                        # lighting use, rather than 3 h/day as assumed for
-                        # measure lifetime definitions
-                        if bldg_sect == "residential" and \
-                                mskeys[4] == "lighting":
-                            life_base = {yr: life_base[yr] * (24 / 3) for
-                                         yr in self.handyvars.aeo_years}
                         # Add to count of primary microsegment key chains with
                         # valid cost/performance/lifetime data
                         valid_keys_cpl += 1
@@ -4623,7 +4814,7 @@ class Measure(object):
                     # Set baseline load shapes to zero in cases where these
                     # fractions have been calculated
                     if calc_sect_shapes is True and tsv_shapes is not None:
-                        tsv_shapes["baseline"] = [0 for x in range(8760)]
+                        tsv_shapes["baseline"] = numpy.zeros(8760)
                 for adopt_scheme in self.handyvars.adopt_schemes_prep:
                     # Update total, competed, and efficient stock, energy,
                     # carbon and baseline/measure cost info. based on adoption
@@ -5001,16 +5192,24 @@ class Measure(object):
                                         contrib_mseg_key_str], add_dict_limited)
 
                     # Add all updated contributing microsegment stock, energy
-                    # carbon, cost, and lifetime information to existing master
-                    # mseg dict and move to next iteration of the loop through
-                    # key chains
-                    self.markets[adopt_scheme]["master_mseg"] = \
-                        self.add_keyvals(self.markets[adopt_scheme][
-                            "master_mseg"], add_dict)
+                    # carbon, cost, and lifetime information to the running
+                    # sum for the master mseg and move to next iteration of
+                    # the loop through key chains
+                    if adopt_scheme not in master_sums:
+                        master_sums[adopt_scheme] = KeyValTree(
+                            add_dict, keys=self.markets[adopt_scheme][
+                                "master_mseg"].keys())
+                    else:
+                        master_sums[adopt_scheme].add(add_dict)
                     # Add capacity factor information to contributing microsegment data
                     self.markets[adopt_scheme]["mseg_adjust"][
                         "capacity factor"][contrib_mseg_key_str] = stk_cap_fact
 
+        # Add summed contributing microsegment information to the master mseg
+        for adopt_scheme, master_sum in master_sums.items():
+            self.markets[adopt_scheme]["master_mseg"] = self.add_keyvals(
+                self.markets[adopt_scheme]["master_mseg"], master_sum.to_dict())
+
         # Print warnings
         if len(warn_list) > 0:
             for warn in list(set(warn_list)):
@@ -5206,6 +5405,164 @@ class Measure(object):
 
         return choice_params
 
+    def fin_base_cpl(self, base_cpl, mskeys, bldg_sect):
+        """Finalize baseline technology cost, performance, and lifetime data.
+
+        Note:
+            Finalized data depend only on the baseline microsegment and the
+            building sector of the measure (and on the user options that set
+            the global variables used below), and are therefore stored once
+            for use across all measures that apply to the same microsegment.
+            Errors in the baseline data are stored alongside the data such
+            that they are raised for each measure that uses the data.
+
+        Args:
+            base_cpl (dict): Baseline cost, performance, and lifetime data for
+                the current microsegment.
+            mskeys (tuple): Current mseg information.
+            bldg_sect (string): Applicable building sector for measure.
+
+        Returns:
+            Dict with baseline typical and best performance levels before and
+            after corrections to lighting performance values, performance
+            units, installed costs (before incentives), installed cost units,
+            lifetimes, and any error found in the cost/performance/lifetime
+            data (None if the data are valid) along with its traceback. When
+            an error is found, the data include corrected performance levels
+            only if the error was found after they were corrected.
+        """
+        fin_key = (bldg_sect,) + tuple(mskeys)
+        # Return data previously finalized for the same microsegment
+        if fin_key in self.handyvars.base_cpl_fin:
+            return self.handyvars.base_cpl_fin[fin_key]
+
+        # Set baseline performance; try for case where baseline
+        # performance is broken out by new and existing
+        # vintage; given an exception, expect a single set of
+        # values across both vintages
+        try:
+            # Typical performance level
+            perf_base = base_cpl["performance"]["typical"][mskeys[-1]]
+            # Try to pull 'best' tier performance data alongside 'typical'.
+            # If it doesn't work, set typical and best to the same levels.
+            try:
+                perf_base_best = base_cpl["performance"]["best"][mskeys[-1]]
+            except KeyError:
+                perf_base_best = base_cpl["performance"]["typical"][mskeys[-1]]
+        except KeyError:
+            # Typical performance level
+            perf_base = base_cpl["performance"]["typical"]
+            # Try to pull 'best' tier performance data alongside 'typical'.
+            # If it doesn't work, set typical and best to the same levels.
+            try:
+                perf_base_best = base_cpl["performance"]["best"]
+            except KeyError:
+                perf_base_best = base_cpl["performance"]["typical"]
+        # Ensure that retrieved best performance is by year; if not set to typical
+        if not isinstance(perf_base_best, dict):
+            perf_base_best = perf_base
+        # Set baseline performance units
+        perf_base_units = base_cpl["performance"]["units"]
+        # Invert dishwasher baseline perf. units to match units
+        # in the underlying EIA data, which are not currently
+        # handled by the baseline CPL data prep routine * NOTE:
+        # should be addressed via GH issue #393
+        if "dishwasher" in mskeys:
+            perf_base_units = "cycle/kWh"
+        base_cpl_fin = {
+            "performance": perf_base, "performance (best)": perf_base_best,
+            "performance units": perf_base_units, "error": None}
+
+        # Pull out typical cost data before incentives, if applicable
+        if "incentives" in base_cpl["installed cost"].keys():
+            cost_base_init = base_cpl["installed cost"]["before incentives"]
+        else:
+            cost_base_init = base_cpl["installed cost"]
+        try:
+            # In some cases, typical cost data will be split
+            # further by new vs. existing keys; handle accordingly
+            # and finalize costs (before incentives). Note: deep copy is
+            # necessary to ensure that subsequent modification of base costs
+            # does not change original data
+            if mskeys[-1] in cost_base_init["typical"].keys():
+                cost_base = copy.deepcopy(cost_base_init["typical"][mskeys[-1]])
+            else:
+                cost_base = copy.deepcopy(cost_base_init["typical"])
+            # Set baseline cost units
+            cost_base_units = cost_base_init["units"]
+
+            # Set baseline lifetime
+            life_base = base_cpl["lifetime"]["average"]
+            # Extend baseline lifetime to dict broken out by
+            # year if necessary
+            if type(base_cpl["lifetime"]["average"]) in [float, int]:
+                life_base = {yr: life_base for yr in self.handyvars.aeo_years}
+
+            # Check for cases where baseline data are available but
+            # set to zero, "NA", or 999 values (excepting cases
+            # where baseline cost is expected to be zero). In such
+            # cases, raise a ValueError after checking to ensure
+            # that all baseline data are invalid
+
+            # Installed cost
+            if any([((("lighting" in mskeys and (isinstance(
+                x[1], float) and round(x[1]) in [0, 999])) or
+                x[1] in [0, "NA", 999]) and mskeys[-2] not in
+                self.handyvars.zero_cost_tech) for x in
+                    cost_base.items()]):
+                # If some years have valid cost data, take the max
+                # from those years and extend across the full
+                # time horizon (cases like commercial lighting
+                # sometimes have typical CPL data that declines to
+                # zero with declining stock)
+                mx_cb = round(max([
+                    x[1] for x in cost_base.items() if x[1] != "NA"]))
+                if mx_cb not in [0, 999]:
+                    cost_base = {yr: mx_cb for yr in self.handyvars.aeo_years}
+                else:
+                    raise ValueError
+            # Performance (typical and best)
+            perf_base, perf_base_best = [
+                self.fix_lgt_perf_vals(x, mskeys) for x in [perf_base, perf_base_best]]
+            base_cpl_fin.update({
+                "performance (final)": perf_base, "performance (best, final)": perf_base_best})
+            # Lifetime
+            if any([z[1] in [0, "NA"] for z in life_base.items()]):
+                # If some years have valid lifetime data, take
+                # the max from those years and extend across the
+                # full time horizon
+                mx_lf = round(max([
+                    x[1] for x in life_base.items() if x[1] != "NA"]))
+                if mx_lf not in [0, 999]:
+                    life_base = {yr: mx_lf for yr in self.handyvars.aeo_years}
+                else:
+                    raise ValueError
+        except (TypeError, ValueError) as e:
+            base_cpl_fin.update({"error": e, "error traceback": e.__traceback__})
+        else:
+            # If the baseline technology is a heat pump in the
+            # residential sector, multiply heat pump baseline costs by 2
+            # to account for the fact that EIA divides all existing heat
+            # pump costs by 2 when separately considered across the
+            # heating and cooling services
+            if bldg_sect == "residential" and (
+                    mskeys[-1] == "existing" and
+                    (mskeys[-2] is not None and "HP" in mskeys[-2])):
+                cost_base = {yr: cost_base[yr] * 2 for yr in self.handyvars.aeo_years}
+            # Adjust residential baseline lighting lifetimes to
+            # reflect the fact that input data assume 24 h/day of
+            # lighting use, rather than 3 h/day as assumed for
+            # measure lifetime definitions
+            if bldg_sect == "residential" and mskeys[4] == "lighting":
+                life_base = {yr: life_base[yr] * (24 / 3) for
+                             yr in self.handyvars.aeo_years}
+            base_cpl_fin.update({
+                "installed cost": cost_base, "installed cost units": cost_base_units,
+                "lifetime": life_base})
+        self.handyvars.base_cpl_fin[fin_key] = base_cpl_fin
+
+        return base_cpl_fin
+
     def fix_lgt_perf_vals(self, perf_in, mskeys):
         """Fix potential zero/NA/999 performance values for lighting tech.
 
@@ -5813,19 +6170,19 @@ class Measure(object):
                         # year from price shape data in AEO range; if not in
                         # range, set all price scaling factors to 1 for year
                         if yr in self.handyvars.aeo_years:
+                            price_fact = 0.59 + 0.41 * numpy.asarray(
+                                tsv_data["price"]["electricity price shapes"][
+                                    yr][mskeys[1]], dtype=float)
                             cost_fact_hourly[yr], \
                                 self.handyvars.tsv_hourly_price[
-                                mskeys[1]][yr] = ([(
-                                    (0.59 + 0.41 * x) if (
-                                        cost_energy_meas[yr] *
-                                        (0.59 + 0.41 * x) >= 0) else 0) for
-                                    x in tsv_data["price"][
-                                     "electricity price shapes"][yr][
-                                     mskeys[1]]] for n in range(2))
+                                mskeys[1]][yr] = (numpy.where(
+                                    cost_energy_meas[yr] * price_fact >= 0,
+                                    price_fact, 0) for n in range(2))
                         else:
                             cost_fact_hourly[yr], \
                                 self.handyvars.tsv_hourly_price[
-                                mskeys[1]][yr] = ([1] * 8760 for n in range(2))
+                                mskeys[1]][yr] = (
+                                    numpy.ones(8760) for n in range(2))
                 else:
                     cost_fact_hourly = \
                         self.handyvars.tsv_hourly_price[mskeys[1]]
@@ -5837,10 +6194,10 @@ class Measure(object):
                 # every two years beginning in 2018)
                 if self.handyvars.tsv_hourly_emissions[mskeys[1]] is None:
                     carbon_fact_hourly,  self.handyvars.tsv_hourly_emissions[
-                        mskeys[1]] = ({yr: tsv_data["emissions"][
-                            "average carbon emissions rates"][yr][
-                            mskeys[1]] for yr in tsv_data["emissions"][
-                            "average carbon emissions rates"].keys()} for
+                        mskeys[1]] = ({yr: numpy.asarray(
+                            carb_rts[mskeys[1]], dtype=float) for
+                            yr, carb_rts in tsv_data["emissions"][
+                            "average carbon emissions rates"].items()} for
                             n in range(2))
                 else:
                     carbon_fact_hourly = self.handyvars.tsv_hourly_emissions[
@@ -5892,8 +6249,10 @@ class Measure(object):
             load_fact (dict): Hourly energy load fractions of annual load.
             ash_cz_wts (list): Factors to map ASH climates -> EMM regions.
             eplus_bldg_wts (dict): Factors to map EPlus -> Scout bldg. types.
-            cost_fact_hourly (list): 8760 electricity price scaling factors.
-            carbon_fact_hourly (list): 8760 emissions scaling factors.
+            cost_fact_hourly (dict): 8760 electricity price scaling factors
+                (numpy arrays) by year.
+            carbon_fact_hourly (dict): 8760 emissions scaling factors (numpy
+                arrays) by year.
             mskeys (tuple): Microsegment information.
             bldg_sect (str): Building sector flag (residential/commercial).
             eu (str): End use for keying time sensitive load data.
@@ -5904,7 +6263,7 @@ class Measure(object):
         Returns:
             Dict of microsegment-specific energy, cost, and emissions re-
             weighting factors that reflect time-sensitive evaluation of energy
-            efficiency and associated energy costs/carbon emissions; list
+            efficiency and associated energy costs/carbon emissions; arrays
             with hourly fractions of annual baseline and efficient energy use
             (if desired by the user)
         """
@@ -5918,8 +6277,8 @@ class Measure(object):
         # Initialize hourly fractions of annual baseline and efficient energy
         # if sector-level load shape information is desired by the user
         if opts.sect_shapes is True:
-            energy_base_shape, energy_eff_shape = ([
-                0 for x in range(8760)] for n in range(2))
+            energy_base_shape, energy_eff_shape = (
+                numpy.zeros(8760) for n in range(2))
         # Initialize carbon/cost scaling factor variables, but only if
         # either measure TSV features are present or the user desires
         # TSV metrics outputs; assume these shapes are not necessary if
@@ -6002,6 +6361,12 @@ class Measure(object):
         else:
             tsv_adjustments = {}
 
+        # Set the day of year (0-364) and hour of day (0-23) that correspond
+        # to each of the 8760 hours of the year; hourly loads are operated on
+        # as arrays that are masked/indexed by these day and hour ranges
+        hr_inds = numpy.arange(8760)
+        hr_day, hr_hour = numpy.divmod(hr_inds, 24)
+
         # Loop through all EPlus building types (which commercial load profiles
         # are broken out by) that map to the current Scout building type
         for bldg in eplus_bldg_wts.keys():
@@ -6136,12 +6501,15 @@ class Measure(object):
                         "to ensure that 8760 data values are available for "
                         "this microsegment. Setting base load values to zero.")
                     # Set unexpected length to 8760 zeros and continue
-                    base_load_hourly = [0] * 8760
+                    base_load_hourly = numpy.zeros(8760)
+                else:
+                    base_load_hourly = numpy.asarray(
+                        base_load_hourly, dtype=float)
                 # Ensure that retrieved baseline load data sum to 1, unless
                 # the data are all zeros (occurs for mobile homes in DC in
                 # 2024 end use load data)
-                elif round(numpy.nansum(base_load_hourly), 2) != 1 and any([
-                        x != 0 for x in base_load_hourly]):
+                if round(numpy.nansum(base_load_hourly), 2) != 1 and \
+                        numpy.any(base_load_hourly != 0):
                     warnings.warn(
                         "Baseline load data do not sum to 1 ("
                         f"{round(sum(base_load_hourly), 2)}) for end use {mskeys[4]}, "
@@ -6150,10 +6518,10 @@ class Measure(object):
                         "to ensure that 8760 values are correct for "
                         "this microsegment. Setting base load values to zero.")
                     # Set unexpected value to 8760 zeros and continue
-                    base_load_hourly = [0] * 8760
+                    base_load_hourly = numpy.zeros(8760)
 
                 # Initialize efficient load shape as equal to base load
-                eff_load_hourly = copy.deepcopy(base_load_hourly)
+                eff_load_hourly = base_load_hourly.copy()
 
                 # Loop through all time-varying efficiency features in sorted
                 # order, applying each successively to the base load shape
@@ -6218,10 +6586,10 @@ class Measure(object):
                     except (TypeError, KeyError):
                         applicable_hrs = list(range(0, 24))
 
-                    # Set enumerate object for applicable day/hour ranges
-                    enumerate_list = list(
-                        enumerate(itertools.product(
-                            range(365), range(24))))
+                    # Flag the hours of the year that fall within the
+                    # applicable day and hour ranges
+                    in_days = numpy.isin(hr_day, applicable_days)
+                    in_hrs = numpy.isin(hr_hour, applicable_hrs)
 
                     # Apply time-varying impacts based on type of time-varying
                     # efficiency feature(s) specified for the measure
@@ -6239,17 +6607,24 @@ class Measure(object):
                             rel_save_tsv = 0
                         # Reflect the shed impacts on efficient load shape
                         # across all relevant hours of the year
-                        eff_load_hourly = [base_load_hourly[i] * (
-                            1 - rel_save_tsv) if (
-                            x in applicable_days and y in applicable_hrs) else
-                            eff_load_hourly[i] for
-                            i, (x, y) in enumerate_list]
+                        eff_load_hourly = numpy.where(
+                            in_days & in_hrs,
+                            base_load_hourly * (1 - rel_save_tsv),
+                            eff_load_hourly)
                     # "Shift" time-varying efficiency features move a certain
                     # percentage of baseline load from one time period into
                     # another time period
                     elif "shift" in a:
                         # Set the number of hours earlier to shift the load
                         offset_hrs = tsv_adjustments[a]["offset_hrs_earlier"]
+                        # Hour of the year to pull shifted load from, and
+                        # hour of the first day to pull shifted load from
+                        # when that hour falls past the end of the year
+                        shift_inds = hr_inds + offset_hrs
+                        wrap_inds = hr_hour + offset_hrs - 24
+                        # Flag hours with shifted load that is pulled from
+                        # within the year and applicable day range
+                        in_yr = (shift_inds <= 8759) & in_days
                         # If the user has not specified a time range for the
                         # load shifting, assume the measure shifts the entire
                         # load shape earlier by the number of hours set above
@@ -6258,12 +6633,8 @@ class Measure(object):
                             # across all 8760 hours of the year; the initial
                             # efficient load in hour X is now the load in hour
                             # X minus user-specified hour offset
-                            eff_load_hourly = [
-                                base_load_hourly[i + offset_hrs] if ((
-                                    i + offset_hrs) <= 8759 and
-                                    x in applicable_days) else
-                                base_load_hourly[(y + offset_hrs) - 24] for
-                                i, (x, y) in enumerate_list]
+                            eff_load_hourly = base_load_hourly[
+                                numpy.where(in_yr, shift_inds, wrap_inds)]
                         # If the user has specified a time range for the load
                         # shifting, shift the load in accordance with range
                         else:
@@ -6293,46 +6664,29 @@ class Measure(object):
                                     list(range(new_start, 24)) + \
                                     list(range(0, new_end + 1))
 
+                            # Flag hours that fall within the range to shift
+                            # load to
+                            in_shift_hrs = numpy.isin(hr_hour, hrs_to_shift_to)
+                            # Load moved into each hour from X hours later,
+                            # where X is determined by the "offset_hours"
+                            # parameter
+                            load_shifted = base_load_hourly[numpy.where(
+                                in_yr, numpy.minimum(shift_inds, 8759),
+                                wrap_inds)] * rel_save_tsv
+
                             # Reflect load shifting impacts on efficient load
-                            # shape across all 8670 hours of the year; take the
+                            # shape across all 8760 hours of the year; take the
                             # user-specified % of load in the user-specified
-                            # hour range and move it X hours earlier, where X
-                            # is determined by the "offset_hours" parameter
-                            eff_load_hourly = [
-                                    (base_load_hourly[i] + (
-                                        base_load_hourly[
-                                            i + offset_hrs] *
-                                        rel_save_tsv)) if (
-                                        ((i + offset_hrs) <= 8759 and
-                                         x in applicable_days)
-                                        and y in hrs_to_shift_to and
-                                        y not in applicable_hrs) else
-                                    (base_load_hourly[i] * (
-                                      1 - rel_save_tsv) + (base_load_hourly[
-                                        i + offset_hrs] *
-                                        rel_save_tsv)) if (
-                                        ((i + offset_hrs) <= 8759 and
-                                         x in applicable_days)
-                                        and y in hrs_to_shift_to and
-                                        y in applicable_hrs) else
-                                    (base_load_hourly[i] +
-                                     base_load_hourly[
-                                        (y + offset_hrs) - 24] * rel_save_tsv)
-                                    if (y in hrs_to_shift_to and
-                                        y not in applicable_hrs and
-                                        x in applicable_days) else
-                                    (base_load_hourly[i] * (
-                                        1 - rel_save_tsv) + base_load_hourly[
-                                        (y + offset_hrs) - 24] * rel_save_tsv)
-                                    if (y in hrs_to_shift_to and
-                                        y in applicable_hrs and
-                                        x in applicable_days) else
-                                    eff_load_hourly[i] * (
-                                        1 - rel_save_tsv) if (
-                                        y in applicable_hrs and
-                                        x in applicable_days) else
-                                    eff_load_hourly[i] for i, (x, y) in
-                                    enumerate_list]
+                            # hour range and move it X hours earlier
+                            eff_load_hourly = numpy.select([
+                                in_days & in_shift_hrs & ~in_hrs,
+                                in_days & in_shift_hrs & in_hrs,
+                                in_days & in_hrs], [
+                                base_load_hourly + load_shifted,
+                                base_load_hourly * (1 - rel_save_tsv) +
+                                load_shifted,
+                                eff_load_hourly * (1 - rel_save_tsv)],
+                                default=eff_load_hourly)
 
                     # "Shape" time-sensitive efficiency features reshape
                     # the baseline load shape in accordance with custom load
@@ -6350,12 +6704,10 @@ class Measure(object):
                                 tsv_adjustments[a]["custom_daily_savings"]
                             # Reflect custom load savings in efficient load
                             # shape
-                            eff_load_hourly = [
-                                base_load_hourly[i] * (
-                                    1 - custom_save_shape[y]) if (
-                                    x in applicable_days) else
-                                eff_load_hourly[i] for
-                                i, (x, y) in enumerate_list]
+                            eff_load_hourly = numpy.where(
+                                in_days, base_load_hourly * (1 - numpy.asarray(
+                                    custom_save_shape)[hr_hour]),
+                                eff_load_hourly)
 
                         # Custom annual load savings shape information contains
                         # savings fractions for all 8760 hours of the year
@@ -6428,28 +6780,26 @@ class Measure(object):
                                 # baseline load shape that is specific to the
                                 # measure in question, which the measure load
                                 # shape is calculated relative to in input CSVs
-                                meas_base_adj = [(
+                                base_valid = numpy.isfinite(base_load_hourly) & (
+                                    base_load_hourly != 0)
+                                meas_base_adj = numpy.ones(8760)
+                                meas_base_adj[base_valid] = numpy.asarray(
                                     custom_hr_save_shape[
-                                        "CSV base frac. annual"][x] /
-                                    base_load_hourly[x]) if (
-                                        numpy.isfinite(base_load_hourly[x]) and
-                                        base_load_hourly[x] != 0) else 1
-                                    for x in range(8760)]
+                                        "CSV base frac. annual"],
+                                    dtype=float)[base_valid] / \
+                                    base_load_hourly[base_valid]
                                 # Pull in relative hourly savings fractions to
                                 # apply to baseline to get to efficient shape
-                                hr_chg = custom_hr_save_shape[
-                                    "CSV relative change"]
+                                hr_chg = numpy.asarray(custom_hr_save_shape[
+                                    "CSV relative change"], dtype=float)
                                 # Apply hourly baseline adjustment and relative
                                 # load change to derive efficient shape
-                                eff_load_hourly = [(
-                                    base_load_hourly[x] * meas_base_adj[x] *
-                                    hr_chg[x]) for x in range(8760)]
+                                eff_load_hourly = \
+                                    base_load_hourly * meas_base_adj * hr_chg
                                 # Ensure all efficient load fractions are
                                 # greater than zero
-                                eff_load_hourly = [
-                                    eff_load_hourly[x] if
-                                    eff_load_hourly[x] >= 0
-                                    else 0 for x in range(8760)]
+                                eff_load_hourly = numpy.where(
+                                    eff_load_hourly >= 0, eff_load_hourly, 0)
                         else:
                             # Throw an error if the load reshaping operation
                             # name is invalid
@@ -6469,24 +6819,18 @@ class Measure(object):
                 # energy to reflect baseline hourly load shape plus effects of
                 # time-sensitive measure features on the baseline load (if any)
                 if opts.sect_shapes is True:
-                    # Base load weighted by contribution of climate for load
-                    # to EMM region
-                    base_ls_wt = [
-                        x * emm_adj_wt for x in base_load_hourly]
-                    # Efficient load weighted by contribution of climate for
-                    # load to current EMM region
-                    eff_ls_wt = [
-                        x * emm_adj_wt for x in eff_load_hourly]
-                    # Add to existing base load fractions (across all climates
-                    # that overlap with the current EMM region)
-                    energy_base_shape = [
-                        energy_base_shape[x] + base_ls_wt[x] for
-                        x in range(len(energy_base_shape))]
-                    # Add to existing efficient load fractions (across all
-                    # climates that overlap with the current EMM region)
-                    energy_eff_shape = [
-                        energy_eff_shape[x] + eff_ls_wt[x] for
-                        x in range(len(energy_eff_shape))]
+                    # Add base load weighted by contribution of climate for
+                    # load to EMM region to existing base load fractions
+                    # (across all climates that overlap with the current EMM
+                    # region)
+                    energy_base_shape = \
+                        energy_base_shape + base_load_hourly * emm_adj_wt
+                    # Add efficient load weighted by contribution of climate
+                    # for load to EMM region to existing efficient load
+                    # fractions (across all climates that overlap with the
+                    # current EMM region)
+                    energy_eff_shape = \
+                        energy_eff_shape + eff_load_hourly * emm_adj_wt
 
                 # Further adjust baseline and efficient load shapes
                 # to account for time sensitive valuation (TSV) output metrics
@@ -6607,23 +6951,21 @@ class Measure(object):
                     # Adjust the baseline and efficient loads to reflect
                     # only the hourly values that fall within the applicable
                     # hour and day ranges from above; set all inapplicable
-                    # values to zero (to maintain full 8760 list length)
-                    base_load_hourly, eff_load_hourly = [[
-                        (x[i] / avg_len) if (
-                            (d + 1) in tsv_metrics_days and
-                            (h + 1) in tsv_metrics_hrs)
-                        else 0 for
-                        i, (d, h) in
-                        self.handyvars.tsv_metrics_data["hourly index"]] for
-                        x in [base_load_hourly, eff_load_hourly]]
+                    # values to zero (to maintain full 8760 array length); the
+                    # applicable hours are flagged on a days x 24 hours grid
+                    in_tsv_mets = (numpy.isin(
+                        numpy.arange(1, 366), tsv_metrics_days)[:, None] &
+                        numpy.isin(numpy.arange(1, 25), tsv_metrics_hrs)
+                    ).ravel()
+                    base_load_hourly, eff_load_hourly = [numpy.where(
+                        in_tsv_mets, x / avg_len, 0) for x in [
+                        base_load_hourly, eff_load_hourly]]
 
                 # Sum across all 8760 hourly baseline and efficient load
                 # values to arrive at final factor used to rescale
                 # annually-determined energy totals
-                energy_scale_base += numpy.sum([
-                    x * emm_adj_wt for x in base_load_hourly])
-                energy_scale_eff += numpy.sum([
-                    x * emm_adj_wt for x in eff_load_hourly])
+                energy_scale_base += numpy.sum(base_load_hourly * emm_adj_wt)
+                energy_scale_eff += numpy.sum(eff_load_hourly * emm_adj_wt)
 
         # Finalize carbon/cost scaling factor variables, but only if
         # either measure TSV features are present or the user desires
@@ -6634,26 +6976,28 @@ class Measure(object):
             # Calculate baseline/efficient cost rescaling factors as the sums
             # of the hourly baseline/efficient load shape multiplied by the
             # hourly price scaling factors; calculate across available
-            # projection years for the price scaling factors
-            for yr in cost_scale_base.keys():
-                cost_scale_base[yr] += numpy.sum([
-                    x * y for x, y in zip(
-                        base_load_hourly, cost_fact_hourly[yr])])
-                cost_scale_eff[yr] += numpy.sum([
-                    x * y for x, y in zip(
-                        eff_load_hourly, cost_fact_hourly[yr])])
+            # projection years for the price scaling factors, stacked as a
+            # years x 8760 array
+            cost_yrs = list(cost_scale_base.keys())
+            cost_fact_yrs = numpy.array([cost_fact_hourly[yr] for yr in cost_yrs])
+            for yr, base_sum, eff_sum in zip(cost_yrs, *[numpy.sum(
+                    cost_fact_yrs * x, axis=1) for x in [
+                    base_load_hourly, eff_load_hourly]]):
+                cost_scale_base[yr] += base_sum
+                cost_scale_eff[yr] += eff_sum
 
             # Calculate baseline/efficient emissions rescaling factors as the
             # sums of the hourly baseline/efficient load shape multiplied by
             # the hourly emissions scaling factors; calculate across available
-            # projection years for the emissions scaling factors
-            for yr in carb_scale_base.keys():
-                carb_scale_base[yr] += numpy.sum([
-                    x * y for x, y in zip(
-                        base_load_hourly, carbon_fact_hourly[yr])])
-                carb_scale_eff[yr] += numpy.sum([
-                    x * y for x, y in zip(
-                        eff_load_hourly, carbon_fact_hourly[yr])])
+            # projection years for the emissions scaling factors, stacked as a
+            # years x 8760 array
+            carb_yrs = list(carb_scale_base.keys())
+            carb_fact_yrs = numpy.array([carbon_fact_hourly[yr] for yr in carb_yrs])
+            for yr, base_sum, eff_sum in zip(carb_yrs, *[numpy.sum(
+                    carb_fact_yrs * x, axis=1) for x in [
+                    base_load_hourly, eff_load_hourly]]):
+                carb_scale_base[yr] += base_sum
+                carb_scale_eff[yr] += eff_sum
 
             # Extend price/emissions factors across all years in the AEO time
             # horizon
@@ -6712,7 +7056,7 @@ class Measure(object):
         # system that wasn't there before)
         if self.fuel_switch_to == "electricity" and \
                 "electricity" not in mskeys and opts.sect_shapes is True:
-            energy_base_shape = [0 for x in range(len(energy_base_shape))]
+            energy_base_shape = numpy.zeros(len(energy_base_shape))
 
         # Return hourly fractions of annual baseline and efficient energy
         # if sector-level load shape information is desired by the user
@@ -8363,10 +8707,10 @@ class Measure(object):
                 self.handyvars.full_dat_out[adopt_scheme] and yr in
                 self.handyvars.aeo_years_summary) and \
                     tsv_shapes is not None:
-                self.sector_shapes[adopt_scheme][mskeys[1]][yr]["baseline"] = [
+                self.sector_shapes[adopt_scheme][mskeys[1]][yr]["baseline"] = \
                     self.sector_shapes[adopt_scheme][mskeys[1]][yr][
-                        "baseline"][x] + tsv_shapes["baseline"][x] *
-                    (energy_total[yr] / tsv_energy_base) for x in range(8760)]
+                        "baseline"] + numpy.asarray(tsv_shapes["baseline"]) * (
+                        energy_total[yr] / tsv_energy_base)
             elif (calc_sect_shapes is True and
                   self.handyvars.full_dat_out[adopt_scheme] and
                   yr in self.handyvars.aeo_years_summary) and \
@@ -8793,23 +9137,21 @@ class Measure(object):
                 if self.fuel_switch_to == "electricity" and \
                         "electricity" not in mskeys:
                     self.sector_shapes[adopt_scheme][mskeys[1]][yr][
-                        "efficient"] = [self.sector_shapes[adopt_scheme][
-                            mskeys[1]][yr]["efficient"][x] + ((
+                        "efficient"] = self.sector_shapes[adopt_scheme][
+                            mskeys[1]][yr]["efficient"] + ((
                                 energy_tot_comp_meas +
-                                energy_tot_uncomp_meas) / tsv_energy_eff) *
-                            tsv_shapes["efficient"][x]
-                        for x in range(8760)]
+                                energy_tot_uncomp_meas) / tsv_energy_eff) * \
+                        numpy.asarray(tsv_shapes["efficient"])
                 else:
                     self.sector_shapes[adopt_scheme][mskeys[1]][yr][
-                        "efficient"] = [self.sector_shapes[adopt_scheme][
-                            mskeys[1]][yr]["efficient"][x] + ((
+                        "efficient"] = self.sector_shapes[adopt_scheme][
+                            mskeys[1]][yr]["efficient"] + ((
                                 energy_tot_comp_meas +
-                                energy_tot_uncomp_meas) / tsv_energy_eff) *
-                            tsv_shapes["efficient"][x] + ((
-                                energy_tot_comp_base +
-                                energy_tot_uncomp_base) / tsv_energy_base) *
-                            tsv_shapes["baseline"][x]
-                        for x in range(8760)]
+                                energy_tot_uncomp_meas) / tsv_energy_eff) * \
+                        numpy.asarray(tsv_shapes["efficient"]) + ((
+                            energy_tot_comp_base +
+                            energy_tot_uncomp_base) / tsv_energy_base) * \
+                        numpy.asarray(tsv_shapes["baseline"])
             # Anticipate and handle case with base carbon intensity of zero for
             # electricity; in this case, assume the measure and baseline
             # intensity is the same (zero intensity is only possible for
@@ -9486,15 +9828,15 @@ class Measure(object):
 
         # Fill out an 'all' region input
         if self.climate_zone == 'all' or 'all' in self.climate_zone:
-            self.climate_zone = self.handyvars.in_all_map["climate_zone"]
+            self.climate_zone = list(self.handyvars.in_all_map["climate_zone"])
         # Fill out 'warm climates' or 'cold climates' region input'
         elif any([self.climate_zone == x or x in self.climate_zone for x in
                   self.handyvars.warm_cold_regs.keys()]):
             # Case where a single warm/cold climate string is provided; key in
             # full warm/cold climate list directly by string
             if isinstance(self.climate_zone, str):
-                self.climate_zone = \
-                    self.handyvars.warm_cold_regs[self.climate_zone]
+                self.climate_zone = list(
+                    self.handyvars.warm_cold_regs[self.climate_zone])
             # Case where region input is formatted as list
             else:
                 # Find which of the warm/cold climate strings is present
@@ -9508,8 +9850,8 @@ class Measure(object):
                 # Otherwise, key in either the full warm or full cold climate
                 # lists
                 else:
-                    self.climate_zone = \
-                        self.handyvars.warm_cold_regs[wrm_cld_key[0]]
+                    self.climate_zone = list(
+                        self.handyvars.warm_cold_regs[wrm_cld_key[0]])
 
         # Fill out a performance input that is resolved by warm/cold climates
         if isinstance(self.energy_efficiency["primary"], dict) and all(
@@ -9535,7 +9877,8 @@ class Measure(object):
 
         # Fill out an 'all' structure type input
         if self.structure_type == 'all' or 'all' in self.structure_type:
-            self.structure_type = self.handyvars.in_all_map["structure_type"]
+            self.structure_type = list(
+                self.handyvars.in_all_map["structure_type"])
 
         # Fill out an 'all' building type, fuel type, end use, and/or
         # technology input. Note that these attributes are affected by whether
@@ -10287,12 +10630,32 @@ class Measure(object):
 
         return cmsegs
 
-    def rand_list_gen(self, distrib_info, nsamples):
+    def gen_rand_seed(self):
+        """Set the seed for sampling probability distributions on measure inputs.
+
+        Returns:
+            Integer seed that is derived from the user-specified random seed
+            and the measure name, such that samples for a given measure are
+            reproducible regardless of the order in which measures are
+            prepared; if no seed is specified by the user, a random seed.
+        """
+        if self.handyvars.rand_seed is not None:
+            seed_seq = numpy.random.SeedSequence([
+                self.handyvars.rand_seed, int(hashlib.sha256(
+                    self.name.encode("utf-8")).hexdigest()[:8], 16)])
+        else:
+            seed_seq = numpy.random.SeedSequence()
+
+        return int(seed_seq.generate_state(1)[0])
+
+    def rand_list_gen(self, distrib_info, nsamples, rnd_gen=None):
         """Generate N samples from a given probability distribution.
 
         Args:
             distrib_info (list): Distribution type and parameters.
             nsamples (int): Number of samples to draw from distribution.
+            rnd_gen (numpy.random.Generator): Random number generator to
+                draw samples with; if None, a randomly seeded generator.
 
         Returns:
             Numpy array of samples from the input distribution.
@@ -10300,29 +10663,31 @@ class Measure(object):
         Raises:
             ValueError: When unsupported probability distribution is present.
         """
+        if rnd_gen is None:
+            rnd_gen = numpy.random.default_rng()
         # Generate a list of randomly generated numbers using the
         # distribution name and parameters provided in "distrib_info".
         # Check that the correct number of parameters is specified for
         # each distribution.
         if len(distrib_info) == 3 and distrib_info[0] == "normal":
-            rand_list = numpy.random.normal(distrib_info[1],
-                                            distrib_info[2], nsamples)
+            rand_list = rnd_gen.normal(distrib_info[1],
+                                       distrib_info[2], nsamples)
         elif len(distrib_info) == 3 and distrib_info[0] == "lognormal":
-            rand_list = numpy.random.lognormal(distrib_info[1],
-                                               distrib_info[2], nsamples)
+            rand_list = rnd_gen.lognormal(distrib_info[1],
+                                          distrib_info[2], nsamples)
         elif len(distrib_info) == 3 and distrib_info[0] == "uniform":
-            rand_list = numpy.random.uniform(distrib_info[1],
-                                             distrib_info[2], nsamples)
+            rand_list = rnd_gen.uniform(distrib_info[1],
+                                        distrib_info[2], nsamples)
         elif len(distrib_info) == 3 and distrib_info[0] == "gamma":
-            rand_list = numpy.random.gamma(distrib_info[1],
-                                           distrib_info[2], nsamples)
+            rand_list = rnd_gen.gamma(distrib_info[1],
+                                      distrib_info[2], nsamples)
         elif len(distrib_info) == 3 and distrib_info[0] == "weibull":
-            rand_list = numpy.random.weibull(distrib_info[1], nsamples)
+            rand_list = rnd_gen.weibull(distrib_info[1], nsamples)
             rand_list = distrib_info[2] * rand_list
         elif len(distrib_info) == 4 and distrib_info[0] == "triangular":
-            rand_list = numpy.random.triangular(distrib_info[1],
-                                                distrib_info[2],
-                                                distrib_info[3], nsamples)
+            rand_list = rnd_gen.triangular(distrib_info[1],
+                                           distrib_info[2],
+                                           distrib_info[3], nsamples)
         else:
             raise ValueError(
                 "Unsupported input distribution specification for ECM '" +
@@ -11213,8 +11578,8 @@ class MeasurePackage(Measure):
             # competition scheme in run.py)
             if not self.sector_shapes and m.sector_shapes:
                 self.sector_shapes = {
-                    a_s: {reg: {yr: {"baseline": [0 for n in range(8760)],
-                                     "efficient": [0 for n in range(8760)]} for
+                    a_s: {reg: {yr: {"baseline": numpy.zeros(8760),
+                                     "efficient": numpy.zeros(8760)} for
                                 yr in self.handyvars.aeo_years_summary} for
                           reg in self.climate_zone}
                     for a_s in self.handyvars.adopt_schemes_run}
@@ -11278,7 +11643,7 @@ class MeasurePackage(Measure):
                             else:
                                 fs_eff_splt = None
                             # Convert mseg string to list for further calcs.
-                            key_list = literal_eval(cm)
+                            key_list = MsegKey.from_str(cm)
                             # Add to initial annual electricity use that
                             # concerns the measure's sector shape, before
                             # package adjustments
@@ -11380,7 +11745,7 @@ class MeasurePackage(Measure):
                     else:
                         fs_eff_splt = None
                     # Convert mseg string to list for further calcs.
-                    key_list = literal_eval(cm)
+                    key_list = MsegKey.from_str(cm)
                     # Further adjust equipment msegs to account for
                     # overlapping envelope performance improvements
                     msegs_meas_fin[cm], mseg_out_break_fin = \
@@ -11453,18 +11818,17 @@ class MeasurePackage(Measure):
                 # information to account for overlaps with other measures in
                 # the package and add to the overall package sector shape
                 if sect_shp_e_fin:
-                    self.sector_shapes[adopt_scheme] = {reg: {yr: {s: [
+                    self.sector_shapes[adopt_scheme] = {reg: {yr: {s: (
                         # Add in measure sector shape data, adjusted to
                         # account for any changes in annual electricity use
                         # after packaging, to the package sector shape
-                        self.sector_shapes[adopt_scheme][reg][yr][s][x] +
-                        m[adopt_scheme]["sect_shp_orig"][
-                            adopt_scheme][reg][yr][s][x] * (
+                        self.sector_shapes[adopt_scheme][reg][yr][s] +
+                        numpy.asarray(m[adopt_scheme]["sect_shp_orig"][
+                            adopt_scheme][reg][yr][s]) * (
                             (m[adopt_scheme]["sect_shp_e_fin"][reg][yr][s] /
                              m[adopt_scheme]["sect_shp_e_init"][reg][yr][s]
                              ) if m[adopt_scheme][
-                                "sect_shp_e_fin"][reg][yr][s] != 0 else 1)
-                        for x in range(8760)]
+                                "sect_shp_e_fin"][reg][yr][s] != 0 else 1))
                         for s in ["baseline", "efficient"]}
                         for yr in self.handyvars.aeo_years_summary}
                         # Ensure that only package regions concerning currently
@@ -11477,12 +11841,16 @@ class MeasurePackage(Measure):
         for adopt_scheme in self.handyvars.adopt_schemes_prep:
             # Loop through all contributing microsegments for the packaged
             # measure and add to the packaged master microsegment
-            for k in (self.markets[adopt_scheme]["mseg_adjust"][
-                    "contributing mseg keys and values"].keys()):
+            contrib_msegs = list(self.markets[adopt_scheme]["mseg_adjust"][
+                "contributing mseg keys and values"].values())
+            if contrib_msegs:
+                master_sum = KeyValTree(contrib_msegs[0], keys=self.markets[
+                    adopt_scheme]["master_mseg"].keys())
+                for cm in contrib_msegs[1:]:
+                    master_sum.add(cm)
                 self.add_keyvals(
                     self.markets[adopt_scheme]["master_mseg"],
-                    self.markets[adopt_scheme]["mseg_adjust"][
-                        "contributing mseg keys and values"][k])
+                    master_sum.to_dict())
             # Set measures to use in calculating average package lifetimes: all
             # non add-on equipment measures if non add-ons are part of package,
             # and otherwise all add-on measures
@@ -11584,7 +11952,7 @@ class MeasurePackage(Measure):
                         self.htcl_overlaps[adopt_scheme]["keys"].append(cm_key)
                         # Translate the contributing microsegment key (which
                         # is in string format) to list format
-                        keys = literal_eval(cm_key)
+                        keys = MsegKey.from_str(cm_key)
                         # Pull out region, building type/vintage,
                         # fuel type, and end use from the key list
                         cm_key_match = [str(x) for x in [
@@ -13347,6 +13715,9 @@ class MeasurePackage(Measure):
 class ECMPrep():
     """Methods to generate and alter Measure and MeasurePackage instances"""
 
+    # Read-only measure preparation inputs set in each parallel worker process
+    worker_inputs = None
+
     @staticmethod
     def prepare_measures(measures, convert_data, msegs, msegs_cpl, handyvars,
                          handyfiles, cbecs_sf_byvint, tsv_data, base_dir, opts,
@@ -13407,13 +13778,21 @@ class ECMPrep():
         # preparation due to Exceptions
         remove_inds = []
 
+        # When multiple workers are requested, check and fill the markets of each measure
+        # in a pool of worker processes
+        if opts is not None and getattr(opts, "workers", 1) > 1 and len(meas_update_objs) > 1:
+            return ECMPrep.prepare_measures_parallel(
+                meas_update_objs, convert_data, msegs, msegs_cpl, handyvars, handyfiles,
+                tsv_data, opts, ctrb_ms_pkg_prep, tsv_data_nonfs)
+
         # Check that all Measure objects have valid market inputs before proceeding
         for m_ind, m in enumerate(meas_update_objs):
             # Try/except allows continuation past malformed ECMs
             try:
                 # Check that the measure's applicable baseline market input definitions
                 # are valid before attempting to retrieve data on this baseline market
-                m.check_meas_inputs()
+                with profiler.stage("check_meas_inputs", m.name):
+                    m.check_meas_inputs()
             except Exception:
                 ECMPrepHelper.prep_error(m.name, handyvars, handyfiles)
                 # Add measure index to removal list
@@ -13423,9 +13802,10 @@ class ECMPrep():
         for m_ind, m in enumerate(meas_update_objs):
             # Try/except allows continuation when individual ECMs error
             try:
-                m.fill_mkts(
-                    msegs, msegs_cpl, convert_data, tsv_data, opts,
-                    ctrb_ms_pkg_prep, tsv_data_nonfs)
+                with profiler.stage("fill_mkts", m.name):
+                    m.fill_mkts(
+                        msegs, msegs_cpl, convert_data, tsv_data, opts,
+                        ctrb_ms_pkg_prep, tsv_data_nonfs)
             except Exception:
                 ECMPrepHelper.prep_error(m.name, handyvars, handyfiles)
                 # Add measure index to removal list
@@ -13435,9 +13815,123 @@ class ECMPrep():
         meas_update_objs = [
             m for m_ind, m in enumerate(meas_update_objs) if
             m_ind not in remove_inds]
+        profiler.count("measures prepared", len(meas_update_objs))
 
         return meas_update_objs
 
+    @staticmethod
+    def prepare_measures_parallel(meas_update_objs, convert_data, msegs, msegs_cpl, handyvars,
+                                  handyfiles, tsv_data, opts, ctrb_ms_pkg_prep, tsv_data_nonfs):
+        """Check inputs for and fill markets of initialized measures across worker processes.
+
+        Note:
+            Large read-only inputs (baseline microsegments, cost/performance/lifetime data,
+            TSV data, and cost conversion data) are handed to each worker once at pool start-up
+            rather than with each measure; where the 'fork' start method is available these
+            inputs are inherited from the parent process without copying. Prepared measures
+            are returned in the same order as the input measures.
+
+        Args:
+            meas_update_objs (list): Initialized Measure objects to prepare.
+            convert_data (dict): Measure cost unit conversion data.
+            msegs (dict): Baseline microsegment stock and energy use.
+            msegs_cpl (dict): Baseline technology cost, performance, and lifetime.
+            handyvars (object): Global variables of use across Measure methods.
+            handyfiles (object): Input files of use across Measure methods.
+            tsv_data (dict): Data needed for time sensitive efficiency valuation.
+            opts (object): Stores user-specified execution options.
+            ctrb_ms_pkg_prep (list): Names of measures that contribute to pkgs.
+            tsv_data_nonfs (dict): If applicable, base-case TSV data to apply to
+                non-fuel switching measures under a high decarb. scenario.
+
+        Returns:
+            List of prepared Measure objects, excluding measures that raised exceptions.
+        """
+        shared_inputs = {
+            "msegs": msegs, "msegs_cpl": msegs_cpl, "convert_data": convert_data,
+            "tsv_data": tsv_data, "opts": opts, "ctrb_ms_pkg_prep": ctrb_ms_pkg_prep,
+            "tsv_data_nonfs": tsv_data_nonfs, "handyvars": handyvars}
+        # Detach the global variables shared across measures so that they are not pickled
+        # alongside each measure sent to/returned from the workers; workers re-attach their
+        # own copy of these variables (see prep_measure_worker)
+        for m in meas_update_objs:
+            m.handyvars.shared = None
+        # Use the 'fork' start method on Linux so that workers share the inputs above with the
+        # parent process; otherwise fall back on the platform default start method
+        if sys.platform.startswith("linux"):
+            mp_context = multiprocessing.get_context("fork")
+        else:
+            mp_context = None
+        n_workers = min(opts.workers, len(meas_update_objs))
+        # Note that finalized baseline cost, performance, and lifetime data
+        # (handyvars.base_cpl_fin) are not shared across workers; each worker
+        # builds its own copy of these data for the measures it prepares
+        logger.info(f"Preparing {len(meas_update_objs)} ECMs across {n_workers} workers")
+        with ProcessPoolExecutor(
+                max_workers=n_workers, mp_context=mp_context,
+                initializer=ECMPrep.init_prep_worker, initargs=(shared_inputs,)) as executor:
+            # Executor map yields results in the order of the input measures
+            results = list(executor.map(ECMPrep.prep_measure_worker, meas_update_objs))
+
+        # Record errors for measures that could not be prepared and remove these measures
+        # from further preparation
+        meas_prepped_objs = []
+        for m, (m_prepped, err_dets, prof_stats) in zip(meas_update_objs, results):
+            # Add stage timings recorded by the worker to those of the parent process
+            profiler.merge(prof_stats)
+            if err_dets is not None:
+                m.handyvars.shared = handyvars
+                ECMPrepHelper.prep_error(m.name, handyvars, handyfiles, err_dets)
+            else:
+                m_prepped.handyvars.shared = handyvars
+                meas_prepped_objs.append(m_prepped)
+        profiler.count("measures prepared", len(meas_prepped_objs))
+
+        return meas_prepped_objs
+
+    @staticmethod
+    def init_prep_worker(shared_inputs):
+        """Store read-only measure preparation inputs in a worker process.
+
+        Args:
+            shared_inputs (dict): Inputs to Measure.fill_mkts shared across all measures.
+        """
+        ECMPrep.worker_inputs = shared_inputs
+        # Workers started without 'fork' do not inherit the state of the parent's profiler
+        profiler.reset(getattr(shared_inputs["opts"], "profile", False))
+
+    @staticmethod
+    def prep_measure_worker(m):
+        """Check inputs for and fill markets of a single measure in a worker process.
+
+        Args:
+            m (object): Initialized Measure object.
+
+        Returns:
+            Tuple of the prepared Measure object (None if an exception occurred), the
+            traceback of any exception that occurred (None if preparation succeeded), and the
+            stage timings recorded while preparing the measure (see StageProfiler.stats).
+        """
+        inputs = ECMPrep.worker_inputs
+        # Only report timings for the current measure back to the parent process
+        profiler.reset(profiler.enabled)
+        # Re-attach global variables that were detached before sending the measure
+        m.handyvars.shared = inputs["handyvars"]
+        try:
+            with profiler.stage("check_meas_inputs", m.name):
+                m.check_meas_inputs()
+            with profiler.stage("fill_mkts", m.name):
+                m.fill_mkts(
+                    inputs["msegs"], inputs["msegs_cpl"], inputs["convert_data"],
+                    inputs["tsv_data"], inputs["opts"], inputs["ctrb_ms_pkg_prep"],
+                    inputs["tsv_data_nonfs"])
+        except Exception:
+            return None, traceback.format_exc(), profiler.stats()
+        # Detach global variables again before returning the prepared measure
+        m.handyvars.shared = None
+
+        return m, None, profiler.stats()
+
     @staticmethod
     def prepare_packages(packages, meas_update_objs, meas_summary,
                          handyvars, handyfiles, base_dir, opts, convert_data):
@@ -13496,18 +13990,15 @@ class ECMPrep():
                             "technology_type"]
                         # Assemble folder path for measure competition data
                         meas_folder_name = handyfiles.ecm_compete_data
-                        # Assemble file name for measure competition data
-                        meas_file_name = meas_obj.name + ".pkl.gz"
                         # Load and set competition data for the missing measure object
-                        with gzip.open(meas_folder_name / meas_file_name, 'r') as zp:
-                            try:
-                                meas_comp_data = pickle.load(zp)
-                            except Exception as e:
-                                raise Exception(
-                                    "Error reading in competition data of " +
-                                    "contributing ECM '" + meas_obj.name +
-                                    "' for package '" + p["name"] + "': " +
-                                    str(e)) from None
+                        try:
+                            meas_comp_data = CompDataIO.load(meas_folder_name, meas_obj.name)
+                        except Exception as e:
+                            raise Exception(
+                                "Error reading in competition data of " +
+                                "contributing ECM '" + meas_obj.name +
+                                "' for package '" + p["name"] + "': " +
+                                str(e)) from None
                         for adopt_scheme in handyvars.adopt_schemes_prep:
                             meas_obj.markets[adopt_scheme]["master_mseg"] = \
                                 meas_summary_data[0]["markets"][adopt_scheme][
@@ -13684,6 +14175,8 @@ def main(opts: argparse.NameSpace):  # noqa: F821
 
     # Configure logger specific to ecm_prep
     ECMPrepHelper.configure_ecm_prep_logger()
+    # Start recording stage timings if requested
+    profiler.reset(getattr(opts, "profile", False))
 
     # Set current working directory
     base_dir = getcwd()
@@ -13716,19 +14209,10 @@ def main(opts: argparse.NameSpace):  # noqa: F821
     meas_toprep_package_init = ECMPrepHelper.downselect_packages(meas_toprep_package_init,
                                                                  opts.ecm_packages)
 
-    # If applicable, import file to write prepared measure sector shapes to
-    # (if file does not exist, provide empty list as substitute, since file
-    # will be created later when writing ECM data)
+    # If applicable, initialize list of prepared measure sector shapes; these
+    # are appended to any previously prepared sector shapes when writing ECM data
     if opts.sect_shapes is True:
-        try:
-            es_ss = open(handyfiles.ecm_prep_shapes, 'r')
-            try:
-                meas_shapes = json.load(es_ss)
-            except ValueError:
-                raise ValueError(f"Error reading in '{handyfiles.ecm_prep_shapes}'")
-            es_ss.close()
-        except FileNotFoundError:
-            meas_shapes = []
+        meas_shapes = []
 
     # Determine full list of individual measure JSON names
     meas_toprep_indiv_names = ECMPrepHelper.retrieve_valid_ecms(meas_toprep_package_init,
@@ -13780,18 +14264,9 @@ def main(opts: argparse.NameSpace):  # noqa: F821
                     meas_summary = meas_summary + meas_summary_env_cf_indiv
             except FileNotFoundError:
                 meas_summary_env_cf = []
-            # If applicable, import separate file that will store
-            # counterfactual package sector shape data
-            try:
-                ecf_ss = open(handyfiles.ecm_prep_env_cf, 'r')
-                try:
-                    meas_shapes_env_cf = json.load(ecf_ss)
-                except ValueError:
-                    raise ValueError(
-                        f"Error reading in '{handyfiles.ecm_prep_env_cf_shapes}'") from None
-                ecf_ss.close()
-            except FileNotFoundError:
-                meas_shapes_env_cf = []
+            # Initialize list of counterfactual package sector shape data, which
+            # are appended to a separate sector shapes file
+            meas_shapes_env_cf = []
         else:
             meas_summary_env_cf, meas_shapes_env_cf = (
                 None for n in range(2))
@@ -13799,10 +14274,28 @@ def main(opts: argparse.NameSpace):  # noqa: F821
         ctrb_ms_pkg_all, pkg_copy_flag, meas_summary_env_cf, \
             meas_shapes_env_cf = (None for n in range(4))
 
+    # Import hashes of the measure definitions and input data that previously
+    # prepared measures are based on (if the file does not exist, measures
+    # without hashes are checked for updates based on file modification times)
+    try:
+        prep_hashes = JsonIO.load_json(handyfiles.ecm_prep_hashes)
+    except FileNotFoundError:
+        prep_hashes = {}
+    # Find a combined hash of the current input data used to prepare measures,
+    # only re-reading input files whose size or modification time have changed
+    # since they were last hashed
+    ECMPrepHelper.load_file_hashes(handyfiles.file_hashes)
+    inputs_hash = ECMPrepHelper.input_files_hash(handyfiles)
+    ECMPrepHelper.dump_file_hashes(handyfiles.file_hashes)
+    # Initialize hashes of the current measure definitions
+    meas_def_hashes = {}
+
     # Import all individual measure JSONs
     for mi in meas_toprep_indiv_names:
         # Load each JSON into a dict
         meas_dict = JsonIO.load_json(handyfiles.indiv_ecms / mi)
+        # Find and record the hash of the current measure definition
+        meas_def_hashes[meas_dict["name"]] = ECMPrepHelper.meas_def_hash(meas_dict)
         try:
             # Shorthand for previously prepared measured data that match
             # current measure
@@ -13814,10 +14307,13 @@ def main(opts: argparse.NameSpace):  # noqa: F821
             # Determine whether dict should be added to list of individual
             # measure definitions to update. Add a measure dict to the list
             # requiring further preparation if: a) measure is in package
-            # (may be removed from update later) b) measure JSON time stamp
-            # indicates it has been modified since the last run of
-            # 'ecm_prep.py' c) measure name is not already included in
-            # database of prepared measure attributes ('/generated/ecm_prep.json'); d)
+            # (may be removed from update later) b) measure definition or the
+            # input data used to prepare it have changed since the measure
+            # was last prepared, based on content hashes (or, for measures
+            # without recorded hashes, measure JSON time stamp indicates it has
+            # been modified since the last run of 'ecm_prep.py') c) measure
+            # name is not already included in database of prepared measure
+            # attributes ('/generated/ecm_prep.json'); d)
             # measure does not already have competition data prepared for
             # it (in '/generated/ecm_competition_data' folder), or
             # or e) command line arguments applied to the measure are not
@@ -13827,14 +14323,20 @@ def main(opts: argparse.NameSpace):  # noqa: F821
             # on results
             compete_files = [x for x in handyfiles.ecm_compete_data.iterdir() if not
                              x.name.startswith('.')]
-            ignore_opts = ["verbose", "yaml", "ecm_directory", "ecm_files", "ecm_files_user",
-                           "ecm_packages", "ecm_files_regex"]
-            update_indiv_ecm = ((ecm_prep_exists and stat(
-                handyfiles.indiv_ecms / mi).st_mtime > stat(
-                handyfiles.ecm_prep).st_mtime) or
-                (len(match_in_prep_file) == 0 or (
+            ignore_opts = ECMPrepHelper.non_result_opts
+            prev_hashes = prep_hashes.get(meas_dict["name"])
+            if prev_hashes is not None:
+                meas_changed = (
+                    prev_hashes["definition"] != meas_def_hashes[meas_dict["name"]] or
+                    prev_hashes["inputs"] != inputs_hash)
+            else:
+                meas_changed = (ecm_prep_exists and stat(
+                    handyfiles.indiv_ecms / mi).st_mtime > stat(
+                    handyfiles.ecm_prep).st_mtime)
+            update_indiv_ecm = (
+                meas_changed or (len(match_in_prep_file) == 0 or (
                     "(CF)" not in meas_dict["name"] and all([all([
-                        x["name"] != Path(y.stem).stem for y in
+                        x["name"] != CompDataIO.meas_name(y) for y in
                         compete_files]) for
                         x in match_in_prep_file])) or
                     (opts is None and not all([all([
@@ -14135,7 +14637,7 @@ def main(opts: argparse.NameSpace):  # noqa: F821
         # costs (if applicable) than in the current run
 
         # Check for existing competition data for the package (condition b)
-        name_mask = all(m["name"] != Path(y.stem).stem for y in
+        name_mask = all(m["name"] != CompDataIO.meas_name(y) for y in
                         handyfiles.ecm_compete_data.iterdir())
         exst_ecms_mask = exst_engy_save_mask = exst_cost_red_mask = False
         exst_pkg_env_mask_1 = exst_pkg_env_mask_2 = False
@@ -14209,28 +14711,28 @@ def main(opts: argparse.NameSpace):  # noqa: F821
     # If one or more measure definition is new or has been edited, proceed
     # further with 'ecm_prep.py' routine; otherwise end the routine
     if len(meas_toprep_indiv) > 0 or len(meas_toprep_package) > 0:
-        # Import baseline microsegments
-        if opts.alt_regions in ['EMM', 'State']:  # Extract EMM/state files
-            bjszip = handyfiles.msegs_in
-            with gzip.GzipFile(bjszip, 'r') as zip_ref:
-                msegs = json.loads(zip_ref.read().decode('utf-8'))
+        # Time the loading of supporting data (if requested)
+        input_load_start = time.perf_counter()
+        # Find the regions that the measures to prepare apply to, such that
+        # baseline data are only loaded for those regions (None indicates
+        # that data for all regions are needed)
+        meas_regions = ECMPrepHelper.find_meas_regions(meas_toprep_indiv, handyvars)
+        # Import baseline microsegments, aggregating internal gains components
+        # (people + equipment only) into a single 'internal gains' node for
+        # heating/secondary heating/cooling demand microsegments
+        msegs = ECMPrepHelper.load_region_data(
+            handyfiles.msegs_in, handyfiles.msegs_store, meas_regions,
+            years_ig=handyvars.aeo_years)
+        # Import baseline cost, performance, and lifetime data; for state
+        # regions, these data are broken out by census division
+        if meas_regions is not None and handyvars.region_cpl_mapping:
+            cpl_regions = set(
+                cdiv for cdiv, states in handyvars.region_cpl_mapping.items() if
+                any([x in meas_regions for x in states]))
         else:
-            msegs = JsonIO.load_json(handyfiles.msegs_in)
-        # Aggregate internal gains components (people + equipment only)
-        # into a single 'internal gains' node for heating/secondary heating/cooling
-        # demand microsegments. This prevents downstream double counting once logic
-        # skips originals when aggregate present.
-        try:
-            msegs = ECMPrepHelper.add_internal_gains_aggregate(msegs, handyvars.aeo_years)
-            logger.info("Applied internal gains aggregation (people + equipment)")
-
-        except Exception as e:
-            logger.warning(
-                f"Internal gains aggregation failed; proceeding without aggregation: {e}")
-        # Import baseline cost, performance, and lifetime data
-        bjszip = handyfiles.msegs_cpl_in
-        with gzip.GzipFile(bjszip, 'r') as zip_ref:
-            msegs_cpl = json.loads(zip_ref.read().decode('utf-8'))
+            cpl_regions = meas_regions
+        msegs_cpl = ECMPrepHelper.load_region_data(
+            handyfiles.msegs_cpl_in, handyfiles.msegs_store, cpl_regions)
         # Import measure cost unit conversion data
         convert_data = JsonIO.load_json(handyfiles.cost_convert_in)
         # Import CBECS square footage by vintage data (used to map EnergyPlus
@@ -14325,6 +14827,8 @@ def main(opts: argparse.NameSpace):  # noqa: F821
 
         else:
             tsv_data, tsv_data_nonfs = (None for n in range(2))
+        if profiler.enabled:
+            profiler.add_stage("input load", time.perf_counter() - input_load_start)
 
         logger.info("Supporting data import complete")
 
@@ -14350,9 +14854,11 @@ def main(opts: argparse.NameSpace):  # noqa: F821
 
         # Prepare measure packages for use in analysis engine (if needed)
         if meas_toprep_package:
-            meas_prepped_objs = ECMPrep.prepare_packages(
-                meas_toprep_package, meas_prepped_objs, meas_summary,
-                handyvars, handyfiles, base_dir, opts, convert_data)
+            with profiler.stage("prepare_packages"):
+                meas_prepped_objs = ECMPrep.prepare_packages(
+                    meas_toprep_package, meas_prepped_objs, meas_summary,
+                    handyvars, handyfiles, base_dir, opts, convert_data)
+            profiler.count("packages prepared", len(meas_toprep_package))
 
         # Warn users about skipped ECMs before completing prep execution
         if len(handyvars.skipped_ecms) != 0:
@@ -14409,15 +14915,10 @@ def main(opts: argparse.NameSpace):  # noqa: F821
                 if opts.sect_shapes is True:
                     # Shorthand for measure sector shapes data object
                     m_ss = meas_prepped_shapes[m_i]
+                    # Add sector shapes for measure (replaces sector shapes
+                    # from any existing case when written)
                     if len(m_ss.keys()) != 0:
-                        # Measure has been prepared from existing case (replace
-                        # high-level data for measure)
-                        if m_ss["name"] in [x["name"] for x in meas_shapes]:
-                            [x.update(m_ss) for x in meas_shapes if
-                             x["name"] == m_ss["name"]]
-                        # Measure is new (add high-level data for measure)
-                        else:
-                            meas_shapes.append(m_ss)
+                        meas_shapes.append(m_ss)
                 # Remove measures from active list; when public health costs are assumed, only
                 # the "high" health costs versions of prepared measures remain active
                 if opts.health_costs is True and "PHC-EE (high)" not in m["name"]:
@@ -14447,6 +14948,8 @@ def main(opts: argparse.NameSpace):  # noqa: F821
         # Notify user that all measure preparations are completed
         logger.info("Writing output data...")
 
+        # Time the writing of competition data (if requested)
+        comp_write_start = time.perf_counter()
         # Write prepared measure competition data and (if applicable) efficient
         # fuel switching splits by microsegment to zipped JSONs
         for ind, m in enumerate(meas_prepped_objs):
@@ -14459,22 +14962,38 @@ def main(opts: argparse.NameSpace):  # noqa: F821
                     m.name not in ctrb_ms_pkg_prep or (
                     opts.pkg_env_costs == '1' and
                     m.technology_type["primary"][0] == "supply")):
-                # Assemble file name for measure competition data
-                meas_file_name = m.name + ".pkl.gz"
                 # Assemble folder path for measure competition data
                 comp_folder_name = handyfiles.ecm_compete_data
-                with gzip.open(comp_folder_name / meas_file_name, 'w') as zp:
-                    pickle.dump(meas_prepped_compete[ind], zp, -1)
+                CompDataIO.dump(meas_prepped_compete[ind], comp_folder_name, m.name,
+                                opts.comp_data_format)
+                profiler.count("competition data files written")
                 if len(meas_eff_fs_splt[ind].keys()) != 0:
                     # Assemble path for measure efficient fs split data
                     fs_splt_folder_name = handyfiles.ecm_eff_fs_splt_data
-                    with gzip.open(fs_splt_folder_name / meas_file_name, 'w') as zp:
-                        pickle.dump(meas_eff_fs_splt[ind], zp, -1)
-        # Write prepared high-level measure attributes data to JSON
-        JsonIO.dump_json(meas_summary, handyfiles.ecm_prep)
-        # If applicable, write sector shape data to JSON
+                    CompDataIO.dump(meas_eff_fs_splt[ind], fs_splt_folder_name, m.name,
+                                    opts.comp_data_format)
+                    profiler.count("competition data files written")
+        # Convert any previously prepared competition and efficient fuel split data
+        # that were written in a different format than the one currently selected
+        for folder in [handyfiles.ecm_compete_data, handyfiles.ecm_eff_fs_splt_data]:
+            n_converted = CompDataIO.convert(folder, opts.comp_data_format)
+            if n_converted != 0:
+                fmt.verboseprint(
+                    opts.verbose, f"Converted {n_converted} existing data files in {folder} "
+                    f"to '{opts.comp_data_format}' format", "info", logger)
+        if profiler.enabled:
+            profiler.add_stage("write competition data", time.perf_counter() - comp_write_start)
+        # Time the writing of prepared measure data (if requested)
+        prep_write_start = time.perf_counter()
+        # Write prepared high-level measure attributes data to JSON, one measure at a time
+        JsonIO.dump_json_stream(meas_summary, handyfiles.ecm_prep)
+        # If applicable, append sector shape data to binary store and
+        # optionally export all stored sector shapes to JSON
         if opts.sect_shapes is True:
-            JsonIO.dump_json(meas_shapes, handyfiles.ecm_prep_shapes)
+            SectorShapesIO.dump(meas_shapes, handyfiles.ecm_prep_shapes)
+            if opts.sect_shapes_json is True:
+                SectorShapesIO.to_json(handyfiles.ecm_prep_shapes,
+                                       handyfiles.ecm_prep_shapes.with_suffix(".json"))
 
         # Write prepared high-level counterfactual measure attributes data to
         # JSON (e.g., a separate file with data that will be used to isolate
@@ -14484,7 +15003,13 @@ def main(opts: argparse.NameSpace):  # noqa: F821
             JsonIO.dump_json(meas_summary_env_cf, handyfiles.ecm_prep_env_cf)
             # If applicable, write out envelope counterfactual sector shapes
             if opts.sect_shapes is True:
-                JsonIO.dump_json(meas_shapes_env_cf, handyfiles.ecm_prep_env_cf_shapes)
+                SectorShapesIO.dump(meas_shapes_env_cf, handyfiles.ecm_prep_env_cf_shapes)
+                if opts.sect_shapes_json is True:
+                    SectorShapesIO.to_json(
+                        handyfiles.ecm_prep_env_cf_shapes,
+                        handyfiles.ecm_prep_env_cf_shapes.with_suffix(".json"))
+        if profiler.enabled:
+            profiler.add_stage("write ecm_prep data", time.perf_counter() - prep_write_start)
 
         # Write metadata for consistent use later in the analysis engine
         glob_vars = {
@@ -14502,9 +15027,24 @@ def main(opts: argparse.NameSpace):  # noqa: F821
     else:
         logger.info("No new ECM updates available")
 
+    # Record hashes of the definitions and input data for all measures that
+    # are currently prepared; exclude measures that could not be prepared
+    # such that these are checked for updates again in subsequent runs
+    for meas_name, def_hash in meas_def_hashes.items():
+        if meas_name in handyvars.skipped_ecms:
+            prep_hashes.pop(meas_name, None)
+        else:
+            prep_hashes[meas_name] = {"definition": def_hash, "inputs": inputs_hash}
+    JsonIO.dump_json(prep_hashes, handyfiles.ecm_prep_hashes)
+
     # Write lists of active/inactive measures to be used in the analysis engine
     JsonIO.dump_json(run_setup, handyfiles.run_setup)
 
+    # Write the profile of stage timings, counts, and peak memory, if requested
+    if profiler.enabled:
+        profiler.write(handyfiles.ecm_prep_profile)
+        logger.info(f"Wrote ecm_prep profile to {handyfiles.ecm_prep_profile}")
+
 
 if __name__ == "__main__":
     start_time = time.time()
@@ -4,6 +4,11 @@ import warnings
 import re
 from scout.config import Config, FilePaths as fp
 
+# User options that have no bearing on prepared measure or analysis results
+non_result_opts = ["verbose", "workers", "comp_data_format", "yaml", "ecm_directory", "ecm_files",
+                   "ecm_files_user", "ecm_packages", "ecm_files_regex", "profile",
+                   "sect_shapes_json"]
+
 
 def ecm_args(args: list = None) -> argparse.NameSpace:  # noqa: F821
     """Parse arguments for ecm_prep.py
@@ -191,6 +196,11 @@ def translate_inputs(opts: argparse.NameSpace) -> argparse.NameSpace:  # noqa: F
         warnings.warn(
             f"WARNING: Analysis regions were set to EMM to allow {warn_text}; "  # noqa: E702
             "ensure that ECM data reflect these EMM regions")
+    if opts.sect_shapes_json and not opts.sect_shapes:
+        opts.sect_shapes_json = False
+        warnings.warn(
+            "WARNING: argument sect_shapes_json was provided without sect_shapes and is not "
+            "applicable, argument will be ignored")
     # Set time-sensitive efficiency values
     if opts.tsv_average_days and (opts.tsv_power_agg != "average" and opts.tsv_type == "power"):
         opts.tsv_average_days = None
@@ -20,6 +20,8 @@ class UsefulVars(object):
         discount_rate (float): Rate to use in discounting costs/savings.
         nsamples (int): Number of samples to draw from probability distribution
             on measure inputs.
+        rand_seed (int or NoneType): User-specified seed for sampling
+            probability distributions on measure inputs.
         regions (string): User region settings.
         aeo_years (list): Modeling time horizon.
         aeo_years_summary (list): Reduced set of snapshot years in the horizon.
@@ -77,6 +79,11 @@ class UsefulVars(object):
             in cases where the conversion is expected (e.g., EER to COP).
         sf_to_house (dict): Stores information for mapping stock units in
             sf to number of households, as applicable.
+        base_cpl_fin (dict): Stores finalized baseline cost, performance, and
+            lifetime data by building sector and microsegment key chain, such
+            that these data are shared by all measures that apply to the same
+            baseline microsegment (see Measure.fin_base_cpl); when measures
+            are prepared in parallel, each worker process fills its own copy.
         com_eqp_eus_nostk (list): Flags commercial equipment end uses for
             which no service demand data (which are used to represent com.
             "stock") are available and square footage should be used for stock.
@@ -117,6 +124,10 @@ class UsefulVars(object):
         tsv_hourly_emissions (dict): Dict for storing hourly emissions factors.
         tsv_hourly_lafs (dict): Dict for storing annual energy, cost, and
             carbon adjustment factors by region, building type, and end use.
+            Note that the hourly factors depend on the measure (e.g., on the
+            sign of its energy costs and its TSV features), such that each
+            measure caches them in its own copy of these dicts (see
+            MeasureVars.measure_attrs).
         emm_name_num_map (dict): Maps EMM region names to EIA region numbers.
         cz_emm_map (dict): Maps climate zones to EMM region net system load
             shape data.
@@ -165,7 +176,8 @@ class UsefulVars(object):
             a_s: (True if a_s in self.adopt_schemes_run else False)
             for a_s in self.adopt_schemes_prep}
         self.discount_rate = 0.07
-        self.nsamples = 100
+        self.nsamples = opts.nsamples
+        self.rand_seed = opts.rand_seed
         self.regions = opts.alt_regions
         # Load metadata including AEO year range
         aeo_yrs = JsonIO.load_json(handyfiles.metadata)
@@ -1252,6 +1264,7 @@ class UsefulVars(object):
             "EF": {"UEF": 1, "SEF": 1, "CEF": 1},
             "SEF": {"UEF": 1}}
         self.sf_to_house = {}
+        self.base_cpl_fin = {}
         self.com_eqp_eus_nostk = [
             "PCs", "non-PC office equipment", "MELs", "other",
             "unspecified"]
@@ -1538,9 +1551,7 @@ class UsefulVars(object):
                     "peak days": {
                         "summer": 183,
                         "winter": 1
-                    },
-                    "hourly index": list(enumerate(
-                        itertools.product(range(365), range(24))))
+                    }
                 }
             else:
                 self.tsv_metrics_data = None
@@ -2011,6 +2022,54 @@ class UsefulVars(object):
         return convert_fact
 
 
+class MeasureVars(object):
+    """Per-measure view onto a single shared set of global variables.
+
+    Attribute reads fall through to the shared UsefulVars instance, while
+    attribute assignments are stored on the view itself; measures therefore
+    share one copy of the (large) global variable tables and only carry
+    the handful of attributes they actually overwrite. Global variables that
+    measures modify in place with measure-specific data are copied onto each
+    view (see `measure_attrs`).
+
+    Attributes:
+        shared (UsefulVars): Global variables shared across all measures.
+    """
+
+    # Global variables that are added to in place as a measure is prepared and that depend on
+    # the measure (warnings issued for the measure and hourly price, emissions, and load
+    # adjustment factors, which reflect the measure's savings and TSV features)
+    measure_attrs = ["save_shp_warn", "tsv_hourly_price", "tsv_hourly_emissions",
+                     "tsv_hourly_lafs"]
+
+    def __init__(self, shared):
+        # Avoid stacking views when the input is itself a view
+        if isinstance(shared, MeasureVars):
+            shared = shared.shared
+        self.shared = shared
+        for attr in self.measure_attrs:
+            if hasattr(shared, attr):
+                setattr(self, attr, copy.deepcopy(getattr(shared, attr)))
+
+    def __getattr__(self, name):
+        # Only invoked for attributes not set locally on the view; never
+        # delegate special/private names or the shared pointer itself (which
+        # may be absent while the view is being pickled or unpickled)
+        if name.startswith("__") or name == "shared":
+            raise AttributeError(name)
+        return getattr(self.shared, name)
+
+    def __deepcopy__(self, memo):
+        # Copies of a measure (e.g., those made for packaging) continue to
+        # point to the same shared variables; only local attributes are copied
+        new = MeasureVars(self.shared)
+        memo[id(self)] = new
+        for key, val in self.__dict__.items():
+            if key != "shared":
+                setattr(new, key, copy.deepcopy(val, memo))
+        return new
+
+
 class UsefulInputFiles(object):
     """Class of input file paths to be used by this routine.
 
@@ -2033,15 +2092,22 @@ class UsefulInputFiles(object):
         indiv_ecms (tuple): Individual ECM JSON definitions folder.
         ecm_packages (tuple): Measure package data.
         ecm_prep (tuple): Prepared measure attributes data for use in the analysis engine.
+        ecm_prep_hashes (tuple): Hashes of the measure definitions and input
+            data that prepared measures are based on (used to find updates).
+        file_hashes (tuple): Hashes of the input data files by file path, size,
+            and modification time (reused until the files change).
         ecm_prep_env_cf (tuple): Prepared envelope/HVAC package measure
             attributes data with effects of HVAC removed (isolate envelope).
-        ecm_prep_shapes (tuple): Prepared measure sector shapes data.
+        ecm_prep_shapes (tuple): Prepared measure sector shapes data (binary
+            store, see utils.SectorShapesIO).
         ecm_prep_env_cf_shapes (tuple): Prepared envelope/HVAC package measure
             sector shapes data with effects of HVAC removed (isolate envelope).
         ecm_compete_data (tuple): Folder with contributing microsegment data
             needed to run measure competition in the analysis engine.
         ecm_eff_fs_splt_data (tuple): Folder with data needed to determine the
             fuel splits of efficient case results for fuel switching measures.
+        msegs_store (tuple): Folder with baseline stock/energy and cost/
+            performance/lifetime data stored separately by region.
         run_setup (str): Names of active measures that should be run in
             the analysis engine.
         cpi_data (tuple): Historical Consumer Price Index data.
@@ -2161,11 +2227,15 @@ class UsefulInputFiles(object):
         self.indiv_ecms = fp.ECM_DEF
         self.ecm_packages = fp.ECM_DEF / "package_ecms.json"
         self.ecm_prep = fp.GENERATED / "ecm_prep.json"
+        self.ecm_prep_hashes = fp.GENERATED / "ecm_prep_hashes.json"
+        self.file_hashes = fp.GENERATED / "file_hashes.json"
+        self.ecm_prep_profile = fp.GENERATED / "ecm_prep_profile.json"
         self.ecm_prep_env_cf = fp.GENERATED / "ecm_prep_env_cf.json"
-        self.ecm_prep_shapes = fp.GENERATED / "ecm_prep_shapes.json"
-        self.ecm_prep_env_cf_shapes = fp.GENERATED / "ecm_prep_env_cf_shapes.json"
+        self.ecm_prep_shapes = fp.GENERATED / "ecm_prep_shapes.bin"
+        self.ecm_prep_env_cf_shapes = fp.GENERATED / "ecm_prep_env_cf_shapes.bin"
         self.ecm_compete_data = fp.ECM_COMP
         self.ecm_eff_fs_splt_data = fp.EFF_FS_SPLIT
+        self.msegs_store = fp.MSEGS_STORE
         self.run_setup = fp.GENERATED / "run_setup.json"
         self.cpi_data = fp.CONVERT_DATA / "cpi.csv"
         self.tsv_shape_data = (
@@ -25,6 +25,8 @@ error message if the file is missing.
 """
 
 import copy
+import numbers
+import warnings
 import numpy as np
 import json
 import functools as ft
@@ -533,392 +535,288 @@ class UsefulVars(object):
             self.json_out = 'cpl_res_com_cdiv.json'
 
 
-def merge_sum(base_dict, add_dict, cd_num, reg_name, res_convert_array,
-              com_convert_array, cpl, flag_map_dat, first_cd_flag, ak_hi_res,
-              cd_to_cz_factor=0, bldg_flag=None, fuel_flag=None, eu_flag=None,
-              tech_typ_flag=None, tech_flag=None, stock_energy_flag=None, key_list=None):
-    """Calculate values to restructure census division data to custom regions.
-
-    Two dicts with identical structure, 'base_dict' and 'add_dict' are
-    passed to this function and manipulated to effect conversion of the
-    data from a census division (specified by 'cd_num') to a custom region
-    (specified by 'reg_name') basis.
-
-    This function operates recursively, traversing the structure of
-    the input dicts until a list of years is reached. At that point,
-    if the census division specified corresponds to the first census
-    division in the original data, the entries in 'base_dict' are
-    overwritten by the same data multiplied by the appropriate conversion
-    factor. If the census division is not the first to appear in the original
-    data, 'base_dict' has already been modified, and data from subsequent
-    census divisions should be added to 'base_dict', thus 'add_dict' is
-    modified to the current custom region using the appropriate
-    conversion factor and added to 'base_dict'.
-
-    This approach to converting the data to a custom region basis works
-    because this function is called from within nested for loops that
-    cover all of the census divisions for each custom region.
-    Consequently, the data from each of the census divisions converted
-    to their respective contributions to a single custom region can be
-    added together to obtain the data in the desired final form.
+def conversion_flags(k, i, base_dict, key_list, res_convert_array,
+                     com_convert_array, flag_map_dat, cd_to_cz_factor=0,
+                     bldg_flag=None, fuel_flag=None, eu_flag=None,
+                     tech_typ_flag=None, tech_flag=None):
+    """Update flags that select census division to custom region conversion factors.
+
+    The conversion factors that apply to a given value in the input database
+    depend on the building type, fuel type, end use, and technology under
+    which the value is nested; this function updates flags for each of
+    these as the database structure is traversed.
 
     Args:
-        base_dict (dict): A portion of the input JSON database
-            corresponding to the current census division, modified in
-            place to convert the data to a custom region basis.
-        add_dict (dict): A portion of the input JSON database
-            corresponding to the current census division, copied from
-            the original input data each time this function is called
-            by the clim_converter function. This portion of the data
-            should be structurally identical to 'base_dict', and
-            (generally) corresponds to the data that should be updated
-            and then added to 'base_dict'.
-        cd_num (int): The census division index (0-8) currently being
-            processed.
-        reg_name (int): The custom region name to which the census division
-            data are being added.
+        k (str): Current key in the database structure.
+        i (dict or list or float): Data under the current key.
+        base_dict (dict): Portion of the database that includes the
+            current key.
+        key_list (list): Keys that specify the current location in the
+            microsegments database structure.
         res_convert_array (numpy.ndarray): Coefficients for converting
             from census divisions to custom regions for residential buildings.
         com_convert_array (numpy.ndarray): Coefficients for converting
             from census divisions to custom regions for commercial buildings.
-        cpl (bool): True if cpl data are being processed
         flag_map_dat (dict): Info. used to flag building types, fuel types,
             end uses, and map to NREL End Use Load Profiles (EULP) datasets.
-        first_cd_flag (boolean): Flag for loop through the first census
-            division in the input data.
-        ak_hi_res (dict): Share of Pacific CDIV's total consumption by fuel that goes to AK or HI,
-            based on EIA SEDS totals by fuel and building type; these states are not currently
-            reflected in the ResStock-based disaggregation shares.
-        cd_to_cz_factor (float): The numeric conversion factor to
-            calculate the contribution from the current census division
-            'cd' to the current custom region 'cz'.
-        bldg_flag (NoneType): Flag for the building type currently being looped
-            through (relevant only to EMM/state custom region convert).
-        fuel_flag (NoneType): Flag for the fuel type currently being looped
-            through (relevant only to EMM/state custom region convert).
-        eu_flag (NoneType): Flag for the end use currently being looped
-            through (relevant only to EMM/state custom region convert)
+        cd_to_cz_factor (numpy.ndarray or dict): Conversion factors for the
+            current building type.
+        bldg_flag (NoneType): Flag for the building type (res/com).
+        fuel_flag (NoneType): Flag for the fuel type.
+        eu_flag (NoneType): Flag for the EULP end use.
         tech_typ_flag (NoneType): Flag envelope vs. equipment heating/cooling technology type.
-        tech_flag (NoneType): Flag for the technology currently being looped
-            through (relevant only to EMM/state custom region convert)
-        stock_energy_flag (NoneType): Flag for the stock or energy
-            through (relevant only to EMM/state custom region convert)
-        key_list (list): Keys that specify the current location in the
-            microsegments database structure and thus indicate what
-            data should be returned by this function.
+        tech_flag (NoneType): Flag for the EULP technology.
 
     Returns:
-        A dict with the same form as base_dict and add_dict, with the
-        values for the particular census division specified in 'cd'
-        converted to the custom region 'cz'.
+        Updated conversion factors for the current building type and
+        building type, fuel type, end use, technology type, and technology flags.
     """
     # List of fuel types to iterate over for updating with corresponding conversion factors.
     fuel_types = ["electricity", "natural gas", "distillate", "other fuel"]
-    # Initialize key_list with an empty array prior to looping through the
-    # microsegments database structure.
-    if key_list is None:
-        key_list = []
 
-    import numbers
-    import warnings
-    import copy
+    # Identify appropriate census division to custom region
+    # conversion weighting factor array as a function of building
+    # type; k and k2 correspond to the current top level/parent key,
+    # thus k and k2 are equal to a building type immediately
+    # prior to traversing the entire child tree for that
+    # building type, for which the conversion number array
+    # cd_to_cz_factor will be the same. Ensure that the walk is
+    # currently at the building type level by checking keys from the
+    # next level down (the fuel type level) against expected fuel types
+    # Record building type flag
+    if ((k in flag_map_dat["res_bldg_types"] and
+        any([x in flag_map_dat["res_fuel_types"] for
+             x in base_dict[k].keys()])) or
+        (k in flag_map_dat["com_bldg_types"] and
+            any([x in flag_map_dat["com_fuel_types"] for
+                x in base_dict[k].keys()]))):
+        if k in flag_map_dat["res_bldg_types"]:
+            cd_to_cz_factor = res_convert_array
+            bldg_flag = "res"
+        elif k in flag_map_dat["com_bldg_types"]:
+            cd_to_cz_factor = com_convert_array
+            bldg_flag = "com"
+    # Flag the current fuel type being updated, which is relevant
+    # to ultimate selection of conversion factor from the conversion
+    # array when translating to EMM region or state, in which case
+    # conversion factors are different for different fuels. Use the
+    # expectation that conversion arrays will be in dict format in the
+    # EMM region or state case (with keys for fuel conversion factors)
+    # to trigger the fuel flag update
+    elif (k in flag_map_dat["res_fuel_types"] or
+            k in flag_map_dat["com_fuel_types"]) and \
+            type(res_convert_array) is dict:
+        fuel_flag = k
+    # When updating total building stock or square footage data for
+    # EMM regions or states, which are not keyed by fuel type, set the
+    # fuel type flag accordingly; for states, this will pull in
+    # mapping data based on consumption splits across all fuels; for
+    # EMM regions, this will pull in mapping data based on
+    # total electricity
+    elif (k in ["total homes", "new homes", "total square footage",
+                "new square footage"]):
+        fuel_flag = "building stock and square footage"
+
+    # Flag the current end use being updated, which is relevant to
+    # ultimate selection of conversion factor from the conversion
+    # array when translating electricity stock/energy data to EMM
+    # region or state, in which case conversion factors are based on
+    # the EULP and are different for different end uses
+    elif (fuel_flag and fuel_flag in fuel_types) and \
+        (type(cd_to_cz_factor[fuel_flag]) is dict) and \
+        any([k in x for x in [flag_map_dat["res_eus"],
+                              flag_map_dat["com_eus"]]]):
+
+        if k == "ventilation":
+            # Only process "ventilation" if the fuel type is "electricity"
+            # and the parent end use is "fans and pumps"
+            if fuel_flag != "electricity" or "fans and pumps" not in key_list:
+                eu_flag = "misc"  # Skip mapping to EULP data
+            else:
+                eu_find = [i[0] for i in flag_map_dat["eulp_map"][fuel_flag].items()
+                           if k in i[1]]
+                if len(eu_find) == 1:
+                    eu_flag = eu_find[0]
+                else:
+                    raise ValueError(
+                        "Could not match Scout end use: " + bldg_flag +
+                        " " + fuel_flag + " " + " " + k + " to EULP data")
+        # Handle special cases of "other" end use technologies in
+        # Scout, which are sometimes handled at the end-use level in
+        # the EULP data (e.g., washing), and the case of cooking,
+        # which has EULP data for residential but not commercial
+        elif k != "other" and (k != "cooking" or (
+                k == "cooking" and bldg_flag == "res")):
+            # Find the EULP end use for the current Scout end use
+            eu_find = [i[0] for i in flag_map_dat["eulp_map"][fuel_flag].items()
+                       if k in i[1]]
+            # If there was not a unique match, warn user
+            if len(eu_find) == 1:
+                eu_flag = eu_find[0]
+            else:
+                raise ValueError(
+                    "Could not match Scout end use: " + bldg_flag +
+                    " " + fuel_flag + " " + " " + k + " to EULP data")
+        else:
+            eu_flag = "misc"
+
+    # Process end uses/technologies that were not initially matched
+    # in the clause above
+    elif eu_flag == "misc":
+        # Case where "other" tech. in Scout data is assigned unique
+        # end-use profile in the EULP data; match tech. to EULP end use
+        if k in flag_map_dat["eulp_other_tech"]:
+            # Find the EULP end use for the current Scout technology;
+            # note that technology name will be included in EULP
+            # mapping dict items w/ "other", e.g., "other-[tech name]"
+            eu_find = [
+                i[0] for i in flag_map_dat["eulp_map"][fuel_flag].items() if any([
+                    k in x for x in i[1]])]
+            # If there was not a unique match, warn user
+            if len(eu_find) == 1:
+                eu_flag = eu_find[0]
+            else:
+                raise ValueError(
+                    "Could not match Scout end use: "
+                    + bldg_flag + " " + fuel_flag + " " +
+                    " " + k + " to EULP data")
+        # All other cases without unique EULP end-use profiles are
+        # assigned to the miscellaneous profile
+        else:
+            eu_flag = "misc"
+    # Flag for technology type if heating or cooling end use
+    elif k in ["supply", "demand"]:
+        tech_typ_flag = k
+    # For electric heating and cooling end uses, which may have factors further
+    # disaggregated by equipment type, flag the technology currently being updated
+    elif fuel_flag == "electricity" and eu_flag in ["heating", "cooling"]:
+        # For equipment ('supply'), aggregation factors will be keyed in by equipment name
+        if tech_typ_flag == "supply":
+            # Check which technology name the current Scout equipment type maps to in the
+            # EULP disaggregation factors and set that name as the technology flag to use
+            # in pulling the factors later
+            if any([k in x[1] for x in flag_map_dat[
+                    "eulp_map"]["electric technologies"][bldg_flag].items()]):
+                tech_flag = [x[0] for x in flag_map_dat["eulp_map"][
+                    "electric technologies"][bldg_flag].items() if k in x[1]][0]
+            # If still at the equipment level (e.g., not at the energy/stock key level below
+            # it or at the year level below that) and there was no mapping available for a
+            # technology that should have it, throw an error
+            elif isinstance(i, dict) and k not in ["energy", "stock"]:
+                raise ValueError(
+                    "Cannot map Scout technology " + k + " to any technology name in the "
+                    "EULP-based disaggregation factors")
+        # For envelope ('demand'), aggregation factors will be summarized across 'all'
+        # heating and cooling technologies (e.g., equivalent to end-use-level disagg.)
+        elif tech_typ_flag == "demand":
+            tech_flag = "all"
+        # Ensure that technology type is either supply (equipment) or demand (envelope)
+        else:
+            raise ValueError("Technology type " + tech_typ_flag + " unexpected for "
+                             "heating or cooling end use; must be 'supply' or 'demand'.")
 
-    def _is_number(x):
-        return isinstance(x, numbers.Number)
+    return cd_to_cz_factor, bldg_flag, fuel_flag, eu_flag, tech_typ_flag, tech_flag
 
-    def _to_list_of_lists(lst):
-        """Wrap flat list -> list-of-lists, keep list-of-lists unchanged."""
-        if lst and _is_number(lst[0]):
-            return [lst]
-        return lst
 
-    def _pad_with_zeros(a, b):
-        """
-        Pad the shorter of two *lists of lists* with zero-vectors so that
-        their lengths match. Keeps arithmetic aligned.
-        """
-        max_len = max(len(a), len(b))
-        elem_len = len(a[0]) if a else len(b[0]) if b else 2
-        zero_vec = [0.0] * elem_len
-        a.extend(copy.deepcopy(zero_vec) for _ in range(max_len - len(a)))
-        b.extend(copy.deepcopy(zero_vec) for _ in range(max_len - len(b)))
-        return a, b
-
-    # Loop through both dicts to find all keys
-    for (k, i) in sorted(base_dict.items()):
-        if k not in add_dict:
-            warnings.warn(f"Key '{k}' not found in add_dict – skipping")
-            continue
-        k2, i2 = k, add_dict[k]
-        # If we have reached a level with keys "stock" or "energy", update the flag.
-        if k in ("stock", "energy"):
-            current_stock_energy_flag = k
-        else:
-            current_stock_energy_flag = stock_energy_flag
-        # Compare the top level/parent keys of the section of the dict
-        # currently being parsed to ensure that both the base_dict
-        # (census division basis) and add_dict (custom region basis)
-        # are proceeding with the same structure; when cost, performance,
-        # and lifetime data are being processed, skip the "unspecified"
-        # building type and the "other" end use where it appears as
-        # an unmodified zero in certain building and fuel type combinations
-        if not (
-            cpl and (
-                (k == 'other' and not isinstance(i, dict)) or
-                k == 'unspecified')):
-            # Identify appropriate census division to custom region
-            # conversion weighting factor array as a function of building
-            # type; k and k2 correspond to the current top level/parent key,
-            # thus k and k2 are equal to a building type immediately
-            # prior to traversing the entire child tree for that
-            # building type, for which the conversion number array
-            # cd_to_cz_factor will be the same. Ensure that the walk is
-            # currently at the building type level by checking keys from the
-            # next level down (the fuel type level) against expected fuel types
-            # Record building type flag
-            if ((k in flag_map_dat["res_bldg_types"] and
-                any([x in flag_map_dat["res_fuel_types"] for
-                     x in base_dict[k].keys()])) or
-                (k in flag_map_dat["com_bldg_types"] and
-                    any([x in flag_map_dat["com_fuel_types"] for
-                        x in base_dict[k].keys()]))):
-                if k in flag_map_dat["res_bldg_types"]:
-                    cd_to_cz_factor = res_convert_array
-                    bldg_flag = "res"
-                elif k in flag_map_dat["com_bldg_types"]:
-                    cd_to_cz_factor = com_convert_array
-                    bldg_flag = "com"
-            # Flag the current fuel type being updated, which is relevant
-            # to ultimate selection of conversion factor from the conversion
-            # array when translating to EMM region or state, in which case
-            # conversion factors are different for different fuels. Use the
-            # expectation that conversion arrays will be in dict format in the
-            # EMM region or state case (with keys for fuel conversion factors)
-            # to trigger the fuel flag update
-            elif (k in flag_map_dat["res_fuel_types"] or
-                    k in flag_map_dat["com_fuel_types"]) and \
-                    type(res_convert_array) is dict:
-                fuel_flag = k
-            # When updating total building stock or square footage data for
-            # EMM regions or states, which are not keyed by fuel type, set the
-            # fuel type flag accordingly; for states, this will pull in
-            # mapping data based on consumption splits across all fuels; for
-            # EMM regions, this will pull in mapping data based on
-            # total electricity
-            elif (k in ["total homes", "new homes", "total square footage",
-                        "new square footage"]):
-                fuel_flag = "building stock and square footage"
-
-            # Flag the current end use being updated, which is relevant to
-            # ultimate selection of conversion factor from the conversion
-            # array when translating electricity stock/energy data to EMM
-            # region or state, in which case conversion factors are based on
-            # the EULP and are different for different end uses
-            elif (fuel_flag and fuel_flag in fuel_types) and \
-                (type(cd_to_cz_factor[fuel_flag]) is dict) and \
-                any([k in x for x in [flag_map_dat["res_eus"],
-                                      flag_map_dat["com_eus"]]]):
-
-                if k == "ventilation":
-                    # Only process "ventilation" if the fuel type is "electricity"
-                    # and the parent end use is "fans and pumps"
-                    if fuel_flag != "electricity" or "fans and pumps" not in key_list:
-                        eu_flag = "misc"  # Skip mapping to EULP data
-                    else:
-                        eu_find = [i[0] for i in flag_map_dat["eulp_map"][fuel_flag].items()
-                                   if k in i[1]]
-                        if len(eu_find) == 1:
-                            eu_flag = eu_find[0]
-                        else:
-                            raise ValueError(
-                                "Could not match Scout end use: " + bldg_flag +
-                                " " + fuel_flag + " " + " " + k + " to EULP data")
-                # Handle special cases of "other" end use technologies in
-                # Scout, which are sometimes handled at the end-use level in
-                # the EULP data (e.g., washing), and the case of cooking,
-                # which has EULP data for residential but not commercial
-                elif k != "other" and (k != "cooking" or (
-                        k == "cooking" and bldg_flag == "res")):
-                    # Find the EULP end use for the current Scout end use
-                    eu_find = [i[0] for i in flag_map_dat["eulp_map"][fuel_flag].items()
-                               if k in i[1]]
-                    # If there was not a unique match, warn user
-                    if len(eu_find) == 1:
-                        eu_flag = eu_find[0]
-                    else:
-                        raise ValueError(
-                            "Could not match Scout end use: " + bldg_flag +
-                            " " + fuel_flag + " " + " " + k + " to EULP data")
-                else:
-                    eu_flag = "misc"
-
-            # Process end uses/technologies that were not initially matched
-            # in the clause above
-            elif eu_flag == "misc":
-                # Case where "other" tech. in Scout data is assigned unique
-                # end-use profile in the EULP data; match tech. to EULP end use
-                if k in flag_map_dat["eulp_other_tech"]:
-                    # Find the EULP end use for the current Scout technology;
-                    # note that technology name will be included in EULP
-                    # mapping dict items w/ "other", e.g., "other-[tech name]"
-                    eu_find = [
-                        i[0] for i in flag_map_dat["eulp_map"][fuel_flag].items() if any([
-                            k in x for x in i[1]])]
-                    # If there was not a unique match, warn user
-                    if len(eu_find) == 1:
-                        eu_flag = eu_find[0]
-                    else:
-                        raise ValueError(
-                            "Could not match Scout end use: "
-                            + bldg_flag + " " + fuel_flag + " " +
-                            " " + k + " to EULP data")
-                # All other cases without unique EULP end-use profiles are
-                # assigned to the miscellaneous profile
-                else:
-                    eu_flag = "misc"
-            # Flag for technology type if heating or cooling end use
-            elif k in ["supply", "demand"]:
-                tech_typ_flag = k
-            # For electric heating and cooling end uses, which may have factors further
-            # disaggregated by equipment type, flag the technology currently being updated
-            elif fuel_flag == "electricity" and eu_flag in ["heating", "cooling"]:
-                # For equipment ('supply'), aggregation factors will be keyed in by equipment name
-                if tech_typ_flag == "supply":
-                    # Check which technology name the current Scout equipment type maps to in the
-                    # EULP disaggregation factors and set that name as the technology flag to use
-                    # in pulling the factors later
-                    if any([k in x[1] for x in flag_map_dat[
-                            "eulp_map"]["electric technologies"][bldg_flag].items()]):
-                        tech_flag = [x[0] for x in flag_map_dat["eulp_map"][
-                            "electric technologies"][bldg_flag].items() if k in x[1]][0]
-                    # If still at the equipment level (e.g., not at the energy/stock key level below
-                    # it or at the year level below that) and there was no mapping available for a
-                    # technology that should have it, throw an error
-                    elif isinstance(i, dict) and k not in ["energy", "stock"]:
-                        raise ValueError(
-                            "Cannot map Scout technology " + k + " to any technology name in the "
-                            "EULP-based disaggregation factors")
-                # For envelope ('demand'), aggregation factors will be summarized across 'all'
-                # heating and cooling technologies (e.g., equivalent to end-use-level disagg.)
-                elif tech_typ_flag == "demand":
-                    tech_flag = "all"
-                # Ensure that technology type is either supply (equipment) or demand (envelope)
-                else:
-                    raise ValueError("Technology type " + tech_typ_flag + " unexpected for "
-                                     "heating or cooling end use; must be 'supply' or 'demand'.")
-
-            # Recursively loop through both dicts
-            if isinstance(i, dict):
-                merge_sum(i, i2, cd_num, reg_name, res_convert_array,
-                          com_convert_array, cpl, flag_map_dat, first_cd_flag, ak_hi_res,
-                          cd_to_cz_factor, bldg_flag, fuel_flag, eu_flag,
-                          tech_typ_flag, tech_flag, stock_energy_flag=current_stock_energy_flag,
-                          key_list=key_list + [k])
-            elif type(base_dict[k]) is not str:
-                # Check whether the conversion array needs to be further keyed
-                # by fuel type and by end use, as is the case when converting to EMM region or
-                # state and using EULP data to disaggregate to those regions; in such cases, the
-                # fuel and end use flags indicate the key values for pulling appropriate data
-
-                if type(cd_to_cz_factor) is dict:
-                    # Data may be further broken out by end use
-                    if (fuel_flag and fuel_flag in fuel_types) and eu_flag:
-
-                        # Ensure that data for the current end use can be
-                        # pulled and that data converted from pandas df
-                        # are in format that is JSON serializable
-                        try:
-                            # Restrict conversion array by fuel, stock/energy var, and end use
-                            convert_array = cd_to_cz_factor[
-                                fuel_flag][current_stock_energy_flag][eu_flag]
-                            # Case where technology-specific factors are available
-                            if tech_flag and "Technology" in convert_array.dtype.names:
-                                convert_fact_init = float(convert_array[convert_array[
-                                    'Technology'] == tech_flag][cd_num][reg_name])
-                            # Case where technology-specific factors are not available
-                            else:
-                                convert_fact_init = float(convert_array[cd_num][reg_name])
-                            # For residential disaggregation based on EULP data, account for the
-                            # fact that ResStock data do not include AK or HI, and the Pacific
-                            # CDIV (#9, index 8 in Python) data need to be adjusted down using
-                            # external estimates on how much of the region's energy use is
-                            # attributable to AK or HI by fuel type
-                            if bldg_flag == "res" and cd_num == 8 and ak_hi_res:
-                                # Set to external disagg factors for AK and HI region loops
-                                if reg_name in ["AK", "HI"]:
-                                    # Energy by fuel type for either AK or HI
-                                    convert_fact = ak_hi_res[reg_name][fuel_flag]
-                                # For all other regions within CDIV 9, adjust down to reflect
-                                # the share of AK/HI
-                                else:
-                                    # Sum AK and HI energy by fuel type
-                                    ak_plus_hi = (
-                                        ak_hi_res["AK"][fuel_flag] + ak_hi_res["HI"][fuel_flag])
-                                    # Scale other regions by 1 - sum of AK and HI energy by fuel
-                                    convert_fact = (convert_fact_init * (1 - ak_plus_hi))
-                            else:
-                                convert_fact = convert_fact_init
-                        except IndexError:
-                            raise ValueError(
-                                "End use: " + bldg_flag + " " + fuel_flag +
-                                " " + eu_flag + " not present in EULP "
-                                "disaggregration data")
-                    else:
-                        # Handle case where for building stock and square footage,
-                        # conversion data are further distinguished by whether
-                        # they apply to number of homes or square footage
-                        try:
-                            convert_fact = cd_to_cz_factor[
-                                           fuel_flag][cd_num][reg_name]
-                        except KeyError:
-                            try:
-                                convert_fact = cd_to_cz_factor[fuel_flag][
-                                    "homes"][cd_num][reg_name]
-                            except KeyError:
-                                convert_fact = cd_to_cz_factor[fuel_flag][
-                                    "square footage"][cd_num][reg_name]
-                else:
-                    # Find the conversion factor for the given combination of
-                    # census division and AIA climate zone
-                    convert_fact = cd_to_cz_factor[cd_num][reg_name]
-                if isinstance(base_dict[k], list):
-                    base_list = _to_list_of_lists(base_dict[k])
-                    add_list = _to_list_of_lists(add_dict[k2])
-                    base_list, add_list = _pad_with_zeros(base_list, add_list)
-
-                    if first_cd_flag:
-                        base_list = [[v * convert_fact for v in sub]
-                                     for sub in base_list]
-                    else:
-                        base_list = [[b + a * convert_fact for b, a in zip(sub_b, sub_a)]
-                                     for sub_b, sub_a in zip(base_list, add_list)]
+def conversion_factor(cd_to_cz_factor, cd_num, reg_name, ak_hi_res, bldg_flag=None,
+                      fuel_flag=None, eu_flag=None, tech_flag=None, stock_energy_flag=None):
+    """Find the factor that converts a census division value to a custom region.
 
-                    # restore original shape (flat vs nested)
-                    if _is_number(base_dict[k][0]) if base_dict[k] else False:
-                        base_dict[k] = base_list[0]
-                    else:
-                        base_dict[k] = base_list
+    Args:
+        cd_to_cz_factor (numpy.ndarray or dict): Conversion factors for the
+            current building type (keyed by fuel type, stock/energy variable,
+            and end use for EMM region or state conversions).
+        cd_num (int): The census division index (0-8) being converted.
+        reg_name (str): The custom region being converted to.
+        ak_hi_res (dict): Share of Pacific CDIV's total consumption by fuel that goes to AK or HI.
+        bldg_flag (NoneType): Flag for the building type (res/com).
+        fuel_flag (NoneType): Flag for the fuel type.
+        eu_flag (NoneType): Flag for the EULP end use.
+        tech_flag (NoneType): Flag for the EULP technology.
+        stock_energy_flag (NoneType): Flag for the stock or energy variable.
+
+    Returns:
+        Conversion factor (float) for the census division and custom region.
+    """
+    # List of fuel types with conversion factors that may be broken out by end use
+    fuel_types = ["electricity", "natural gas", "distillate", "other fuel"]
+
+    if type(cd_to_cz_factor) is dict:
+        # Data may be further broken out by end use
+        if (fuel_flag and fuel_flag in fuel_types) and eu_flag:
+
+            # Ensure that data for the current end use can be
+            # pulled and that data converted from pandas df
+            # are in format that is JSON serializable
+            try:
+                # Restrict conversion array by fuel, stock/energy var, and end use
+                convert_array = cd_to_cz_factor[
+                    fuel_flag][stock_energy_flag][eu_flag]
+                # Case where technology-specific factors are available
+                if tech_flag and "Technology" in convert_array.dtype.names:
+                    convert_fact_init = float(convert_array[convert_array[
+                        'Technology'] == tech_flag][cd_num][reg_name])
+                # Case where technology-specific factors are not available
                 else:
-                    if first_cd_flag:
-                        base_dict[k] = base_dict[k] * convert_fact
+                    convert_fact_init = float(convert_array[cd_num][reg_name])
+                # For residential disaggregation based on EULP data, account for the
+                # fact that ResStock data do not include AK or HI, and the Pacific
+                # CDIV (#9, index 8 in Python) data need to be adjusted down using
+                # external estimates on how much of the region's energy use is
+                # attributable to AK or HI by fuel type
+                if bldg_flag == "res" and cd_num == 8 and ak_hi_res:
+                    # Set to external disagg factors for AK and HI region loops
+                    if reg_name in ["AK", "HI"]:
+                        # Energy by fuel type for either AK or HI
+                        convert_fact = ak_hi_res[reg_name][fuel_flag]
+                    # For all other regions within CDIV 9, adjust down to reflect
+                    # the share of AK/HI
                     else:
-                        base_dict[k] = base_dict[k] + \
-                            add_dict[k2] * convert_fact
-
-        elif k != k2:
-            warnings.warn(f"Merge keys do not match: {k} != {k2}")
+                        # Sum AK and HI energy by fuel type
+                        ak_plus_hi = (
+                            ak_hi_res["AK"][fuel_flag] + ak_hi_res["HI"][fuel_flag])
+                        # Scale other regions by 1 - sum of AK and HI energy by fuel
+                        convert_fact = (convert_fact_init * (1 - ak_plus_hi))
+                else:
+                    convert_fact = convert_fact_init
+            except IndexError:
+                raise ValueError(
+                    "End use: " + bldg_flag + " " + fuel_flag +
+                    " " + eu_flag + " not present in EULP "
+                    "disaggregration data")
+        else:
+            # Handle case where for building stock and square footage,
+            # conversion data are further distinguished by whether
+            # they apply to number of homes or square footage
+            try:
+                convert_fact = cd_to_cz_factor[
+                               fuel_flag][cd_num][reg_name]
+            except KeyError:
+                try:
+                    convert_fact = cd_to_cz_factor[fuel_flag][
+                        "homes"][cd_num][reg_name]
+                except KeyError:
+                    convert_fact = cd_to_cz_factor[fuel_flag][
+                        "square footage"][cd_num][reg_name]
+    else:
+        # Find the conversion factor for the given combination of
+        # census division and AIA climate zone
+        convert_fact = cd_to_cz_factor[cd_num][reg_name]
 
-    return base_dict
+    return convert_fact
 
 
 def clim_converter(input_dict, res_convert_array, com_convert_array, data_in,
                    flag_map_dat, reg_list, cdiv_list, ak_hi_res):
     """Convert input data dict from a census division to a custom region basis.
 
-    This function principally serves to prepare the inputs for, and
-    then call, a function that performs the calculations to convert
-    data in the input_dict database specified for each microsegment
-    from a census division to a custom region basis.
+    The input database is traversed once (in the same order and with the
+    same conversion flag logic as the former recursive merge) to flatten the
+    numeric values for all census divisions into a matrix with one row per
+    value. Values that share conversion flags share a matrix of census
+    division to custom region weights, such that the values for all custom
+    regions are calculated as batched matrix products; the results are
+    re-nested into the input database structure for each custom region.
 
     Args:
         input_dict (dict): Data from JSON database, as imported,
@@ -953,50 +851,186 @@ def clim_converter(input_dict, res_convert_array, com_convert_array, data_in,
     else:
         cpl_bool = False
 
-    # Set up empty dict to be updated with the results for each custom
-    # region as the data are converted
-    converted_dict = {}
-
-    # Add the values from each custom region to the converted_dict
-    for reg_name in reg_list:
-        # Create a copy of the input dict at the level below a census
-        # division or custom region (the structure below that level
-        # should be identical); uses the first census division in
-        # the data
-        first_cd = list(input_dict.keys())[0]
-        base_dict = copy.deepcopy(input_dict[first_cd])
-        # Loop through all census divisions to add their contributions
-        # to each custom region
+    # The first census division in the data sets the structure of the
+    # converted data (the structure below that level should be identical
+    # across census divisions); other census divisions in the data add
+    # their contributions to each custom region in the order of cdiv_list
+    first_cd = list(input_dict.keys())[0]
+    cd_rows = [first_cd] + [
+        cd for cd in cdiv_list if cd in input_dict and cd != first_cd]
+
+    # Initialize flattened numeric values (one list of census division values
+    # per entry), the conversion flags of each numeric value, list values
+    # (one list of census division lists per entry), and conversion weights
+    # for each unique set of conversion flags
+    num_vals, num_flags, list_vals = ([] for n in range(3))
+    weights = {}
+
+    def flatten(base_dict, cd_dicts, key_list, cd_to_cz_factor=0, bldg_flag=None,
+                fuel_flag=None, eu_flag=None, tech_typ_flag=None, tech_flag=None,
+                stock_energy_flag=None):
+        """Flatten census division data into an index tree of the converted data.
+
+        Args:
+            base_dict (dict): Portion of the first census division's data.
+            cd_dicts (list): Same portion of the data for each census division
+                in cd_rows (None where not present).
+            key_list (list): Keys that specify the current location in the
+                microsegments database structure.
+
+        Returns:
+            Dict with the structure of base_dict, where each value is
+            either an index into the flattened numeric or list values or
+            a value that is carried over from the first census division.
+        """
+        # Initialize the index tree in the original key order of the data
+        index_tree = dict.fromkeys(base_dict.keys())
+        # Loop through the data in sorted key order, such that
+        # conversion flags are updated in the same sequence
+        for (k, i) in sorted(base_dict.items()):
+            cd_vals = []
+            for cd, cd_dict in zip(cd_rows, cd_dicts):
+                if cd_dict is not None and k not in cd_dict:
+                    warnings.warn(
+                        f"Key '{k}' not found in data for {cd} – skipping")
+                cd_vals.append(cd_dict.get(k) if cd_dict is not None else None)
+            # If we have reached a level with keys "stock" or "energy", update the flag.
+            if k in ("stock", "energy"):
+                current_stock_energy_flag = k
+            else:
+                current_stock_energy_flag = stock_energy_flag
+            # When cost, performance, and lifetime data are being processed,
+            # carry over the "unspecified" building type and the "other" end
+            # use where it appears as an unmodified zero in certain building
+            # and fuel type combinations
+            if cpl_bool and ((k == 'other' and not isinstance(i, dict)) or
+                             k == 'unspecified'):
+                index_tree[k] = ("keep", i)
+                continue
+            cd_to_cz_factor, bldg_flag, fuel_flag, eu_flag, tech_typ_flag, tech_flag = \
+                conversion_flags(
+                    k, i, base_dict, key_list, res_convert_array, com_convert_array,
+                    flag_map_dat, cd_to_cz_factor, bldg_flag, fuel_flag, eu_flag,
+                    tech_typ_flag, tech_flag)
+            # Carry over string values
+            if isinstance(i, str):
+                index_tree[k] = ("keep", i)
+                continue
+            elif isinstance(i, dict):
+                index_tree[k] = flatten(
+                    i, [v if isinstance(v, dict) else None for v in cd_vals],
+                    key_list + [k], cd_to_cz_factor, bldg_flag, fuel_flag, eu_flag,
+                    tech_typ_flag, tech_flag, current_stock_energy_flag)
+                continue
+            # Record the conversion weights for the current conversion flags
+            flags = (bldg_flag, fuel_flag, eu_flag, tech_flag, current_stock_energy_flag)
+            if flags not in weights:
+                weights[flags] = conversion_weights(cd_to_cz_factor, flags)
+            if isinstance(i, list):
+                index_tree[k] = ("list", len(list_vals))
+                list_vals.append((cd_vals, flags))
+            else:
+                index_tree[k] = ("num", len(num_vals))
+                num_vals.append([v if v is not None else 0 for v in cd_vals])
+                num_flags.append(flags)
+        return index_tree
+
+    def conversion_weights(cd_to_cz_factor, flags):
+        """Find the weights of each census division's data in each custom region.
+
+        Args:
+            cd_to_cz_factor (numpy.ndarray or dict): Conversion factors for the
+                current building type.
+            flags (tuple): Building type, fuel type, end use, technology, and
+                stock/energy flags.
+
+        Returns:
+            numpy.ndarray: Weights with a row for each census division in
+                cd_rows and a column for each custom region.
+        """
+        bldg_flag, fuel_flag, eu_flag, tech_flag, stock_energy_flag = flags
+        # The first census division's data are the starting point for
+        # each custom region
+        weight = np.zeros((len(cd_rows), len(reg_list)))
+        weight[0] = 1
         for cdiv_ind, cdiv_name in enumerate(cdiv_list):
-            # Flag a loop through the first census division in the input
-            # dict for special handling in merge_sum function
+            if cdiv_name not in input_dict:
+                continue
+            factors = np.array([conversion_factor(
+                cd_to_cz_factor, cdiv_ind, reg_name, ak_hi_res, bldg_flag, fuel_flag,
+                eu_flag, tech_flag, stock_energy_flag) for reg_name in reg_list],
+                dtype=float)
+            # The first census division's data are scaled by the conversion
+            # factor; data from other census divisions are converted and added
             if cdiv_name == first_cd:
-                first_cd_flag = True
+                weight = weight * factors
             else:
-                first_cd_flag = ""
-            # Make a copy of the portion of the input dict corresponding
-            # to the current census division, to be added to the base_dict
-            # data; if census division not present in the data, continue loop
-            try:
-                add_dict = copy.deepcopy(input_dict[cdiv_name])
-            except KeyError:
-                continue
-            # Call the merge_sum function to replace base_dict with
-            # updated contents; this approach overwrites base_dict, which
-            # is intentional because it is the master dict that stores the
-            # data on a custom region basis as the contribution from each
-            # census division is added to the custom region by merge_sum
-            base_dict = merge_sum(base_dict, add_dict, cdiv_ind,
-                                  reg_name, res_convert_array,
-                                  com_convert_array, cpl_bool, flag_map_dat,
-                                  first_cd_flag, ak_hi_res, key_list=[])
-
-        # Once fully updated with the data from all census divisions,
-        # write the resulting data to a new variable and update the
-        # master dict with the data using the appropriate census
-        # division string name as the key
-        newadd = base_dict
-        converted_dict.update({reg_name: newadd})
+                weight[cd_rows.index(cdiv_name)] += factors
+        return weight
+
+    index_tree = flatten(input_dict[first_cd], [input_dict[cd] for cd in cd_rows], [])
+
+    # Convert numeric values to all custom regions at once, as a matrix
+    # product of census division values and weights for each unique set
+    # of conversion flags
+    num_vals = np.array(num_vals, dtype=float).reshape(len(num_vals), len(cd_rows))
+    num_out = np.zeros((len(num_vals), len(reg_list)))
+    num_flags = np.array(
+        [list(weights.keys()).index(f) for f in num_flags], dtype=int)
+    for flag_ind, weight in enumerate(weights.values()):
+        rows = np.flatnonzero(num_flags == flag_ind)
+        if len(rows) != 0:
+            num_out[rows] = num_vals[rows] @ weight
+    # Store converted values by custom region
+    num_out = num_out.T.tolist()
+
+    # Convert list values (e.g., lists of values by year or lists of such
+    # lists), padding shorter lists across census divisions with zeros
+    list_out = []
+    for cd_vals, flags in list_vals:
+        # Wrap flat lists into lists of lists
+        cd_lists = [([v] if v and isinstance(v[0], numbers.Number) else v) if
+                    v is not None else [] for v in cd_vals]
+        n_rows = max(len(v) for v in cd_lists)
+        elem_len = next((len(v[0]) for v in cd_lists if v), 2)
+        cd_arr = np.zeros((len(cd_rows), n_rows, elem_len))
+        for cd_ind, v in enumerate(cd_lists):
+            if v:
+                cd_arr[cd_ind, :len(v)] = v
+        reg_arr = np.tensordot(weights[flags], cd_arr, axes=(0, 0))
+        # Restore original shape (flat vs nested) of the first census
+        # division's list
+        if cd_vals[0] and isinstance(cd_vals[0][0], numbers.Number):
+            list_out.append([x[0] for x in reg_arr.tolist()])
+        else:
+            list_out.append(reg_arr.tolist())
+
+    def nest(index_tree, reg_ind):
+        """Re-nest converted values for a custom region.
+
+        Args:
+            index_tree (dict): Index tree of the converted data (see flatten).
+            reg_ind (int): Index of the custom region in reg_list.
+
+        Returns:
+            Dict of converted data with the structure of the input data
+            for a single census division.
+        """
+        nested = {}
+        for k, v in index_tree.items():
+            if isinstance(v, dict):
+                nested[k] = nest(v, reg_ind)
+            elif v[0] == "num":
+                nested[k] = num_out[reg_ind][v[1]]
+            elif v[0] == "list":
+                nested[k] = list_out[v[1]][reg_ind]
+            else:
+                nested[k] = copy.deepcopy(v[1])
+        return nested
+
+    # Write the converted data for each custom region to a new dict
+    converted_dict = {
+        reg_name: nest(index_tree, reg_ind) for reg_ind, reg_name in enumerate(reg_list)}
 
     return converted_dict
 
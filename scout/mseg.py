@@ -7,6 +7,7 @@ import argparse
 import csv
 from scout import mseg_techdata as rmt
 from scout.config import FilePaths as fp
+from scout.utils import DataIndex
 
 
 class EIAData(object):
@@ -92,6 +93,13 @@ class SkipLines(object):
             self.lt_skip_header = 37
             self.lt_skip_footer = 51
 
+
+# Fields by which the rows of the AEO energy, stock, and household count
+# data and the thermal load components data are indexed (see
+# utils.DataIndex); the thermal load components data include only the
+# census division, building type, and end use fields
+index_fields = ('CDIV', 'BLDG', 'ENDUSE', 'FUEL', 'EQPCLASS', 'BULBTYPE')
+
 # Define a series of dicts that will translate imported JSON
 # microsegment names to AEO microsegment(s)
 
@@ -395,7 +403,8 @@ def thermal_load_select(tl_data, sel):
     building envelope.
 
     Args:
-        tl_data (numpy.ndarray): An array of thermal load component factors.
+        tl_data (DataIndex): An index of the array of thermal load
+            component factors.
         sel (list): A nested list of indices for selecting the relevant
             data, created by json_translator.
 
@@ -406,9 +415,7 @@ def thermal_load_select(tl_data, sel):
     """
 
     # Select the appropriate data from the thermal loads data array
-    tl_data_sel = tl_data[numpy.all([tl_data['ENDUSE'] == sel[0][0],
-                                     tl_data['CDIV'] == sel[0][1],
-                                     tl_data['BLDG'] == sel[0][2]], axis=0)]
+    tl_data_sel = tl_data.select(sel[0][1], sel[0][2], sel[0][0])
 
     # Extract the demand modifier value (the fraction of heating or
     # cooling load gained/lost through the relevant exterior surface)
@@ -431,8 +438,9 @@ def nrg_stock_select(data, sel):
     and stock data always have a single key for each year.
 
     Args:
-        data (numpy.ndarray): An array of AEO energy, equipment stock,
-            and household count data given by microsegment.
+        data (DataIndex): An index of the array of AEO energy,
+            equipment stock, and household count data given by
+            microsegment.
         sel (list): A nested list of indices for selecting the relevant
             data, created by json_translator.
 
@@ -441,33 +449,10 @@ def nrg_stock_select(data, sel):
         each year of available data for the specified microsegment.
     """
 
-    # Define initial stock and energy dicts
-    group_stock = {}
-    group_energy = {}
-
-    # Select data for the specified census division and building type
-    data_sel = data[numpy.all([data['CDIV'] == sel[0][1],
-                               data['BLDG'] == sel[0][2]], axis=0)]
-
-    # Multiple end uses can be provided, but try first to see if only
-    # one end use is provided; if not, select data for all of the
-    # end uses given
-    if type(sel[0][0]) is not tuple:
-        data_sel = data_sel[numpy.all(
-            [data_sel['ENDUSE'] == sel[0][0]], axis=0)]
-    else:
-        data_sel = data_sel[numpy.hstack([numpy.where(
-            data_sel['ENDUSE'] == i) for i in sel[0][0]]).flatten()]
-
-    # Multiple fuel types can be provided, but try first to see if only
-    # one fuel type is provided and if not, use a different approach to
-    # select data for all of the fuel types indicated
-    if type(sel[0][3]) is not tuple:
-        data_sel = data_sel[numpy.all(
-            [data_sel['FUEL'] == sel[0][3]], axis=0)]
-    else:
-        data_sel = data_sel[numpy.hstack([numpy.where(
-            data_sel['FUEL'] == i) for i in sel[0][3]]).flatten()]
+    # Set the census division, building type, end use(s), and fuel
+    # type(s) to select data for; multiple end uses and fuel types can
+    # be provided as tuples of values
+    sel_vals = [sel[0][1], sel[0][2], sel[0][0], sel[0][3]]
 
     # If an equipment class is specified, select the subset of
     # applicable data as appropriate
@@ -477,37 +462,30 @@ def nrg_stock_select(data, sel):
         eqp = False
 
     if eqp:
-        if isinstance(eqp, tuple):  # Lighting
-            data_sel = data_sel[
-                numpy.all([data_sel['EQPCLASS'] == eqp[0],
-                           data_sel['BULBTYPE'] == eqp[1]], axis=0)]
+        if isinstance(eqp, tuple):  # Lighting (fixture and bulb type)
+            sel_vals.extend(eqp)
         else:  # Other end uses
-            data_sel = data_sel[
-                numpy.all([data_sel['EQPCLASS'] == eqp], axis=0)]
-
-    # Loop through the reduced numpy stock and energy array and
-    # combine the reported values together
-    for idx, row in enumerate(data_sel):
-        # If data for the year is already present for the current
-        # microsegment (as with microsegments that combine several
-        # EIA categories together), add the new stock and consumption
-        # values to the existing values (assume that if the year is
-        # present in the group_stock dict it is also in group_energy)
-        if row['YEAR'] in group_stock:
-            # Record energy consumption and stock information
-            # (change the year to a string to yield a valid
-            # JSON dict, where all keys must be strings)
-            group_stock[row['YEAR']] += row['EQSTOCK']
-            group_energy[row['YEAR']] += row['CONSUMPTION']
-
-        else:
-            group_stock[row['YEAR']] = row['EQSTOCK']
-            group_energy[row['YEAR']] = row['CONSUMPTION']
+            sel_vals.append(eqp)
+
+    # Select the applicable rows of the AEO data array
+    data_sel = data.select(*sel_vals)
+
+    # Combine the reported stock and energy values for each year (as
+    # with microsegments that combine several EIA categories together),
+    # preserving the order in which the years first appear
+    years, yr_first, yr_inv = numpy.unique(
+        data_sel['YEAR'], return_index=True, return_inverse=True)
+    group_stock, group_energy = [
+        numpy.zeros(len(years), dtype=data_sel[x].dtype) for
+        x in ['EQSTOCK', 'CONSUMPTION']]
+    numpy.add.at(group_stock, yr_inv, data_sel['EQSTOCK'])
+    numpy.add.at(group_energy, yr_inv, data_sel['CONSUMPTION'])
+    yr_order = numpy.argsort(yr_first)
 
     # Convert the numeric year keys in the energy and stock dicts
     # to strings to be compatible with valid JSON
-    group_stock = {str(key): value for key, value in group_stock.items()}
-    group_energy = {str(key): value for key, value in group_energy.items()}
+    group_stock = {str(years[i]): group_stock[i] for i in yr_order}
+    group_energy = {str(years[i]): group_energy[i] for i in yr_order}
 
     return group_energy, group_stock
 
@@ -525,8 +503,9 @@ def sqft_homes_select(data, sel):
     use, building type, and technology type in each census division.
 
     Args:
-        data (numpy.ndarray): An array of AEO energy, equipment stock,
-            and household count data given by microsegment.
+        data (DataIndex): An index of the array of AEO energy,
+            equipment stock, and household count data given by
+            microsegment.
         sel (list): A nested list of indices for selecting the relevant
             data, created by json_translator.
 
@@ -545,15 +524,10 @@ def sqft_homes_select(data, sel):
 
     # Select home count or square footage data based on selection indices
     if technology_supplydict['total homes (tech level)'] in sel[0]:
-        data_sel = data[numpy.all([data['ENDUSE'] == sel[0][0],
-                                   data['CDIV'] == sel[0][1],
-                                   data['BLDG'] == sel[0][2],
-                                   data['FUEL'] == sel[0][3],
-                                   data['EQPCLASS'] == sel[0][4]], axis=0)]
+        data_sel = data.select(
+            sel[0][1], sel[0][2], sel[0][0], sel[0][3], sel[0][4])
     else:
-        data_sel = data[numpy.all([data['ENDUSE'] == sel[0][0],
-                                   data['CDIV'] == sel[0][1],
-                                   data['BLDG'] == sel[0][2]], axis=0)]
+        data_sel = data.select(sel[0][1], sel[0][2], sel[0][0])
 
     # Loop through the reduced numpy stock and energy (and ancillary
     # data) array and restructure the reported values
@@ -590,9 +564,11 @@ def list_generator(nrg_stock, tloads, filterdata, aeo_years, lt_factors):
     reported only for the first bulb type for each fixture type.
 
     Args:
-        nrg_stock (numpy.ndarray): An array of AEO energy, equipment
-            stock, and household count data given by microsegment.
-        loads (numpy.ndarray): An array of thermal load component factors.
+        nrg_stock (DataIndex): An index of the array of AEO energy,
+            equipment stock, and household count data given by
+            microsegment.
+        loads (DataIndex): An index of the array of thermal load
+            component factors.
         filterdata (list): A list of keys from the microsegments JSON
             indicating the data to be obtained.
         aeo_years (int): The number of years of data reported in the
@@ -759,9 +735,11 @@ def walk(nrg_stock, loads, json_dict, yrs_range, lt_factors, key_list=[]):
     terminal node.
 
     Args:
-        nrg_stock (numpy.ndarray): An array of AEO energy, equipment
-            stock, and household count data given by microsegment.
-        loads (numpy.ndarray): An array of thermal load component factors.
+        nrg_stock (DataIndex): An index of the array of AEO energy,
+            equipment stock, and household count data given by
+            microsegment.
+        loads (DataIndex): An index of the array of thermal load
+            component factors.
         json_dict (dict): The empty microsegments JSON structure.
         yrs_range (int): The number of years of data reported in the
             RESDBOUT file.
@@ -1555,8 +1533,12 @@ def main():
         msjson = json.load(jsi)
 
         # Run through JSON objects, determine replacement information
-        # to mine from the imported data, and make the replacements
-        result = walk(ns_data, tl_data, msjson, yrs_range, lt_wt_fac)
+        # to mine from the imported data, and make the replacements;
+        # index the energy/stock and thermal loads data once up front
+        # such that the data for each microsegment are looked up directly
+        result = walk(DataIndex(ns_data, index_fields),
+                      DataIndex(tl_data, index_fields), msjson, yrs_range,
+                      lt_wt_fac)
 
         # Add in onsite generation for SF as a new end-use from
         # RGENOUT.txt
@@ -3,22 +3,30 @@ from __future__ import annotations
 import json
 import numpy
 import copy
+from pathlib import Path
 from numpy.linalg import LinAlgError
 from collections import OrderedDict, defaultdict
 import gzip
-import pickle
-from ast import literal_eval
 import math
+import time
 from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
 import numpy_financial as npf
 from scout.plots import run_plot
 from scout.config import Config, FilePaths as fp
-from scout.utils import PrintFormat as fmt
+from scout.ecm_prep_args import non_result_opts
+from scout.utils import PrintFormat as fmt, MsegKey, CompDataIO, StageProfiler, KeyValTree, \
+    JsonIO
 import warnings
 import itertools
 import pandas as pd
 from operator import itemgetter
 import os
+import sys
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+# Stage timings, counts, and peak memory of the current run (see the 'profile' option);
+# disabled by default
+profiler = StageProfiler()
 
 
 class UsefulInputFiles(object):
@@ -47,15 +55,20 @@ class UsefulInputFiles(object):
             heating, cooking, drying, and other end uses.
     """
 
-    def __init__(self, energy_out, regions, grid_decarb):
+    def __init__(self, energy_out, regions, grid_decarb, run_setup=None):
         self.glob_vars = fp.GENERATED / "glob_run_vars.json"
         self.meas_summary_data = fp.GENERATED / "ecm_prep.json"
         self.meas_compete_data = fp.ECM_COMP
         self.meas_eff_fs_splt_data = fp.EFF_FS_SPLIT
-        self.active_measures = fp.GENERATED / "run_setup.json"
+        # Use a run setup file other than the one written by ecm_prep if given
+        if run_setup is not None:
+            self.active_measures = run_setup
+        else:
+            self.active_measures = fp.GENERATED / "run_setup.json"
         self.meas_engine_out_ecms = fp.RESULTS / "ecm_results.json"
         self.meas_engine_out_agg = fp.RESULTS / "agg_results.json"
         self.comp_fracs_out = fp.RESULTS / "comp_fracs.json"
+        self.profile_out = fp.RESULTS / "run_profile.json"
         self.cpi_data = fp.CONVERT_DATA / "cpi.csv"
         self.state_appl_regs = fp.SUB_FED / "appl_regs.csv"
         self.codes = fp.SUB_FED / "codes.csv"
@@ -786,12 +799,15 @@ class Engine(object):
         output_all (OrderedDict): Summary results across all active measures;
             also stores data on energy output type (site, source (fossil
             equivalent site-source) or source (captured energy site-source).
+        mseg_index (dict): Index of the measures that pertain to each
+            contributing microsegment, reused across adoption schemes.
     """
 
     def __init__(self, handyvars, opts, measure_objects, energy_out, brkout):
         self.handyvars = handyvars
         self.opts = opts
         self.measures = measure_objects
+        self.mseg_index = None
         self.output_ecms, self.output_all = (OrderedDict() for n in range(2))
         self.output_all["All ECMs"] = OrderedDict([
             ("Markets and Savings (Overall)", OrderedDict())])
@@ -936,6 +952,14 @@ class Engine(object):
         measures_update = [m for m in self.measures if m.update_results[
             "savings"][adopt_scheme][comp_scheme] is True]
 
+        # Initialize inputs to the batched financial metrics calculation
+        # across all measures, the index of the measure that each batch
+        # element belongs to, and the total batch length
+        batch_inputs, batch_meas, batch_len = [[] for n in range(11)], [], 0
+        # Initialize measures to update financial metrics for, along with the
+        # position and length of each year's inputs in the batch
+        fin_update = []
+
         # Update measure savings and associated financial metrics
         for m in measures_update:
             # Initialize energy/energy cost savings, carbon/
@@ -1043,18 +1067,17 @@ class Engine(object):
 
                 # Initialize per unit measure stock, energy, and carbon costs;
                 # per unit energy and carbon cost savings; per unit energy and
-                # carbon savings; unit stock, energy, and carbon costs to use
-                # in residential and commercial competition calculations; and
-                # financial metrics (irr, payback, cce, ccc)
+                # carbon savings
                 scostbase_unit, scostmeas_delt_unit, scostmeas_unit, \
                     ecost_meas_unit, ccost_meas_unit, \
                     ecostsave_unit, ccostsave_unit, esave_unit, \
-                    csave_unit, stock_unit_cost_res, stock_unit_cost_com, \
-                    energy_unit_cost_res, energy_unit_cost_com, \
-                    carb_unit_cost_res, carb_unit_cost_com, irr_e, irr_ec, \
-                    payback_e, payback_ec, cce, cce_bens, ccc, ccc_bens = ({
+                    csave_unit = ({
                         yr: None for yr in self.handyvars.aeo_years} for
-                        n in range(23))
+                        n in range(9))
+
+                # Initialize the position and length of each year's inputs in
+                # the batch
+                batch_yrs = {}
 
                 # Calculate per unit stock costs, energy and carbon savings,
                 # and energy and carbon cost savings for each projection year;
@@ -1165,231 +1188,196 @@ class Engine(object):
                     # Calculate measure financial metrics
 
                     # If the total baseline stock is zero or no measure units
-                    # have been captured for a given year, set finance metrics
-                    # to 999
+                    # have been captured for a given year, flag the year for
+                    # finance metrics to be set after the calculations below
                     if nunits_cmp == 0 or (
                         not isinstance(nunits_meas_cmp, numpy.ndarray) and
                         nunits_meas_cmp == 0 or
                             isinstance(nunits_meas_cmp, numpy.ndarray) and all(
                                 nunits_meas_cmp) == 0):
-                        if yr == self.handyvars.aeo_years[0]:
-                            stock_unit_cost_res[yr], \
-                                energy_unit_cost_res[yr], \
-                                carb_unit_cost_res[yr], \
-                                stock_unit_cost_com[yr], \
-                                energy_unit_cost_com[yr], \
-                                carb_unit_cost_com[yr], \
-                                irr_e[yr], irr_ec[yr], payback_e[yr], \
-                                payback_ec[yr], cce[yr], cce_bens[yr], \
-                                ccc[yr], ccc_bens[yr] = [
-                                    None for n in range(6)] + [
-                                    999 for n in range(8)]
-                        else:
-                            yr_prev = str(int(yr) - 1)
-                            stock_unit_cost_res[yr], \
-                                energy_unit_cost_res[yr], \
-                                carb_unit_cost_res[yr], \
-                                stock_unit_cost_com[yr], \
-                                energy_unit_cost_com[yr], \
-                                carb_unit_cost_com[yr], \
-                                irr_e[yr], irr_ec[yr], \
-                                payback_e[yr], payback_ec[yr], \
-                                cce[yr], cce_bens[yr], \
-                                ccc[yr], ccc_bens[yr] = [x[yr_prev] for x in [
-                                    stock_unit_cost_res, energy_unit_cost_res,
-                                    carb_unit_cost_res, stock_unit_cost_com,
-                                    energy_unit_cost_com, carb_unit_cost_com,
-                                    irr_e, irr_ec, payback_e, payback_ec, cce,
-                                    cce_bens, ccc, ccc_bens]]
+                        batch_yrs[yr] = None
                     # Otherwise, check whether any financial metric calculation
                     # inputs that can be arrays are in fact arrays
                     elif any(isinstance(x, numpy.ndarray) for x in [
                             scostmeas_delt_unit[yr], esave_unit[yr],
                             life_meas]):
-                        # Make copies of the above stock, energy/carbon/cost
-                        # variables for possible further manipulation below
-                        # before using as inputs to "metric update" function
-                        scostmeas_delt_unit_tmp, esave_tmp_unit, \
-                            ecostsave_tmp_unit, csave_tmp_unit, \
-                            ccostsave_tmp_unit, life_meas_tmp, \
-                            scost_meas_tmp, ecost_meas_tmp, ccost_meas_tmp = [
-                                scostmeas_delt_unit[yr], esave_unit[yr],
-                                ecostsave_unit[yr], csave_unit[yr],
-                                ccostsave_unit[yr], life_meas,
-                                scostmeas_unit[yr],
-                                ecost_meas_unit[yr],
-                                ccost_meas_unit[yr]]
-
-                        # Ensure consistency in length of all "metric_update"
-                        # inputs that can be arrays
-
                         # Determine the length that any array inputs to
-                        # "metric_update" should consistently have
+                        # "metric_update_batch" should consistently have
                         len_arr = next((len(item) for item in [
                             scostmeas_delt_unit[yr], esave_unit[yr],
                             life_meas] if isinstance(
                                 item, numpy.ndarray)), None)
-
-                        # Ensure all array inputs to "metric_update" are of the
-                        # above length
-
-                        # Check capital cost inputs
-                        if not isinstance(
-                                scostmeas_delt_unit_tmp, numpy.ndarray):
-                            scostmeas_delt_unit_tmp = numpy.repeat(
-                                scostmeas_delt_unit_tmp, len_arr)
-                            scost_meas_tmp = numpy.repeat(
-                                scost_meas_tmp, len_arr)
-                        # Check energy/energy cost and carbon/cost savings
-                        # inputs
-                        if not isinstance(
-                                esave_tmp_unit, numpy.ndarray):
-                            esave_tmp_unit = numpy.repeat(
-                                esave_tmp_unit, len_arr)
-                            ecostsave_tmp_unit = \
-                                numpy.repeat(ecostsave_tmp_unit, len_arr)
-                            csave_tmp_unit = numpy.repeat(
-                                csave_tmp_unit, len_arr)
-                            ccostsave_tmp_unit = \
-                                numpy.repeat(ccostsave_tmp_unit, len_arr)
-                            ecost_meas_tmp = numpy.repeat(
-                                ecost_meas_tmp, len_arr)
-                            ccost_meas_tmp = numpy.repeat(
-                                ccost_meas_tmp, len_arr)
-                        # Check measure lifetime input
-                        if not isinstance(life_meas_tmp, numpy.ndarray):
-                            life_meas_tmp = numpy.repeat(
-                                life_meas_tmp, len_arr)
-
-                        # Initialize numpy arrays for financial metrics outputs
-                        stock_unit_cost_res[yr], energy_unit_cost_res[yr], \
-                            carb_unit_cost_res[yr], stock_unit_cost_com[yr], \
-                            energy_unit_cost_com[yr], carb_unit_cost_com[yr], \
-                            irr_e[yr], irr_ec[yr], payback_e[yr], \
-                            payback_ec[yr], cce[yr], cce_bens[yr], ccc[yr], \
-                            ccc_bens[yr] = (numpy.repeat(None, len(
-                                scostmeas_delt_unit_tmp)) for v in range(14))
-
-                        # Run measure energy/carbon/cost savings and lifetime
-                        # inputs through "metric_update" function to yield
-                        # financial metric outputs. To handle inputs that are
-                        # arrays, use a for loop to generate an output for each
-                        # input array element one-by-one and append it to the
-                        # appropriate output list. Note that lifetime float
-                        # values are translated to integers, and all
-                        # energy, carbon, and energy/carbon cost savings values
-                        # are normalized by total applicable stock units
-                        for x in range(0, len(scostmeas_delt_unit_tmp)):
-                            stock_unit_cost_res[yr][x], \
-                                energy_unit_cost_res[yr][x], \
-                                carb_unit_cost_res[yr][x], \
-                                stock_unit_cost_com[yr][x], \
-                                energy_unit_cost_com[yr][x], \
-                                carb_unit_cost_com[yr][x], \
-                                irr_e[yr][x], irr_ec[yr][x], \
-                                payback_e[yr][x], payback_ec[yr][x], \
-                                cce[yr][x], cce_bens[yr][x], ccc[yr][x], \
-                                ccc_bens[yr][x] = self.metric_update(
-                                    m, int(round(life_base)),
-                                    int(round(life_meas_tmp[x])),
-                                    scostbase_unit[yr],
-                                    scostmeas_delt_unit_tmp[x],
-                                    esave_tmp_unit[x], ecostsave_tmp_unit[x],
-                                    csave_tmp_unit[x], ccostsave_tmp_unit[x],
-                                    scost_meas_tmp[x], ecost_meas_tmp[x],
-                                    ccost_meas_tmp[x], opts)
+                        # Ensure all array inputs to "metric_update_batch" are
+                        # of the above length and add them to the batch; note
+                        # that all energy, carbon, and energy/carbon cost
+                        # savings values are normalized by total applicable
+                        # stock units
+                        for inputs, x in zip(batch_inputs, [
+                                life_base, life_meas, scostbase_unit[yr],
+                                scostmeas_delt_unit[yr], esave_unit[yr],
+                                ecostsave_unit[yr], csave_unit[yr],
+                                ccostsave_unit[yr], scostmeas_unit[yr],
+                                ecost_meas_unit[yr], ccost_meas_unit[yr]]):
+                            inputs.append(numpy.broadcast_to(x, len_arr))
+                        batch_meas.append(numpy.full(len_arr, len(fin_update)))
+                        batch_yrs[yr] = (batch_len, len_arr, True)
+                        batch_len += len_arr
                     else:
-                        # Run measure energy/carbon/cost savings and lifetime
-                        # inputs through "metric_update" function to yield
-                        # financial metric outputs. Note that lifetime float
-                        # values are translated to integers, and all
-                        # energy, carbon, and energy/carbon cost savings values
-                        # are normalized by total applicable stock units
-                        stock_unit_cost_res[yr], energy_unit_cost_res[yr], \
-                            carb_unit_cost_res[yr], stock_unit_cost_com[yr], \
-                            energy_unit_cost_com[yr], carb_unit_cost_com[yr], \
-                            irr_e[yr], irr_ec[yr], payback_e[yr], \
-                            payback_ec[yr], cce[yr], cce_bens[yr], ccc[yr], \
-                            ccc_bens[yr] = \
-                            self.metric_update(
-                                m, int(round(life_base)),
-                                int(round(life_meas)), scostbase_unit[yr],
+                        # Add measure energy/carbon/cost savings and lifetime
+                        # inputs to the batch as a single element. Note that
+                        # all energy, carbon, and energy/carbon cost savings
+                        # values are normalized by total applicable stock units
+                        for inputs, x in zip(batch_inputs, [
+                                life_base, life_meas, scostbase_unit[yr],
                                 scostmeas_delt_unit[yr], esave_unit[yr],
                                 ecostsave_unit[yr], csave_unit[yr],
-                                ccostsave_unit[yr],
-                                scostmeas_unit[yr],
-                                ecost_meas_unit[yr],
-                                ccost_meas_unit[yr], opts)
-
-                # Set measure financial metrics dict to update (across years)
-                metrics_finance = m.financial_metrics
-                # Update unit capital and operating costs
-                metrics_finance["unit cost"]["stock cost"]["residential"], \
-                    metrics_finance["unit cost"]["stock cost"][
-                    "commercial"] = [stock_unit_cost_res, stock_unit_cost_com]
-                metrics_finance["unit cost"]["energy cost"]["residential"], \
-                    metrics_finance["unit cost"]["energy cost"][
-                    "commercial"] = [energy_unit_cost_res,
-                                     energy_unit_cost_com]
-                metrics_finance["unit cost"]["carbon cost"]["residential"], \
-                    metrics_finance["unit cost"]["carbon cost"][
-                    "commercial"] = [carb_unit_cost_res, carb_unit_cost_com]
-                # Update internal rate of return
-                metrics_finance["irr (w/ energy costs)"] = irr_e
-                metrics_finance["irr (w/ energy and carbon costs)"] = irr_ec
-                # Update payback period
-                metrics_finance["payback (w/ energy costs)"] = payback_e
-                metrics_finance["payback (w/ energy and carbon costs)"] = \
-                    payback_ec
-                # Update cost of conserved energy
-                metrics_finance["cce"] = cce
-                metrics_finance["cce (w/ carbon cost benefits)"] = cce_bens
-                # Update cost of conserved carbon
-                metrics_finance["ccc"] = ccc
-                metrics_finance["ccc (w/ energy cost benefits)"] = ccc_bens
-
-                # Set measure consumer-level metrics to finalized status
-                m.update_results["financial metrics"] = False
-
-    def metric_update(self, m, life_base, life_meas, scost_base,
-                      scost_meas_delt, esave, ecostsave, csave, ccostsave,
-                      scost_meas, ecost_meas, ccost_meas, opts):
-        """Calculate measure financial metrics for a given year.
+                                ccostsave_unit[yr], scostmeas_unit[yr],
+                                ecost_meas_unit[yr], ccost_meas_unit[yr]]):
+                            inputs.append(numpy.atleast_1d(x))
+                        batch_meas.append(numpy.full(1, len(fin_update)))
+                        batch_yrs[yr] = (batch_len, 1, False)
+                        batch_len += 1
+
+                # Add measure to those with financial metrics to update
+                fin_update.append((m, batch_yrs))
+
+        # Run measure energy/carbon/cost savings and lifetime inputs for all
+        # measures and years through "metric_update_batch" function at once
+        # to yield financial metric outputs. Note that lifetime float values
+        # are translated to integers
+        if batch_len > 0:
+            batch_out = [numpy.array(x, dtype=object) for x in
+                         self.metric_update_batch(
+                             [upd[0] for upd in fin_update], numpy.concatenate(batch_meas),
+                             *[numpy.concatenate(x) for x in batch_inputs], opts)]
+
+        # Update financial metrics for each measure from the batch outputs
+        for m, batch_yrs in fin_update:
+            # Initialize unit stock, energy, and carbon costs to use in
+            # residential and commercial competition calculations and
+            # financial metrics (irr, payback, cce, ccc)
+            stock_unit_cost_res, stock_unit_cost_com, energy_unit_cost_res, \
+                energy_unit_cost_com, carb_unit_cost_res, carb_unit_cost_com, \
+                irr_e, irr_ec, payback_e, payback_ec, cce, cce_bens, ccc, \
+                ccc_bens = ({yr: None for yr in self.handyvars.aeo_years} for
+                            n in range(14))
+            # Financial metric outputs to update by year
+            fin_metrics = [
+                stock_unit_cost_res, energy_unit_cost_res, carb_unit_cost_res,
+                stock_unit_cost_com, energy_unit_cost_com, carb_unit_cost_com,
+                irr_e, irr_ec, payback_e, payback_ec, cce, cce_bens, ccc,
+                ccc_bens]
+            for yr in self.handyvars.aeo_years:
+                # If the total baseline stock is zero or no measure units
+                # have been captured for a given year, set finance metrics
+                # to 999 (first year) or to the previous year's metrics
+                if batch_yrs[yr] is None:
+                    if yr == self.handyvars.aeo_years[0]:
+                        for x, val in zip(fin_metrics, [
+                                None for n in range(6)] + [
+                                999 for n in range(8)]):
+                            x[yr] = val
+                    else:
+                        yr_prev = str(int(yr) - 1)
+                        for x in fin_metrics:
+                            x[yr] = x[yr_prev]
+                    continue
+                # Pull the year's financial metric outputs from the batch;
+                # where inputs were arrays, store outputs as arrays
+                start, len_arr, is_arr = batch_yrs[yr]
+                for x, out in zip(fin_metrics, batch_out):
+                    if is_arr:
+                        x[yr] = out[start:start + len_arr].copy()
+                    else:
+                        x[yr] = out[start]
+
+            # Set measure financial metrics dict to update (across years)
+            metrics_finance = m.financial_metrics
+            # Update unit capital and operating costs
+            metrics_finance["unit cost"]["stock cost"]["residential"], \
+                metrics_finance["unit cost"]["stock cost"][
+                "commercial"] = [stock_unit_cost_res, stock_unit_cost_com]
+            metrics_finance["unit cost"]["energy cost"]["residential"], \
+                metrics_finance["unit cost"]["energy cost"][
+                "commercial"] = [energy_unit_cost_res,
+                                 energy_unit_cost_com]
+            metrics_finance["unit cost"]["carbon cost"]["residential"], \
+                metrics_finance["unit cost"]["carbon cost"][
+                "commercial"] = [carb_unit_cost_res, carb_unit_cost_com]
+            # Update internal rate of return
+            metrics_finance["irr (w/ energy costs)"] = irr_e
+            metrics_finance["irr (w/ energy and carbon costs)"] = irr_ec
+            # Update payback period
+            metrics_finance["payback (w/ energy costs)"] = payback_e
+            metrics_finance["payback (w/ energy and carbon costs)"] = \
+                payback_ec
+            # Update cost of conserved energy
+            metrics_finance["cce"] = cce
+            metrics_finance["cce (w/ carbon cost benefits)"] = cce_bens
+            # Update cost of conserved carbon
+            metrics_finance["ccc"] = ccc
+            metrics_finance["ccc (w/ energy cost benefits)"] = ccc_bens
+
+            # Set measure consumer-level metrics to finalized status
+            m.update_results["financial metrics"] = False
+
+    def metric_update_batch(self, meas, meas_ind, life_base, life_meas,
+                            scost_base, scost_meas_delt, esave, ecostsave,
+                            csave, ccostsave, scost_meas, ecost_meas,
+                            ccost_meas, opts):
+        """Calculate measure financial metrics for a batch of inputs.
 
         Notes:
             Calculate internal rate of return, simple payback, and cost of
             conserved energy/carbon from cash flows and energy/carbon
             savings across the measure lifetime. In the cash flows, represent
             the benefits of longer lifetimes for lighting equipment ECMs over
-            comparable baseline technologies.
+            comparable baseline technologies. Each element of the input
+            arrays is a separate set of inputs (e.g., a projection year or
+            a sample of an uncertain measure input); the cash flows for all
+            elements are stacked into 2-D arrays (elements x years of
+            measure life) so that the metrics are calculated together.
+            Elements may belong to different measures; element outputs
+            match those of a separate calculation for each set of inputs.
 
         Args:
-            m (object): Measure object.
-            nunits (int): Total competed baseline units in a given year.
-            nunits_meas (int): Total competed units captured by measure in
-                given year.
-            life_base (float): Baseline technology lifetime.
-            life_meas (float): Measure lifetime.
-            scost_base (float): Per unit baseline capital cost in given year.
-            scost_meas_delt (float): Per unit incremental capital
-                cost for measure over baseline unit in given year.
-            esave (float): Per unit annual energy savings over measure
-                lifetime, starting in given year.
-            ecostsave (float): Per unit annual energy cost savings over
-                measure lifetime, starting in a given year.
-            csave (float): Per unit annual avoided carbon emissions over
-                measure lifetime, starting in given year.
-            ccostsave (float): Per unit annual carbon cost savings over
-                measure lifetime, starting in a given year.
-            scost_meas (float): Per unit measure capital cost in given year.
-            ecost_meas (float): Per unit measure energy cost in given year.
-            ccost_meas (float): Per unit measure carbon cost in given year.
+            meas (list): Measure objects the batch elements belong to.
+            meas_ind (numpy.ndarray): Index (in 'meas') of the measure that
+                each element belongs to.
+            life_base (numpy.ndarray): Baseline technology lifetimes (years).
+            life_meas (numpy.ndarray): Measure lifetimes (years).
+            scost_base (numpy.ndarray): Per unit baseline capital costs.
+            scost_meas_delt (numpy.ndarray): Per unit incremental capital
+                costs for measure over baseline unit.
+            esave (numpy.ndarray): Per unit annual energy savings over
+                measure lifetime.
+            ecostsave (numpy.ndarray): Per unit annual energy cost savings
+                over measure lifetime.
+            csave (numpy.ndarray): Per unit annual avoided carbon emissions
+                over measure lifetime.
+            ccostsave (numpy.ndarray): Per unit annual carbon cost savings
+                over measure lifetime.
+            scost_meas (numpy.ndarray): Per unit measure capital costs.
+            ecost_meas (numpy.ndarray): Per unit measure energy costs.
+            ccost_meas (numpy.ndarray): Per unit measure carbon costs.
             opts (object): Stores user-specified execution options.
 
         Returns:
-            Consumer and portfolio-level financial metrics for the given
-            measure cost savings inputs.
+            Arrays of consumer and portfolio-level financial metrics, with
+            one array element for each element of the inputs.
         """
+        # Ensure lifetimes are integers; round float lifetimes
+        life_base, life_meas = [numpy.rint(x).astype(int) for x in [
+            life_base, life_meas]]
+        # Ensure remaining inputs are float arrays
+        scost_base, scost_meas_delt, esave, ecostsave, csave, ccostsave, \
+            scost_meas, ecost_meas, ccost_meas = [
+                numpy.asarray(x, dtype=float) for x in [
+                    scost_base, scost_meas_delt, esave, ecostsave, csave,
+                    ccostsave, scost_meas, ecost_meas, ccost_meas]]
+        # Number of input elements to calculate metrics for
+        n_elem = len(life_meas)
+
         # Develop four initial cash flow scenarios over the measure life:
         # 1) Cash flows considering capital costs only
         # 2) Cash flows considering capital costs and energy costs
@@ -1399,118 +1387,88 @@ class Engine(object):
         # For lighting equipment ECMs only: determine when over the course of
         # the ECM lifetime (if at all) a cost gain is realized from an avoided
         # purchase of the baseline lighting technology due to longer measure
-        # lifetime; store this information in a list of year indicators for
-        # subsequent use below.  Example: an LED bulb lasts 30 years compared
-        # to a baseline bulb's 10 years, meaning 3 purchases of the baseline
+        # lifetime.  Example: an LED bulb lasts 30 years compared to a
+        # baseline bulb's 10 years, meaning 3 purchases of the baseline
         # bulb would have occurred by the time the LED bulb has reached the
         # end of its life.
-        added_stockcost_gain_yrs = []
-        if (life_meas > life_base) and ("lighting" in m.end_use[
-            "primary"]) and (m.measure_type == "full service") and (
-                m.technology_type["primary"] == "supply"):
-            for i in range(1, life_meas):
-                if i % life_base == 0:
-                    added_stockcost_gain_yrs.append(i - 1)
+        lgt_supply = numpy.array([("lighting" in m.end_use["primary"]) and (
+            m.measure_type == "full service") and (
+            m.technology_type["primary"] == "supply") for m in meas],
+            dtype=bool)[meas_ind]
 
         # If the measure lifetime is less than 1 year, set it to 1 year
         # (a minimum for measure lifetime to work in below calculations)
-        if life_meas < 1:
-            life_meas = 1
-
-        # Construct capital cost cash flows across measure life
-
-        # Initialize incremental and total capital cost cash flows with
-        # upfront incremental and total capital cost
-        cashflows_s_delt = numpy.array(scost_meas_delt)
-        cashflows_s_tot = numpy.array(scost_meas)
-
-        for life_yr in range(0, life_meas):
-            # Check whether an avoided cost of the baseline technology should
-            # be added for given year; if not, set this term to zero
-            if life_yr in added_stockcost_gain_yrs:
-                scost_life = scost_base
-            else:
-                scost_life = 0
-
-            # Add avoided capital costs as appropriate (e.g., for an LED
-            # lighting measure with a longer lifetime than the comparable
-            # baseline lighting technology)
-            cashflows_s_delt = numpy.append(cashflows_s_delt, scost_life)
-            cashflows_s_tot = numpy.append(cashflows_s_tot, scost_life)
+        life_meas = numpy.maximum(life_meas, 1)
+
+        # Cash flow years, where the first year (index 0) is reserved for the
+        # initial investment; cash flows are padded with zeros beyond the
+        # lifetime of each element
+        cf_yrs = numpy.arange(life_meas.max() + 1)
+        # Flag years with cash flows after the initial investment
+        in_life = (cf_yrs >= 1) & (cf_yrs <= life_meas[:, None])
+        # Flag years in which an avoided cost of the baseline technology is
+        # realized
+        added_stockcost_gain = (lgt_supply & (life_meas > life_base))[
+            :, None] & in_life & (cf_yrs < life_meas[:, None]) & (
+            cf_yrs % numpy.maximum(life_base, 1)[:, None] == 0)
+
+        # Construct incremental and total capital cost cash flows across
+        # measure life, starting with the upfront incremental and total
+        # capital cost and adding avoided capital costs as appropriate
+        # (e.g., for an LED lighting measure with a longer lifetime than the
+        # comparable baseline lighting technology)
+        cashflows_s_delt, cashflows_s_tot = [numpy.where(
+            added_stockcost_gain, scost_base[:, None], 0.0) for n in range(2)]
+        cashflows_s_delt[:, 0], cashflows_s_tot[:, 0] = [
+            scost_meas_delt, scost_meas]
 
         # Construct complete incremental and total energy and carbon cash
         # flows across measure lifetime. First term (reserved for initial
         # investment) is zero
-        cashflows_e_delt, cashflows_c_delt = [
-            numpy.append(0, [x] * life_meas) for x in [ecostsave, ccostsave]]
-        cashflows_e_tot, cashflows_c_tot = [
-            numpy.append(0, [x] * life_meas) for x in [ecost_meas, ccost_meas]]
+        cashflows_e_delt, cashflows_c_delt, cashflows_e_tot, \
+            cashflows_c_tot = [numpy.where(in_life, x[:, None], 0.0) for x in [
+                ecostsave, ccostsave, ecost_meas, ccost_meas]]
 
         # Calculate net present values (NPVs) using the above cashflows
         npv_s_delt, npv_e_delt, npv_c_delt = [
-            npf.npv(self.handyvars.discount_rate, x) for x in [
+            self.npv_batch(self.handyvars.discount_rate, x) for x in [
                 cashflows_s_delt, cashflows_e_delt, cashflows_c_delt]]
 
-        # Develop arrays of energy and carbon savings across measure
-        # lifetime (for use in cost of conserved energy and carbon calcs).
-        # First term (reserved for initial investment figure) is zero, and
-        # each array is normalized by number of captured stock units
-        esave_array = numpy.append(0, [esave] * life_meas)
-        csave_array = numpy.append(0, [csave] * life_meas)
-
-        # Calculate Net Present Value and annuity equivalent Net Present Value
-        # of the above energy and carbon savings
-        npv_esave = npf.npv(self.handyvars.discount_rate, esave_array)
-        npv_csave = npf.npv(self.handyvars.discount_rate, csave_array)
+        # Calculate Net Present Value of energy and carbon savings across
+        # measure lifetime (for use in cost of conserved energy and carbon
+        # calcs). First term (reserved for initial investment figure) is zero
+        npv_esave, npv_csave = [self.npv_batch(
+            self.handyvars.discount_rate, numpy.where(
+                in_life, x[:, None], 0.0)) for x in [esave, csave]]
 
         # Calculate portfolio-level financial metrics
-
-        # Calculate cost of conserved energy w/ and w/o carbon cost savings
-        # benefits. Restrict denominator values less than or equal to zero
-        if npv_esave > 0:
-            cce = (-npv_s_delt / npv_esave)
-            cce_bens = (-(npv_s_delt + npv_c_delt) / npv_esave)
-        else:
-            cce, cce_bens = [999 for n in range(2)]
-
-        # Calculate cost of conserved carbon w/ and w/o energy cost savings
-        # benefits. Restrict denominator values less than or equal to zero
-        if npv_csave > 0:
-            ccc = (-npv_s_delt / (npv_csave * 1000000))
-            ccc_bens = (-(npv_s_delt + npv_e_delt) /
-                        (npv_csave * 1000000))
-        else:
-            ccc, ccc_bens = [999 for n in range(2)]
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            # Calculate cost of conserved energy w/ and w/o carbon cost
+            # savings benefits. Restrict denominator values less than or
+            # equal to zero
+            cce, cce_bens = [numpy.where(
+                npv_esave > 0, x / npv_esave, 999) for x in [
+                -npv_s_delt, -(npv_s_delt + npv_c_delt)]]
+            # Calculate cost of conserved carbon w/ and w/o energy cost
+            # savings benefits. Restrict denominator values less than or
+            # equal to zero
+            ccc, ccc_bens = [numpy.where(
+                npv_csave > 0, x / (npv_csave * 1000000), 999) for x in [
+                -npv_s_delt, -(npv_s_delt + npv_e_delt)]]
 
         # Calculate internal rate of return and simple payback for capital
-        # + energy and capital + energy + carbon cash flows.  Use try/
-        # except to handle cases where IRR/payback cannot be calculated
+        # + energy and capital + energy + carbon cash flows; IRR/payback
+        # values that cannot be calculated are set to 999
 
         # IRR and payback given capital + energy cash flows
-        try:
-            irr_e = npf.irr(cashflows_s_delt + cashflows_e_delt)
-            if not math.isfinite(irr_e):
-                raise (ValueError)
-        except (ValueError, LinAlgError):
-            irr_e = 999
-        try:
-            payback_e = self.payback(cashflows_s_delt + cashflows_e_delt)
-        except (ValueError, LinAlgError):
-            payback_e = 999
+        irr_e = self.irr_batch(cashflows_s_delt + cashflows_e_delt, life_meas)
+        payback_e = self.payback_batch(
+            cashflows_s_delt + cashflows_e_delt, life_meas)
         # IRR and payback given capital + energy + carbon cash flows
-        try:
-            irr_ec = npf.irr(
-                cashflows_s_delt + cashflows_e_delt + cashflows_c_delt)
-            if not math.isfinite(irr_ec):
-                raise (ValueError)
-        except (ValueError, LinAlgError):
-            irr_ec = 999
-        try:
-            payback_ec = \
-                self.payback(
-                    cashflows_s_delt + cashflows_e_delt + cashflows_c_delt)
-        except (ValueError, LinAlgError):
-            payback_ec = 999
+        irr_ec = self.irr_batch(
+            cashflows_s_delt + cashflows_e_delt + cashflows_c_delt, life_meas)
+        payback_ec = self.payback_batch(
+            cashflows_s_delt + cashflows_e_delt + cashflows_c_delt, life_meas)
 
         # Set unit capital and operating costs using the above
         # cashflows for later use in measure competition calculations. For
@@ -1522,123 +1480,308 @@ class Engine(object):
         # tolerance observed amongst commercial adopters.  These discount
         # rate levels are imported from commercial AEO demand module data.
 
-        # Populate unit costs for residential sector
-        # Check whether measure applies to residential sector
-        if any([x in ["single family home", "multi family home",
-                      "mobile home"] for x in m.bldg_type]):
-            unit_cost_s_res, unit_cost_e_res, unit_cost_c_res = [
-                scost_meas, ecost_meas, ccost_meas]
-        # If measure does not apply to residential sector, set residential
+        # Flag elements of measures that apply to the residential and
+        # commercial sectors
+        res_bldgs = ["single family home", "multi family home", "mobile home"]
+        sect_res = numpy.array([any([
+            x in res_bldgs for x in m.bldg_type]) for m in meas],
+            dtype=bool)[meas_ind]
+        sect_com = numpy.array([any([
+            x not in res_bldgs for x in m.bldg_type]) for m in meas],
+            dtype=bool)[meas_ind]
+
+        # Populate unit costs for residential sector; for elements of
+        # measures that do not apply to residential sector, set residential
         # unit costs to 'None'
-        else:
-            unit_cost_s_res, unit_cost_e_res, unit_cost_c_res = (
-                None for n in range(3))
-
-        # Populate unit costs for commercial sector
-        # Check whether measure applies to commercial sector
-        if any([x not in ["single family home", "multi family home",
-                          "mobile home"] for x in m.bldg_type]):
+        unit_cost_s_res, unit_cost_e_res, unit_cost_c_res = [numpy.where(
+            sect_res, x.astype(object), None) for x in [
+            scost_meas, ecost_meas, ccost_meas]]
+
+        # Populate unit costs for commercial sector; for elements of measures
+        # that do not apply to commercial sector, set commercial unit costs to
+        # 'None'
+        unit_cost_s_com, unit_cost_e_com, unit_cost_c_com = (
+            numpy.full(n_elem, None) for n in range(3))
+        if sect_com.any():
+            # Discount rate category names
+            rate_keys = ["rate " + str(ind + 1) for ind in range(
+                len(self.handyvars.com_timeprefs["rates"]))]
             if opts.high_res_comp is False:
-                unit_cost_s_com, unit_cost_e_com, unit_cost_c_com = (
-                    {} for n in range(3))
-                # Set unit cost values under 7 discount rate categories
-                try:
-                    for ind, tps in enumerate(
-                            self.handyvars.com_timeprefs["rates"]):
-                        unit_cost_s_com["rate " + str(ind + 1)], \
-                            unit_cost_e_com["rate " + str(ind + 1)], \
-                            unit_cost_c_com["rate " + str(ind + 1)] = \
-                            [npf.npv(tps, x) for x in [
-                             cashflows_s_tot, cashflows_e_tot,
-                             cashflows_c_tot]]
-                        if any([not math.isfinite(x) for x in [
-                                unit_cost_s_com["rate " + str(ind + 1)],
-                                unit_cost_e_com["rate " + str(ind + 1)],
-                                unit_cost_c_com["rate " + str(ind + 1)]]]):
-                            raise (ValueError)
-                except ValueError:
-                    unit_cost_s_com, unit_cost_e_com, unit_cost_c_com = (
-                        None for n in range(3))
+                # Calculate unit cost values under 7 discount rate categories
+                # (elements x discount rate categories)
+                npv_s_tot, npv_e_tot, npv_c_tot = [numpy.column_stack([
+                    self.npv_batch(tps, x) for tps in
+                    self.handyvars.com_timeprefs["rates"]]) for x in [
+                    cashflows_s_tot, cashflows_e_tot, cashflows_c_tot]]
+                # Flag elements with finite unit costs under all categories;
+                # unit costs for other elements are set to 'None'
+                finite = sect_com & numpy.all(numpy.isfinite(
+                    [npv_s_tot, npv_e_tot, npv_c_tot]), axis=(0, 2))
+                for unit_cost, npv in zip([
+                        unit_cost_s_com, unit_cost_e_com, unit_cost_c_com], [
+                        npv_s_tot, npv_e_tot, npv_c_tot]):
+                    unit_cost[finite] = [
+                        dict(zip(rate_keys, x)) for x in npv[finite].tolist()]
             else:
                 # Finalize annual energy and carbon costs
-                unit_cost_e_com, unit_cost_c_com = [ecost_meas, ccost_meas]
+                unit_cost_e_com[sect_com], unit_cost_c_com[sect_com] = [
+                    x[sect_com] for x in [ecost_meas, ccost_meas]]
                 # Annualize unit stock costs under 7 hurdle rates, where hurdle rate is 7 distinct
                 # time preference premiums over the risk-free interest rate plus the risk-free rate
-                unit_cost_s_com = {}
-                for ind, tps in enumerate(self.handyvars.com_timeprefs["rates"]):
-                    try:
-                        unit_cost_s_com["rate " + str(ind + 1)] = \
-                            scost_meas * (tps / (1 - ((1 + tps) ** -life_meas)))
-                    # If hurdle rate is zero, annualize stock costs by dividing by lifetime
-                    except ZeroDivisionError:
-                        unit_cost_s_com = scost_meas / life_meas
-
-        # If measure does not apply to commercial sector, set commercial
-        # unit costs to 'None'
-        else:
-            unit_cost_s_com, unit_cost_e_com, unit_cost_c_com = (
-                None for n in range(3))
+                # (elements x hurdle rates)
+                tps = numpy.array(self.handyvars.com_timeprefs["rates"])
+                annuity = 1 - ((1 + tps) ** -life_meas[:, None].astype(float))
+                with numpy.errstate(divide="ignore", invalid="ignore"):
+                    scost_ann = scost_meas[:, None] * (tps / annuity)
+                # If hurdle rate is zero, annualize stock costs by dividing by lifetime
+                zero_rate = numpy.any(annuity == 0, axis=1)
+                unit_cost_s_com[sect_com & zero_rate] = (
+                    scost_meas / life_meas)[sect_com & zero_rate]
+                unit_cost_s_com[sect_com & ~zero_rate] = [
+                    dict(zip(rate_keys, x)) for x in
+                    scost_ann[sect_com & ~zero_rate].tolist()]
 
         # Return all updated economic metrics
         return unit_cost_s_res, unit_cost_e_res, unit_cost_c_res, \
             unit_cost_s_com, unit_cost_e_com, unit_cost_c_com, irr_e, \
             irr_ec, payback_e, payback_ec, cce, cce_bens, ccc, ccc_bens
 
-    def payback(self, cashflows):
-        """Calculate simple payback period.
+    def npv_batch(self, rate, cashflows):
+        """Calculate net present values for rows of cash flows.
 
         Notes:
-            Calculate the simple payback period given an input list of
-            cash flows, which may be uneven.
+            Row-wise equivalent of 'numpy_financial.npv'.
 
         Args:
-            cashflows (list): Cash flows across measure lifetime.
+            rate (float): Discount rate.
+            cashflows (numpy.ndarray): Cash flows (rows x years), where the
+                first year is the initial investment.
 
         Returns:
-            Simple payback period for the input cash flows.
+            Net present value of the cash flows in each row.
         """
-        # Separate initial investment and subsequent cash flows
-        # from "cashflows" input; extend cashflows up until 100 years
-        # out to ensure calculation of all paybacks under 100 years
-        investment, cashflows = cashflows[0], list(
-            cashflows[1:]) + [cashflows[-1]] * (100 - len(cashflows[1:]))
-        # If initial investment is positive, payback = 0
-        if investment >= 0:
-            payback_val = 0
-        else:
-            # Find absolute value of initial investment to compare
-            # subsequent cash flows against
-            investment = abs(investment)
-            # Initialize cumulative cashflow and # years tracking
-            total, years, cumulative = 0, 0, []
-            # Add to years and cumulative cashflow trackers while cumulative
-            # cashflow < investment
-            for cashflow in cashflows:
-                total += cashflow
-                if total < investment:
-                    years += 1
-                cumulative.append(total)
-            # If investment pays back within the measure lifetime,
-            # calculate this payback period in years
-            if years < len(cashflows):
-                a = years
-                # Case where payback period < 1 year
-                if (years - 1) < 0:
-                    b = investment
-                    c = cumulative[0]
-                # Case where payback period >= 1 year
+        return (cashflows / (1 + rate) ** numpy.arange(
+            cashflows.shape[1])).sum(axis=1)
+
+    def irr_batch(self, cashflows, life):
+        """Calculate internal rates of return for rows of cash flows.
+
+        Notes:
+            Reproduce 'numpy_financial.irr' for many cash flows at once.
+            The IRR is found from the roots of the cash flow polynomial,
+            which are the eigenvalues of its companion matrix; companion
+            matrices for cash flows with the same lifetime are stacked and
+            solved together. Cash flows with leading/trailing zeros or
+            non-finite values are handled one-by-one.
+
+        Args:
+            cashflows (numpy.ndarray): Cash flows (rows x years), where the
+                first year is the initial investment; years beyond the
+                lifetime of a row are ignored.
+            life (numpy.ndarray): Lifetime (in years) for each row.
+
+        Returns:
+            Internal rate of return for each row, set to 999 where it
+            cannot be calculated.
+        """
+        # Initialize IRR values as not calculable
+        irr = numpy.full(len(life), 999.0)
+        for life_yrs in numpy.unique(life):
+            # Rows with the given lifetime
+            rows = numpy.flatnonzero(life == life_yrs)
+            # Polynomial coefficients for each row, from the final year's
+            # cash flow down to the initial investment
+            coeffs = cashflows[rows, life_yrs::-1]
+            # Flag rows whose polynomials can be solved together (no
+            # leading/trailing zeros to strip and all values finite)
+            stack = numpy.all(numpy.isfinite(coeffs), axis=1) & (
+                coeffs[:, 0] != 0) & (coeffs[:, -1] != 0)
+            # Build companion matrices for these rows and find their roots
+            if stack.any():
+                comp_mat = numpy.zeros((stack.sum(), life_yrs, life_yrs))
+                comp_mat[:, 1:, :-1] = numpy.eye(life_yrs - 1)
+                comp_mat[:, 0, :] = \
+                    -coeffs[stack, 1:] / coeffs[stack, :1]
+                try:
+                    roots = numpy.linalg.eigvals(comp_mat)
+                except LinAlgError:
+                    # Fall back on handling each row one-by-one
+                    stack[:] = False
                 else:
-                    b = investment - cumulative[years - 1]
-                    c = cumulative[years] - cumulative[years - 1]
-                payback_val = a + (b / c)
-            # If investment does not pay back within measure lifetime,
-            # set payback period to artifically high number
-            else:
-                payback_val = 999
+                    # Only real, positive roots yield a valid IRR
+                    valid = (roots.imag == 0) & (roots.real > 0)
+                    with numpy.errstate(divide="ignore", over="ignore"):
+                        rates = 1 / roots.real - 1
+                    # Where there is more than one valid IRR, use the one
+                    # closest to zero
+                    pick = numpy.argmin(numpy.where(
+                        valid, numpy.abs(rates), numpy.inf), axis=1)
+                    pick_rows = numpy.arange(len(pick))
+                    rates, valid = [
+                        x[pick_rows, pick] for x in [rates, valid]]
+                    valid &= numpy.isfinite(rates)
+                    irr[rows[stack][valid]] = rates[valid]
+            # Calculate IRR for remaining rows one-by-one
+            for row in rows[~stack]:
+                try:
+                    irr_row = npf.irr(cashflows[row, :life_yrs + 1])
+                    if math.isfinite(irr_row):
+                        irr[row] = irr_row
+                except (ValueError, LinAlgError):
+                    pass
+
+        return irr
+
+    def payback_batch(self, cashflows, life):
+        """Calculate simple payback periods for rows of cash flows.
+
+        Args:
+            cashflows (numpy.ndarray): Cash flows (rows x years), where the
+                first year is the initial investment; years beyond the
+                lifetime of a row are ignored.
+            life (numpy.ndarray): Lifetime (in years) for each row.
+
+        Returns:
+            Simple payback period for each row of cash flows.
+        """
+        # Separate initial investment and subsequent cash flows; extend
+        # subsequent cashflows up until 100 years out (repeating the final
+        # year of the lifetime) to ensure calculation of all paybacks
+        # under 100 years
+        investment = cashflows[:, 0]
+        n_yrs = numpy.maximum(life, 100)
+        yrs = numpy.arange(1, n_yrs.max() + 1)
+        cumulative = numpy.cumsum(numpy.take_along_axis(
+            cashflows, numpy.minimum(yrs, life[:, None]), axis=1), axis=1)
+        # Find absolute value of initial investment to compare
+        # cumulative cashflows against
+        investment_abs = numpy.abs(investment)
+        # Count the years with cumulative cashflow < investment
+        years = numpy.sum((cumulative < investment_abs[:, None]) & (
+            yrs <= n_yrs[:, None]), axis=1)
+        # Calculate the payback period in years, interpolating within the
+        # year in which payback occurs
+        rows = numpy.arange(len(years))
+        cum_prev = numpy.where(years > 0, cumulative[
+            rows, numpy.maximum(years - 1, 0)], 0)
+        cum_pay = cumulative[rows, numpy.minimum(years, yrs[-1] - 1)]
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            payback_val = years + (investment_abs - cum_prev) / (
+                cum_pay - cum_prev)
+        # If investment does not pay back within measure lifetime,
+        # set payback period to artifically high number
+        payback_val = numpy.where(years < n_yrs, payback_val, 999)
+        # If initial investment is positive, payback = 0
+        payback_val = numpy.where(investment >= 0, 0, payback_val)
 
-        # Return updated payback period value in years
         return payback_val
 
+    def calc_schemes_parallel(self, htcl_totals, opts):
+        """Calculate savings/metrics and compete measures for each adoption scheme in parallel.
+
+        Notes:
+            Each adoption scheme's uncompeted savings/metrics, measure
+            competition, and competed savings/metrics are calculated in a
+            separate worker process; the schemes' market data are independent
+            of one another. Workers return only their scheme's markets and
+            savings, which are merged into the engine's measures here.
+
+        Args:
+            htcl_totals (tuple): Heating/cooling energy totals by climate zone,
+                building type, and structure type.
+            opts (object): Stores user-specified execution options.
+        """
+        shared_inputs = {"engine": self, "htcl_totals": htcl_totals, "opts": opts}
+        # Use the 'fork' start method on Linux so that workers share the engine and its
+        # measures with the parent process; otherwise fall back on the platform default
+        if sys.platform.startswith("linux"):
+            mp_context = multiprocessing.get_context("fork")
+        else:
+            mp_context = None
+        with ProcessPoolExecutor(
+                max_workers=len(self.handyvars.adopt_schemes), mp_context=mp_context,
+                initializer=Engine.init_worker, initargs=(shared_inputs,)) as executor:
+            # Executor map yields results in the order of the input adoption schemes
+            results = list(executor.map(Engine.scheme_worker, self.handyvars.adopt_schemes))
+
+        # Merge each scheme's results into the measures of the parent process
+        for adopt_scheme, (meas_results, conv_fracs, prof_stats) in zip(
+                self.handyvars.adopt_schemes, results):
+            # Add stage timings recorded by the worker to those of the parent process
+            profiler.merge(prof_stats)
+            for m, (mkts, save, update, fin_metrics) in zip(self.measures, meas_results):
+                m.markets[adopt_scheme] = mkts
+                m.savings[adopt_scheme] = save
+                m.update_results["savings"][adopt_scheme] = update
+                # Financial metrics do not vary by adoption scheme; keep the first finalized
+                if m.update_results["financial metrics"] is True and fin_metrics is not None:
+                    m.financial_metrics = fin_metrics
+                    m.update_results["financial metrics"] = False
+            # Electric/heat pump conversion fractions are only updated for the
+            # max adoption potential scheme (see compete_adj)
+            if adopt_scheme == "Max adoption potential":
+                self.handyvars.conversion_fracs = conv_fracs
+
+    @staticmethod
+    def init_worker(shared_inputs):
+        """Store the engine and competition inputs in a worker process.
+
+        Args:
+            shared_inputs (dict): Engine, user options, and other inputs shared
+                across the tasks run by the worker.
+        """
+        Engine.worker_inputs = shared_inputs
+        # Workers started without 'fork' do not inherit the state of the parent's profiler
+        profiler.reset(getattr(shared_inputs["opts"], "profile", False))
+
+    @staticmethod
+    def scheme_worker(adopt_scheme):
+        """Calculate savings/metrics and compete measures for one adoption scheme.
+
+        Args:
+            adopt_scheme (string): Assumed consumer adoption scenario.
+
+        Returns:
+            Tuple of each measure's markets, savings, savings update flags, and
+            financial metrics (None if not finalized) for the adoption scheme;
+            electric/heat pump conversion fractions (None for schemes other
+            than max adoption potential); and the stage timings recorded by the
+            worker (see StageProfiler.stats).
+        """
+        inputs = Engine.worker_inputs
+        a_run, opts = inputs["engine"], inputs["opts"]
+        # Only report timings for the current scheme back to the parent process
+        profiler.reset(profiler.enabled)
+        # Restrict each measure to the market slices for the current scheme; uncompeted
+        # technical potential data are also needed for financial metrics and for
+        # competition cost data under the 'high_res_comp' option
+        for m in a_run.measures:
+            m.markets = {
+                scheme: (mkts if scheme == adopt_scheme else {
+                    "uncompeted": mkts["uncompeted"]}) for scheme, mkts in m.markets.items()
+                if scheme in [adopt_scheme, "Technical potential"]}
+            m.savings = {adopt_scheme: m.savings[adopt_scheme]}
+
+        with profiler.stage("calc_savings_metrics", f"{adopt_scheme} (uncompeted)"):
+            a_run.calc_savings_metrics(adopt_scheme, "uncompeted", opts)
+        if opts.no_comp is not True:
+            with profiler.stage("compete_measures", adopt_scheme):
+                a_run.compete_measures(adopt_scheme, inputs["htcl_totals"], opts)
+        with profiler.stage("calc_savings_metrics", f"{adopt_scheme} (competed)"):
+            a_run.calc_savings_metrics(adopt_scheme, "competed", opts)
+
+        meas_results = [(
+            m.markets[adopt_scheme], m.savings[adopt_scheme],
+            m.update_results["savings"][adopt_scheme],
+            m.financial_metrics if m.update_results["financial metrics"] is False else None)
+            for m in a_run.measures]
+        if adopt_scheme == "Max adoption potential":
+            conv_fracs = a_run.handyvars.conversion_fracs
+        else:
+            conv_fracs = None
+
+        return meas_results, conv_fracs, profiler.stats()
+
     def compete_measures(self, adopt_scheme, htcl_totals, opts):
         """Compete/apportion total stock/energy/carbon/cost across measures.
 
@@ -1653,128 +1796,343 @@ class Engine(object):
                 building type, and structure type.
             opts (object): Stores user-specified execution options.
         """
-        # Establish list of key chains and supporting competition data for all
-        # stock/energy/carbon/cost microsegments that contribute to a measure's
-        # total stock/energy/carbon/cost microsegments, across active measures
-        mseg_keys, mkts_adj = ([] for n in range(2))
-        for x in self.measures:
-            mseg_keys.extend(x.markets[adopt_scheme]["competed"][
-                "mseg_adjust"]["contributing mseg keys and values"].keys())
-            mkts_adj.append(x.markets[adopt_scheme]["competed"]["mseg_adjust"])
-
-        # Establish list of unique key chains in mseg_keys list above,
-        # ensuring that all 'primary' microsegments (e.g., relating to direct
-        # equipment replacement) are ordered and updated before 'secondary'
-        # microsegments (e.g., relating to indirect effects of equipment
-        # replacement, such as reduced waste heat from changes in lighting)
-        msegs = sorted(numpy.unique(mseg_keys))
+        # Initialize timing of the competition steps below
+        comp_times = {
+            "index": 0, "primary": 0, "secondary": 0, "htcl": 0}
+        start_time = time.perf_counter()
+        # Establish supporting competition data for all stock/energy/carbon/
+        # cost microsegments that contribute to a measure's total stock/
+        # energy/carbon/cost microsegments, across active measures
+        mkts_adj = [x.markets[adopt_scheme]["competed"]["mseg_adjust"] for
+                    x in self.measures]
+        # Find the indices of the measures that pertain to each unique
+        # contributing microsegment, ensuring that all 'primary'
+        # microsegments (e.g., relating to direct equipment replacement) are
+        # ordered and updated before 'secondary' microsegments (e.g., relating
+        # to indirect effects of equipment replacement, such as reduced waste
+        # heat from changes in lighting)
+        msegs, mseg_meas_inds = self.index_contrib_msegs(mkts_adj)
+        comp_times["index"] = time.perf_counter() - start_time
+        profiler.count("contributing microsegments competed", len(msegs))
 
         # Initialize a dict used to store data on overlaps between supply-side
         # heating/cooling ECMs (e.g., HVAC equipment) and demand-side
         # heating/cooling ECMs (e.g., envelope). If the current set of ECMs
         # does not affect both supply-side and demand-side heating/cooling
         # markets, this dict is set to None
-        if any(["supply" in x for x in msegs]) and \
-           any(["demand" in x for x in msegs]):
+        if any([MsegKey.from_str(x).tech_type == "supply" for x in msegs]) and \
+           any([MsegKey.from_str(x).tech_type == "demand" for x in msegs]):
             htcl_adj_data = {"supply": {}, "demand": {}}
         else:
             htcl_adj_data = None
 
-        # Run through all unique contributing microsegments in the above list,
-        # determining how the initial measure stock/energy/carbon/cost data
-        # associated with each should be adjusted to reflect the effects of
-        # measure competition
-        for msu in msegs:
+        # Determine how the initial measure stock/energy/carbon/cost data
+        # associated with each contributing microsegment should be adjusted to
+        # reflect the effects of measure competition. If multiple workers are
+        # available, compete clusters of measures that share no contributing
+        # microsegments (and therefore do not interact until the supply/demand
+        # heating/cooling adjustments below) in parallel worker processes
+        n_workers = getattr(opts, "workers", 1)
+        if n_workers > 1:
+            clusters = self.measure_clusters(msegs, mseg_meas_inds)
+            profiler.count("measure clusters competed", len(clusters))
+        if n_workers > 1 and len(clusters) > 1:
+            self.compete_clusters_parallel(
+                clusters, mkts_adj, mseg_meas_inds, adopt_scheme, opts, n_workers, comp_times)
+        else:
+            self.compete_msegs(msegs, mkts_adj, mseg_meas_inds, adopt_scheme, opts, comp_times)
+
+        # For any contributing microsegment that pertains to heating or
+        # cooling, record data needed for additional adjustments to remove
+        # overlaps between the supply-side and demand-side of heating
+        # and cooling energy (note that supply-side and demand-side heating
+        # and cooling ECMs are not directly competed). Data are recorded after
+        # all microsegments are competed, in the same order that the
+        # microsegments were competed. NOTE: EXCLUDE SECONDARY HEATING/COOLING
+        # MICROSEGMENTS FOR NOW UNTIL REASONABLE APPROACH FOR ADJUSTING THESE
+        # IS IMPLEMENTED
+        if htcl_adj_data is not None:
+            step_time = time.perf_counter()
+            for msu in msegs:
+                msu_key = MsegKey.from_str(msu)
+                # Ensure the current contributing microsegment pertains to
+                # heating or cooling (marked by 'supply' or 'demand' keys)
+                if msu_key.mseg_type == "primary" and \
+                        msu_key.tech_type in ["supply", "demand"]:
+                    # Create short name for all ECM competition data pertaining
+                    # to current contributing microsegment
+                    msu_mkts = [self.measures[x].markets[adopt_scheme]["competed"][
+                        "mseg_adjust"]["contributing mseg keys and values"][msu] for
+                        x in mseg_meas_inds[msu]]
+                    htcl_adj_data = self.htcl_adj_rec(
+                        htcl_adj_data, msu, msu_mkts, htcl_totals)
+            comp_times["htcl"] += time.perf_counter() - step_time
 
+        # Once all direct competition is finished, remove all recorded
+        # overlapping energy use and associated carbon/costs between
+        # supply-side and demand-side heating and cooling ECMs, provided both
+        # are present in the analysis
+        if htcl_adj_data is not None:
+            # Find the subset of ECMs that applies to heating and cooling
+            measures_htcl_adj = [m for m in self.measures if any([
+                z[0] in ["heating", "cooling", "secondary heating"] for
+                z in m.end_use.values() if z is not None])]
+
+            # Remove energy, carbon, and cost overlaps between supply-side and
+            # demand-side heating/cooling ECMs
+            step_time = time.perf_counter()
+            with profiler.stage("htcl_adj", adopt_scheme):
+                self.htcl_adj(measures_htcl_adj, adopt_scheme, htcl_adj_data)
+            comp_times["htcl"] += time.perf_counter() - step_time
+
+        # Report a breakdown of the time spent on each competition step
+        # relative to the total number of measure-microsegment pairs competed
+        fmt.verboseprint(
+            opts.verbose, (
+                f"Competed {sum(len(x) for x in mseg_meas_inds.values())} "
+                f"measure-microsegment pairs across {len(msegs)} contributing "
+                f"microsegments for '{adopt_scheme}' scenario in "
+                f"{time.perf_counter() - start_time:.2f} s (index: "
+                f"{comp_times['index']:.2f} s; primary: "
+                f"{comp_times['primary']:.2f} s; secondary: "
+                f"{comp_times['secondary']:.2f} s; heating/cooling overlaps: "
+                f"{comp_times['htcl']:.2f} s)"), "info")
+
+    def compete_msegs(self, msegs, mkts_adj, mseg_meas_inds, adopt_scheme, opts, comp_times):
+        """Compete measures across a sequence of contributing microsegments.
+
+        Args:
+            msegs (list): Contributing microsegment keys to compete, in order.
+            mkts_adj (list): Competition adjustment data for each active
+                measure under the current adoption scheme.
+            mseg_meas_inds (dict): Indices of the measures that pertain to each
+                contributing microsegment (see index_contrib_msegs).
+            adopt_scheme (string): Assumed consumer adoption scenario.
+            opts (object): Stores user-specified execution options.
+            comp_times (dict): Time spent on each competition step, updated
+                with the time spent competing the microsegments.
+        """
+        # Run through the contributing microsegments, determining how the
+        # initial measure stock/energy/carbon/cost data associated with each
+        # should be adjusted to reflect the effects of measure competition
+        for msu in msegs:
+            step_time = time.perf_counter()
+            # Parse the contributing microsegment key chain
+            msu_key = MsegKey.from_str(msu)
             # Determine the subset of measures that pertain to the current
             # contributing microsegment
-            measures_adj = [self.measures[x] for x in range(
-                0, len(self.measures)) if msu in mkts_adj[x][
-                "contributing mseg keys and values"].keys()]
-
-            # Create short name for all ECM competition data pertaining to
-            # current contributing microsegment
-            msu_mkts = [m.markets[adopt_scheme]["competed"][
-                "mseg_adjust"]["contributing mseg keys and values"][msu] for
-                m in measures_adj]
+            measures_adj = [self.measures[x] for x in mseg_meas_inds[msu]]
 
             # If the current contributing microsegment is of the 'primary'
             # type, directly compete the microsegment across applicable
             # measures
-            if "primary" in msu:
+            if msu_key.mseg_type == "primary":
                 # If multiple measures are competing for the primary
                 # microsegment, determine the market shares of each competing
                 # measure and adjust primary stock/energy/carbon/cost
                 # totals for each measure accordingly, using separate market
                 # share modeling routines for residential/commercial sectors.
-                if len(measures_adj) > 1 and any(x in msu for x in (
-                        'single family home', 'multi family home',
-                        'mobile home')):
+                if len(measures_adj) > 1 and msu_key.residential:
                     self.compete_res_primary(measures_adj, msu, adopt_scheme, opts)
-                elif len(measures_adj) > 1 and all(x not in msu for x in (
-                        'single family home', 'multi family home',
-                        'mobile home')):
+                elif len(measures_adj) > 1:
                     self.compete_com_primary(measures_adj, msu, adopt_scheme, opts)
+                comp_times["primary"] += time.perf_counter() - step_time
             # If the current contributing microsegment is of the 'secondary'
             # type, adjust the microsegment across applicable measures as
             # needed to reflect competition of associated primary
             # contributing microsegment(s) for each measure
-            elif "secondary" in msu:
+            elif msu_key.mseg_type == "secondary":
                 # Determine the climate zone, building type, and structure type
                 # needed to link the secondary microsegment and associated3
                 # primary microsegment(s)
-                mseg_separate = literal_eval(msu)
                 secnd_mseg_adjkey = str((
-                    mseg_separate[1], mseg_separate[2], mseg_separate[-1]))
+                    msu_key.region, msu_key.bldg_type, msu_key.structure_type))
                 # Determine the subset of measures pertaining to the given
                 # secondary microsegment that require total energy/carbon/cost
                 # adjustments due to changes in associated primary
                 # microsegment(s) (note that secondary microsegments do not
                 # affect stock totals, only energy/carbon and associated costs)
-                measures_adj_scnd = [self.measures[x] for x in range(
-                    0, len(self.measures)) if self.measures[x] in
-                    measures_adj and any(
-                    [(y[1] > 0) for y in mkts_adj[x][
-                        "secondary mseg adjustments"]["market share"][
-                        "original energy (total captured)"][
-                        secnd_mseg_adjkey].items()])]
+                measures_adj_scnd = [
+                    self.measures[x] for x in mseg_meas_inds[msu] if any(
+                        [(y[1] > 0) for y in mkts_adj[x][
+                            "secondary mseg adjustments"]["market share"][
+                            "original energy (total captured)"][
+                            secnd_mseg_adjkey].items()])]
                 # If at least one applicable measure requires adjustments to
                 # total secondary energy/carbon/cost, proceed with the
                 # adjustment calculation
                 if len(measures_adj_scnd) > 0:
                     self.secondary_adj(measures_adj_scnd, msu,
                                        secnd_mseg_adjkey, adopt_scheme)
+                comp_times["secondary"] += time.perf_counter() - step_time
 
-            # For any contributing microsegment that pertains to heating or
-            # cooling, record data needed for additional adjustments to remove
-            # overlaps between the supply-side and demand-side of heating
-            # and cooling energy (note that supply-side and demand-side heating
-            # and cooling ECMs are not directly competed). NOTE: EXCLUDE
-            # SECONDARY HEATING/COOLING MICROSEGMENTS FOR NOW UNTIL
-            # REASONABLE APPROACH FOR ADJUSTING THESE IS IMPLEMENTED
+    def measure_clusters(self, msegs, mseg_meas_inds):
+        """Partition measures into clusters that share no contributing microsegments.
 
-            # Ensure the current contributing microsegment pertains to
-            # heating or cooling (marked by 'supply' or 'demand' keys) and
-            # that both supply and demand-side ECMs are present in the analysis
-            if ('primary' in msu and
-                ('supply' in msu or 'demand' in msu)) and \
-                    htcl_adj_data is not None:
-                htcl_adj_data = self.htcl_adj_rec(
-                    htcl_adj_data, msu, msu_mkts, htcl_totals)
+        Notes:
+            Clusters are the connected components of the graph linking each
+            measure to the contributing microsegments it applies to. Measures
+            in different clusters are never competed against one another; they
+            only interact through the supply/demand-side heating/cooling
+            adjustments made after all clusters are competed.
 
-        # Once all direct competition is finished, remove all recorded
-        # overlapping energy use and associated carbon/costs between
-        # supply-side and demand-side heating and cooling ECMs, provided both
-        # are present in the analysis
-        if htcl_adj_data is not None:
-            # Find the subset of ECMs that applies to heating and cooling
-            measures_htcl_adj = [m for m in self.measures if any([
-                z[0] in ["heating", "cooling", "secondary heating"] for
-                z in m.end_use.values() if z is not None])]
+        Args:
+            msegs (list): Sorted contributing microsegment keys.
+            mseg_meas_inds (dict): Indices of the measures that pertain to each
+                contributing microsegment (see index_contrib_msegs).
 
-            # Remove energy, carbon, and cost overlaps between supply-side and
-            # demand-side heating/cooling ECMs
-            self.htcl_adj(measures_htcl_adj, adopt_scheme, htcl_adj_data)
+        Returns:
+            List of clusters, each given as the ascending indices of the
+            cluster's measures and the cluster's contributing microsegment keys
+            (in the order of the input keys); clusters are ordered by
+            descending number of measure-microsegment pairs.
+        """
+        # Link the measures of each contributing microsegment, tracking the
+        # root measure of each measure's cluster
+        roots = list(range(len(self.measures)))
+
+        def find_root(ind):
+            while roots[ind] != ind:
+                roots[ind] = roots[roots[ind]]
+                ind = roots[ind]
+            return ind
+
+        for msu in msegs:
+            root = find_root(mseg_meas_inds[msu][0])
+            for ind in mseg_meas_inds[msu][1:]:
+                roots[find_root(ind)] = root
+        # Group the contributing microsegments by cluster, preserving order
+        cluster_msegs = defaultdict(list)
+        for msu in msegs:
+            cluster_msegs[find_root(mseg_meas_inds[msu][0])].append(msu)
+        clusters = [
+            (sorted(set(ind for msu in c_msegs for ind in mseg_meas_inds[msu])), c_msegs)
+            for c_msegs in cluster_msegs.values()]
+
+        # Order the largest clusters first to balance work across workers
+        return sorted(clusters, key=lambda c: -sum(
+            len(mseg_meas_inds[msu]) for msu in c[1]))
+
+    def compete_clusters_parallel(self, clusters, mkts_adj, mseg_meas_inds, adopt_scheme, opts,
+                                  n_workers, comp_times):
+        """Compete independent clusters of measures across worker processes.
+
+        Args:
+            clusters (list): Measure indices and contributing microsegment keys
+                of each cluster (see measure_clusters).
+            mkts_adj (list): Competition adjustment data for each active
+                measure under the current adoption scheme.
+            mseg_meas_inds (dict): Indices of the measures that pertain to each
+                contributing microsegment (see index_contrib_msegs).
+            adopt_scheme (string): Assumed consumer adoption scenario.
+            opts (object): Stores user-specified execution options.
+            n_workers (int): Maximum number of worker processes.
+            comp_times (dict): Time spent on each competition step, updated
+                with the time spent by the workers competing the clusters.
+        """
+        shared_inputs = {
+            "engine": self, "mkts_adj": mkts_adj, "mseg_meas_inds": mseg_meas_inds,
+            "adopt_scheme": adopt_scheme, "opts": opts}
+        # Electric/heat pump conversion fractions are added to across all competed
+        # microsegments; workers report only the additions from their own cluster
+        conv_fracs = None
+        if self.opts.write_elec_conv_fracs and adopt_scheme == "Max adoption potential" and \
+                self.handyvars.conversion_fracs:
+            conv_fracs = KeyValTree(self.handyvars.conversion_fracs)
+            conv_fracs_start = conv_fracs.values.copy()
+        # Use the 'fork' start method on Linux so that workers share the engine and its
+        # measures with the parent process; otherwise fall back on the platform default
+        if sys.platform.startswith("linux"):
+            mp_context = multiprocessing.get_context("fork")
+        else:
+            mp_context = None
+        with ProcessPoolExecutor(
+                max_workers=min(n_workers, len(clusters)), mp_context=mp_context,
+                initializer=Engine.init_worker, initargs=(shared_inputs,)) as executor:
+            # Executor map yields results in the order of the input clusters
+            results = list(executor.map(Engine.cluster_worker, clusters))
+
+        # Merge each cluster's competed markets into the measures of the parent process
+        for (meas_inds, c_msegs), (mkts, c_conv_fracs, c_times, prof_stats) in zip(
+                clusters, results):
+            # Add stage timings recorded by the worker to those of the parent process
+            profiler.merge(prof_stats)
+            for ind, mkts_c in zip(meas_inds, mkts):
+                self.measures[ind].markets[adopt_scheme]["competed"] = mkts_c
+                mkts_adj[ind] = mkts_c["mseg_adjust"]
+            if conv_fracs is not None:
+                conv_fracs.values += conv_fracs.flatten(c_conv_fracs) - conv_fracs_start
+            # Competition step times are summed across workers
+            for step in ["primary", "secondary"]:
+                comp_times[step] += c_times[step]
+        if conv_fracs is not None:
+            self.handyvars.conversion_fracs = conv_fracs.to_dict()
+
+    @staticmethod
+    def cluster_worker(cluster):
+        """Compete a single cluster of measures in a worker process.
+
+        Args:
+            cluster (tuple): Measure indices and contributing microsegment
+                keys of the cluster (see measure_clusters).
+
+        Returns:
+            Tuple of the competed markets of each of the cluster's measures,
+            electric/heat pump conversion fractions (None if not updated in
+            competition), the time spent on each competition step, and the
+            stage timings recorded by the worker (see StageProfiler.stats).
+        """
+        inputs = Engine.worker_inputs
+        a_run, adopt_scheme = inputs["engine"], inputs["adopt_scheme"]
+        # Only report timings for the current cluster back to the parent process
+        profiler.reset(profiler.enabled)
+        meas_inds, msegs = cluster
+        comp_times = {"primary": 0, "secondary": 0}
+        a_run.compete_msegs(msegs, inputs["mkts_adj"], inputs["mseg_meas_inds"], adopt_scheme,
+                            inputs["opts"], comp_times)
+        if a_run.opts.write_elec_conv_fracs and adopt_scheme == "Max adoption potential":
+            conv_fracs = a_run.handyvars.conversion_fracs
+        else:
+            conv_fracs = None
+
+        return [a_run.measures[ind].markets[adopt_scheme]["competed"] for ind in meas_inds], \
+            conv_fracs, comp_times, profiler.stats()
+
+    def index_contrib_msegs(self, mkts_adj):
+        """Index the measures that pertain to each contributing microsegment.
+
+        Notes:
+            The index is built once and reused for subsequent adoption schemes
+            as long as each measure's contributing microsegments are unchanged.
+
+        Args:
+            mkts_adj (list): Competition adjustment data for each active
+                measure under the current adoption scheme.
+
+        Returns:
+            Sorted list of unique contributing microsegment keys and a dict
+            mapping each of these keys to the (ascending) indices of the
+            measures in the engine's measure list that pertain to it.
+        """
+        # Contributing microsegment keys for each measure
+        mseg_keys = [x["contributing mseg keys and values"].keys() for
+                     x in mkts_adj]
+        # Build the index if it has not yet been built or if any measure's
+        # contributing microsegments differ from those that were indexed
+        if self.mseg_index is None or len(mseg_keys) != len(
+                self.mseg_index["keys"]) or any(
+                k != k_ind for k, k_ind in zip(
+                    mseg_keys, self.mseg_index["keys"])):
+            mseg_meas_inds = defaultdict(list)
+            for ind, keys in enumerate(mseg_keys):
+                for k in keys:
+                    mseg_meas_inds[k].append(ind)
+            self.mseg_index = {
+                "keys": [set(k) for k in mseg_keys],
+                "msegs": sorted(mseg_meas_inds.keys()),
+                "measures": dict(mseg_meas_inds)}
+
+        return self.mseg_index["msegs"], self.mseg_index["measures"]
 
     def compete_res_primary(self, measures_adj, mseg_key, adopt_scheme, opts):
         """Apportion stock/energy/carbon/cost across residential measures.
@@ -1792,13 +2150,6 @@ class Engine(object):
             adopt_scheme (string): Assumed consumer adoption scenario.
             opts (object): Stores user-specified execution options.
         """
-        # Initialize list of dicts that each store the annual market fractions
-        # captured by competing measures; also initialize a dict that sums
-        # market fractions by year across competing measures (used to normalize
-        # the measure market fractions such that they all sum to 1)
-        mkt_fracs = [{} for meas in range(0, len(measures_adj))]
-        mkt_fracs_tot = dict.fromkeys(self.handyvars.aeo_years, 0)
-
         # Find mseg key to use in pulling stock and cost data (in some cases, like cooling
         # msegs for heat pump tech,stock turnover and cost information for the current
         # msegs should be linked to another microsegment – heating msegs, in the HP case)
@@ -1872,93 +2223,12 @@ class Engine(object):
         yrs_on_mkt, noapply_sbmkt_fracs_regs = self.state_app_reg_screen(
             measures_adj, stk_cost_dat_keys)
 
-        # Loop through competing measures and calculate market shares for
-        # each based on their annualized capital and operating costs
-        for ind, m in enumerate(measures_adj):
-            # Set measure markets and market adjustment information
-
-            # Loop through all years in time horizon
-            for yr in self.handyvars.aeo_years:
-                # Ensure measure is on the market in given year
-                if yr in yrs_on_mkt[ind]:
-                    # Set measure capital and operating cost inputs. * Note:
-                    # operating cost is set to just energy costs (for now), but
-                    # could be expanded to include maintenance and carbon costs
-
-                    # Set capital cost (handle as numpy array or point value)
-                    if isinstance(unit_cost_s_in[ind][yr], numpy.ndarray):
-                        cap_cost = numpy.zeros(len(unit_cost_s_in[ind][yr]))
-                        for i in range(0, len(unit_cost_s_in[ind][yr])):
-                            cap_cost[i] = unit_cost_s_in[ind][yr][i]
-                    else:
-                        cap_cost = unit_cost_s_in[ind][yr]
-                    # Set operating cost (handle as numpy array or point value)
-                    if isinstance(unit_cost_e_in[ind][yr], numpy.ndarray):
-                        op_cost = numpy.zeros(len(unit_cost_e_in[ind][yr]))
-                        for i in range(0, len(unit_cost_e_in[ind][yr])):
-                            op_cost[i] = unit_cost_e_in[ind][yr][i]
-                    else:
-                        op_cost = unit_cost_e_in[ind][yr]
-
-                    # Calculate measure market fraction using log-linear
-                    # regression equation that takes capital/operating
-                    # costs as inputs
-
-                    # Handle case where cost is None
-                    try:
-                        # Calculate weighted sum of incremental capital and
-                        # operating costs
-                        sum_wt = cap_cost * \
-                            m.markets[adopt_scheme]["competed"][
-                                "mseg_adjust"]["competed choice parameters"][
-                                str(mseg_key)]["b1"][yr] + op_cost * \
-                            m.markets[adopt_scheme]["competed"]["mseg_adjust"][
-                                "competed choice parameters"][
-                                str(mseg_key)]["b2"][yr]
-
-                        # Guard against cases with very low weighted sums of
-                        # incremental capital and operating costs
-                        if not isinstance(sum_wt, numpy.ndarray) and \
-                                sum_wt < -500:
-                            sum_wt = -500
-                        elif isinstance(sum_wt, numpy.ndarray) and any([
-                                x < -500 for x in sum_wt]):
-                            sum_wt = [-500 if x < -500 else x for x in sum_wt]
-
-                        # Calculate market fraction
-                        mkt_fracs[ind][yr] = numpy.exp(sum_wt)
-                    except TypeError:
-                        mkt_fracs[ind][yr] = 0
-
-                    # Add calculated market fraction to mkt fraction sum
-                    mkt_fracs_tot[yr] = \
-                        mkt_fracs_tot[yr] + mkt_fracs[ind][yr]
-
-        # Loop through competing measures to normalize their calculated
-        # market shares to the total market share sum; use normalized
-        # market shares to make adjustments to each measure's master
-        # microsegment values
-        for ind, m in enumerate(measures_adj):
-            # Calculate annual market share fraction for the measure and
-            # adjust measure's master microsegment values accordingly
-            for yr in self.handyvars.aeo_years:
-                # Ensure measure is on the market in given year; if not,
-                # the measure either splits the market with other
-                # competing measures if none of those measures is on
-                # the market either, or else has a market share of zero
-                if yr in yrs_on_mkt[ind]:
-                    if ((not isinstance(mkt_fracs_tot[yr], numpy.ndarray) and
-                         mkt_fracs_tot[yr] != 0) or (
-                        isinstance(mkt_fracs_tot[yr], numpy.ndarray) and all(
-                            mkt_fracs_tot[yr] != 0))):
-                        mkt_fracs[ind][yr] = \
-                            mkt_fracs[ind][yr] / mkt_fracs_tot[yr]
-                    else:
-                        mkt_fracs[ind][yr] = 1 / len(measures_adj)
-                elif yr not in years_on_mkt_all:
-                    mkt_fracs[ind][yr] = 1 / len(measures_adj)
-                else:
-                    mkt_fracs[ind][yr] = 0
+        # Calculate market shares for each competing measure based on its
+        # annualized capital and operating costs
+        mkt_fracs = self.res_mkt_fracs(
+            unit_cost_s_in, unit_cost_e_in, [m.markets[adopt_scheme]["competed"][
+                "mseg_adjust"]["competed choice parameters"][str(mseg_key)] for
+                m in measures_adj], yrs_on_mkt, years_on_mkt_all)
 
         # Calculate final adjustments to market shares to reflect sub-market scaling fractions
         # in the measure definition and/or sub-federal appliance restrictions that affect
@@ -2004,14 +2274,6 @@ class Engine(object):
             adopt_scheme (string): Assumed consumer adoption scenario.
             opts (object): Stores user-specified execution options.
         """
-        # Initialize list of dicts that each store the annual market fractions
-        # captured by competing measures; also initialize a dict that records
-        # the total annualized capital + operating costs for each measure
-        # and discount rate level (used to choose which measure is adopted
-        # under each discount rate level)
-        mkt_fracs = [{} for meas in range(0, len(measures_adj))]
-        tot_cost = [{} for meas in range(0, len(measures_adj))]
-
         # Find mseg key to use in pulling stock and stock cost data (in some cases, like cooling
         # msegs for heat pump tech, stock cost and stock turnover information for the current
         # msegs should be linked to another microsegment – heating msegs, in the HP case)
@@ -2118,218 +2380,14 @@ class Engine(object):
         yrs_on_mkt, noapply_sbmkt_fracs_regs = self.state_app_reg_screen(
             measures_adj, stk_cost_dat_keys)
 
-        # Initialize a flag that indicates whether any competing measures
-        # have arrays of annualized capital and/or operating costs rather
-        # than point values (resultant of distributions on measure inputs),
-        # for each year in the range above
-        length_array = numpy.repeat(0, len(self.handyvars.aeo_years))
-
-        # Loop through all years in time horizon
-        for ind_l, yr in enumerate(self.handyvars.aeo_years):
-            # Determine whether any of the competing measures have
-            # arrays of annualized capital and/or operating costs for
-            # the given year; if so, find the array length. * Note: all
-            # array lengths should be equal to the 'nsamples' variable
-            # defined in 'ecm_prep.py'
-            if any([isinstance(x[yr], numpy.ndarray) or
-                    isinstance(y[yr], numpy.ndarray) for
-                    x, y in zip(unit_cost_s_in, unit_cost_e_in)]) is True:
-                length_array[ind_l] = next(
-                    (len(x[yr]) or len(y[yr]) for x, y in
-                     zip(unit_cost_s_in, unit_cost_e_in) if isinstance(
-                        x[yr], numpy.ndarray) or isinstance(
-                            y[yr], numpy.ndarray)),
-                    length_array[ind_l])
-
-        # Loop through competing measures and calculate market shares for
-        # each based on their annualized capital and operating costs
-        for ind, m in enumerate(measures_adj):
-            # Set measure markets and market adjustment information
-            # Loop through all years in time horizon
-            for ind_l, yr in enumerate(self.handyvars.aeo_years):
-                # Ensure measure is on the market in given year
-                if yr in yrs_on_mkt[ind]:
-                    # Set measure capital and operating cost inputs. * Note:
-                    # operating cost is set to just energy costs (for now), but
-                    # could be expanded to include maintenance and carbon costs
-
-                    # Handle cases where capital and/or operating cost inputs
-                    # are specified as arrays for at least one of the competing
-                    # measures. In this case, the capital and operating costs
-                    # for all measures must be formatted consistently as arrays
-                    # of the same length
-                    if length_array[ind_l] > 0:
-                        cap_cost, op_cost = ([
-                            {} for n in range(length_array[ind_l])] for
-                            n in range(2))
-                        for i in range(length_array[ind_l]):
-                            # Set capital cost input array
-                            if isinstance(
-                                    unit_cost_s_in[ind][yr], numpy.ndarray):
-                                cap_cost[i] = unit_cost_s_in[ind][yr][i]
-                            else:
-                                cap_cost[i] = unit_cost_s_in[ind][yr]
-                            # Set operating cost input array
-                            if isinstance(
-                                    unit_cost_e_in[ind][yr], numpy.ndarray):
-                                op_cost[i] = unit_cost_e_in[ind][yr][i]
-                            else:
-                                op_cost[i] = unit_cost_e_in[ind][yr]
-                        # Sum capital and operating cost arrays and add to the
-                        # total cost dict entry for the given measure
-                        tot_cost[ind][yr] = [
-                            [] for n in range(length_array[ind_l])]
-                        # Handle case where cost is None
-                        try:
-                            for c_l in range(0, len(tot_cost[ind][yr])):
-                                for dr in sorted(cap_cost[c_l].keys()):
-                                    if op_cost_rate_bins:
-                                        tot_cost[ind][yr][c_l].append(
-                                            cap_cost[c_l][dr] + op_cost[c_l][dr])
-                                    else:
-                                        tot_cost[ind][yr][c_l].append(
-                                            cap_cost[c_l][dr] + op_cost[c_l])
-                        except AttributeError:
-                            pass
-                    # Handle cases where capital and/or operating cost inputs
-                    # are specified as point values for all competing measures
-                    else:
-                        # Set capital cost point value
-                        cap_cost = unit_cost_s_in[ind][yr]
-                        # Set operating cost point value
-                        op_cost = unit_cost_e_in[ind][yr]
-
-                        # Sum capital and operating cost point values and add
-                        # to the total cost dict entry for the given measure
-                        tot_cost[ind][yr] = []
-                        # Handle case where cost is None
-                        try:
-                            for dr in sorted(cap_cost.keys()):
-                                if op_cost_rate_bins:
-                                    tot_cost[ind][yr].append(
-                                        cap_cost[dr] + op_cost[dr])
-                                else:
-                                    tot_cost[ind][yr].append(cap_cost[dr] + op_cost)
-                        except AttributeError:
-                            pass
-
-        # Loop through competing measures and use total annualized capital
-        # + operating costs to determine the overall share of the market
-        # that is captured by each measure; use market shares to make
-        # adjustments to each measure's master microsegment values
-        for ind, m in enumerate(measures_adj):
-            # Calculate annual market share fraction for the measure and
-            # adjust measure's master microsegment values accordingly
-
-            # Loop through all years in time horizon
-            for ind_l, yr in enumerate(self.handyvars.aeo_years):
-                # Ensure measure is on the market in given year; if not,
-                # the measure either splits the market with other
-                # competing measures if none of those measures is on
-                # the market either, or else has a market share of zero
-                if yr in yrs_on_mkt[ind]:
-                    # Set the fractions of commericial adopters who fall into
-                    # each discount rate category for this particular
-                    # microsegment
-                    mkt_dists = m.markets[adopt_scheme]["competed"][
-                        "mseg_adjust"]["competed choice parameters"][
-                            str(mseg_key)]["rate distribution"][yr]
-                    # For each discount rate category, find which measure has
-                    # the lowest annualized cost and assign that measure the
-                    # share of commercial market adopters defined for that
-                    # category above
-
-                    # Handle cases where capital and/or operating cost inputs
-                    # are specified as lists for at least one of the competing
-                    # measures.
-                    if length_array[ind_l] > 0 and len(
-                            tot_cost[ind][yr][0]) != 0:
-                        mkt_fracs[ind][yr] = [
-                            [] for n in range(length_array[ind_l])]
-                        for c_l in range(length_array[ind_l]):
-                            for ind2, dr in enumerate(
-                                    tot_cost[ind][yr][c_l]):
-                                # Find the lowest annualized cost for the
-                                # set of competing measures/discount bin
-                                min_val = min([
-                                    tot_cost[x][yr][c_l][ind2] for x in
-                                    range(0, len(measures_adj)) if
-                                    (yr in tot_cost[x].keys() and
-                                     len(tot_cost[x][yr][0]) != 0)])
-                                # Determine how many competing measures
-                                # have the lowest annualized cost under
-                                # the given discount rate bin
-                                min_val_ecms = [
-                                    x for x in range(0, len(measures_adj)) if
-                                    (yr in tot_cost[x].keys() and
-                                     len(tot_cost[x][yr][0]) != 0) and
-                                    tot_cost[x][yr][c_l][ind2] == min_val]
-                                # If the current measure has the lowest
-                                # annualized cost, assign it appropriate
-                                # market share for current discount rate
-                                # category being looped through, divided by
-                                # total number of competing measures that
-                                # share the lowest annualized cost
-                                if tot_cost[ind][yr][c_l][ind2] == min_val:
-                                    mkt_fracs[ind][yr][c_l].append(
-                                        mkt_dists[ind2] /
-                                        len(min_val_ecms))
-                                # Otherwise, set its market share for that
-                                # discount rate bin to zero
-                                else:
-                                    mkt_fracs[ind][yr][c_l].append(0)
-                            mkt_fracs[ind][yr][c_l] = sum(
-                                mkt_fracs[ind][yr][c_l])
-                        # Convert market fractions list to numpy array for
-                        # use in compete_adj function below
-                        mkt_fracs[ind][yr] = numpy.array(
-                            mkt_fracs[ind][yr])
-                    # Handle cases where capital and/or operating cost inputs
-                    # are specified as point values for all competing measures
-                    elif length_array[ind_l] == 0:
-                        if len(tot_cost[ind][yr]) != 0:
-                            mkt_fracs[ind][yr] = []
-                            for ind2, dr in enumerate(tot_cost[ind][yr]):
-                                # Find the lowest annualized cost for the given
-                                # set of competing measures and discount bin
-                                min_val = min([
-                                    tot_cost[x][yr][ind2] for x in
-                                    range(0, len(measures_adj)) if (
-                                        yr in tot_cost[x].keys() and
-                                        len(tot_cost[x][yr]) != 0)])
-                                # Determine how many of the competing measures
-                                # have the lowest annualized cost under
-                                # the given discount rate bin
-                                min_val_ecms = [
-                                    x for x in range(0, len(measures_adj)) if
-                                    (yr in tot_cost[x].keys() and
-                                     len(tot_cost[x][yr]) != 0) and
-                                    tot_cost[x][yr][ind2] == min_val]
-                                # If the current measure has the lowest
-                                # annualized cost, assign it the appropriate
-                                # market share for the current discount rate
-                                # category being looped through, divided by the
-                                # total number of competing measures that share
-                                # the lowest annualized cost
-                                if tot_cost[ind][yr][ind2] == min_val:
-                                    mkt_fracs[ind][yr].append(
-                                        mkt_dists[ind2] / len(min_val_ecms))
-                                # Otherwise, set its market share for that
-                                # discount rate bin to zero
-                                else:
-                                    mkt_fracs[ind][yr].append(0)
-                            mkt_fracs[ind][yr] = sum(mkt_fracs[ind][yr])
-                        else:
-                            mkt_fracs[ind][yr] = 0
-                    else:
-                        mkt_fracs[ind][yr] = 0
-                elif yr not in years_on_mkt_all:
-                    if len(measures_adj) > 1:
-                        mkt_fracs[ind][yr] = 1 / len(measures_adj)
-                    else:
-                        mkt_fracs[ind][yr] = 0
-                else:
-                    mkt_fracs[ind][yr] = 0
+        # Determine the share of the market captured by each competing measure
+        # based on its total annualized capital + operating costs under each
+        # discount rate level
+        mkt_fracs = self.com_mkt_fracs(
+            unit_cost_s_in, unit_cost_e_in, [m.markets[adopt_scheme]["competed"][
+                "mseg_adjust"]["competed choice parameters"][str(mseg_key)][
+                "rate distribution"] for m in measures_adj], yrs_on_mkt,
+            years_on_mkt_all, op_cost_rate_bins)
 
         # Calculate final adjustments to market shares to reflect sub-market scaling fractions
         # in the measure definition and/or sub-federal appliance restrictions that affect
@@ -2359,6 +2417,213 @@ class Engine(object):
                     adj_list_eff, adj_list_base, yr, mseg_key, m, adopt_scheme,
                     mkt_entry_yrs, adj_stk_trk)
 
+    def res_mkt_fracs(self, unit_cost_s_in, unit_cost_e_in, choice_params, yrs_on_mkt,
+                      years_on_mkt_all):
+        """Calculate residential measure market shares from annualized costs.
+
+        Notes:
+            Each measure's share of the market is found with a log-linear
+            regression equation that takes capital/operating costs as inputs,
+            normalized by the total across competing measures. Costs and choice
+            parameters are stacked into dense (measures x years x samples)
+            arrays, such that shares are found for all competing measures and
+            years at once; the samples dimension has a length of one unless
+            any measure has arrays of (sampled) capital/operating costs.
+
+        Args:
+            unit_cost_s_in (list): Annual unit capital costs for each
+                competing measure.
+            unit_cost_e_in (list): Annual unit operating costs for each
+                competing measure.
+            choice_params (list): Annual capital ('b1') and operating ('b2')
+                cost choice parameters for each competing measure.
+            yrs_on_mkt (list): Years that each competing measure is on the
+                market.
+            years_on_mkt_all (numpy.ndarray): Years in which at least one
+                competing measure is on the market.
+
+        Returns:
+            List of dicts with the annual market share of each competing
+            measure; shares are arrays in years in which any measure on the
+            market has arrays of capital/operating costs.
+        """
+        yrs = self.handyvars.aeo_years
+        n_meas = len(unit_cost_s_in)
+        # Flag the years in which each measure is on the market
+        on_mkt = numpy.array([[yr in yrs_on_mkt[ind] for yr in yrs] for ind in range(n_meas)])
+        # Capital cost, operating cost, and choice parameter inputs for each
+        # measure and year on the market. * Note: operating cost is set to just
+        # energy costs (for now), but could be expanded to include maintenance
+        # and carbon costs
+        inputs = [[(
+            unit_cost_s_in[ind][yr], unit_cost_e_in[ind][yr],
+            choice_params[ind]["b1"][yr], choice_params[ind]["b2"][yr]) if
+            on_mkt[ind, y_ind] else None for y_ind, yr in enumerate(yrs)]
+            for ind in range(n_meas)]
+        # Flag inputs with no missing (None) values, for which a market share
+        # can be calculated (otherwise, the measure has no share of the market),
+        # and inputs that include arrays of (sampled) values
+        valid = numpy.array([[x is not None and all(y is not None for y in x) for
+                              x in inputs_m] for inputs_m in inputs])
+        sampled = valid & numpy.array([[x is not None and any(
+            isinstance(y, numpy.ndarray) for y in x) for x in inputs_m] for inputs_m in inputs])
+        n_samples = max([len(y) for inputs_m in inputs for x in inputs_m if x is not None
+                         for y in x if isinstance(y, numpy.ndarray)], default=1)
+        # Stack the inputs (inputs x measures x years x samples); point values
+        # are repeated across samples
+        stacked = numpy.zeros((4, n_meas, len(yrs), n_samples))
+        for ind, y_ind in zip(*numpy.nonzero(valid)):
+            for v_ind, x in enumerate(inputs[ind][y_ind]):
+                stacked[v_ind, ind, y_ind] = x
+        cap_cost, op_cost, b1, b2 = stacked
+
+        # Calculate weighted sum of incremental capital and operating costs,
+        # guarding against cases with very low weighted sums
+        sum_wt = cap_cost * b1 + op_cost * b2
+        sum_wt = numpy.where(sum_wt < -500, -500, sum_wt)
+        # Calculate market fractions and sum them across competing measures
+        mkt_fracs = numpy.where(valid[:, :, None], numpy.exp(sum_wt), 0)
+        mkt_fracs_tot = mkt_fracs.sum(axis=0)
+        # Market shares are arrays in years where any measure's fraction is an
+        # array; normalize shares to the total across competing measures where
+        # this total is non-zero (for all samples)
+        yr_sampled = sampled.any(axis=0)
+        tot_nonzero = numpy.where(
+            yr_sampled, numpy.all(mkt_fracs_tot != 0, axis=1), mkt_fracs_tot[:, 0] != 0)
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            mkt_shares = mkt_fracs / mkt_fracs_tot
+
+        # Finalize annual market shares for each measure. If a measure is not
+        # on the market in a given year, it either splits the market with
+        # other competing measures if none of those measures is on the market
+        # either, or else has a market share of zero; measures on the market
+        # also split the market when their total market fraction is zero
+        mkt_shares_out = [{} for ind in range(n_meas)]
+        for ind in range(n_meas):
+            for y_ind, yr in enumerate(yrs):
+                if on_mkt[ind, y_ind] and tot_nonzero[y_ind]:
+                    mkt_shares_out[ind][yr] = mkt_shares[ind, y_ind] if \
+                        yr_sampled[y_ind] else mkt_shares[ind, y_ind, 0]
+                elif on_mkt[ind, y_ind] or yr not in years_on_mkt_all:
+                    mkt_shares_out[ind][yr] = 1 / n_meas
+                else:
+                    mkt_shares_out[ind][yr] = 0
+
+        return mkt_shares_out
+
+    def com_mkt_fracs(self, unit_cost_s_in, unit_cost_e_in, rate_dists, yrs_on_mkt,
+                      years_on_mkt_all, op_cost_rate_bins):
+        """Calculate commercial measure market shares from annualized costs.
+
+        Notes:
+            For each discount rate (time preference premium) level, the measure
+            with the lowest total annualized capital + operating cost captures
+            the share of commercial adopters in that level, which is split
+            evenly across measures that share the lowest cost. Total costs are
+            stacked into dense (measures x years x samples x discount rate
+            levels) arrays, such that shares are found for all competing
+            measures, years, and levels at once; the samples dimension has a
+            length of one unless any measure has arrays of (sampled) costs.
+
+        Args:
+            unit_cost_s_in (list): Annual unit capital costs by discount rate
+                level for each competing measure.
+            unit_cost_e_in (list): Annual unit operating costs (by discount
+                rate level if 'op_cost_rate_bins' is True) for each competing
+                measure.
+            rate_dists (list): Annual fractions of commercial adopters in each
+                discount rate level for each competing measure.
+            yrs_on_mkt (list): Years that each competing measure is on the
+                market.
+            years_on_mkt_all (numpy.ndarray): Years in which at least one
+                competing measure is on the market.
+            op_cost_rate_bins (bool): Flag for operating costs that are
+                resolved by discount rate level.
+
+        Returns:
+            List of dicts with the annual market share of each competing
+            measure; shares are arrays in years in which any competing measure
+            has arrays of capital/operating costs.
+        """
+        yrs = self.handyvars.aeo_years
+        n_meas = len(unit_cost_s_in)
+        n_rates = len(self.handyvars.com_timeprefs["rates"])
+        # Flag the years in which each measure is on the market
+        on_mkt = numpy.array([[yr in yrs_on_mkt[ind] for yr in yrs] for ind in range(n_meas)])
+        # Determine whether any of the competing measures have arrays of
+        # annualized capital and/or operating costs for each year; if so, find
+        # the array length. * Note: all array lengths should be equal to the
+        # 'nsamples' variable defined in 'ecm_prep.py'
+        length_array = [next((
+            len(x[yr]) or len(y[yr]) for x, y in zip(unit_cost_s_in, unit_cost_e_in) if
+            isinstance(x[yr], numpy.ndarray) or isinstance(y[yr], numpy.ndarray)), 0)
+            for yr in yrs]
+
+        # Stack capital and operating costs (measures x years x samples x
+        # discount rate levels) for each measure and year on the market; point
+        # values are repeated across samples, and operating costs that are not
+        # resolved by discount rate level are repeated across levels
+        cap_cost, op_cost = (numpy.zeros((
+            n_meas, len(yrs), max(max(length_array), 1), n_rates)) for n in range(2))
+        # Flag costs with no missing (None) values, which are compared across
+        # measures (otherwise, the measure has no share of the market)
+        valid = numpy.zeros((n_meas, len(yrs)), dtype=bool)
+        for ind, y_ind in zip(*numpy.nonzero(on_mkt)):
+            yr = yrs[y_ind]
+            for c_l in range(max(length_array[y_ind], 1)):
+                cap, op = [x[ind][yr][c_l] if (
+                    length_array[y_ind] > 0 and isinstance(x[ind][yr], numpy.ndarray)) else
+                    x[ind][yr] for x in [unit_cost_s_in, unit_cost_e_in]]
+                # Handle case where cost is None
+                try:
+                    rate_keys = sorted(cap.keys())
+                except AttributeError:
+                    break
+                cap_cost[ind, y_ind, c_l] = [cap[dr] for dr in rate_keys]
+                op_cost[ind, y_ind, c_l] = [op[dr] for dr in rate_keys] if \
+                    op_cost_rate_bins else op
+                valid[ind, y_ind] = True
+        # Stack the fractions of adopters in each discount rate level
+        mkt_dists = numpy.zeros((n_meas, len(yrs), n_rates))
+        for ind, y_ind in zip(*numpy.nonzero(valid)):
+            mkt_dists[ind, y_ind] = rate_dists[ind][yrs[y_ind]]
+
+        # Find the lowest total annualized cost across competing measures and
+        # how many measures share it, for each year, sample, and discount rate
+        # level
+        tot_cost = numpy.where(valid[:, :, None, None], cap_cost + op_cost, numpy.inf)
+        min_val = tot_cost.min(axis=0)
+        min_val_ecms = valid[:, :, None, None] & (tot_cost == min_val)
+        n_min_val_ecms = min_val_ecms.sum(axis=0)
+        # Measures with the lowest annualized cost capture the share of the
+        # market for the discount rate level, divided by the number of measures
+        # that share the lowest cost; other measures have a share of zero
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            mkt_shares_rates = numpy.where(
+                min_val_ecms, mkt_dists[:, :, None, :] / n_min_val_ecms, 0)
+        # Sum shares across discount rate levels (in level order)
+        mkt_shares = numpy.zeros(mkt_shares_rates.shape[:-1])
+        for ind2 in range(n_rates):
+            mkt_shares = mkt_shares + mkt_shares_rates[..., ind2]
+
+        # Finalize annual market shares for each measure. If a measure is not
+        # on the market in a given year, it either splits the market with
+        # other competing measures if none of those measures is on the market
+        # either, or else has a market share of zero
+        mkt_shares_out = [{} for ind in range(n_meas)]
+        for ind in range(n_meas):
+            for y_ind, yr in enumerate(yrs):
+                if valid[ind, y_ind]:
+                    mkt_shares_out[ind][yr] = \
+                        mkt_shares[ind, y_ind, :length_array[y_ind]] if \
+                        length_array[y_ind] > 0 else float(mkt_shares[ind, y_ind, 0])
+                elif not on_mkt[ind, y_ind] and yr not in years_on_mkt_all and n_meas > 1:
+                    mkt_shares_out[ind][yr] = 1 / n_meas
+                else:
+                    mkt_shares_out[ind][yr] = 0
+
+        return mkt_shares_out
+
     def state_app_reg_screen(self, measures_adj, stk_cost_dat_keys):
         """Determine whether appliance restrictions apply to competed measure mseg.
 
@@ -2380,7 +2645,7 @@ class Engine(object):
             # Separate out components of the mseg information; use mseg information that accounts
             # for any links/dependencies between mseg and other msegs the measure applies to (
             # assume that first measure in the competing set is representative of links for all)
-            mseg_separate = literal_eval(stk_cost_dat_keys[0][0])
+            mseg_separate = MsegKey.from_str(stk_cost_dat_keys[0][0])
             # Shorthand for current mseg region, bldg. type, bldg. vintage, fuel, end use, tech.
             ctb_mseg_params_notech = [mseg_separate[1], mseg_separate[2], mseg_separate[-1],
                                       mseg_separate[3], mseg_separate[4]]
@@ -2964,7 +3229,7 @@ class Engine(object):
         # type)
 
         # Convert contributing microsegment key chain string to a list
-        keys = literal_eval(msu)
+        keys = MsegKey.from_str(msu)
         # Pull out climate zone, building type, structure type, fuel type,
         # and end use
         msu_split = [str(x) for x in [keys[1], keys[2], keys[-1],
@@ -3051,7 +3316,7 @@ class Engine(object):
             # overlaps across the heating/cooling supply-side and demand-side
             for mseg in htcl_keys:
                 # Convert contributing microsegment key chain string to a list
-                keys = literal_eval(mseg)
+                keys = MsegKey.from_str(mseg)
                 # Pull out climate zone, building type, structure type,
                 # fuel type, and end use
                 msu_split = [str(x) for x in [keys[1], keys[2], keys[-1],
@@ -3430,7 +3695,7 @@ class Engine(object):
                 "cooling" not in mseg_key))):
             # Decompose contributing microsegment key information into a list,
             # to be modified per comment above
-            key_list = list(literal_eval(mseg_key))
+            key_list = list(MsegKey.from_str(mseg_key))
             # Strip any additional information that is added to the
             # EIA technology name to further distinguish msegs with exogenous
             # rates, specific heating and cooling pairings, and/or panel upgrade needs
@@ -3711,7 +3976,7 @@ class Engine(object):
         # combination of categories will be adjusted to reflect competition)
 
         # Convert microsegment string to a list
-        key_list = literal_eval(mseg_key)
+        key_list = MsegKey.from_str(mseg_key)
         # Establish applicable climate zone breakout
         for cz in self.handyvars.out_break_czones.items():
             if key_list[1] in cz[1]:
@@ -4421,7 +4686,7 @@ class Engine(object):
             # type for the current contributing primary microsegment from the
             # microsegment key chain information and use as the key for linking
             # the primary and its associated secondary microsegment
-            cz_bldg_struct = literal_eval(mseg_key)
+            cz_bldg_struct = MsegKey.from_str(mseg_key)
             secnd_mseg_adjkey = str((
                 cz_bldg_struct[1], cz_bldg_struct[2], cz_bldg_struct[-1]))
 
@@ -4804,7 +5069,7 @@ class Engine(object):
             conversion = (measure.fuel_switch_to == "electricity" or (
                 measure.tech_switch_to not in [None, "NA", "same"]))
             # Find and set region, fuel, end use, and vintage for current mseg
-            key_list = list(literal_eval(mseg_key))
+            key_list = list(MsegKey.from_str(mseg_key))
             reg, base_fuel, eu, vint = [key_list[1], key_list[3], key_list[4], key_list[-1]]
             # Ensure that the mseg end use name is in the conversion end uses
             # (handles potential erroneous match of "heating" in secondary heating)
@@ -7347,26 +7612,31 @@ def measure_opts_match(option_dicts: list[dict]) -> bool:
         bool: if True, then all options dicts are alike, otherwise False
     """
 
-    ignore_opts = ["verbose", "yaml", "ecm_directory", "ecm_files", "ecm_files_user",
-                   "ecm_packages", "ecm_files_regex"]
-    keys_to_check = [key for key in option_dicts[0].keys() if key not in ignore_opts]
+    keys_to_check = [key for key in option_dicts[0].keys() if key not in non_result_opts]
     if any(opts[x] != option_dicts[0][x] for opts in option_dicts[1:] for x in keys_to_check):
         return False
 
     return True
 
 
-def main(opts: argparse.NameSpace):  # noqa: F821
+def main(opts: argparse.NameSpace, run_setup: Path = None):  # noqa: F821
     """Import, finalize, and write out measure savings and financial metrics.
 
     Note:
         Import measures from a JSON, calculate competed and uncompeted
         savings and financial metrics for each measure, and write a summary
         of key results to an output JSON.
+
+    Args:
+        opts (argparse.NameSpace): run.py input arguments.
+        run_setup (Path, optional): Run setup file listing the active ECMs. Defaults to None,
+            in which case the run_setup.json file written by ecm_prep.py is used.
     """
 
     # Raise numpy errors as exceptions
     numpy.seterr('raise')
+    # Start recording stage timings if requested
+    profiler.reset(getattr(opts, "profile", False))
     # Initialize user opts variable (elements: S-S calculation method;
     # daily hour range of focus for TSV metrics (all hours, peak, low demand
     # hours); output type for TSV metrics (energy or power); calculation type
@@ -7377,7 +7647,7 @@ def main(opts: argparse.NameSpace):  # noqa: F821
     # used by default to calculate site-source conversions, with no TSV metrics
     # and AIA regions and a baseline grid scenario)
     handyfiles = UsefulInputFiles(
-        energy_out=energy_out, regions="AIA", grid_decarb=False)
+        energy_out=energy_out, regions="AIA", grid_decarb=False, run_setup=run_setup)
     # Instantiate useful variables object
     handyvars = UsefulVars(handyfiles, opts, brkout="basic", regions="AIA",
                            state_appl_regs=None, codes=None, bps=None, exog_rates=None)
@@ -7394,14 +7664,6 @@ def main(opts: argparse.NameSpace):  # noqa: F821
     else:
         trim_yrs = False
 
-    # Import measure files
-    with open(handyfiles.meas_summary_data, 'r') as mjs:
-        try:
-            meas_summary = json.load(mjs)
-        except ValueError as e:
-            raise ValueError(
-                f"Error reading in '{handyfiles.meas_summary_data}': {str(e)}") from None
-
     # Import list of all unique active measures
     with open(handyfiles.active_measures, 'r') as am:
         try:
@@ -7410,6 +7672,15 @@ def main(opts: argparse.NameSpace):  # noqa: F821
         except ValueError as e:
             raise ValueError(
                 f"Error reading in '{handyfiles.active_measures}': {str(e)}") from None
+
+    # Import measure files one measure at a time, keeping the names of all
+    # measures but the full attributes of only those that are active and not
+    # tagged for removal
+    meas_names_all, meas_summary_restrict = set(), []
+    for m in JsonIO.iter_json_records(handyfiles.meas_summary_data):
+        meas_names_all.add(m["name"])
+        if m["name"] in active_meas_all and m["remove"] is False:
+            meas_summary_restrict.append(m)
     print('ECM attributes data load complete')
 
     active_ecms_w_jsons = 0
@@ -7417,7 +7688,7 @@ def main(opts: argparse.NameSpace):  # noqa: F821
     # matching ECM definition in ./ecm_definitions; warn users about ECMs
     # that do not have a matching ECM definition, which will be excluded
     for mn in active_meas_all:
-        if mn not in [m["name"] for m in meas_summary]:
+        if mn not in meas_names_all:
             warnings.warn(
                 "WARNING: ECM '" + mn + "' in 'run_setup.json' active " +
                 "list does not match any of the ECM names found in " +
@@ -7445,9 +7716,6 @@ def main(opts: argparse.NameSpace):  # noqa: F821
                           "found in the 'name' field for corresponding " +
                           "measure definitions in ./ecm_definitions"))
     # Further check to ensure that no active measures are tagged for removal
-    meas_summary_restrict = [
-        m for m in meas_summary if m["name"] in active_meas_all and
-        m["remove"] is False]
     if len(meas_summary_restrict) == 0:
         raise ValueError(
             "Active measures were found but all tagged for removal.")
@@ -7510,7 +7778,7 @@ def main(opts: argparse.NameSpace):  # noqa: F821
         if not measure_opts_match([m.usr_opts for m in measures_objlist]):
             raise ValueError(
                 "Attempting to compete measures with different user option settings. To address"
-                f" this issue, ensure that all active ECMs in {fp.GENERATED / 'run_setup.json'}"
+                f" this issue, ensure that all active ECMs in {handyfiles.active_measures}"
                 " were prepared using the same command line options, or delete the file"
                 " ./supporting_data/ and rerun ecm_prep.py with desired command line options.")
     except AttributeError:
@@ -7577,7 +7845,7 @@ def main(opts: argparse.NameSpace):  # noqa: F821
     # scheme is assumed
     if energy_out[0] != "fossil_equivalent" or regions != "AIA" or \
             grid_decarb is True:
-        handyfiles = UsefulInputFiles(energy_out, regions, grid_decarb)
+        handyfiles = UsefulInputFiles(energy_out, regions, grid_decarb, run_setup)
     # Re-instantiate useful variables object when regional breakdown other
     # than the default AIA climate zone breakdown is chosen
     if regions != "AIA":
@@ -7594,21 +7862,20 @@ def main(opts: argparse.NameSpace):  # noqa: F821
             print('Importing ECM competition data...', end="", flush=True)
 
         for m in measures_objlist:
-            # Assemble file name for measure competition data
-            meas_file_name = m.name + ".pkl.gz"
             # Assemble folder path for measure competition data
             comp_folder_name = handyfiles.meas_compete_data
-            with gzip.open(comp_folder_name / meas_file_name, 'r') as zp:
-                try:
-                    meas_comp_data = pickle.load(zp)
-                except Exception as e:
-                    raise Exception(
-                        f"Error reading in competition data of ECM '{m.name}': {str(e)}") from None
+            # Load competition data, which may be written in either compressed or uncompressed
+            # format (see 'comp_data_format' option of ecm_prep)
+            try:
+                with profiler.stage("load competition data", m.name):
+                    meas_comp_data = CompDataIO.load(comp_folder_name, m.name)
+            except Exception as e:
+                raise Exception(
+                    f"Error reading in competition data of ECM '{m.name}': {str(e)}") from None
             # Assemble folder path for measure efficient fuel split data
             fs_splt_folder_name = handyfiles.meas_eff_fs_splt_data
             try:
-                with gzip.open(fs_splt_folder_name / meas_file_name, 'r') as zp:
-                    meas_eff_fs_data = pickle.load(zp)
+                meas_eff_fs_data = CompDataIO.load(fs_splt_folder_name, m.name)
             except FileNotFoundError:
                 meas_eff_fs_data = None
             for adopt_scheme in handyvars.adopt_schemes:
@@ -7653,41 +7920,57 @@ def main(opts: argparse.NameSpace):  # noqa: F821
     # Instantiate an Engine object using active measures list
     a_run = Engine(handyvars, opts, measures_objlist, energy_out, brkout)
     # Import baseline microsegments
-    if regions in ['EMM', 'State']:  # Extract compressed EMM/state data
-        bjszip = handyfiles.msegs_in
-        with gzip.GzipFile(bjszip, 'r') as zip_ref:
-            msegs = json.loads(zip_ref.read().decode('utf-8'))
-    else:
-        with open(handyfiles.msegs_in, 'r') as msi:
-            try:
-                msegs = json.load(msi)
-            except ValueError as e:
-                raise ValueError(
-                    f"Error reading in '{handyfiles.msegs_in}': {str(e)}") from None
+    with profiler.stage("load baseline data"):
+        if regions in ['EMM', 'State']:  # Extract compressed EMM/state data
+            bjszip = handyfiles.msegs_in
+            with gzip.GzipFile(bjszip, 'r') as zip_ref:
+                msegs = json.loads(zip_ref.read().decode('utf-8'))
+        else:
+            with open(handyfiles.msegs_in, 'r') as msi:
+                try:
+                    msegs = json.load(msi)
+                except ValueError as e:
+                    raise ValueError(
+                        f"Error reading in '{handyfiles.msegs_in}': {str(e)}") from None
+    profiler.count("measures", len(measures_objlist))
 
     # Calculate uncompeted and competed measure savings and financial
     # metrics, and write key outputs to JSON file
-    for adopt_scheme in handyvars.adopt_schemes:
-        # Calculate each measure's uncompeted savings and metrics,
-        # and print progress update to user
-        print("Calculating uncompeted '" + adopt_scheme +
-              "' savings/metrics...", end="", flush=True)
-        a_run.calc_savings_metrics(adopt_scheme, "uncompeted", opts)
-        print("Calculations complete")
-        # Update each measure's competed markets to reflect the
-        # removal of savings overlaps with competing measures,
-        # and print progress update to user
-        if opts.no_comp is not True:
-            print("Competing ECMs for '" + adopt_scheme + "' scenario...",
-                  end="", flush=True)
-            a_run.compete_measures(adopt_scheme, htcl_totals, opts)
-            print("Competition complete")
-        # Calculate each measure's competed measure savings and metrics
-        # using updated competed markets, and print progress update to user
-        print("Calculating competed '" + adopt_scheme +
-              "' savings/metrics...", end="", flush=True)
-        a_run.calc_savings_metrics(adopt_scheme, "competed", opts)
+    # If specified by the user, calculate savings/metrics and compete measures for each
+    # adoption scheme in parallel worker processes before finalizing each scheme's outputs below
+    schemes_parallel = getattr(opts, "parallel_schemes", False) is True and \
+        len(handyvars.adopt_schemes) > 1
+    if schemes_parallel:
+        print("Calculating savings/metrics and competing ECMs for '" +
+              "', '".join(handyvars.adopt_schemes) + "' scenarios in parallel...",
+              end="", flush=True)
+        a_run.calc_schemes_parallel(htcl_totals, opts)
         print("Calculations complete")
+    for adopt_scheme in handyvars.adopt_schemes:
+        if not schemes_parallel:
+            # Calculate each measure's uncompeted savings and metrics,
+            # and print progress update to user
+            print("Calculating uncompeted '" + adopt_scheme +
+                  "' savings/metrics...", end="", flush=True)
+            with profiler.stage("calc_savings_metrics", f"{adopt_scheme} (uncompeted)"):
+                a_run.calc_savings_metrics(adopt_scheme, "uncompeted", opts)
+            print("Calculations complete")
+            # Update each measure's competed markets to reflect the
+            # removal of savings overlaps with competing measures,
+            # and print progress update to user
+            if opts.no_comp is not True:
+                print("Competing ECMs for '" + adopt_scheme + "' scenario...",
+                      end="", flush=True)
+                with profiler.stage("compete_measures", adopt_scheme):
+                    a_run.compete_measures(adopt_scheme, htcl_totals, opts)
+                print("Competition complete")
+            # Calculate each measure's competed measure savings and metrics
+            # using updated competed markets, and print progress update to user
+            print("Calculating competed '" + adopt_scheme +
+                  "' savings/metrics...", end="", flush=True)
+            with profiler.stage("calc_savings_metrics", f"{adopt_scheme} (competed)"):
+                a_run.calc_savings_metrics(adopt_scheme, "competed", opts)
+            print("Calculations complete")
         # Add the effects of codes and standards, if applicable
         if any([x is not None and len(x) != 0 for x in [codes, bps]]) \
             and (brkout == "detail" or (
@@ -7722,7 +8005,8 @@ def main(opts: argparse.NameSpace):  # noqa: F821
                 a_run.output_ecms[x.name] = final_codes_bps_dict
         else:
             final_codes_bps_dict = None
-        a_run.finalize_outputs(adopt_scheme, trim_out, trim_yrs)
+        with profiler.stage("finalize_outputs", adopt_scheme):
+            a_run.finalize_outputs(adopt_scheme, trim_out, trim_yrs)
         # If necessary, write out electric/heat pump conversion fractions for the scenario
         if a_run.handyvars.conversion_fracs and adopt_scheme == "Max adoption potential":
             print("\nWriting out endogenous electric/heat pump conversion fractions...",
@@ -7777,13 +8061,9 @@ def main(opts: argparse.NameSpace):  # noqa: F821
 
     # Determine regions and building types used by active measures for
     # aggregating onsite generation data
-    czgrp = set([cz for m in meas_summary
-                 if m["name"] in active_meas_all and m["remove"] is False
-                 for cz in m['climate_zone']])
+    czgrp = set([cz for m in meas_summary_restrict for cz in m['climate_zone']])
     czgrp = sorted(czgrp)
-    btgrp = [bt for m in meas_summary
-             if m["name"] in active_meas_all and m["remove"] is False
-             for bt in m['bldg_type']]
+    btgrp = [bt for m in meas_summary_restrict for bt in m['bldg_type']]
     # Drop multi family and mobile homes, along with commercial unspecified
     # building type; no onsite generation data provided for these bldg. types
     btgrp = set([
@@ -7861,24 +8141,11 @@ def main(opts: argparse.NameSpace):  # noqa: F821
     # written with ECM results output
     a_run.output_ecms['On-site Generation'] = osg_temp
 
-    # Recursively navigate dictionary and round values
-    def round_values(data, precision):
-        if isinstance(data, dict):
-            for k, v in data.items():
-                data[k] = round_values(v, precision)
-        elif isinstance(data, float):
-            data = round(data, precision)
-        return data
-
-    a_run.output_ecms = round_values(a_run.output_ecms, 6)
-    a_run.output_all = round_values(a_run.output_all, 6)
-
-    # Write summary outputs for individual measures to a JSON
-    with open(handyfiles.meas_engine_out_ecms, "w") as jso:
-        json.dump(a_run.output_ecms, jso, indent=2)
-    # Write summary outputs across all measures to a JSON
-    with open(handyfiles.meas_engine_out_agg, "w") as jso:
-        json.dump(a_run.output_all, jso, indent=2)
+    with profiler.stage("write results"):
+        # Write summary outputs for individual measures and across all measures
+        # to JSONs, rounding each record as it is written
+        JsonIO.dump_json_stream(a_run.output_ecms, handyfiles.meas_engine_out_ecms, precision=6)
+        JsonIO.dump_json_stream(a_run.output_all, handyfiles.meas_engine_out_agg, precision=6)
     print("Data writing complete")
     # Write competition adjustment fractions to a JSON, if applicable
     if a_run.output_ecms_cfs is not None:
@@ -7891,9 +8158,16 @@ def main(opts: argparse.NameSpace):  # noqa: F821
         # Notify user that the output data are being plotted
         print("Plotting output data...", end="", flush=True)
         # Execute plots
-        run_plot(meas_summary, a_run, handyvars, measures_objlist, regions, cbpslist, trim_out)
+        with profiler.stage("plotting"):
+            run_plot(meas_summary_restrict, a_run, handyvars, measures_objlist, regions, cbpslist,
+                     trim_out)
         print("Plotting complete")
 
+    # Write the profile of stage timings, counts, and peak memory, if requested
+    if profiler.enabled:
+        profiler.write(handyfiles.profile_out)
+        print(f"Wrote run profile to {handyfiles.profile_out}")
+
 
 def parse_args(args: list = None) -> argparse.NameSpace:  # noqa: F821
     """Parse arguments for run.py using Config class
@@ -7915,7 +8189,6 @@ def parse_args(args: list = None) -> argparse.NameSpace:  # noqa: F821
 
 
 if __name__ == '__main__':
-    import time
     start_time = time.time()
     opts = parse_args()
     main(opts)
@@ -3,18 +3,295 @@ from pathlib import Path
 from scout.config import LogConfig, Config, FilePaths as fp
 from scout.ecm_prep_args import ecm_args
 from scout.ecm_prep import ECMPrepHelper, main as ecm_prep_main
-from scout.utils import JsonIO
+from scout.ecm_prep_vars import UsefulInputFiles
+from scout.utils import JsonIO, CompDataIO, StageProfiler
 from scout import run
 from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
+import hashlib
+import json
 import logging
 import shutil
+import sys
+import tempfile
+import time
 LogConfig.configure_logging()
 logger = logging.getLogger(__name__)
 
 
+class PrepCache():
+    """Prepared individual ECM data shared across the groups of a batch run. ECMs prepared for
+        one group are reused by other groups when the ECM definitions and the ecm_prep options
+        that bear on the ECMs' results match and the ECMs were prepared from the current input
+        data; reused ECMs are seeded into a group's generated
+        directory before ecm_prep.main() is run, which then treats them as previously prepared.
+
+    Attributes:
+        cache_dir (Path): directory storing the cached ECM data
+    """
+
+    # ecm_prep options under which copies of ECMs or additional ECM data are prepared; ECMs are
+    # not cached or reused for groups that use these options
+    excluded_opts = ["health_costs", "pkg_env_sep", "sect_shapes", "add_typ_eff"]
+    # ecm_prep options that only bear on the results of some ECMs (see `opt_applies`)
+    meas_specific_opts = ["no_scnd_lgt", "floor_start"]
+
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = cache_dir
+
+    @staticmethod
+    def opt_applies(opt: str, meas_def: dict) -> bool:
+        """Determine whether an ecm_prep option bears on the results of an ECM
+
+        Args:
+            opt (str): ecm_prep option name
+            meas_def (dict): ECM definition
+
+        Returns:
+            bool: True if the option may change the ECM's prepared results
+        """
+
+        if opt == "no_scnd_lgt":
+            # Secondary heating/cooling effects are only assessed for lighting ECMs, including
+            # ECMs that apply to 'all' end uses
+            end_use = meas_def.get("end_use") or []
+            if isinstance(end_use, dict):
+                end_use = end_use.get("primary") or []
+            if isinstance(end_use, str):
+                end_use = [end_use]
+            return any(x in end_use for x in ["all", "lighting"])
+        elif opt == "floor_start":
+            # An elevated minimum efficiency floor only removes ECMs flagged for removal
+            return meas_def.get("min_eff_elec_flag") is not None
+        return True
+
+    @staticmethod
+    def usr_opts(opts: argparse.NameSpace) -> dict:  # noqa: F821
+        """Convert ecm_prep arguments to the form in which they are recorded for prepared ECMs
+
+        Args:
+            opts (argparse.NameSpace): ecm_prep arguments
+
+        Returns:
+            dict: ecm_prep arguments as recorded in ecm_prep.json
+        """
+
+        return json.loads(json.dumps(vars(opts), default=str))
+
+    @staticmethod
+    def key(data) -> str:
+        """Find the cache key for JSON-serializable data
+
+        Args:
+            data: data identifying a cache entry
+
+        Returns:
+            str: hexadecimal SHA-256 digest of the data
+        """
+
+        return hashlib.sha256(
+            json.dumps(data, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def entry_key(self, meas_def: dict, usr_opts: dict, inputs_hash: str) -> str:
+        """Find the cache key for an ECM, based on its definition, the ecm_prep options that
+            bear on its results, and the input data it is prepared from
+
+        Args:
+            meas_def (dict): ECM definition
+            usr_opts (dict): ecm_prep options the ECM is prepared with
+            inputs_hash (str): combined hash of the input data the ECM is prepared from (see
+                ECMPrepHelper.input_files_hash)
+
+        Returns:
+            str: cache key
+        """
+
+        # ECM-specific options can only be screened out if ECM attributes are not overridden
+        field_updates = usr_opts.get("ecm_field_updates")
+        result_opts = {
+            k: v for k, v in usr_opts.items() if k not in ECMPrepHelper.non_result_opts and (
+                field_updates or k not in self.meas_specific_opts or
+                self.opt_applies(k, meas_def))}
+
+        return self.key([meas_def["name"], ECMPrepHelper.meas_def_hash(meas_def), inputs_hash,
+                         result_opts])
+
+    @staticmethod
+    def inputs_hash(opts: argparse.NameSpace) -> str:  # noqa: F821
+        """Find the combined hash of the current input data that ECMs are prepared from
+
+        Args:
+            opts (argparse.NameSpace): ecm_prep arguments for the group
+
+        Returns:
+            str: hexadecimal SHA-256 digest of the input data
+        """
+
+        return ECMPrepHelper.input_files_hash(UsefulInputFiles(opts))
+
+    def glob_vars_key(self, usr_opts: dict) -> str:
+        """Find the cache key for global run variables written by ecm_prep.py, which do not depend
+            on ECM-specific options
+
+        Args:
+            usr_opts (dict): ecm_prep options
+
+        Returns:
+            str: cache key
+        """
+
+        return self.key({k: v for k, v in usr_opts.items() if k not in (
+            ECMPrepHelper.non_result_opts + self.meas_specific_opts)})
+
+    def cacheable(self, usr_opts: dict) -> bool:
+        """Determine whether ECMs prepared with the given options can be cached
+
+        Args:
+            usr_opts (dict): ecm_prep options
+
+        Returns:
+            bool: True if none of the excluded options are used
+        """
+
+        return all(usr_opts.get(opt) in [False, None] for opt in self.excluded_opts)
+
+    @staticmethod
+    def load_defs(ecm_files: list) -> list:
+        """Load definitions of the individual ECMs that can be cached, excluding ECMs that are
+            prepared alongside reference case analogues
+
+        Args:
+            ecm_files (list): ECM definition file names (without extension)
+
+        Returns:
+            list: ECM definitions
+        """
+
+        meas_defs = []
+        for ecm in ecm_files:
+            def_pth = fp.ECM_DEF / f"{ecm}.json"
+            if not def_pth.exists():
+                continue
+            meas_def = JsonIO.load_json(def_pth)
+            if isinstance(meas_def, dict) and meas_def.get("ref_analogue") is not True:
+                meas_defs.append(meas_def)
+
+        return meas_defs
+
+    def seed(self, opts: argparse.NameSpace) -> list:  # noqa: F821
+        """Copy cached data for matching ECMs into the current generated directory. ECMs that
+            were already prepared in the directory are left for ecm_prep.py to check.
+
+        Args:
+            opts (argparse.NameSpace): ecm_prep arguments for the group
+
+        Returns:
+            list: names of the ECMs seeded from the cache
+        """
+
+        usr_opts = self.usr_opts(opts)
+        glob_vars_cache = self.cache_dir / "glob_run_vars" / f"{self.glob_vars_key(usr_opts)}.json"
+        glob_vars = fp.GENERATED / "glob_run_vars.json"
+        # Global run variables are needed in case no ECMs remain to be prepared
+        if not self.cacheable(usr_opts) or not (glob_vars.exists() or glob_vars_cache.exists()):
+            return []
+
+        ecm_prep_pth, hashes_pth = [
+            fp.GENERATED / "ecm_prep.json", fp.GENERATED / "ecm_prep_hashes.json"]
+        meas_summary = JsonIO.load_json(ecm_prep_pth) if ecm_prep_pth.exists() else []
+        prep_hashes = JsonIO.load_json(hashes_pth) if hashes_pth.exists() else {}
+        prepped = [m["name"] for m in meas_summary]
+        # Only ECMs prepared from the current input data are reused
+        inputs_hash = self.inputs_hash(opts)
+        seeded = []
+        for meas_def in self.load_defs(opts.ecm_files):
+            entry_dir = self.cache_dir / self.entry_key(meas_def, usr_opts, inputs_hash)
+            if meas_def["name"] in prepped or not (entry_dir / "entry.json").exists():
+                continue
+            entry = JsonIO.load_json(entry_dir / "entry.json")
+            # Record the ECM as prepared with the group's options, which may differ from those
+            # of the cached ECM only in options that do not bear on the ECM's results
+            entry["record"]["usr_opts"] = usr_opts
+            meas_summary.append(entry["record"])
+            prep_hashes[meas_def["name"]] = entry["hashes"]
+            for folder in [fp.ECM_COMP, fp.EFF_FS_SPLIT]:
+                if (entry_dir / folder.name).exists():
+                    for data_file in (entry_dir / folder.name).iterdir():
+                        shutil.copy(data_file, folder)
+            seeded.append(meas_def["name"])
+
+        if seeded:
+            JsonIO.dump_json(meas_summary, ecm_prep_pth)
+            JsonIO.dump_json(prep_hashes, hashes_pth)
+            if not glob_vars.exists():
+                shutil.copy(glob_vars_cache, glob_vars)
+
+        return seeded
+
+    def publish(self, opts: argparse.NameSpace):  # noqa: F821
+        """Add ECMs prepared in the current generated directory to the cache. Entries are
+            written to a temporary directory and then renamed, so that groups prepared
+            concurrently never read partially written entries.
+
+        Args:
+            opts (argparse.NameSpace): ecm_prep arguments for the group
+        """
+
+        usr_opts = self.usr_opts(opts)
+        ecm_prep_pth, hashes_pth = [
+            fp.GENERATED / "ecm_prep.json", fp.GENERATED / "ecm_prep_hashes.json"]
+        if not self.cacheable(usr_opts) or not (ecm_prep_pth.exists() and hashes_pth.exists()):
+            return
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        records = {m["name"]: m for m in JsonIO.load_json(ecm_prep_pth) if
+                   "contributing_ECMs" not in m.keys()}
+        prep_hashes = JsonIO.load_json(hashes_pth)
+        # Competition and efficient fuel split data files, by ECM name
+        data_files = {}
+        for folder in [fp.ECM_COMP, fp.EFF_FS_SPLIT]:
+            for data_file in folder.iterdir():
+                data_files.setdefault(CompDataIO.meas_name(data_file), []).append(data_file)
+
+        for meas_def in self.load_defs(opts.ecm_files):
+            record, hashes = [x.get(meas_def["name"]) for x in [records, prep_hashes]]
+            # Only cache ECMs with competition data that were prepared from the current definition
+            if record is None or hashes is None or meas_def["name"] not in data_files or \
+                    hashes["definition"] != ECMPrepHelper.meas_def_hash(meas_def) or \
+                    not self.cacheable(record["usr_opts"]):
+                continue
+            entry_dir = self.cache_dir / self.entry_key(
+                meas_def, record["usr_opts"], hashes["inputs"])
+            if entry_dir.exists():
+                continue
+            tmp_dir = Path(tempfile.mkdtemp(dir=self.cache_dir))
+            JsonIO.dump_json({"record": record, "hashes": hashes}, tmp_dir / "entry.json")
+            for data_file in data_files[meas_def["name"]]:
+                (tmp_dir / data_file.parent.name).mkdir(exist_ok=True)
+                shutil.copy(data_file, tmp_dir / data_file.parent.name)
+            try:
+                tmp_dir.rename(entry_dir)
+            except OSError:
+                # Entry was added by another group in the meantime
+                shutil.rmtree(tmp_dir)
+
+        # Cache global run variables for the group's options
+        glob_vars = fp.GENERATED / "glob_run_vars.json"
+        if glob_vars.exists():
+            glob_vars_dir = self.cache_dir / "glob_run_vars"
+            glob_vars_dir.mkdir(exist_ok=True)
+            tmp_pth = Path(tempfile.mkstemp(dir=glob_vars_dir)[1])
+            shutil.copy(glob_vars, tmp_pth)
+            tmp_pth.replace(glob_vars_dir / f"{self.glob_vars_key(usr_opts)}.json")
+
+
 class BatchRun():
-    def __init__(self, yml_dir):
+    def __init__(self, yml_dir, jobs: int = 1):
+        if jobs < 1:
+            raise ValueError("The `jobs` argument must be an integer of 1 or greater.")
         self.yml_dir = yml_dir.resolve()
+        self.jobs = jobs
 
     def get_ecm_files(self, ymls: list) -> list:  # noqa: F821
         """Retrieve all ECMs from 1 or more config file and return together in a list of lists
@@ -99,51 +376,164 @@ class BatchRun():
 
         return yml_groups
 
+    def prep_group(self, yml_grp: list, grp_dir: Path, prep_cache: PrepCache) -> list:
+        """Run ecm_prep.main() for a group of configuration files with common ecm_prep arguments
+            and write a run setup file for each configuration file in the group. Each run setup
+            file is written to its own directory within the group's generated directory so that
+            run.main() calls for the group do not share a run_setup.json file.
+
+        Args:
+            yml_grp (list): filepaths of yml configuration files in the group
+            grp_dir (Path): generated directory for the group
+            prep_cache (PrepCache): prepared ECM data shared across groups
+
+        Returns:
+            list: (configuration file, run setup file) pairs for each yml in the group
+        """
+
+        # Set custom generated directory for the group, write .txt file to document the ymls
+        fp.set_paths({"GENERATED": grp_dir})
+        paths = [yml.resolve().as_posix() for yml in yml_grp]
+
+        for yml_file in paths:
+            shutil.copy(yml_file, fp.GENERATED)
+
+        # Set list of ECMs and run ecm_prep.main()
+        ecm_prep_opts = ecm_args(["-y", str(yml_grp[0].resolve())])
+        ecm_prep_opts.ecm_files = self.get_unique_ecm_files(yml_grp)
+        ecm_prep_opts.ecm_directory = None
+        ecm_prep_opts.ecm_files_regex = []
+        # Reuse ECMs already prepared for other groups with matching options
+        seeded = prep_cache.seed(ecm_prep_opts)
+        if seeded:
+            logger.info(f"Reusing {len(seeded)} ECM(s) prepared for other configuration files")
+        logger.info(f"Running ecm_prep.py for the following configuration files: {paths}")
+        ecm_prep_main(ecm_prep_opts)
+        prep_cache.publish(ecm_prep_opts)
+
+        # Write a run setup file for each yml in the group
+        run_setup = JsonIO.load_json(fp.GENERATED / "run_setup.json")
+        # Find subset of ECMs that were set to inactive or skipped in the prep run
+        inactive_skipped_ecms = run_setup["inactive"] + run_setup["skipped"]
+        ecm_files_list = self.get_ecm_files(yml_grp)
+        run_setups = []
+        for ct, config in enumerate(yml_grp):
+            # Set all ECMs inactive
+            run_setup = ECMPrepHelper.update_active_measures(
+                run_setup,
+                to_inactive=ecm_prep_opts.ecm_files
+            )
+            # Set yml-specific ECMs active
+            # Find yml-specific individual ECMs not marked inactive or skipped
+            active_ecms = [ecm for ecm in ecm_files_list[ct] if
+                           ecm not in inactive_skipped_ecms]
+            # Set yml-specific ECMs not marked inactive or skipped active
+            run_setup = ECMPrepHelper.update_active_measures(run_setup, to_active=active_ecms)
+            run_dir = grp_dir / config.stem
+            run_dir.mkdir(parents=True, exist_ok=True)
+            JsonIO.dump_json(run_setup, run_dir / "run_setup.json")
+            run_setups.append((config, run_dir / "run_setup.json"))
+        fp.reset_base_paths()
+
+        return run_setups
+
+    def run_config(self, config: Path, grp_dir: Path, run_setup: Path):
+        """Run run.main() for a configuration file using the ECMs prepared for its group.
+
+        Args:
+            config (Path): path to the yml configuration file
+            grp_dir (Path): generated directory for the configuration file's group
+            run_setup (Path): run setup file for the configuration file
+        """
+
+        fp.set_paths({"GENERATED": grp_dir})
+        run_opts = self.get_run_opts(config)
+        logger.info(f"Running run.py for {config}")
+        run.main(run_opts, run_setup)
+        fp.reset_base_paths()
+
+    @staticmethod
+    def timed_task(task, *args) -> tuple:
+        """Run a batch task and record its wall time and peak memory. Peak memory is that of
+            the process running the task (not including any worker processes started by the
+            task), which covers earlier tasks run in the same process
+
+        Args:
+            task (callable): ecm_prep.py or run.py task to run
+            args: arguments to the task
+
+        Returns:
+            tuple: task output, wall time (s), and peak memory (MB)
+        """
+
+        start_time = time.perf_counter()
+        output = task(*args)
+
+        return output, time.perf_counter() - start_time, StageProfiler.peak_memory(
+            children=False)
+
     def run_batch(self):
         """Run ecm_prep.py and run.py using 1 or more configuration files. Configuration files
             are first grouped together if they have common ecm_prep arguments and ecm_prep.main()
             is run for each group. run.main() is then run for each individual configuration file.
+            If more than one job is allowed, groups are prepared concurrently and each
+            configuration file's run.main() starts as soon as its group has been prepared; each
+            task runs in its own process so that file paths are not shared across tasks.
         """
 
         yml_grps = self.group_common_configs(self.yml_dir)
-        for ct, yml_grp in enumerate(yml_grps):
-            # Set custom generated directory for each group, write .txt file to document the ymls
-            fp.set_paths({"GENERATED": fp.GENERATED / f"batch_run{ct+1}"})
-            paths = [yml.resolve().as_posix() for yml in yml_grp]
-
-            for yml_file in paths:
-                shutil.copy(yml_file, fp.GENERATED)
-
-            # Set list of ECMs and run ecm_prep.main()
-            ecm_prep_opts = ecm_args(["-y", str(yml_grp[0].resolve())])
-            ecm_prep_opts.ecm_files = self.get_unique_ecm_files(yml_grp)
-            ecm_prep_opts.ecm_directory = None
-            ecm_prep_opts.ecm_files_regex = []
-            logger.info(f"Running ecm_prep.py for the following configuration files: {paths}")
-            ecm_prep_main(ecm_prep_opts)
-
-            # Run run.main() for each yml in the group, set custom results directories
-            run_setup = JsonIO.load_json(fp.GENERATED / "run_setup.json")
-            # Find subset of ECMs that were set to inactive or skipped in the prep run
-            inactive_skipped_ecms = run_setup["inactive"] + run_setup["skipped"]
-            ecm_files_list = self.get_ecm_files(yml_grp)
-            for ct, config in enumerate(yml_grp):
-                # Set all ECMs inactive
-                run_setup = ECMPrepHelper.update_active_measures(
-                    run_setup,
-                    to_inactive=ecm_prep_opts.ecm_files
-                )
-                # Set yml-specific ECMs active
-                # Find yml-specific individual ECMs not marked inactive or skipped
-                active_ecms = [ecm for ecm in ecm_files_list[ct] if
-                               ecm not in inactive_skipped_ecms]
-                # Set yml-specific ECMs not marked inactive or skipped active
-                run_setup = ECMPrepHelper.update_active_measures(run_setup, to_active=active_ecms)
-                JsonIO.dump_json(run_setup, fp.GENERATED / "run_setup.json")
-                run_opts = self.get_run_opts(config)
-                logger.info(f"Running run.py for {config}")
-                run.main(run_opts)
-            fp.reset_base_paths()
+        grp_dirs = [fp.GENERATED / f"batch_run{ct+1}" for ct in range(len(yml_grps))]
+        # Share prepared ECMs across groups
+        prep_cache = PrepCache(fp.GENERATED / "batch_cache")
+        # Record wall time and peak memory for each task
+        task_stats = []
+        # Flag for whether peak memory is recorded separately for each task; otherwise, tasks
+        # share a process and peak memory is the maximum across tasks run so far
+        per_task_mem = False
+        if self.jobs == 1:
+            for yml_grp, grp_dir in zip(yml_grps, grp_dirs):
+                run_setups, *stats = self.timed_task(self.prep_group, yml_grp, grp_dir, prep_cache)
+                task_stats.append((f"ecm_prep.py ({grp_dir.name})", *stats))
+                for config, run_setup in run_setups:
+                    _, *stats = self.timed_task(self.run_config, config, grp_dir, run_setup)
+                    task_stats.append((f"run.py ({config.name})", *stats))
+        else:
+            # Start a new process for each task where supported, such that peak memory
+            # reflects only that task
+            pool_args = {"max_workers": self.jobs,
+                         "mp_context": multiprocessing.get_context("spawn")}
+            if sys.version_info >= (3, 11):
+                pool_args["max_tasks_per_child"] = 1
+                per_task_mem = True
+            with ProcessPoolExecutor(**pool_args) as executor:
+                prep_futures = {
+                    executor.submit(
+                        self.timed_task, self.prep_group, yml_grp, grp_dir, prep_cache): grp_dir
+                    for yml_grp, grp_dir in zip(yml_grps, grp_dirs)}
+                run_futures = {}
+                # Submit run.py tasks for each group as soon as its ECMs are prepared
+                for future in as_completed(prep_futures):
+                    grp_dir = prep_futures[future]
+                    run_setups, *stats = future.result()
+                    task_stats.append((f"ecm_prep.py ({grp_dir.name})", *stats))
+                    for config, run_setup in run_setups:
+                        run_futures[executor.submit(
+                            self.timed_task, self.run_config, config, grp_dir,
+                            run_setup)] = config
+                for future in as_completed(run_futures):
+                    _, *stats = future.result()
+                    task_stats.append((f"run.py ({run_futures[future].name})", *stats))
+
+        # Summarize wall time and peak memory for each task
+        if per_task_mem:
+            mem_label = "peak memory of task process"
+        else:
+            mem_label = "peak memory of shared process to date"
+        summary = [f"Batch run summary (wall time, {mem_label}):"]
+        for task_name, wall_time, peak_mem in task_stats:
+            peak_mem = f"{peak_mem:.0f} MB" if peak_mem is not None else "N/A"
+            summary.append(f"  {task_name}: {wall_time:.1f} s, {peak_mem}")
+        logger.info("\n".join(summary))
 
 
 if __name__ == "__main__":
@@ -154,5 +544,12 @@ if __name__ == "__main__":
         help=("Path to directory containing YAML configuration files")
     )
 
+    parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=1,
+        help=("Number of ecm_prep.py/run.py tasks to run at once")
+    )
+
     opts = parser.parse_args()
-    BatchRun(opts.batch).run_batch()
+    BatchRun(opts.batch, opts.jobs).run_batch()
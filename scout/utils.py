@@ -1,7 +1,22 @@
+import csv
+import copy
 import json
+import gzip
+import itertools
+import pickle
 import numpy
+import operator
 import logging
+import sys
+import time
+from ast import literal_eval
+from contextlib import contextmanager, nullcontext
+from functools import lru_cache, partial
 from pathlib import Path, PurePath
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
 
 
 class JsonIO:
@@ -33,6 +48,484 @@ class JsonIO:
         with open(filepath, "w") as handle:
             json.dump(data, handle, indent=2, cls=MyEncoder)
 
+    @staticmethod
+    def dump_json_stream(data, filepath: Path, precision=None):
+        """Export data to .json file one top-level record at a time.
+
+        The output is identical to that of dump_json, but each top-level record (dict
+        item or list element) is rounded (if applicable), serialized, and written out
+        before the next record is processed, rather than serializing the data as a whole.
+
+        Args:
+            data (dict or list): data to write to .json file; dict keys must be strings
+            filepath (pathlib.Path): filepath of .json file
+            precision (int, optional): number of decimal places to round floats to;
+                if None, floats are not rounded
+        """
+        if isinstance(data, dict):
+            records, brackets = data.items(), "{}"
+        else:
+            records, brackets = ((None, x) for x in data), "[]"
+        with open(filepath, "w") as handle:
+            handle.write(brackets[0])
+            n_records = 0
+            for key, val in records:
+                # Round the current record's values in place before writing it
+                if precision is not None:
+                    val = JsonIO.round_floats(val, precision)
+                    if key is not None:
+                        data[key] = val
+                # Nested lines of the record are indented one level further than in a
+                # standalone dump; JSON strings never hold literal newlines
+                val_str = json.dumps(val, indent=2, cls=MyEncoder).replace("\n", "\n  ")
+                if key is not None:
+                    val_str = json.dumps(key) + ": " + val_str
+                handle.write(("," if n_records else "") + "\n  " + val_str)
+                n_records += 1
+            handle.write(("\n" if n_records else "") + brackets[1])
+
+    @staticmethod
+    def iter_json_records(filepath: Path, chunk_size: int = 1 << 16):
+        """Read the top-level records of a .json file one at a time.
+
+        Only the text of the record currently being parsed is held in memory, such that
+        callers can keep the records they need without loading the full file.
+
+        Args:
+            filepath (pathlib.Path): filepath of .json file holding a list or dict
+            chunk_size (int): number of characters to read from the file at a time
+
+        Yields:
+            List elements, or (key, value) tuples if the file holds a dict
+        """
+        decoder = json.JSONDecoder()
+        with open(filepath, "r") as handle:
+            buf, pos = "", 0
+
+            def next_char():
+                # Skip whitespace, reading further chunks as needed; "" at end of file
+                nonlocal buf, pos
+                while True:
+                    while pos < len(buf) and buf[pos] in " \t\n\r":
+                        pos += 1
+                    if pos < len(buf):
+                        return buf[pos]
+                    buf, pos = handle.read(chunk_size), 0
+                    if not buf:
+                        return ""
+
+            def decode():
+                # Decode the next value, growing the buffer until it holds it completely
+                nonlocal buf, pos
+                while True:
+                    try:
+                        val, end = decoder.raw_decode(buf, pos)
+                        # A number at the end of the buffer may continue in the next chunk
+                        if end < len(buf):
+                            buf, pos = buf[end:], 0
+                            return val
+                    except json.JSONDecodeError:
+                        pass
+                    more = handle.read(max(chunk_size, len(buf) - pos))
+                    if not more:
+                        # Let the decoder report the error for the incomplete tail
+                        val, end = decoder.raw_decode(buf, pos)
+                        buf, pos = buf[end:], 0
+                        return val
+                    buf, pos = buf[pos:] + more, 0
+
+            def expect(chars):
+                nonlocal pos
+                char = next_char()
+                if char not in chars or not char:
+                    raise json.JSONDecodeError(
+                        f"Expecting one of {list(chars)}", buf, pos)
+                pos += 1
+                return char
+
+            try:
+                close = "]" if expect("[{") == "[" else "}"
+                if next_char() == close:
+                    return
+                while True:
+                    next_char()
+                    if close == "}":
+                        key = decode()
+                        expect(":")
+                        next_char()
+                        yield key, decode()
+                    else:
+                        yield decode()
+                    if expect("," + close) == close:
+                        break
+            except ValueError as e:
+                raise ValueError(f"Error reading in '{filepath}': {str(e)}") from None
+
+    @staticmethod
+    def round_floats(data, precision):
+        """Recursively round floats in (nested dict) data.
+
+        Args:
+            data: data to round; dicts are rounded in place
+            precision (int): number of decimal places to round floats to
+
+        Returns:
+            Rounded data
+        """
+        if isinstance(data, dict):
+            for k, v in data.items():
+                data[k] = JsonIO.round_floats(v, precision)
+        elif isinstance(data, float):
+            data = round(data, precision)
+        return data
+
+
+class DataIndex:
+    """Index the rows of a structured EIA data array by its leading fields.
+
+    The rows of the array are grouped once by each leading combination of
+    the index fields (e.g., census division; census division and building
+    type; and so on) such that the rows for a given microsegment can be
+    looked up directly rather than by masking the full array.
+
+    Attributes:
+        data (numpy.ndarray): The indexed structured array.
+        fields (list): Names of the indexed fields present in the array,
+            in the order in which they must be specified for selection.
+        sort_rows (bool): If True, selected rows are returned in their
+            original order; otherwise, rows are ordered as they would be if
+            the array were filtered on each field in turn.
+        groups (dict): Row indices (numpy arrays, in original row order)
+            keyed by tuples of values for each leading set of fields.
+    """
+
+    def __init__(self, data, fields, sort_rows=False):
+        self.data = data
+        # Only index the fields that are present in the array (e.g., the
+        # residential thermal loads data are not broken out by fuel type)
+        self.fields = [f for f in fields if f in data.dtype.names]
+        self.sort_rows = sort_rows
+        groups = {}
+        for idx, key in enumerate(zip(*[data[f].tolist() for f in self.fields])):
+            for n in range(1, len(key) + 1):
+                groups.setdefault(key[:n], []).append(idx)
+        self.groups = {
+            key: numpy.array(rows, dtype=int) for key, rows in groups.items()}
+
+    def select(self, *values):
+        """Select the rows of the array that match the given field values.
+
+        Args:
+            values: Values to match for each of the leading index fields,
+                in order; a tuple of values selects rows matching any of the
+                values in the tuple.
+
+        Returns:
+            numpy.ndarray: The matching rows of the indexed array.
+        """
+        # Find all combinations of single values for the given fields,
+        # varying the values for the last field given slowest
+        values = [x if isinstance(x, tuple) else (x,) for x in values]
+        keys = [k[::-1] for k in itertools.product(*values[::-1])]
+        rows = numpy.concatenate(
+            [self.groups.get(k, numpy.array([], dtype=int)) for k in keys])
+        if self.sort_rows:
+            rows = numpy.sort(rows)
+
+        return self.data[rows]
+
+
+class CompDataIO:
+    """Read and write per-measure competition and fuel split data files.
+
+    Each measure's data are stored in a separate pickle file named after the
+    measure, either gzip-compressed ('.pkl.gz') or uncompressed ('.pkl'). The
+    data are nested dicts keyed by microsegment, which are loaded whole for
+    each measure, such that uncompressed pickles avoid the inflate step of
+    loading without a separate serialization of the data model.
+    """
+
+    # File name suffixes by data format
+    suffixes = {"pkl.gz": ".pkl.gz", "pkl": ".pkl"}
+    # File recording the format that all measure data in a folder were last converted to
+    format_file = ".comp_data_format"
+
+    @staticmethod
+    def meas_name(filepath: Path):
+        """Find the measure name of a competition data file.
+
+        Args:
+            filepath (pathlib.Path): filepath of competition data file
+
+        Returns:
+            str: measure name, or None if the file is not competition data
+        """
+        for sfx in CompDataIO.suffixes.values():
+            if filepath.name.endswith(sfx):
+                return filepath.name[:-len(sfx)]
+        return None
+
+    @staticmethod
+    def dump(data, folder: Path, meas_name, data_format="pkl.gz"):
+        """Write a measure's data, removing any copy in the other format.
+
+        Args:
+            data: data to write
+            folder (pathlib.Path): folder to write data to
+            meas_name (str): measure name
+            data_format (str): 'pkl.gz' (compressed) or 'pkl' (uncompressed)
+        """
+        filepath = folder / (meas_name + CompDataIO.suffixes[data_format])
+        opener = gzip.open if data_format == "pkl.gz" else open
+        with opener(filepath, "wb") as handle:
+            pickle.dump(data, handle, -1)
+        # Remove stale data for the measure written in the other format
+        for sfx in CompDataIO.suffixes.values():
+            if folder / (meas_name + sfx) != filepath:
+                (folder / (meas_name + sfx)).unlink(missing_ok=True)
+
+    @staticmethod
+    def load(folder: Path, meas_name):
+        """Load a measure's data, in whichever format it was written.
+
+        Args:
+            folder (pathlib.Path): folder to load data from
+            meas_name (str): measure name
+
+        Returns:
+            Loaded data
+
+        Raises:
+            FileNotFoundError: if no data exist for the measure
+        """
+        filepath = folder / (meas_name + CompDataIO.suffixes["pkl"])
+        if filepath.exists():
+            with open(filepath, "rb") as handle:
+                return pickle.load(handle)
+        with gzip.open(folder / (meas_name + CompDataIO.suffixes["pkl.gz"]), "rb") as handle:
+            return pickle.load(handle)
+
+    @staticmethod
+    def convert(folder: Path, data_format):
+        """Convert all measure data in a folder to the given format.
+
+        Note:
+            Files in the other format can only be added to the folder by adding
+            directory entries, which updates the folder's modification time; the
+            folder is therefore not scanned again when it has not been modified
+            since its data were last converted to the same format.
+
+        Args:
+            folder (pathlib.Path): folder with measure data
+            data_format (str): 'pkl.gz' (compressed) or 'pkl' (uncompressed)
+
+        Returns:
+            int: number of files converted
+        """
+        format_path = folder / CompDataIO.format_file
+        if format_path.exists() and format_path.read_text() == data_format and \
+                folder.stat().st_mtime_ns <= format_path.stat().st_mtime_ns:
+            return 0
+        n_converted = 0
+        for filepath in sorted(folder.iterdir()):
+            meas_name = CompDataIO.meas_name(filepath)
+            if meas_name is None or filepath.name.startswith(".") or \
+                    filepath.name.endswith(CompDataIO.suffixes[data_format]):
+                continue
+            CompDataIO.dump(CompDataIO.load(folder, meas_name), folder, meas_name, data_format)
+            n_converted += 1
+        # Record the format only after all files are converted; replacing the file also
+        # updates its modification time past that of the folder
+        format_path.unlink(missing_ok=True)
+        format_path.write_text(data_format)
+        return n_converted
+
+
+class SectorShapesIO:
+    """Read and write measure sector-level 8760 load shapes in a binary store.
+
+    Baseline and efficient hourly loads for each measure, adoption scenario,
+    region, and year are stored as fixed-dtype blocks of shape (2, 8760) that
+    are appended to a binary data file; a JSON index file alongside the data
+    file (same name with an '_index.json' suffix) maps each measure, adoption
+    scenario, region, and year to its block. Measures that are prepared again
+    have their blocks appended and re-indexed, and the data file is compacted
+    once unreferenced blocks outnumber referenced blocks.
+    """
+
+    # Data type of stored hourly loads
+    dtype = numpy.dtype("<f8")
+    # Load shapes stored for each block, in order
+    shape_keys = ["baseline", "efficient"]
+    # Number of hours in each load shape
+    hours = 8760
+
+    @staticmethod
+    def block_bytes():
+        """Find the size of each block of a sector shapes data file.
+
+        Returns:
+            int: number of bytes per block
+        """
+        return len(SectorShapesIO.shape_keys) * SectorShapesIO.hours * \
+            SectorShapesIO.dtype.itemsize
+
+    @staticmethod
+    def index_path(filepath: Path):
+        """Find the index file of a sector shapes data file.
+
+        Args:
+            filepath (pathlib.Path): sector shapes data file
+
+        Returns:
+            pathlib.Path: index file
+        """
+        return filepath.with_name(filepath.stem + "_index.json")
+
+    @staticmethod
+    def load_index(filepath: Path):
+        """Load the index of a sector shapes data file.
+
+        Args:
+            filepath (pathlib.Path): sector shapes data file
+
+        Returns:
+            dict: block index of each measure -> adoption scenario -> region -> year
+                under the 'measures' key, and the number of blocks in the data file under
+                the 'blocks' key; empty if the data file does not yet exist
+        """
+        index_path = SectorShapesIO.index_path(filepath)
+        if not filepath.exists() or not index_path.exists():
+            return {"blocks": 0, "measures": {}}
+        return JsonIO.load_json(index_path)
+
+    @staticmethod
+    def blocks(filepath: Path, index=None):
+        """Map the blocks of a sector shapes data file to an array.
+
+        Args:
+            filepath (pathlib.Path): sector shapes data file
+            index (dict, optional): index of the data file (see load_index); loaded if not given
+
+        Returns:
+            numpy.memmap: read-only array of shape (blocks, 2, 8760)
+        """
+        if index is None:
+            index = SectorShapesIO.load_index(filepath)
+        if index["blocks"] == 0:
+            return numpy.zeros((0, len(SectorShapesIO.shape_keys), SectorShapesIO.hours),
+                               dtype=SectorShapesIO.dtype)
+        return numpy.memmap(filepath, dtype=SectorShapesIO.dtype, mode="r", shape=(
+            index["blocks"], len(SectorShapesIO.shape_keys), SectorShapesIO.hours))
+
+    @staticmethod
+    def dump(shapes, filepath: Path):
+        """Append measures' sector shapes to a data file and update its index.
+
+        Args:
+            shapes (list): sector shapes of each measure, as dicts with the measure name
+                under the 'name' key and baseline and efficient 8760 loads nested under
+                adoption scenario -> region -> year keys
+            filepath (pathlib.Path): sector shapes data file
+        """
+        index = SectorShapesIO.load_index(filepath)
+        # Start a new data file if no index to its existing blocks is available
+        mode = "r+b" if index["blocks"] != 0 else "wb"
+        with open(filepath, mode) as handle:
+            # Discard any bytes past the indexed blocks (e.g., left by an earlier write that
+            # was interrupted before the index was updated), such that appended blocks are
+            # aligned with the block numbers recorded in the index
+            handle.truncate(index["blocks"] * SectorShapesIO.block_bytes())
+            handle.seek(0, 2)
+            for meas_shapes in shapes:
+                meas_index = index["measures"].setdefault(meas_shapes["name"], {})
+                for adopt_scheme, reg_shapes in meas_shapes.items():
+                    if adopt_scheme == "name":
+                        continue
+                    # Replace any previously stored shapes for the adoption scenario
+                    meas_index[adopt_scheme] = {}
+                    for reg, yr_shapes in reg_shapes.items():
+                        meas_index[adopt_scheme][reg] = {}
+                        for yr, yr_shape in yr_shapes.items():
+                            handle.write(numpy.asarray(
+                                [yr_shape[s] for s in SectorShapesIO.shape_keys],
+                                dtype=SectorShapesIO.dtype).tobytes())
+                            meas_index[adopt_scheme][reg][yr] = index["blocks"]
+                            index["blocks"] += 1
+        # Compact the data file once unreferenced blocks outnumber referenced blocks
+        n_referenced = sum(len(yr_blocks) for meas_index in index["measures"].values() for
+                           reg_blocks in meas_index.values() for yr_blocks in reg_blocks.values())
+        if index["blocks"] > 2 * n_referenced:
+            index = SectorShapesIO.compact(filepath, index)
+        JsonIO.dump_json(index, SectorShapesIO.index_path(filepath))
+
+    @staticmethod
+    def compact(filepath: Path, index):
+        """Rewrite a sector shapes data file with only the blocks referenced by its index.
+
+        Args:
+            filepath (pathlib.Path): sector shapes data file
+            index (dict): index of the data file (see load_index)
+
+        Returns:
+            dict: index of the compacted data file
+        """
+        blocks = SectorShapesIO.blocks(filepath, index)
+        compacted = {"blocks": 0, "measures": {}}
+        tmp_path = filepath.with_name(filepath.name + ".tmp")
+        with open(tmp_path, "wb") as handle:
+            for name, meas_index in index["measures"].items():
+                compacted["measures"][name] = {}
+                for adopt_scheme, reg_blocks in meas_index.items():
+                    compacted["measures"][name][adopt_scheme] = {}
+                    for reg, yr_blocks in reg_blocks.items():
+                        compacted["measures"][name][adopt_scheme][reg] = {}
+                        for yr, block in yr_blocks.items():
+                            handle.write(numpy.ascontiguousarray(blocks[block]).tobytes())
+                            compacted["measures"][name][adopt_scheme][reg][yr] = \
+                                compacted["blocks"]
+                            compacted["blocks"] += 1
+        del blocks
+        tmp_path.replace(filepath)
+        return compacted
+
+    @staticmethod
+    def load(filepath: Path, names=None):
+        """Load measures' sector shapes from a data file.
+
+        Args:
+            filepath (pathlib.Path): sector shapes data file
+            names (list, optional): names of measures to load. Defaults to None (all measures).
+
+        Returns:
+            list: sector shapes of each measure, in the format written by dump, with
+                baseline and efficient 8760 loads as numpy arrays
+        """
+        index = SectorShapesIO.load_index(filepath)
+        blocks = SectorShapesIO.blocks(filepath, index)
+        shapes = []
+        for name, meas_index in index["measures"].items():
+            if names is not None and name not in names:
+                continue
+            meas_shapes = {"name": name}
+            for adopt_scheme, reg_blocks in meas_index.items():
+                meas_shapes[adopt_scheme] = {reg: {yr: dict(zip(
+                    SectorShapesIO.shape_keys, numpy.array(blocks[block]))) for
+                    yr, block in yr_blocks.items()} for reg, yr_blocks in reg_blocks.items()}
+            shapes.append(meas_shapes)
+        return shapes
+
+    @staticmethod
+    def to_json(filepath: Path, json_path: Path):
+        """Export all measures' sector shapes in a data file to JSON.
+
+        Args:
+            filepath (pathlib.Path): sector shapes data file
+            json_path (pathlib.Path): JSON file to write, with a list of each measure's
+                sector shapes (see load)
+        """
+        JsonIO.dump_json(SectorShapesIO.load(filepath), json_path)
+
 
 class MyEncoder(json.JSONEncoder):
     """Convert numpy arrays to list for JSON serializing."""
@@ -49,6 +542,474 @@ class MyEncoder(json.JSONEncoder):
             return super(MyEncoder, self).default(obj)
 
 
+class KeyValTree:
+    """Flattened arithmetic view of nested data dicts that share a key structure.
+
+    Measure markets are nested dicts (e.g., stock/energy/carbon/cost ->
+    total/competed -> baseline/efficient -> year) that are summed across many
+    contributing microsegments. Rather than walking both dicts recursively on
+    every addition, the tree records the key structure of the dicts once, as
+    a schema that pulls all leaf values of each branch in a single lookup, and
+    holds the leaf values in a single array, such that additions are array
+    operations; the nested dict is rebuilt only when the result is needed.
+
+    Attributes:
+        schema (tuple): Keys of the leaf values and the nested branches of
+            the flattened dict (see compile_schema).
+        values (numpy.ndarray): Leaf values in the order of the schema;
+            numeric when all leaf values share a common shape, otherwise an
+            object array of the individual leaf values.
+        int_inds (list): Indices of the leaf values that have been integers
+            in all dicts added to the tree, which are restored as integers
+            when the nested dict is rebuilt.
+    """
+
+    def __init__(self, data, keys=None):
+        """Flatten a nested dict into a key schema and leaf values.
+
+        Args:
+            data (dict): Nested dict to flatten.
+            keys (list, optional): Top-level keys of the dict to include in
+                the tree. Defaults to None (all keys).
+        """
+        if keys is not None:
+            data = {k: data[k] for k in keys}
+        self.schema = self.compile_schema(data)
+        vals = self.gather(data)
+        self.int_inds = [
+            ind for ind, v in enumerate(vals) if isinstance(v, (int, numpy.integer))]
+        self.values = self.stack(vals)
+        # Ensure that leaf values held by reference (e.g., arrays of sampled
+        # values) are not later modified along with the original dict
+        if self.values.dtype == object:
+            self.values = copy.deepcopy(self.values)
+
+    @staticmethod
+    def compile_schema(data):
+        """Record the key structure of a nested dict.
+
+        Args:
+            data (dict): Nested dict.
+
+        Returns:
+            tuple: Keys of the dict in their original order, keys of its leaf
+                (non-dict) values, a getter that pulls all leaf values of the
+                dict at once (None if there are no leaf values), and the key
+                and schema of each nested dict.
+        """
+        leaf_keys = [k for k, v in data.items() if not isinstance(v, dict)]
+        branches = [(k, KeyValTree.compile_schema(v)) for k, v in data.items() if
+                    isinstance(v, dict)]
+        if len(leaf_keys) > 1:
+            getter = operator.itemgetter(*leaf_keys)
+        elif leaf_keys:
+            # A single-key item getter returns the value rather than a tuple
+            getter = partial(KeyValTree.single_leaf, leaf_keys[0])
+        else:
+            getter = None
+        return (list(data.keys()), leaf_keys, getter, branches)
+
+    @staticmethod
+    def single_leaf(key, data):
+        """Pull the only leaf value of a dict as a one-element tuple.
+
+        Args:
+            key (str): Key of the leaf value.
+            data (dict): Dict with the leaf value.
+
+        Returns:
+            tuple: Leaf value.
+        """
+        return (data[key],)
+
+    def gather(self, data):
+        """Pull the leaf values of a nested dict in the order of the schema.
+
+        Args:
+            data (dict): Nested dict that includes all keys of the schema.
+
+        Returns:
+            list: Leaf values of the dict.
+
+        Raises:
+            KeyError: When the dict does not include one of the schema's keys.
+        """
+        vals = []
+        try:
+            self.gather_branch(self.schema, data, vals)
+        except (KeyError, TypeError, IndexError):
+            raise KeyError("Dict does not include all keys of the flattened "
+                           "key structure")
+        return vals
+
+    @staticmethod
+    def gather_branch(schema, data, vals):
+        """Append the leaf values of a nested dict branch to a list.
+
+        Args:
+            schema (tuple): Schema of the branch (see compile_schema).
+            data (dict): Branch of the nested dict.
+            vals (list): Leaf values gathered so far.
+        """
+        getter, branches = schema[2:]
+        if getter is not None:
+            vals.extend(getter(data))
+        for k, branch in branches:
+            KeyValTree.gather_branch(branch, data[k], vals)
+
+    @staticmethod
+    def stack(vals):
+        """Stack leaf values into an array.
+
+        Args:
+            vals (list): Leaf values.
+
+        Returns:
+            numpy.ndarray: Numeric array when all values are non-empty and share
+                a common shape, otherwise an object array of the values.
+        """
+        try:
+            arr = numpy.array(vals, dtype=float)
+            # Empty (None) values are read as NaN; check for these only when
+            # NaN values are present
+            if not numpy.isnan(arr).any() or all(v is not None for v in vals):
+                return arr
+        except (TypeError, ValueError):
+            pass
+        arr = numpy.empty(len(vals), dtype=object)
+        for ind, v in enumerate(vals):
+            arr[ind] = v
+        return arr
+
+    def flatten(self, data):
+        """Pull the leaf values of a nested dict into an array.
+
+        Args:
+            data (dict): Nested dict that includes all keys of the schema.
+
+        Returns:
+            numpy.ndarray: Leaf values in the order of the schema.
+        """
+        return self.stack(self.gather(data))
+
+    def add(self, data):
+        """Add the leaf values of a nested dict to those of the tree.
+
+        Note:
+            Follows the element-wise convention of the recursive dict
+            addition this replaces: a leaf value of None is replaced by the
+            value being added to it.
+
+        Args:
+            data (dict): Nested dict that includes all keys of the schema.
+
+        Returns:
+            KeyValTree: The updated tree.
+        """
+        vals = self.gather(data)
+        # Integer values remain integers only when added to other integers
+        if self.int_inds:
+            self.int_inds = [ind for ind in self.int_inds if isinstance(
+                vals[ind], (int, numpy.integer))]
+        arr = self.stack(vals)
+        if self.values.dtype != object and arr.dtype != object and \
+                self.values.shape == arr.shape:
+            self.values += arr
+        else:
+            arr = numpy.empty(len(vals), dtype=object)
+            for ind, (v1, v2) in enumerate(zip(self.leaf_values(), vals)):
+                arr[ind] = copy.deepcopy(v2) if v1 is None else v1 + v2
+            self.values = arr
+        return self
+
+    def leaf_values(self):
+        """List the tree's leaf values as they are stored in the nested dict.
+
+        Returns:
+            list: Leaf values; floats (or integers, where all added values were
+                integers) when the tree's values are one-dimensional and
+                numeric, otherwise numpy arrays (or the original object array
+                elements).
+        """
+        if self.values.ndim == 1 and self.values.dtype != object:
+            vals = self.values.tolist()
+            for ind in self.int_inds:
+                vals[ind] = int(vals[ind])
+        else:
+            vals = list(self.values)
+        return vals
+
+    def to_dict(self):
+        """Rebuild the nested dict from the tree's schema and values.
+
+        Returns:
+            dict: Nested dict with the tree's key structure and leaf values
+                (see leaf_values).
+        """
+        return self.build_branch(self.schema, iter(self.leaf_values()))
+
+    @staticmethod
+    def build_branch(schema, vals):
+        """Rebuild a nested dict branch from its schema and leaf values.
+
+        Args:
+            schema (tuple): Schema of the branch (see compile_schema).
+            vals (iterator): Leaf values, starting with those of the branch.
+
+        Returns:
+            dict: Nested dict branch with its keys in their original order.
+        """
+        keys, leaf_keys, _, branches = schema
+        data = dict(zip(leaf_keys, vals))
+        for k, branch in branches:
+            data[k] = KeyValTree.build_branch(branch, vals)
+        if list(data.keys()) != keys:
+            data = {k: data[k] for k in keys}
+        return data
+
+
+class MsegKey(tuple):
+    """Contributing microsegment key chain with named fields.
+
+    Microsegment key chains are stored in measure competition data as the
+    string representation of a tuple, e.g., "('primary', 'AIA_CZ1',
+    'single family home', 'electricity', 'cooling', 'supply', 'ASHP',
+    'existing')"; heating, cooling, and secondary heating key chains include
+    the technology type ('supply' or 'demand') while others do not. Instances
+    behave as the original tuple and add named access to its fields.
+    """
+
+    # Residential building types
+    res_bldg_types = ("single family home", "multi family home", "mobile home")
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def from_str(key_str):
+        """Parse (once per unique string) a microsegment key chain string.
+
+        Args:
+            key_str (str): String representation of a key chain tuple.
+
+        Returns:
+            MsegKey: Parsed key chain; repeated calls with the same string
+                return the same object.
+        """
+        return MsegKey(literal_eval(key_str))
+
+    @property
+    def mseg_type(self):
+        """Microsegment type ('primary' or 'secondary')."""
+        return self[0]
+
+    @property
+    def region(self):
+        """Climate zone or region."""
+        return self[1]
+
+    @property
+    def bldg_type(self):
+        """Building type."""
+        return self[2]
+
+    @property
+    def fuel_type(self):
+        """Fuel type."""
+        return self[3]
+
+    @property
+    def end_use(self):
+        """End use."""
+        return self[4]
+
+    @property
+    def tech_type(self):
+        """Technology type ('supply' or 'demand'), or None if not given."""
+        return self[5] if len(self) == 8 else None
+
+    @property
+    def technology(self):
+        """Technology."""
+        return self[-2]
+
+    @property
+    def structure_type(self):
+        """Structure type ('new' or 'existing')."""
+        return self[-1]
+
+    @property
+    def residential(self):
+        """Flag for whether the building type is residential."""
+        return self[2] in MsegKey.res_bldg_types
+
+
+class StageProfiler:
+    """Record wall time, call counts, and peak memory for the stages of a Scout step.
+
+    Stages are timed by wrapping code in a `stage()` context; counters record the number of
+    items (e.g., measures, packages, files) handled along the way. When the profiler is
+    disabled, `stage()` returns a shared no-op context and `count()` returns immediately, such
+    that instrumented code incurs negligible overhead.
+    """
+
+    # No-op context shared across all stages when profiling is disabled
+    null_stage = nullcontext()
+
+    def __init__(self, enabled=False):
+        self.reset(enabled)
+
+    def reset(self, enabled=False):
+        """Clear all recorded stages and counts.
+
+        Args:
+            enabled (bool): Flag for whether to record stages going forward.
+        """
+        self.enabled = enabled
+        self.stages = {}
+        self.counts = {}
+        self.start_time = time.perf_counter()
+
+    def stage(self, name, item=None):
+        """Time a stage of the calculations.
+
+        Args:
+            name (str): Name of the stage.
+            item (str): Optional name of the item (e.g., measure) the stage is run for; when
+                given, the wall time for the item is also recorded separately.
+
+        Returns:
+            Context manager that records the wall time and peak memory of its block.
+        """
+        if not self.enabled:
+            return self.null_stage
+        return self.timed_stage(name, item)
+
+    @contextmanager
+    def timed_stage(self, name, item=None):
+        """Record the wall time and peak memory of a block of code (see stage())."""
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage(name, time.perf_counter() - start_time, item=item)
+
+    def add_stage(self, name, wall_time, calls=1, max_wall_time=None, peak_memory=None,
+                  item=None):
+        """Add timing data to the record for a stage.
+
+        Args:
+            name (str): Name of the stage.
+            wall_time (float): Wall time (s) to add to the stage total.
+            calls (int): Number of stage calls the wall time covers.
+            max_wall_time (float): Longest wall time (s) of a single call; defaults to
+                wall_time.
+            peak_memory (float): Peak resident memory (MB); defaults to the peak memory of the
+                current process to date.
+            item (str): Optional name of the item the stage was run for.
+        """
+        if max_wall_time is None:
+            max_wall_time = wall_time
+        if peak_memory is None:
+            peak_memory = StageProfiler.peak_memory(children=False)
+        rec = self.stages.setdefault(name, {
+            "calls": 0, "wall_time": 0.0, "max_wall_time": 0.0, "peak_memory": None})
+        rec["calls"] += calls
+        rec["wall_time"] += wall_time
+        rec["max_wall_time"] = max(rec["max_wall_time"], max_wall_time)
+        if peak_memory is not None:
+            rec["peak_memory"] = max(rec["peak_memory"] or 0, peak_memory)
+        if item is not None:
+            items = rec.setdefault("items", {})
+            items[item] = items.get(item, 0) + wall_time
+
+    def count(self, name, n=1):
+        """Increment a counter.
+
+        Args:
+            name (str): Name of the counter.
+            n (int): Amount to increment the counter by.
+        """
+        if not self.enabled:
+            return
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    def stats(self):
+        """Return the recorded stages and counts (e.g., to send from a worker process).
+
+        Returns:
+            dict: Recorded stages and counts.
+        """
+        return {"stages": self.stages, "counts": self.counts}
+
+    def merge(self, stats):
+        """Add stages and counts recorded by another profiler (e.g., in a worker process).
+
+        Args:
+            stats (dict): Recorded stages and counts (see stats()).
+        """
+        if not self.enabled or not stats:
+            return
+        for name, rec in stats["stages"].items():
+            self.add_stage(
+                name, rec["wall_time"], calls=rec["calls"], max_wall_time=rec["max_wall_time"],
+                peak_memory=rec["peak_memory"])
+            for item, wall_time in rec.get("items", {}).items():
+                items = self.stages[name].setdefault("items", {})
+                items[item] = items.get(item, 0) + wall_time
+        for name, n in stats["counts"].items():
+            self.count(name, n)
+
+    def report(self):
+        """Summarize the recorded stages and counts.
+
+        Returns:
+            dict: Total wall time (s) and peak memory (MB) since the profiler was reset,
+                along with the recorded stages and counts.
+        """
+        return {
+            "wall_time": time.perf_counter() - self.start_time,
+            "peak_memory": StageProfiler.peak_memory(),
+            "stages": self.stages,
+            "counts": self.counts}
+
+    def write(self, filepath: Path):
+        """Write the profiler report to a JSON file and a CSV file of stage totals.
+
+        Args:
+            filepath (Path): Path of the JSON report; the CSV file is written alongside it
+                with the same name and a .csv suffix.
+        """
+        report = self.report()
+        JsonIO.dump_json(report, filepath)
+        with open(filepath.with_suffix(".csv"), "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["stage", "calls", "wall_time", "max_wall_time", "peak_memory"])
+            for name, rec in report["stages"].items():
+                writer.writerow([name, rec["calls"], rec["wall_time"], rec["max_wall_time"],
+                                 rec["peak_memory"]])
+            writer.writerow(["total", "", report["wall_time"], "", report["peak_memory"]])
+
+    @staticmethod
+    def peak_memory(children=True):
+        """Find the peak resident memory of the current process and, optionally, its children.
+
+        Args:
+            children (bool): Flag for whether to include terminated child processes.
+
+        Returns:
+            float: peak resident memory (MB), or None if it cannot be determined
+        """
+        if resource is None:
+            return None
+        whos = [resource.RUSAGE_SELF]
+        if children:
+            whos.append(resource.RUSAGE_CHILDREN)
+        peak = max(resource.getrusage(who).ru_maxrss for who in whos)
+        # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+        if sys.platform == "darwin":
+            return peak / 1024 ** 2
+        return peak / 1024
+
+
 class PrintFormat:
     """Class for customizing print messages."""
 
@@ -84,8 +84,14 @@ class TestConfig(unittest.TestCase, Utils):
             "tsv_power_agg": None,
             "tsv_average_days": None,
             "sect_shapes": False,
+            "sect_shapes_json": False,
             "rp_persist": False,
             "verbose": False,
+            "workers": 1,
+            "comp_data_format": "pkl.gz",
+            "nsamples": 100,
+            "rand_seed": None,
+            "profile": False,
             "health_costs": False,
             "split_fuel": False,
             "no_scnd_lgt": False,
@@ -125,7 +131,10 @@ class TestConfig(unittest.TestCase, Utils):
             "report_cfs": False,
             "no_comp": False,
             "high_res_comp": False,
-            "write_elec_conv_fracs": False
+            "write_elec_conv_fracs": False,
+            "profile": False,
+            "parallel_schemes": False,
+            "workers": 1
         },
     }
 
@@ -339,6 +348,16 @@ class TestConfig(unittest.TestCase, Utils):
         expected_err = ("`tsv_average_days` must be specified if `tsv_power_agg` is 'average'.")
         self.assertTrue(expected_err in actual_err, f"Expected {expected_err} in {actual_err}")
 
+        cli_args = ["--workers", "0"]
+        actual_err = self._get_cfg_args_err_message("ecm_prep", cli_args)
+        expected_err = "The `workers` argument must be an integer of 1 or greater."
+        self.assertTrue(expected_err in actual_err, f"Expected {expected_err} in {actual_err}")
+
+        cli_args = ["--nsamples", "1"]
+        actual_err = self._get_cfg_args_err_message("ecm_prep", cli_args)
+        expected_err = "The `nsamples` argument must be an integer of 2 or greater."
+        self.assertTrue(expected_err in actual_err, f"Expected {expected_err} in {actual_err}")
+
         cli_args = ["--retrofit_type", "increasing",
                     "--retrofit_multiplier", "1"]
         actual_err = self._get_cfg_args_err_message("ecm_prep", cli_args)
@@ -374,8 +393,14 @@ class TestECMPrepArgsTranslate(unittest.TestCase, Utils):
         "tsv_power_agg": None,
         "tsv_average_days": None,
         "sect_shapes": False,
+        "sect_shapes_json": False,
         "rp_persist": False,
         "verbose": False,
+        "workers": 1,
+        "comp_data_format": "pkl.gz",
+        "nsamples": 100,
+        "rand_seed": None,
+        "profile": False,
         "health_costs": False,
         "split_fuel": False,
         "no_scnd_lgt": False,
@@ -4,6 +4,7 @@
 
 # Import code to be tested
 from scout import com_mseg as cm
+from scout.utils import DataIndex
 
 # Import needed packages
 import unittest
@@ -685,6 +686,15 @@ class CommonUnitTest(unittest.TestCase):
         dtype=[('ENDUSE', '<U50'), ('CDIV', '<i4'), ('BLDG', '<i4'),
                ('WIND_SOL', '<f8'), ('PEOPLE', '<f8'), ('GRND', '<f8')])
 
+    # Index the sample commercial building, service demand, and thermal
+    # loads data arrays
+    sample_db_index = DataIndex(
+        sample_db_array, cm.db_index_fields, sort_rows=True)
+    sample_sd_index = DataIndex(
+        sample_sd_array, cm.sd_index_fields, sort_rows=True)
+    sample_tl_index = DataIndex(
+        sample_tl_array, cm.load_index_fields, sort_rows=True)
+
     # Define list outputs from the key conversion function
     sample_keys_converted = [[9, 10, 1, 2, 'GRND'],
                              [1, 5, 2, 1, 'PEOPLE'],
@@ -898,13 +908,13 @@ class PercentageCalculationTest(CommonUnitTest):
     @classmethod
     def setUpClass(self):  # so that set up is run once for the entire class
         (self.a_abs, self.a_pct, self.b) = cm.sd_mseg_percent(
-            self.sample_sd_array, self.selections[0], self.years)
+            self.sample_sd_index, self.selections[0], self.years)
         (self.c_abs, self.c_pct, self.d) = cm.sd_mseg_percent(
-            self.sample_sd_array, self.selections[1], self.years)
+            self.sample_sd_index, self.selections[1], self.years)
         (self.e_abs, self.e_pct, self.f) = cm.sd_mseg_percent(
-            self.sample_sd_array, self.selections[2], self.years)
+            self.sample_sd_index, self.selections[2], self.years)
         (self.g_abs, self.g_pct, self.h) = cm.sd_mseg_percent(
-            self.sample_sd_array, self.selections[3], self.years)
+            self.sample_sd_index, self.selections[3], self.years)
 
     # Test technology type name capture/identification
     def test_service_demand_name_identification(self):
@@ -964,7 +974,7 @@ class CommercialDataSelectionTest(CommonUnitTest):
                 select_indices = catg_code
 
             np.testing.assert_array_equal(
-                cm.catg_data_selector(self.sample_db_array,
+                cm.catg_data_selector(self.sample_db_index,
                                       select_indices,
                                       correct_label_str,
                                       self.years),
@@ -1018,9 +1028,9 @@ class DataToFinalDictAtLeafNodeRestructuringTest(CommonUnitTest):
     # Test each if/else data condition in the data_handler function separately
     def test_restructuring_cases_with_thermal_loads(self):
         for i in [0, 1]:
-            self.dict_check(cm.data_handler(self.sample_db_array,
-                                            self.sample_sd_array,
-                                            self.sample_tl_array,
+            self.dict_check(cm.data_handler(self.sample_db_index,
+                                            self.sample_sd_index,
+                                            self.sample_tl_index,
                                             self.sample_keys[i],
                                             self.sd_end_uses,
                                             self.years),
@@ -1028,9 +1038,9 @@ class DataToFinalDictAtLeafNodeRestructuringTest(CommonUnitTest):
 
     def test_restructuring_cases_with_miscellaneous_electric_loads(self):
         for i in [2, 3]:
-            self.dict_check(cm.data_handler(self.sample_db_array,
-                                            self.sample_sd_array,
-                                            self.sample_tl_array,
+            self.dict_check(cm.data_handler(self.sample_db_index,
+                                            self.sample_sd_index,
+                                            self.sample_tl_index,
                                             self.sample_keys[i],
                                             self.sd_end_uses,
                                             self.years),
@@ -1038,9 +1048,9 @@ class DataToFinalDictAtLeafNodeRestructuringTest(CommonUnitTest):
 
     def test_restructuring_cases_with_service_demand_data(self):
         for i in [4, 5, 6]:
-            self.dict_check(cm.data_handler(self.sample_db_array,
-                                            self.sample_sd_array,
-                                            self.sample_tl_array,
+            self.dict_check(cm.data_handler(self.sample_db_index,
+                                            self.sample_sd_index,
+                                            self.sample_tl_index,
                                             self.sample_keys[i],
                                             self.sd_end_uses,
                                             self.years),
@@ -1048,9 +1058,9 @@ class DataToFinalDictAtLeafNodeRestructuringTest(CommonUnitTest):
 
     def test_restructuring_all_other_cases(self):
         for i in [7, 8]:
-            self.dict_check(cm.data_handler(self.sample_db_array,
-                                            self.sample_sd_array,
-                                            self.sample_tl_array,
+            self.dict_check(cm.data_handler(self.sample_db_index,
+                                            self.sample_sd_index,
+                                            self.sample_tl_index,
                                             self.sample_keys[i],
                                             self.sd_end_uses,
                                             self.years),
@@ -1058,9 +1068,9 @@ class DataToFinalDictAtLeafNodeRestructuringTest(CommonUnitTest):
 
     def test_restructuring_square_footage_data(self):
         for i in [9, 10]:
-            self.dict_check(cm.data_handler(self.sample_db_array,
-                                            self.sample_sd_array,
-                                            self.sample_tl_array,
+            self.dict_check(cm.data_handler(self.sample_db_index,
+                                            self.sample_sd_index,
+                                            self.sample_tl_index,
                                             self.sample_keys[i],
                                             self.sd_end_uses,
                                             self.years),
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+
+""" Tests for preparing measures """
+
+# Import code to be tested
+from scout.ecm_prep import ECMPrepHelper, ECMPrep, Measure
+from scout.ecm_prep_vars import MeasureVars
+from scout.utils import JsonIO
+
+# Import needed packages
+import unittest
+import numpy
+import copy
+import os
+import json
+import tempfile
+from argparse import Namespace
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+
+class SampledMeasure(Measure):
+    """Measure whose markets are samples drawn from a cost distribution.
+
+    Stands in for a full measure definition when preparing measures, such that
+    the sampling of input distributions can be checked without baseline data.
+    """
+
+    def __init__(self, base_dir, handyvars, handyfiles, opts, **kwargs):
+        self.name, self.fail = kwargs["name"], kwargs.get("fail")
+        self.handyvars = MeasureVars(handyvars)
+        self.energy_efficiency = None
+
+    def check_meas_inputs(self):
+        if self.fail == "check_meas_inputs":
+            raise ValueError(f"Invalid inputs for ECM '{self.name}'")
+
+    def fill_mkts(self, msegs, msegs_cpl, convert_data, tsv_data, opts, ctrb_ms_pkg_prep,
+                  tsv_data_nonfs):
+        if self.fail == "fill_mkts":
+            raise ValueError(f"Invalid markets for ECM '{self.name}'")
+        rnd_gen = numpy.random.default_rng(self.gen_rand_seed())
+        self.markets = self.rand_list_gen(["normal", 10, 2], self.handyvars.nsamples, rnd_gen)
+
+
+def prep_sampled_measures(measures, workers, rand_seed=1):
+    """Prepare sampled measures, returning the measures and the names of skipped measures."""
+    handyvars = SimpleNamespace(nsamples=5, rand_seed=rand_seed, skipped_ecms=[])
+    with mock.patch("scout.ecm_prep.Measure", SampledMeasure):
+        prepped = ECMPrep.prepare_measures(
+            measures, None, None, None, handyvars, None, None, None, None,
+            Namespace(workers=workers, verbose=False), [], None)
+    return prepped, handyvars.skipped_ecms
+
+
+class FileHashTest(unittest.TestCase):
+    """Test the reuse of input file hashes within and across runs.
+
+    Verify that files are only read again to find their hash when their
+    size or modification time change, including when the hashes found in
+    a previous run are imported from file.
+    """
+
+    def setUp(self):
+        self.hashes = mock.patch.dict(ECMPrepHelper.file_hashes, clear=True)
+        self.hashes.start()
+        self.addCleanup(self.hashes.stop)
+
+    def test_file_hashes_persist(self):
+        """Test for reuse of hashes of unchanged files in a later run."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_in, store = Path(tmp_dir, "data.json"), Path(tmp_dir, "file_hashes.json")
+            data_in.write_text('{"a": 1}')
+            digest = ECMPrepHelper.file_hash(data_in)
+            ECMPrepHelper.dump_file_hashes(store)
+            # A later run reuses the stored hash without reading the file
+            ECMPrepHelper.file_hashes.clear()
+            ECMPrepHelper.load_file_hashes(store)
+            with mock.patch("builtins.open", side_effect=AssertionError):
+                self.assertEqual(ECMPrepHelper.file_hash(data_in), digest)
+            # A changed file is hashed again, and only its latest hash is stored
+            data_in.write_text('{"a": 2}')
+            os.utime(data_in, ns=(0, 0))
+            self.assertNotEqual(ECMPrepHelper.file_hash(data_in), digest)
+            ECMPrepHelper.dump_file_hashes(store)
+            ECMPrepHelper.file_hashes.clear()
+            ECMPrepHelper.load_file_hashes(store)
+            self.assertEqual([k[1:] for k in ECMPrepHelper.file_hashes], [(8, 0)])
+            # Missing or unreadable stores are ignored
+            store.write_text("{")
+            ECMPrepHelper.load_file_hashes(store)
+            ECMPrepHelper.load_file_hashes(Path(tmp_dir, "missing.json"))
+
+
+class RegionDataTest(unittest.TestCase):
+    """Test the loading of baseline data for a subset of regions.
+
+    Verify that measures' regions are expanded and combined, that baseline
+    data are only read in full when the original file or the years that
+    internal gains are aggregated across change, and that only the regions
+    of interest are returned.
+    """
+
+    data = {"AIA_CZ1": {"a": 1}, "AIA_CZ2": {"a": 2}, "AIA_CZ3": {"a": 3}}
+
+    def setUp(self):
+        self.hashes = mock.patch.dict(ECMPrepHelper.file_hashes, clear=True)
+        self.hashes.start()
+        self.addCleanup(self.hashes.stop)
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.data_in = Path(self.tmp_dir.name, "msegs.json")
+        self.store_dir = Path(self.tmp_dir.name, "msegs_store")
+        self.write_data(self.data, 1)
+
+    def write_data(self, data, mtime_ns):
+        # Write baseline data with a given modification time
+        self.data_in.write_text(json.dumps(data))
+        os.utime(self.data_in, ns=(mtime_ns, mtime_ns))
+
+    def load(self, regions=None, years_ig=None):
+        # Load baseline data, returning the data and whether the original file was read
+        with mock.patch.object(JsonIO, "load_json", wraps=JsonIO.load_json) as load_json:
+            data = ECMPrepHelper.load_region_data(
+                self.data_in, self.store_dir, regions, years_ig)
+        return data, any(x.args[0] == self.data_in for x in load_json.call_args_list)
+
+    def test_find_meas_regions(self):
+        """Test for combination of the regions that measures apply to."""
+        handyvars = SimpleNamespace(warm_cold_regs={"warm climates": ["AIA_CZ4", "AIA_CZ5"]})
+        self.assertEqual(ECMPrepHelper.find_meas_regions([
+            {"climate_zone": "AIA_CZ1"}, {"climate_zone": ["AIA_CZ2", "warm climates"]}],
+            handyvars), {"AIA_CZ1", "AIA_CZ2", "AIA_CZ4", "AIA_CZ5"})
+        for cz in [None, "all", ["AIA_CZ1", "all"]]:
+            with self.subTest(climate_zone=cz):
+                self.assertIsNone(ECMPrepHelper.find_meas_regions(
+                    [{"climate_zone": "AIA_CZ1"}, {"climate_zone": cz}], handyvars))
+
+    def test_partial_load(self):
+        """Test for loading of only the regions of interest from the store."""
+        self.assertEqual(self.load({"AIA_CZ2"}), ({"AIA_CZ2": {"a": 2}}, True))
+        self.assertEqual(self.load({"AIA_CZ1", "AIA_CZ3"}), (
+            {"AIA_CZ1": {"a": 1}, "AIA_CZ3": {"a": 3}}, False))
+        self.assertEqual(self.load(), (self.data, False))
+
+    def test_stamp_change(self):
+        """Test for updates to the store when the original file changes."""
+        self.load()
+        # Touched but unchanged files are hashed again but not read in full
+        self.write_data(self.data, 2)
+        self.assertEqual(self.load({"AIA_CZ1"}), ({"AIA_CZ1": {"a": 1}}, False))
+        self.assertEqual(JsonIO.load_json(
+            self.store_dir / "msegs" / "index.json")["stamp"][1], 2)
+        # Changed files are read in full, replacing the stored data
+        self.write_data({"AIA_CZ1": {"a": 4}}, 3)
+        self.assertEqual(self.load(), ({"AIA_CZ1": {"a": 4}}, True))
+        self.assertEqual(self.load(), ({"AIA_CZ1": {"a": 4}}, False))
+        self.assertEqual(len([x for x in (self.store_dir / "msegs").iterdir() if x.is_dir()]), 1)
+
+    def test_years_ig(self):
+        """Test for storage of internal gains data by the years aggregated across."""
+        def add_ig(data, years):
+            return {k: dict(v, ig=years) for k, v in data.items()}
+        with mock.patch.object(ECMPrepHelper, "add_internal_gains_aggregate", add_ig):
+            for years, read in [(["2024"], True), (["2024", "2025"], True), (["2024"], False),
+                                (None, True), (["2024", "2025"], False)]:
+                with self.subTest(years=years):
+                    self.assertEqual(self.load({"AIA_CZ1"}, years), (
+                        {"AIA_CZ1": {"a": 1, **({"ig": years} if years else {})}}, read))
+
+
+class FinBaseCplTest(unittest.TestCase):
+    """Test the finalized baseline cost, performance, and lifetime data.
+
+    Verify that the data are finalized once per microsegment and shared by
+    all measures that apply to it, and that errors found in the data are
+    shared along with any performance values corrected before the error.
+    """
+
+    mskeys = ("primary", "AIA_CZ1", "single family home", "electricity", "lighting",
+              "supply", "LED", "new")
+
+    def setUp(self):
+        # Two measures that share global variables
+        handyvars = SimpleNamespace(
+            aeo_years=["2024", "2025"], zero_cost_tech=[], base_cpl_fin={})
+        self.measures = [object.__new__(Measure) for n in range(2)]
+        for m in self.measures:
+            m.handyvars = handyvars
+
+    def base_cpl(self, cost, perf, life):
+        # Baseline cost, performance, and lifetime data by year
+        return {"installed cost": {"typical": dict(zip(["2024", "2025"], cost)),
+                                   "units": "$/unit"},
+                "performance": {"typical": dict(zip(["2024", "2025"], perf)), "units": "lm/W"},
+                "lifetime": {"average": dict(zip(["2024", "2025"], life))}}
+
+    def test_shared(self):
+        """Test for identical finalized data across measures."""
+        base_cpl = self.base_cpl([10, 20], ["NA", 90], [5, 5])
+        fin = [m.fin_base_cpl(base_cpl, self.mskeys, "residential") for m in self.measures]
+        self.assertIs(fin[0], fin[1])
+        self.assertIsNone(fin[0]["error"])
+        self.assertEqual(fin[0]["performance"], {"2024": "NA", "2025": 90})
+        self.assertEqual(fin[0]["performance (final)"], {"2024": 90, "2025": 90})
+        self.assertEqual(fin[0]["installed cost"], {"2024": 10, "2025": 20})
+        # Residential lighting lifetimes are adjusted for hours of use
+        self.assertEqual(fin[0]["lifetime"], {"2024": 40, "2025": 40})
+
+    def test_errors(self):
+        """Test for errors shared across measures with their messages."""
+        for cost, life, perf_fin in [
+                (["NA", "NA"], [5, 5], None), ([10, 20], [0, "NA"], {"2024": 90, "2025": 90})]:
+            with self.subTest(cost=cost, life=life):
+                self.measures[0].handyvars.base_cpl_fin.clear()
+                base_cpl = self.base_cpl(cost, ["NA", 90], life)
+                fin = [m.fin_base_cpl(base_cpl, self.mskeys, "residential")
+                       for m in self.measures]
+                self.assertIs(fin[0], fin[1])
+                self.assertIsInstance(fin[0]["error"], ValueError)
+                # Performance values corrected before the error was found are kept
+                self.assertEqual(fin[0].get("performance (final)"), perf_fin)
+                self.assertNotIn("lifetime", fin[0])
+        # Errors are raised again with their message
+        with self.assertRaisesRegex(ValueError, "max"):
+            self.measures[0].handyvars.base_cpl_fin.clear()
+            fin = self.measures[0].fin_base_cpl(
+                self.base_cpl(["NA", "NA"], ["NA", 90], [5, 5]), self.mskeys, "residential")
+            raise fin["error"].with_traceback(fin["error traceback"])
+
+
+class SamplingTest(unittest.TestCase):
+    """Test the sampling of probability distributions on measure inputs.
+
+    Verify that samples drawn for a measure depend only on the user-specified
+    seed and the measure name, and not on the order in which measures are
+    prepared or the number of workers that prepare them.
+    """
+
+    measures = [{"name": "ECM A"}, {"name": "ECM B"}, {"name": "ECM C"}]
+
+    def samples(self, measures, workers, rand_seed=1):
+        # Samples drawn for each prepared measure, by measure name
+        return {m.name: m.markets for m in prep_sampled_measures(
+            measures, workers, rand_seed)[0]}
+
+    def test_seed_reproducible(self):
+        """Test for identical samples across measure orders and worker counts."""
+        samples = self.samples(self.measures, 1)
+        for measures, workers in [(self.measures[::-1], 1), (self.measures, 2),
+                                  (self.measures[::-1], 3), (self.measures[1:], 2)]:
+            with self.subTest(measures=[m["name"] for m in measures], workers=workers):
+                for name, samples_m in self.samples(measures, workers).items():
+                    numpy.testing.assert_array_equal(samples_m, samples[name])
+        # Samples differ across measures and seeds
+        self.assertFalse(numpy.array_equal(samples["ECM A"], samples["ECM B"]))
+        self.assertFalse(numpy.array_equal(
+            samples["ECM A"], self.samples(self.measures, 1, rand_seed=2)["ECM A"]))
+        # Samples are drawn independently of the global random state
+        numpy.random.seed(0)
+        numpy.testing.assert_array_equal(
+            self.samples(self.measures, 1)["ECM A"], samples["ECM A"])
+
+
+class PrepareMeasuresParallelTest(unittest.TestCase):
+    """Test the preparation of measures across worker processes.
+
+    Verify that measures prepared across workers match those prepared
+    serially, in the same order, and that measures that raise errors in a
+    worker are skipped and recorded as in serial preparation.
+    """
+
+    measures = [{"name": "ECM A"}, {"name": "ECM B", "fail": "fill_mkts"}, {"name": "ECM C"},
+                {"name": "ECM D", "fail": "check_meas_inputs"}, {"name": "ECM E"}]
+
+    def test_workers(self):
+        """Test for identical prepared measures and skipped measures with 2 workers."""
+        serial, skipped_serial = prep_sampled_measures(self.measures, 1)
+        parallel, skipped_parallel = prep_sampled_measures(self.measures, 2)
+        self.assertEqual([m.name for m in parallel], ["ECM A", "ECM C", "ECM E"])
+        self.assertEqual([m.name for m in serial], [m.name for m in parallel])
+        for m_s, m_p in zip(serial, parallel):
+            numpy.testing.assert_array_equal(m_s.markets, m_p.markets)
+            # Prepared measures are re-attached to the parent's global variables
+            self.assertIsNotNone(m_p.handyvars.shared)
+        self.assertEqual(skipped_parallel, ["ECM B", "ECM D"])
+        self.assertEqual(sorted(skipped_serial), skipped_parallel)
+
+
+class MeasureVarsTest(unittest.TestCase):
+    """Test the per-measure views onto the global variables.
+
+    Verify that measures share the global variable tables, while global
+    variables that measures add to in place with measure-specific data (see
+    MeasureVars.measure_attrs) and attributes that measures assign are kept
+    separate for each measure, including for copies of a measure.
+    """
+
+    def test_isolation(self):
+        """Test for shared tables and separate measure-specific data across measures."""
+        shared = SimpleNamespace(
+            aeo_years=["2024", "2025"], base_cpl_fin={}, save_shp_warn=[],
+            tsv_hourly_price={"EMM_1": None}, tsv_hourly_emissions={"EMM_1": None},
+            tsv_hourly_lafs={"EMM_1": {"residential": {}}})
+        views = [MeasureVars(shared), MeasureVars(shared)]
+        views.append(copy.deepcopy(views[0]))
+        # Measures add measure-specific data to their own copies
+        views[0].save_shp_warn.append("warning")
+        views[0].tsv_hourly_price["EMM_1"] = {"2024": numpy.ones(8760)}
+        views[0].tsv_hourly_emissions["EMM_1"] = {"2024": numpy.zeros(8760)}
+        views[0].tsv_hourly_lafs["EMM_1"]["residential"]["single family home"] = {}
+        views[0].nsamples = 10
+        for view in [shared] + views[1:]:
+            self.assertEqual(view.save_shp_warn, [])
+            self.assertEqual(view.tsv_hourly_price, {"EMM_1": None})
+            self.assertEqual(view.tsv_hourly_emissions, {"EMM_1": None})
+            self.assertEqual(view.tsv_hourly_lafs, {"EMM_1": {"residential": {}}})
+            self.assertFalse(hasattr(view, "nsamples"))
+        # Global variable tables are not copied
+        for view in views:
+            self.assertIs(view.shared, shared)
+            self.assertIs(view.aeo_years, shared.aeo_years)
+            self.assertIs(view.base_cpl_fin, shared.base_cpl_fin)
+        # Views onto views point to the same global variables
+        self.assertIs(MeasureVars(views[0]).shared, shared)
+
+
+# Offer external code execution (include all lines below this point in all
+# test files)
+def main():
+    """Trigger default behavior of running all test fixtures in the file."""
+    unittest.main()
+
+
+if __name__ == "__main__":
+    main()
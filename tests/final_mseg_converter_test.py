@@ -16,6 +16,117 @@ import copy
 import itertools
 
 
+def merge_sum_legacy(base_dict, add_dict, cd_num, reg_name, res_convert_array,
+                     com_convert_array, cpl, flag_map_dat, first_cd_flag, ak_hi_res,
+                     cd_to_cz_factor=0, bldg_flag=None, fuel_flag=None, eu_flag=None,
+                     tech_typ_flag=None, tech_flag=None, stock_energy_flag=None,
+                     key_list=None):
+    """Convert one census division of data to a custom region with the former
+    'merge_sum' (copied without changes)."""
+    # Initialize key_list with an empty array prior to looping through the
+    # microsegments database structure.
+    if key_list is None:
+        key_list = []
+
+    import numbers
+    import warnings
+    import copy
+
+    def _is_number(x):
+        return isinstance(x, numbers.Number)
+
+    def _to_list_of_lists(lst):
+        """Wrap flat list -> list-of-lists, keep list-of-lists unchanged."""
+        if lst and _is_number(lst[0]):
+            return [lst]
+        return lst
+
+    def _pad_with_zeros(a, b):
+        """
+        Pad the shorter of two *lists of lists* with zero-vectors so that
+        their lengths match. Keeps arithmetic aligned.
+        """
+        max_len = max(len(a), len(b))
+        elem_len = len(a[0]) if a else len(b[0]) if b else 2
+        zero_vec = [0.0] * elem_len
+        a.extend(copy.deepcopy(zero_vec) for _ in range(max_len - len(a)))
+        b.extend(copy.deepcopy(zero_vec) for _ in range(max_len - len(b)))
+        return a, b
+
+    # Loop through both dicts to find all keys
+    for (k, i) in sorted(base_dict.items()):
+        if k not in add_dict:
+            warnings.warn(f"Key '{k}' not found in add_dict – skipping")
+            continue
+        k2, i2 = k, add_dict[k]
+        # If we have reached a level with keys "stock" or "energy", update the flag.
+        if k in ("stock", "energy"):
+            current_stock_energy_flag = k
+        else:
+            current_stock_energy_flag = stock_energy_flag
+        # Compare the top level/parent keys of the section of the dict
+        # currently being parsed to ensure that both the base_dict
+        # (census division basis) and add_dict (custom region basis)
+        # are proceeding with the same structure; when cost, performance,
+        # and lifetime data are being processed, skip the "unspecified"
+        # building type and the "other" end use where it appears as
+        # an unmodified zero in certain building and fuel type combinations
+        if not (
+            cpl and (
+                (k == 'other' and not isinstance(i, dict)) or
+                k == 'unspecified')):
+            cd_to_cz_factor, bldg_flag, fuel_flag, eu_flag, tech_typ_flag, tech_flag = \
+                fmc.conversion_flags(
+                    k, i, base_dict, key_list, res_convert_array, com_convert_array,
+                    flag_map_dat, cd_to_cz_factor, bldg_flag, fuel_flag, eu_flag,
+                    tech_typ_flag, tech_flag)
+
+            # Recursively loop through both dicts
+            if isinstance(i, dict):
+                merge_sum_legacy(i, i2, cd_num, reg_name, res_convert_array,
+                                 com_convert_array, cpl, flag_map_dat, first_cd_flag, ak_hi_res,
+                                 cd_to_cz_factor, bldg_flag, fuel_flag, eu_flag,
+                                 tech_typ_flag, tech_flag,
+                                 stock_energy_flag=current_stock_energy_flag,
+                                 key_list=key_list + [k])
+            elif type(base_dict[k]) is not str:
+                # Check whether the conversion array needs to be further keyed
+                # by fuel type and by end use, as is the case when converting to EMM region or
+                # state and using EULP data to disaggregate to those regions; in such cases, the
+                # fuel and end use flags indicate the key values for pulling appropriate data
+                convert_fact = fmc.conversion_factor(
+                    cd_to_cz_factor, cd_num, reg_name, ak_hi_res, bldg_flag, fuel_flag,
+                    eu_flag, tech_flag, current_stock_energy_flag)
+                if isinstance(base_dict[k], list):
+                    base_list = _to_list_of_lists(base_dict[k])
+                    add_list = _to_list_of_lists(add_dict[k2])
+                    base_list, add_list = _pad_with_zeros(base_list, add_list)
+
+                    if first_cd_flag:
+                        base_list = [[v * convert_fact for v in sub]
+                                     for sub in base_list]
+                    else:
+                        base_list = [[b + a * convert_fact for b, a in zip(sub_b, sub_a)]
+                                     for sub_b, sub_a in zip(base_list, add_list)]
+
+                    # restore original shape (flat vs nested)
+                    if _is_number(base_dict[k][0]) if base_dict[k] else False:
+                        base_dict[k] = base_list[0]
+                    else:
+                        base_dict[k] = base_list
+                else:
+                    if first_cd_flag:
+                        base_dict[k] = base_dict[k] * convert_fact
+                    else:
+                        base_dict[k] = base_dict[k] + \
+                                   add_dict[k2] * convert_fact
+
+        elif k != k2:
+            warnings.warn(f"Merge keys do not match: {k} != {k2}")
+
+    return base_dict
+
+
 class CommonUnitTest(unittest.TestCase):
     """ Set up a common unittest.TestCase subclass with data and
     functions common to the tests below """
@@ -411,7 +522,7 @@ class DataRestructuringFunctionTest(CommonUnitTest):
     cd_list = ['new england', 'mid atlantic', 'east north central']
 
     # List the dicts that should be produced from the inputs to the
-    # merge_sum function in the order in which they should be tested
+    # merge_sum_legacy function in the order in which they should be tested
     # (i.e., matching the order of 'census_divisions' and 'climate_zones')
     loutput = [
         {'single family home': {
@@ -487,7 +598,7 @@ class DataRestructuringFunctionTest(CommonUnitTest):
 
     def test_conversion_calculation_for_individual_cz_cd_combinations(self):
         for idx, _ in enumerate(self.census_divisions):
-            # Since the merge_sum function recursively operates on
+            # Since the merge_sum_legacy function recursively operates on
             # 'base_input', make the two required copies to serve as
             # the inputs for testing purposes to ensure that all tests
             # start with the same input data
@@ -495,16 +606,16 @@ class DataRestructuringFunctionTest(CommonUnitTest):
             add_input = copy.deepcopy(self.orig_input)
 
             # Call the function to be tested
-            result = fmc.merge_sum(base_input,
-                                   add_input,
-                                   (idx+1),
-                                   self.climate_zones[idx],
-                                   self.res_cd_cz_array,
-                                   self.com_cd_cz_array,
-                                   self.cpl_bool,
-                                   self.flag_map_dat,
-                                   first_cd_flag="",
-                                   ak_hi_res=None)
+            result = merge_sum_legacy(base_input,
+                                      add_input,
+                                      (idx+1),
+                                      self.climate_zones[idx],
+                                      self.res_cd_cz_array,
+                                      self.com_cd_cz_array,
+                                      self.cpl_bool,
+                                      self.flag_map_dat,
+                                      first_cd_flag="",
+                                      ak_hi_res=None)
 
             self.dict_check(result, self.loutput[idx])
 
@@ -2894,6 +3005,60 @@ class ToClimateZoneConversionTest(CommonUnitTest):
         dict2 = self.test_cpl_output_emm
         self.dict_check(dict1, dict2)
 
+    def clim_converter_legacy(self, input_dict, res_convert_array,
+                              com_convert_array, data_in, reg_list):
+        """Convert the input dict region by region with the former
+        'clim_converter' loop over 'merge_sum' (copied without changes)."""
+        if data_in == '2':
+            cpl_bool = True
+        else:
+            cpl_bool = False
+        converted_dict = {}
+        for reg_name in reg_list:
+            first_cd = list(input_dict.keys())[0]
+            base_dict = copy.deepcopy(input_dict[first_cd])
+            for cdiv_ind, cdiv_name in enumerate(self.cdiv_list):
+                if cdiv_name == first_cd:
+                    first_cd_flag = True
+                else:
+                    first_cd_flag = ""
+                try:
+                    add_dict = copy.deepcopy(input_dict[cdiv_name])
+                except KeyError:
+                    continue
+                base_dict = merge_sum_legacy(
+                    base_dict, add_dict, cdiv_ind, reg_name, res_convert_array,
+                    com_convert_array, cpl_bool, self.flag_map_dat,
+                    first_cd_flag, None, key_list=[])
+            converted_dict.update({reg_name: base_dict})
+        return converted_dict
+
+    # Compare the batched conversion to the former per-region recursive
+    # conversion for each combination of data and region set
+    def test_conversion_matches_legacy(self):
+        for input_dict, arrays, data_in, reg_list in [
+                (self.test_energy_stock_input,
+                 (self.res_cd_cz_array, self.com_cd_cz_array),
+                 self.user_input_nrgstk, self.aia_list),
+                (self.test_energy_stock_input,
+                 (self.res_cd_cz_array_fuelsplit,
+                  self.com_cd_cz_array_fuelsplit),
+                 self.user_input_nrgstk, self.emm_list),
+                (self.test_cpl_input,
+                 (self.res_cd_cz_wtavg_array, self.com_cd_cz_wtavg_array),
+                 self.user_input_cpl, self.aia_list),
+                (self.test_cpl_input,
+                 (self.res_cd_cz_wtavg_array_fuelsplit,
+                  self.com_cd_cz_wtavg_array_fuelsplit),
+                 self.user_input_cpl, self.emm_list)]:
+            with self.subTest(data_in=data_in, regions=reg_list[0]):
+                dict1 = fmc.clim_converter(
+                    input_dict, *arrays, data_in, self.flag_map_dat,
+                    reg_list, self.cdiv_list, ak_hi_res=None)
+                dict2 = self.clim_converter_legacy(
+                    input_dict, *arrays, data_in, reg_list)
+                self.dict_check(dict1, dict2)
+
 
 class EnvelopeDataUnitTest(CommonUnitTest):
     """ Set up a CommonUnitTest subclass with additional data to be
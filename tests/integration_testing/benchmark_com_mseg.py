@@ -0,0 +1,90 @@
+from __future__ import annotations
+from pathlib import Path
+from argparse import ArgumentParser
+import itertools
+import sys
+import time
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from scout import com_mseg as cm  # noqa: E402
+from scout.utils import DataIndex  # noqa: E402
+
+
+def synthetic_db_array(n_years: int = 40) -> np.ndarray:
+    """Generate a synthetic array in the format of the commercial DBOUT data
+
+    Args:
+        n_years (int, optional): Number of years of data per category. Defaults to 40.
+
+    Returns:
+        np.ndarray: Structured array with a row for each combination of data label, census
+            division, building type, end use, fuel type, and year
+    """
+    rng = np.random.default_rng(0)
+    labels = ["EndUseConsump", "MiscElConsump", "CMNewFloorSpace", "SurvFloorTotal"]
+    rows = [
+        (lbl, div, bldg, eu, fuel, yr, amt) for (lbl, div, bldg, eu, fuel, yr), amt in zip(
+            itertools.product(labels, range(1, 10), range(1, 12), range(1, 11), range(1, 5),
+                              range(1, n_years + 1)),
+            rng.random(len(labels) * 9 * 11 * 10 * 4 * n_years))]
+
+    return np.array(rows, dtype=[
+        ("Label", "U20"), ("Division", "i4"), ("BldgType", "i4"), ("EndUse", "i4"),
+        ("Fuel", "i4"), ("Year", "i4"), ("Amount", "f8")])
+
+
+def masked_select(db_array: np.ndarray, sel: list, section_label: str) -> np.ndarray:
+    """Select data for a microsegment by masking the full commercial data array
+
+    Args:
+        db_array (np.ndarray): Commercial data array
+        sel (list): Census division, building type, end use, and fuel type codes
+        section_label (str): Data label to select
+
+    Returns:
+        np.ndarray: Selected rows of the array
+    """
+    return db_array[np.all([db_array["Label"] == section_label,
+                            db_array["Division"] == sel[0],
+                            db_array["BldgType"] == sel[1],
+                            db_array["EndUse"] == sel[2],
+                            db_array["Fuel"] == sel[3]], axis=0)]
+
+
+def benchmark(n_sel: int = 500) -> None:
+    """Time masked vs. indexed selection of commercial microsegment data
+
+    Args:
+        n_sel (int, optional): Number of microsegment selections to time. Defaults to 500.
+    """
+    db_array = synthetic_db_array()
+    sels = list(itertools.product(range(1, 10), range(1, 12), range(1, 11), range(1, 5)))[:n_sel]
+
+    start = time.perf_counter()
+    masked = [masked_select(db_array, sel, "EndUseConsump") for sel in sels]
+    masked_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    db_index = DataIndex(db_array, cm.db_index_fields, sort_rows=True)
+    index_time = time.perf_counter() - start
+    start = time.perf_counter()
+    indexed = [db_index.select("EndUseConsump", *sel) for sel in sels]
+    indexed_time = time.perf_counter() - start
+
+    # Ensure both selection approaches yield the same data
+    for x, y in zip(masked, indexed):
+        np.testing.assert_array_equal(x, y)
+
+    print(f"Rows in data array: {len(db_array)}")
+    print(f"Masked selection ({len(sels)} microsegments): {masked_time:.3f} s")
+    print(f"Index build: {index_time:.3f} s")
+    print(f"Indexed selection ({len(sels)} microsegments): {indexed_time:.3f} s")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--n_sel", type=int, default=500,
+                        help="Number of microsegment selections to time")
+    opts = parser.parse_args()
+    benchmark(opts.n_sel)
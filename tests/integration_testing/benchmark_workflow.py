@@ -0,0 +1,218 @@
+from __future__ import annotations
+from pathlib import Path
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+import multiprocessing
+import subprocess
+import shutil
+import sys
+import logging
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from scout import ecm_prep, run  # noqa: E402
+from scout.ecm_prep_args import ecm_args  # noqa: E402
+from scout.config import LogConfig, FilePaths as fp  # noqa: E402
+from scout.utils import JsonIO  # noqa: E402
+
+LogConfig.configure_logging()
+logger = logging.getLogger(__name__)
+
+# Individual ECM definitions used as templates for synthesized ECMs; these span residential and
+# commercial supply-side and demand-side heating/cooling, water heating, lighting, and
+# refrigeration, such that synthesized ECMs exercise all competition routines
+TEMPLATE_ECMS = [
+    "(R) ESTAR HP FS (NG Furnace)",
+    "(R) ENERGY STAR Windows",
+    "(R) ESTAR HPWH TS",
+    "(R) Best Residential LED Lighting",
+    "(C) ESTAR HP FS (RTU, NG Heat)",
+    "(C) 90.1-2022 Windows",
+    "(C) 90.1 Lighting",
+    "(C) Best Refrigeration"
+]
+# Stored benchmark results, named by commit
+BENCHMARK_DIR = Path(__file__).parent / "benchmarks"
+
+
+def synthesize_ecms(n_measures: int, ecm_dir: Path, templates: list = TEMPLATE_ECMS) -> list:
+    """Write a set of ECM definitions synthesized from template ECMs
+
+    Args:
+        n_measures (int): Number of ECMs to synthesize
+        ecm_dir (Path): Directory to write the ECM definitions (and an empty package list) to
+        templates (list, optional): Names of template ECMs in ./ecm_definitions, which are
+            cycled through to synthesize the ECMs. Defaults to TEMPLATE_ECMS.
+
+    Returns:
+        list: Names of the synthesized ECMs
+    """
+    ecm_dir.mkdir(parents=True, exist_ok=True)
+    template_defs = [JsonIO.load_json(fp.ECM_DEF / f"{name}.json") for name in templates]
+    names = []
+    for ind, meas_def in zip(range(n_measures), itertools.cycle(template_defs)):
+        # Copies of the same template compete with each other for the same microsegments
+        meas_def = dict(meas_def, name=f"{meas_def['name']} #{ind + 1}")
+        JsonIO.dump_json(meas_def, ecm_dir / f"{meas_def['name']}.json")
+        names.append(meas_def["name"])
+    JsonIO.dump_json([], ecm_dir / "package_ecms.json")
+
+    return names
+
+
+def benchmark_case(case: dict, case_dir: Path) -> dict:
+    """Prepare and run a set of synthesized ECMs with stage profiling
+
+    Args:
+        case (dict): Number of ECMs, region setting, and adoption scenario of the case
+        case_dir (Path): Directory for the case's ECM definitions, generated data, and results
+
+    Returns:
+        dict: Case settings along with wall time (s), peak memory (MB), and stage timings of the
+            ecm_prep and run steps
+    """
+    if case_dir.exists():
+        shutil.rmtree(case_dir)
+    ecm_dir = case_dir / "ecm_definitions"
+    synthesize_ecms(case["n_measures"], ecm_dir)
+    # Write generated data and results for the case to its own directory
+    fp.set_paths({"GENERATED": case_dir / "generated"})
+
+    prep_args = ["--ecm_directory", str(ecm_dir), "--alt_regions", case["regions"], "--profile"]
+    if case["adopt_scheme"] != "all":
+        prep_args += ["--adopt_scn_restrict", case["adopt_scheme"]]
+    ecm_prep.main(ecm_args(prep_args))
+    run.main(run.parse_args([
+        "--results_directory", str(case_dir / "results"), "--profile"]))
+
+    # Summarize the stage profiles written by each step
+    result = dict(case)
+    for step, profile_file in [("ecm_prep", fp.GENERATED / "ecm_prep_profile.json"),
+                               ("run", fp.RESULTS / "run_profile.json")]:
+        profile = JsonIO.load_json(profile_file)
+        result[step] = {
+            "wall_time": profile["wall_time"],
+            "peak_memory": profile["peak_memory"],
+            "stages": {name: stage["wall_time"] for name, stage in profile["stages"].items()}}
+    result["ecm_prep"]["measures_per_s"] = case["n_measures"] / result["ecm_prep"]["wall_time"]
+    fp.reset_base_paths()
+
+    return result
+
+
+def case_name(case: dict) -> str:
+    """Name a benchmark case by its settings
+
+    Args:
+        case (dict): Number of ECMs, region setting, and adoption scenario of the case
+
+    Returns:
+        str: Case name
+    """
+    return f"{case['n_measures']}-{case['regions']}-{case['adopt_scheme']}"
+
+
+def run_benchmarks(n_measures: list, regions: list, adopt_schemes: list, out_dir: Path) -> dict:
+    """Time ecm_prep and run across combinations of ECM counts, regions, and adoption scenarios
+
+    Args:
+        n_measures (list): Numbers of ECMs to synthesize
+        regions (list): Region settings (AIA, EMM, State)
+        adopt_schemes (list): Adoption scenarios to restrict to, or 'all' for both
+        out_dir (Path): Directory for the ECM definitions, generated data, and results of
+            each case
+
+    Returns:
+        dict: Results of each case (see benchmark_case), keyed by case name
+    """
+    results = {}
+    for n, reg, scheme in itertools.product(n_measures, regions, adopt_schemes):
+        case = {"n_measures": n, "regions": reg, "adopt_scheme": scheme}
+        name = case_name(case)
+        logger.info(f"Running benchmark case {name}")
+        # Run each case in a fresh process such that peak memory is not carried across cases
+        with ProcessPoolExecutor(
+                max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+            results[name] = executor.submit(benchmark_case, case, out_dir / name).result()
+        logger.info(f"Case {name}: ecm_prep {results[name]['ecm_prep']['wall_time']:.1f} s, "
+                    f"run {results[name]['run']['wall_time']:.1f} s")
+
+    return results
+
+
+def compare_benchmarks(base: dict, new: dict, tolerance: float = 0.1) -> list:
+    """Compare benchmark results against a baseline and report regressions
+
+    Args:
+        base (dict): Baseline benchmark results (see run_benchmarks)
+        new (dict): New benchmark results
+        tolerance (float, optional): Fractional increase in wall time or peak memory over the
+            baseline beyond which a regression is reported. Defaults to 0.1.
+
+    Returns:
+        list: Regressions found, each as (case, step, metric, baseline value, new value)
+    """
+    regressions = []
+    for name in sorted(set(base) & set(new)):
+        for step in ["ecm_prep", "run"]:
+            base_step, new_step = base[name][step], new[name][step]
+            metrics = [("wall_time", base_step["wall_time"], new_step["wall_time"]),
+                       ("peak_memory", base_step["peak_memory"], new_step["peak_memory"])]
+            metrics += [(f"stage: {stage}", base_step["stages"][stage], wall_time) for
+                        stage, wall_time in new_step["stages"].items() if
+                        stage in base_step["stages"]]
+            for metric, base_val, new_val in metrics:
+                if base_val is None or new_val is None:
+                    continue
+                change = (new_val - base_val) / base_val if base_val else 0
+                logger.info(f"{name} {step} {metric}: {base_val:.2f} -> {new_val:.2f} "
+                            f"({change:+.1%})")
+                if change > tolerance:
+                    regressions.append((name, step, metric, base_val, new_val))
+
+    return regressions
+
+
+def commit_label() -> str:
+    """Find the short hash of the current commit, used to label benchmark results
+
+    Returns:
+        str: Short commit hash, or 'current' if it cannot be determined
+    """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            check=True, cwd=Path(__file__).parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "current"
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--n_measures", type=int, nargs="+", default=[8, 32],
+                        help="Numbers of ECMs to synthesize from the template ECMs")
+    parser.add_argument("--regions", nargs="+", choices=["AIA", "EMM", "State"],
+                        default=["AIA", "EMM", "State"], help="Region settings to benchmark")
+    parser.add_argument("--adopt_schemes", nargs="+",
+                        choices=["all", "Technical potential", "Max adoption potential"],
+                        default=["all"], help="Adoption scenarios to benchmark")
+    parser.add_argument("--label", type=str, default=None,
+                        help="Label of the stored results; defaults to the current commit hash")
+    parser.add_argument("--compare", type=Path, default=None,
+                        help="Stored benchmark results to compare the new results against")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="Fractional increase over the compared results to flag")
+    opts = parser.parse_args()
+
+    label = opts.label or commit_label()
+    results = run_benchmarks(opts.n_measures, opts.regions, opts.adopt_schemes,
+                             fp.GENERATED / "benchmarks" / label)
+    BENCHMARK_DIR.mkdir(exist_ok=True)
+    JsonIO.dump_json(results, BENCHMARK_DIR / f"{label}.json")
+    logger.info(f"Wrote benchmark results to {BENCHMARK_DIR / f'{label}.json'}")
+    if opts.compare is not None:
+        regressions = compare_benchmarks(JsonIO.load_json(opts.compare), results, opts.tolerance)
+        for name, step, metric, base_val, new_val in regressions:
+            logger.warning(f"Regression in {name} {step} {metric}: {base_val:.2f} -> "
+                           f"{new_val:.2f}")
+        sys.exit(1 if regressions else 0)
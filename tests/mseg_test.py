@@ -4,6 +4,7 @@
 
 # Import code to be tested
 from scout import mseg as rm
+from scout.utils import DataIndex
 
 # Import needed packages
 import unittest
@@ -379,8 +380,9 @@ class NumpyArrayReductionTest(unittest.TestCase):
     # using the EIA_Supply option to confirm that both the reported
     # data and the reduced array with the remaining data are correct
     def test_recording_of_EIA_data_tech(self):
+        data_index = DataIndex(self.EIA_nrg_stock, rm.index_fields)
         for n in range(0, len(self.EIA_nrg_stock_filter)):
-            (a, b) = rm.nrg_stock_select(self.EIA_nrg_stock,
+            (a, b) = rm.nrg_stock_select(data_index,
                                          self.EIA_nrg_stock_filter[n])
             # Compare equipment stock
             self.assertEqual(a, self.EIA_nrg_stock_out[n][0])
@@ -393,8 +395,9 @@ class NumpyArrayReductionTest(unittest.TestCase):
     # TEMP - this should also test home count numbers (and comments
     # and variables names should reflect that)
     def test_recording_of_EIA_data_sqft_homes(self):
+        data_index = DataIndex(self.EIA_nrg_stock, rm.index_fields)
         for n in range(0, len(self.EIA_sqft_homes_filter)):
-            a = rm.sqft_homes_select(self.EIA_nrg_stock,
+            a = rm.sqft_homes_select(data_index,
                                      self.EIA_sqft_homes_filter[n])
             # Compare square footage
             self.assertEqual(a, self.EIA_sqft_homes_out[n])
@@ -402,7 +405,8 @@ class NumpyArrayReductionTest(unittest.TestCase):
     # Test extraction of the correct value from the thermal load
     # components data
     def test_recording_of_thermal_loads_data(self):
-        self.assertEqual(rm.thermal_load_select(self.tloads_example,
+        self.assertEqual(rm.thermal_load_select(
+                         DataIndex(self.tloads_example, rm.index_fields),
                          self.tl_flt),
                          self.tloads_sample)
 
@@ -485,6 +489,10 @@ class DataToListFormatTest(unittest.TestCase):
                                               ('GRND', 'f8'),
                                               ('EQUIP', 'f8')])
 
+    # Index the energy/stock and thermal loads data arrays
+    nrg_stock_index = DataIndex(nrg_stock_array, rm.index_fields)
+    loads_index = DataIndex(loads_array, rm.index_fields)
+
     # Define a set of filters that should yield matched microsegment
     # stock/energy data
     ok_filters = [['new england', 'single family home',
@@ -717,8 +725,8 @@ class DataToListFormatTest(unittest.TestCase):
     def test_ok_filters(self):
         for idx, afilter in enumerate(self.ok_filters):
             # Call the function under test and capture its outputs
-            a = rm.list_generator(self.nrg_stock_array,
-                                  self.loads_array,
+            a = rm.list_generator(self.nrg_stock_index,
+                                  self.loads_index,
                                   afilter,
                                   self.aeo_years,
                                   self.lt_factor_expected)
@@ -730,8 +738,8 @@ class DataToListFormatTest(unittest.TestCase):
     def test_nonsense_filters(self):
         for idx, afilter in enumerate(self.nonsense_filters):
             # Call the function under test and capture its outputs
-            a = rm.list_generator(self.nrg_stock_array,
-                                  self.loads_array,
+            a = rm.list_generator(self.nrg_stock_index,
+                                  self.loads_index,
                                   afilter,
                                   self.aeo_years,
                                   self.lt_factor_expected)
@@ -745,8 +753,8 @@ class DataToListFormatTest(unittest.TestCase):
             with self.assertRaises(KeyError):
                 # Expect the function to raise an error with each call
                 # using the filters supplied from fail_filters
-                rm.list_generator(self.nrg_stock_array,
-                                  self.loads_array,
+                rm.list_generator(self.nrg_stock_index,
+                                  self.loads_index,
                                   afilter,
                                   self.aeo_years,
                                   self.lt_factor_expected)
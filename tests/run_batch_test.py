@@ -1,7 +1,12 @@
 import unittest
+import tempfile
+from argparse import Namespace
 from pathlib import Path
-from scout.run_batch import BatchRun
+from unittest import mock
+from scout.run_batch import BatchRun, PrepCache
 from scout.config import FilePaths as fp
+from scout.utils import JsonIO
+from scout.ecm_prep import ECMPrepHelper
 
 
 class TestBatchRun(unittest.TestCase):
@@ -46,6 +51,121 @@ class TestBatchRun(unittest.TestCase):
         self.assertEqual(self.trim_dir_path(fp.RESULTS), "results/config2")
         self.assertEqual(self.trim_dir_path(fp.PLOTS, 3), "results/config2/plots")
 
+    def test_jobs(self):
+        # Test that a jobs limit below 1 is rejected
+        with self.assertRaises(ValueError):
+            BatchRun(self.yml_dir, jobs=0)
+
+    def test_timed_task(self):
+        # Test that task outputs are returned alongside wall time and peak memory
+        output, wall_time, peak_mem = self.batch_run.timed_task(sum, [1, 2, 3])
+        self.assertEqual(output, 6)
+        self.assertGreaterEqual(wall_time, 0)
+        if peak_mem is not None:
+            self.assertGreater(peak_mem, 0)
+
+
+class TestPrepCache(unittest.TestCase):
+
+    def setUp(self):
+        # Set up ECM definitions and generated directories for two groups in a temporary folder
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        tmp_pth = Path(self.tmp_dir.name)
+        self.grp_dirs = [tmp_pth / "batch_run1", tmp_pth / "batch_run2"]
+        self.prep_cache = PrepCache(tmp_pth / "batch_cache")
+        fp.set_paths({"ECM_DEF": tmp_pth / "ecm_definitions"})
+        self.meas_defs = [{"name": "ECM A", "end_use": "heating"},
+                          {"name": "ECM B", "end_use": ["lighting"]}]
+        for meas_def in self.meas_defs:
+            JsonIO.dump_json(meas_def, fp.ECM_DEF / f"{meas_def['name']}.json")
+        # Hash of the current input data
+        self.inputs_hash = mock.patch.object(PrepCache, "inputs_hash", return_value="x")
+        self.inputs_hash.start()
+        self.addCleanup(self.inputs_hash.stop)
+
+    def tearDown(self):
+        fp.reset_base_paths()
+        self.tmp_dir.cleanup()
+
+    def opts(self, **kwargs):
+        # Sample ecm_prep arguments
+        opts = {"ecm_files": ["ECM A", "ECM B"], "verbose": False, "no_scnd_lgt": False,
+                "floor_start": None, "health_costs": False, "pkg_env_sep": False,
+                "sect_shapes": False, "add_typ_eff": False, "ecm_field_updates": None}
+        opts.update(kwargs)
+        return Namespace(**opts)
+
+    def prep(self, grp_dir, opts, inputs_hash="x"):
+        # Write prepared data for the ECMs as ecm_prep.py would
+        fp.set_paths({"GENERATED": grp_dir})
+        JsonIO.dump_json([{"name": m["name"], "usr_opts": vars(opts)} for m in
+                          self.meas_defs], fp.GENERATED / "ecm_prep.json")
+        JsonIO.dump_json({m["name"]: {"definition": ECMPrepHelper.meas_def_hash(m),
+                                      "inputs": inputs_hash}
+                          for m in self.meas_defs}, fp.GENERATED / "ecm_prep_hashes.json")
+        JsonIO.dump_json({}, fp.GENERATED / "glob_run_vars.json")
+        for m in self.meas_defs:
+            (fp.ECM_COMP / f"{m['name']}.pkl.gz").write_bytes(b"data")
+
+    def test_entry_key(self):
+        # Test that ECM-specific options only affect the keys of ECMs they bear on
+        opts_1, opts_2 = [vars(self.opts(no_scnd_lgt=x)) for x in [False, True]]
+        keys = [[self.prep_cache.entry_key(m, o, "x") for o in [opts_1, opts_2]]
+                for m in self.meas_defs]
+        self.assertEqual(keys[0][0], keys[0][1])
+        self.assertNotEqual(keys[1][0], keys[1][1])
+        # Test that options with no bearing on results do not affect the keys
+        self.assertEqual(self.prep_cache.entry_key(self.meas_defs[0], opts_1, "x"),
+                         self.prep_cache.entry_key(
+                             self.meas_defs[0], vars(self.opts(verbose=True)), "x"))
+        # Test that the input data hash affects the keys
+        self.assertNotEqual(self.prep_cache.entry_key(self.meas_defs[0], opts_1, "x"),
+                            self.prep_cache.entry_key(self.meas_defs[0], opts_1, "y"))
+
+    def test_opt_applies(self):
+        # Test that secondary lighting effects are flagged for ECMs that apply to all end uses
+        for end_use, applies in [("heating", False), (["heating", "cooling"], False),
+                                 ("lighting", True), (["lighting"], True), ("all", True),
+                                 (["all"], True), ({"primary": "all", "secondary": None}, True),
+                                 ({"primary": ["heating"], "secondary": None}, False)]:
+            with self.subTest(end_use=end_use):
+                self.assertEqual(PrepCache.opt_applies(
+                    "no_scnd_lgt", {"name": "ECM", "end_use": end_use}), applies)
+
+    def test_seed(self):
+        # Test that ECMs prepared for one group are seeded into another group when their results
+        # are unaffected by the options that differ between the groups
+        self.prep(self.grp_dirs[0], self.opts())
+        self.prep_cache.publish(self.opts())
+        opts = self.opts(no_scnd_lgt=True)
+        fp.set_paths({"GENERATED": self.grp_dirs[1]})
+        # Test that all groups share the per-region baseline data store
+        self.assertEqual(fp.MSEGS_STORE, fp._base_paths["MSEGS_STORE"])
+        seeded = self.prep_cache.seed(opts)
+        self.assertEqual(seeded, ["ECM A"])
+        meas_summary = JsonIO.load_json(fp.GENERATED / "ecm_prep.json")
+        self.assertEqual([m["name"] for m in meas_summary], ["ECM A"])
+        self.assertTrue(meas_summary[0]["usr_opts"]["no_scnd_lgt"])
+        self.assertTrue((fp.ECM_COMP / "ECM A.pkl.gz").exists())
+        self.assertTrue((fp.GENERATED / "glob_run_vars.json").exists())
+        # Test that ECMs are not cached when options that add ECM copies are used
+        fp.set_paths({"GENERATED": self.grp_dirs[0]})
+        self.assertEqual(self.prep_cache.seed(self.opts(health_costs=True)), [])
+
+    def test_seed_inputs_changed(self):
+        # Test that ECMs prepared from outdated input data are not seeded, and that ECMs
+        # prepared again from the updated data are cached alongside the outdated entries
+        self.prep(self.grp_dirs[0], self.opts(), inputs_hash="old")
+        self.prep_cache.publish(self.opts())
+        fp.set_paths({"GENERATED": self.grp_dirs[1]})
+        self.assertEqual(self.prep_cache.seed(self.opts()), [])
+        self.prep(self.grp_dirs[0], self.opts())
+        self.prep_cache.publish(self.opts())
+        fp.set_paths({"GENERATED": self.grp_dirs[1]})
+        self.assertEqual(self.prep_cache.seed(self.opts()), ["ECM A", "ECM B"])
+        self.assertEqual(JsonIO.load_json(fp.GENERATED / "ecm_prep_hashes.json")["ECM A"][
+            "inputs"], "x")
+
 
 if __name__ == '__main__':
     unittest.main()
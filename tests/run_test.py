@@ -11,8 +11,11 @@ import numpy
 import copy
 import itertools
 import numpy_financial as npf
+import math
+from numpy.linalg import LinAlgError
 import pytest
 from pathlib import Path
+from types import SimpleNamespace
 
 base_args = run.parse_args([])
 
@@ -1470,6 +1473,63 @@ class PrioritizationMetricsTest(unittest.TestCase, CommonMethods, Constants):
         self.dict_check(engine_instance.measures[
             0].financial_metrics, self.ok_out_dist4[2])
 
+    def test_metrics_ok_multiple(self):
+        """Test output given several measures updated in one batch."""
+        # Initialize test measures and assign them sample 'uncompeted'
+        # markets with point and array inputs
+        test_cases = [
+            (self.sample_measure_res, self.ok_master_mseg_point, self.ok_out_point_res),
+            (self.sample_measure_com, self.ok_master_mseg_point, self.ok_out_point_com),
+            (self.sample_measure_res, self.ok_master_mseg_dist1, self.ok_out_dist1),
+            (self.sample_measure_res, self.ok_master_mseg_dist4, self.ok_out_dist4)]
+        test_meas = []
+        for sample_measure, master_mseg, _ in test_cases:
+            meas = run.Measure(self.handyvars, **copy.deepcopy(sample_measure))
+            meas.markets[self.test_adopt_scheme]["uncompeted"][
+                "master_mseg"] = copy.deepcopy(master_mseg)
+            test_meas.append(meas)
+        # Create Engine instance using test measures, run function on them
+        engine_instance = run.Engine(
+            self.handyvars, base_args, test_meas, energy_out=[
+                "fossil_equivalent", "NA", "NA", "NA", "NA"], brkout="basic")
+        engine_instance.calc_savings_metrics(
+            self.test_adopt_scheme, "uncompeted", self.opts)
+        # Verify that each measure's results match those for the measure
+        # when updated on its own
+        for meas, (_, _, ok_out) in zip(engine_instance.measures, test_cases):
+            self.dict_check(meas.update_results, ok_out[0])
+            self.dict_check(meas.savings[self.test_adopt_scheme]["uncompeted"], ok_out[1])
+            self.dict_check(meas.financial_metrics, ok_out[2])
+
+    def test_metrics_parallel_schemes(self):
+        """Test output given adoption schemes calculated in parallel."""
+        # Initialize test measure and assign it sample 'uncompeted' and
+        # 'competed' markets ('ok_master_mseg_point') for all adoption schemes
+        test_meas = run.Measure(self.handyvars, **self.sample_measure_res)
+        for adopt_scheme in self.handyvars.adopt_schemes:
+            for comp_scheme in ["uncompeted", "competed"]:
+                test_meas.markets[adopt_scheme][comp_scheme]["master_mseg"] = \
+                    copy.deepcopy(self.ok_master_mseg_point)
+        # Create Engine instance using test measure, run function on it
+        # without measure competition
+        engine_instance = run.Engine(
+            self.handyvars, base_args, [test_meas], energy_out=[
+                "fossil_equivalent", "NA", "NA", "NA", "NA"], brkout="basic")
+        opts = copy.deepcopy(self.opts)
+        opts.no_comp = True
+        engine_instance.calc_schemes_parallel(None, opts)
+        # Verify that worker results are merged for all adoption/competition schemes
+        self.assertFalse(engine_instance.measures[0].update_results["financial metrics"])
+        for adopt_scheme in self.handyvars.adopt_schemes:
+            for comp_scheme in ["uncompeted", "competed"]:
+                self.assertFalse(engine_instance.measures[0].update_results[
+                    "savings"][adopt_scheme][comp_scheme])
+                self.dict_check(engine_instance.measures[0].savings[
+                    adopt_scheme][comp_scheme], self.ok_out_point_res[1])
+        # Verify test measure financial metrics
+        self.dict_check(engine_instance.measures[
+            0].financial_metrics, self.ok_out_point_res[2])
+
 
 class MetricUpdateTest(unittest.TestCase, CommonMethods, Constants):
     """Test the operation of the 'metrics_update' function.
@@ -1551,16 +1611,261 @@ class MetricUpdateTest(unittest.TestCase, CommonMethods, Constants):
         cls.ok_out_array = [2, 0.5, 1, None, None, None, 0.62, 1.59,
                             2, 0.67, 0.005, -0.13, 7.7e-10, -9.2e-9]
 
+    def metric_update_legacy(self, engine, m, life_base, life_meas, scost_base,
+                             scost_meas_delt, esave, ecostsave, csave, ccostsave,
+                             scost_meas, ecost_meas, ccost_meas, opts):
+        """Calculate measure financial metrics element by element with the former
+        'metric_update' (copied without changes apart from its engine argument)."""
+        # Develop four initial cash flow scenarios over the measure life:
+        # 1) Cash flows considering capital costs only
+        # 2) Cash flows considering capital costs and energy costs
+        # 3) Cash flows considering capital costs and carbon costs
+        # 4) Cash flows considering capital, energy, and carbon costs
+
+        # For lighting equipment ECMs only: determine when over the course of
+        # the ECM lifetime (if at all) a cost gain is realized from an avoided
+        # purchase of the baseline lighting technology due to longer measure
+        # lifetime; store this information in a list of year indicators for
+        # subsequent use below.  Example: an LED bulb lasts 30 years compared
+        # to a baseline bulb's 10 years, meaning 3 purchases of the baseline
+        # bulb would have occurred by the time the LED bulb has reached the
+        # end of its life.
+        added_stockcost_gain_yrs = []
+        if (life_meas > life_base) and ("lighting" in m.end_use[
+            "primary"]) and (m.measure_type == "full service") and (
+                m.technology_type["primary"] == "supply"):
+            for i in range(1, life_meas):
+                if i % life_base == 0:
+                    added_stockcost_gain_yrs.append(i - 1)
+
+        # If the measure lifetime is less than 1 year, set it to 1 year
+        # (a minimum for measure lifetime to work in below calculations)
+        if life_meas < 1:
+            life_meas = 1
+
+        # Construct capital cost cash flows across measure life
+
+        # Initialize incremental and total capital cost cash flows with
+        # upfront incremental and total capital cost
+        cashflows_s_delt = numpy.array(scost_meas_delt)
+        cashflows_s_tot = numpy.array(scost_meas)
+
+        for life_yr in range(0, life_meas):
+            # Check whether an avoided cost of the baseline technology should
+            # be added for given year; if not, set this term to zero
+            if life_yr in added_stockcost_gain_yrs:
+                scost_life = scost_base
+            else:
+                scost_life = 0
+
+            # Add avoided capital costs as appropriate (e.g., for an LED
+            # lighting measure with a longer lifetime than the comparable
+            # baseline lighting technology)
+            cashflows_s_delt = numpy.append(cashflows_s_delt, scost_life)
+            cashflows_s_tot = numpy.append(cashflows_s_tot, scost_life)
+
+        # Construct complete incremental and total energy and carbon cash
+        # flows across measure lifetime. First term (reserved for initial
+        # investment) is zero
+        cashflows_e_delt, cashflows_c_delt = [
+            numpy.append(0, [x] * life_meas) for x in [ecostsave, ccostsave]]
+        cashflows_e_tot, cashflows_c_tot = [
+            numpy.append(0, [x] * life_meas) for x in [ecost_meas, ccost_meas]]
+
+        # Calculate net present values (NPVs) using the above cashflows
+        npv_s_delt, npv_e_delt, npv_c_delt = [
+            npf.npv(engine.handyvars.discount_rate, x) for x in [
+                cashflows_s_delt, cashflows_e_delt, cashflows_c_delt]]
+
+        # Develop arrays of energy and carbon savings across measure
+        # lifetime (for use in cost of conserved energy and carbon calcs).
+        # First term (reserved for initial investment figure) is zero, and
+        # each array is normalized by number of captured stock units
+        esave_array = numpy.append(0, [esave] * life_meas)
+        csave_array = numpy.append(0, [csave] * life_meas)
+
+        # Calculate Net Present Value and annuity equivalent Net Present Value
+        # of the above energy and carbon savings
+        npv_esave = npf.npv(engine.handyvars.discount_rate, esave_array)
+        npv_csave = npf.npv(engine.handyvars.discount_rate, csave_array)
+
+        # Calculate portfolio-level financial metrics
+
+        # Calculate cost of conserved energy w/ and w/o carbon cost savings
+        # benefits. Restrict denominator values less than or equal to zero
+        if npv_esave > 0:
+            cce = (-npv_s_delt / npv_esave)
+            cce_bens = (-(npv_s_delt + npv_c_delt) / npv_esave)
+        else:
+            cce, cce_bens = [999 for n in range(2)]
+
+        # Calculate cost of conserved carbon w/ and w/o energy cost savings
+        # benefits. Restrict denominator values less than or equal to zero
+        if npv_csave > 0:
+            ccc = (-npv_s_delt / (npv_csave * 1000000))
+            ccc_bens = (-(npv_s_delt + npv_e_delt) /
+                        (npv_csave * 1000000))
+        else:
+            ccc, ccc_bens = [999 for n in range(2)]
+
+        # Calculate internal rate of return and simple payback for capital
+        # + energy and capital + energy + carbon cash flows.  Use try/
+        # except to handle cases where IRR/payback cannot be calculated
+
+        # IRR and payback given capital + energy cash flows
+        try:
+            irr_e = npf.irr(cashflows_s_delt + cashflows_e_delt)
+            if not math.isfinite(irr_e):
+                raise (ValueError)
+        except (ValueError, LinAlgError):
+            irr_e = 999
+        try:
+            payback_e = self.payback_legacy(cashflows_s_delt + cashflows_e_delt)
+        except (ValueError, LinAlgError):
+            payback_e = 999
+        # IRR and payback given capital + energy + carbon cash flows
+        try:
+            irr_ec = npf.irr(
+                cashflows_s_delt + cashflows_e_delt + cashflows_c_delt)
+            if not math.isfinite(irr_ec):
+                raise (ValueError)
+        except (ValueError, LinAlgError):
+            irr_ec = 999
+        try:
+            payback_ec = \
+                self.payback_legacy(
+                    cashflows_s_delt + cashflows_e_delt + cashflows_c_delt)
+        except (ValueError, LinAlgError):
+            payback_ec = 999
+
+        # Set unit capital and operating costs using the above
+        # cashflows for later use in measure competition calculations. For
+        # residential sector measures, unit costs are simply the unit-level
+        # capital and operating costs for the measure.  For commerical
+        # sector measures, unit costs are translated to life cycle capital
+        # and operating costs across the measure lifetime using multiple
+        # discount rate levels that reflect various degrees of risk
+        # tolerance observed amongst commercial adopters.  These discount
+        # rate levels are imported from commercial AEO demand module data.
+
+        # Populate unit costs for residential sector
+        # Check whether measure applies to residential sector
+        if any([x in ["single family home", "multi family home",
+                      "mobile home"] for x in m.bldg_type]):
+            unit_cost_s_res, unit_cost_e_res, unit_cost_c_res = [
+                scost_meas, ecost_meas, ccost_meas]
+        # If measure does not apply to residential sector, set residential
+        # unit costs to 'None'
+        else:
+            unit_cost_s_res, unit_cost_e_res, unit_cost_c_res = (
+                None for n in range(3))
+
+        # Populate unit costs for commercial sector
+        # Check whether measure applies to commercial sector
+        if any([x not in ["single family home", "multi family home",
+                          "mobile home"] for x in m.bldg_type]):
+            if opts.high_res_comp is False:
+                unit_cost_s_com, unit_cost_e_com, unit_cost_c_com = (
+                    {} for n in range(3))
+                # Set unit cost values under 7 discount rate categories
+                try:
+                    for ind, tps in enumerate(
+                            engine.handyvars.com_timeprefs["rates"]):
+                        unit_cost_s_com["rate " + str(ind + 1)], \
+                            unit_cost_e_com["rate " + str(ind + 1)], \
+                            unit_cost_c_com["rate " + str(ind + 1)] = \
+                            [npf.npv(tps, x) for x in [
+                             cashflows_s_tot, cashflows_e_tot,
+                             cashflows_c_tot]]
+                        if any([not math.isfinite(x) for x in [
+                                unit_cost_s_com["rate " + str(ind + 1)],
+                                unit_cost_e_com["rate " + str(ind + 1)],
+                                unit_cost_c_com["rate " + str(ind + 1)]]]):
+                            raise (ValueError)
+                except ValueError:
+                    unit_cost_s_com, unit_cost_e_com, unit_cost_c_com = (
+                        None for n in range(3))
+            else:
+                # Finalize annual energy and carbon costs
+                unit_cost_e_com, unit_cost_c_com = [ecost_meas, ccost_meas]
+                # Annualize unit stock costs under 7 hurdle rates, where hurdle rate is 7 distinct
+                # time preference premiums over the risk-free interest rate plus the risk-free rate
+                unit_cost_s_com = {}
+                for ind, tps in enumerate(engine.handyvars.com_timeprefs["rates"]):
+                    try:
+                        unit_cost_s_com["rate " + str(ind + 1)] = \
+                            scost_meas * (tps / (1 - ((1 + tps) ** -life_meas)))
+                    # If hurdle rate is zero, annualize stock costs by dividing by lifetime
+                    except ZeroDivisionError:
+                        unit_cost_s_com = scost_meas / life_meas
+
+        # If measure does not apply to commercial sector, set commercial
+        # unit costs to 'None'
+        else:
+            unit_cost_s_com, unit_cost_e_com, unit_cost_c_com = (
+                None for n in range(3))
+
+        # Return all updated economic metrics
+        return unit_cost_s_res, unit_cost_e_res, unit_cost_c_res, \
+            unit_cost_s_com, unit_cost_e_com, unit_cost_c_com, irr_e, \
+            irr_ec, payback_e, payback_ec, cce, cce_bens, ccc, ccc_bens
+
+    @staticmethod
+    def payback_legacy(cashflows):
+        """Calculate a simple payback period with the former 'payback' (copied
+        without changes)."""
+        # Separate initial investment and subsequent cash flows
+        # from "cashflows" input; extend cashflows up until 100 years
+        # out to ensure calculation of all paybacks under 100 years
+        investment, cashflows = cashflows[0], list(
+            cashflows[1:]) + [cashflows[-1]] * (100 - len(cashflows[1:]))
+        # If initial investment is positive, payback = 0
+        if investment >= 0:
+            payback_val = 0
+        else:
+            # Find absolute value of initial investment to compare
+            # subsequent cash flows against
+            investment = abs(investment)
+            # Initialize cumulative cashflow and # years tracking
+            total, years, cumulative = 0, 0, []
+            # Add to years and cumulative cashflow trackers while cumulative
+            # cashflow < investment
+            for cashflow in cashflows:
+                total += cashflow
+                if total < investment:
+                    years += 1
+                cumulative.append(total)
+            # If investment pays back within the measure lifetime,
+            # calculate this payback period in years
+            if years < len(cashflows):
+                a = years
+                # Case where payback period < 1 year
+                if (years - 1) < 0:
+                    b = investment
+                    c = cumulative[0]
+                # Case where payback period >= 1 year
+                else:
+                    b = investment - cumulative[years - 1]
+                    c = cumulative[years] - cumulative[years - 1]
+                payback_val = a + (b / c)
+            # If investment does not pay back within measure lifetime,
+            # set payback period to artifically high number
+            else:
+                payback_val = 999
+
+        # Return updated payback period value in years
+        return payback_val
+
     def test_metric_updates(self):
         """Test for correct outputs given valid inputs."""
         # Create an Engine instance using sample_measure list
         engine_instance = run.Engine(
             self.handyvars, base_args, self.measure_list, energy_out=[
                 "fossil_equivalent", "NA", "NA", "NA", "NA"], brkout="basic")
-        # Record the output for the test run of the 'metric_update'
+        # Record the output for the test run of the former 'metric_update'
         # function
-        function_output = engine_instance.metric_update(
-            self.measure_list[0], self.ok_base_life,
+        function_output = self.metric_update_legacy(
+            engine_instance, self.measure_list[0], self.ok_base_life,
             int(self.ok_product_lifetime), self.ok_base_scost,
             self.ok_meas_sdelt, self.ok_esave, self.ok_ecostsave,
             self.ok_csave, self.ok_ccostsave, self.ok_scost_meas,
@@ -1573,11 +1878,73 @@ class MetricUpdateTest(unittest.TestCase, CommonMethods, Constants):
             else:
                 self.assertEqual(function_output[ind], x)
 
+    def test_metric_updates_batch(self):
+        """Test batched outputs match former 'metric_update' outputs for each element."""
+        # Sample residential lighting, commercial heating/cooling, and
+        # commercial lighting measures
+        measure_list = self.measure_list + [run.Measure(
+            self.handyvars, **x) for x in [
+            CommonTestMeasures().sample_measure3,
+            CommonTestMeasures().sample_measure5]]
+        # Create an Engine instance using sample_measure list
+        engine_instance = run.Engine(
+            self.handyvars, base_args, measure_list, energy_out=[
+                "fossil_equivalent", "NA", "NA", "NA", "NA"], brkout="basic")
+        # Sample inputs for a batch of elements across the measures, including
+        # lifetimes of varying length (longer and shorter than the baseline),
+        # an element with zero energy/carbon savings, and an element with a
+        # positive initial cash flow
+        meas_ind = numpy.array([0, 0, 0, 1, 1, 2, 2, 2])
+        life_base = numpy.array([self.ok_base_life, 3, 3, 3, 5, 3, 4, 2])
+        life_meas = numpy.array([
+            int(self.ok_product_lifetime), 12, 1, 6, 10, 13, 8, 2])
+        scale = numpy.array([1, 2, 0, 1.5, 0.5, 3, -1, 1])
+        scost_base, scost_meas_delt, esave, ecostsave, csave, ccostsave, \
+            scost_meas, ecost_meas, ccost_meas = [x * scale for x in [
+                self.ok_base_scost, self.ok_meas_sdelt, self.ok_esave,
+                self.ok_ecostsave, self.ok_csave, self.ok_ccostsave,
+                self.ok_scost_meas, self.ok_ecost_meas, self.ok_ccost_meas]]
+        for high_res_comp in [False, True]:
+            opts = copy.deepcopy(self.opts)
+            opts.high_res_comp = high_res_comp
+            # Record the output for the test run of the 'metric_update_batch'
+            # function
+            batch_output = engine_instance.metric_update_batch(
+                measure_list, meas_ind, life_base, life_meas, scost_base,
+                scost_meas_delt, esave, ecostsave, csave, ccostsave,
+                scost_meas, ecost_meas, ccost_meas, opts)
+            # Test that each element of the batched outputs matches the output
+            # of the former 'metric_update' function for that element's inputs
+            for elem in range(len(meas_ind)):
+                function_output = self.metric_update_legacy(
+                    engine_instance, measure_list[meas_ind[elem]], int(life_base[elem]),
+                    int(life_meas[elem]), scost_base[elem],
+                    scost_meas_delt[elem], esave[elem], ecostsave[elem],
+                    csave[elem], ccostsave[elem], scost_meas[elem],
+                    ecost_meas[elem], ccost_meas[elem], opts)
+                for ind, x in enumerate(function_output):
+                    with self.subTest(high_res_comp=high_res_comp, elem=elem,
+                                      output=ind):
+                        if isinstance(x, dict):
+                            self.dict_check(batch_output[ind][elem], x)
+                        elif x is not None:
+                            self.assertAlmostEqual(
+                                batch_output[ind][elem], x, places=6)
+                        else:
+                            self.assertIsNone(batch_output[ind][elem])
+        # Test that the first element yields the expected outputs
+        for ind, x in enumerate(self.ok_out_array):
+            if x is not None:
+                self.assertAlmostEqual(batch_output[ind][0], x, places=2)
+            else:
+                self.assertEqual(batch_output[ind][0], x)
+
 
 class PaybackTest(unittest.TestCase, Constants):
-    """Test the operation of the 'payback' function.
+    """Test the operation of the 'payback_batch' function.
 
-    Verify cashflow input generates expected payback output.
+    Verify cashflow input generates expected payback output, and that
+    payback periods match those of the former per-row 'payback' function.
 
     Attributes:
         handyvars (object): Useful variables across the class.
@@ -1606,10 +1973,19 @@ class PaybackTest(unittest.TestCase, Constants):
         engine_instance = run.Engine(
             self.handyvars, base_args, self.measure_list, energy_out=[
                 "fossil_equivalent", "NA", "NA", "NA", "NA"], brkout="basic")
+        # Stack the cash flows of varying lifetimes as rows, padding cash flows
+        # beyond each row's lifetime with values that should be ignored
+        life = numpy.array([len(cf) - 1 for cf in self.ok_cashflows])
+        cashflows = numpy.full((len(self.ok_cashflows), life.max() + 1), -1000.0)
+        for idx, cf in enumerate(self.ok_cashflows):
+            cashflows[idx, :len(cf)] = cf
         # Test that valid input cashflows yield correct output payback values
+        # that match those of the former 'payback' function
+        paybacks = engine_instance.payback_batch(cashflows, life)
         for idx, cf in enumerate(self.ok_cashflows):
-            self.assertAlmostEqual(engine_instance.payback(cf),
-                                   self.ok_out[idx], places=2)
+            self.assertAlmostEqual(paybacks[idx], self.ok_out[idx], places=2)
+            self.assertAlmostEqual(
+                paybacks[idx], MetricUpdateTest.payback_legacy(cf), places=10)
 
 
 class ResCompeteTest(unittest.TestCase, CommonMethods, Constants):
@@ -1652,6 +2028,7 @@ class ResCompeteTest(unittest.TestCase, CommonMethods, Constants):
             'measures_supply' Measure objects.
         a_run (object): Analysis engine object incorporating all
             'measures_all' objects.
+        measures_all_init (list): Copy of 'measures_all' before competition.
         measures_all_dist (list): List including competing/interacting sample
             Measure objects with array inputs.
         measures_demand_dist (list): Demand-side subset of 'measures_all_dist'.
@@ -12203,6 +12580,7 @@ class ResCompeteTest(unittest.TestCase, CommonMethods, Constants):
         # Adjust/finalize point value test measure consumer metrics
         for ind, m in enumerate(cls.a_run.measures):
             m.financial_metrics['unit cost'] = consumer_metrics_final[ind]
+        cls.measures_all_init = copy.deepcopy(cls.measures_all)
         cls.measures_all_dist = [run.Measure(cls.handyvars, **x) for x in [
             cls.compete_meas1_dist, copy.deepcopy(cls.compete_meas2),
             cls.compete_meas3_dist, copy.deepcopy(cls.compete_meas4),
@@ -17196,6 +17574,37 @@ class ResCompeteTest(unittest.TestCase, CommonMethods, Constants):
                 self.dict_check(comp_a_std_out[ind], a_run_a_stds.measures[ind].markets[
                     test_adopt_scheme_a_stds]["competed"]["master_mseg"]["energy"])
 
+    def test_compete_clusters(self):
+        """Test competition of independent measure clusters across workers."""
+        # Sample heating/cooling energy totals for supply/demand-side overlaps
+        htcl_totals = {"AIA_CZ1": {"single family home": {"existing": {
+            "electricity": {"cooling": {yr: 100 for yr in self.handyvars.aeo_years}}}}}}
+        # Compete the sample measures serially and across two workers
+        a_runs = []
+        for workers in [1, 2]:
+            a_run = run.Engine(
+                self.handyvars, base_args, copy.deepcopy(self.measures_all_init),
+                energy_out=["fossil_equivalent", "NA", "NA", "NA", "NA"], brkout="basic")
+            opts_workers = copy.deepcopy(self.opts)
+            opts_workers.workers = workers
+            a_run.compete_measures(self.test_adopt_scheme, htcl_totals, opts_workers)
+            a_runs.append(a_run)
+        # Demand-side and supply-side measures share no contributing microsegments
+        clusters = a_runs[0].measure_clusters(*a_runs[0].index_contrib_msegs([
+            m.markets[self.test_adopt_scheme]["competed"]["mseg_adjust"] for
+            m in a_runs[0].measures]))
+        self.assertEqual([c[0] for c in clusters], [[0, 1], [2, 3, 4]])
+        # Check that competed master microsegments and output breakout data
+        # match across serial and parallel competition
+        for m_serial, m_parallel in zip(a_runs[0].measures, a_runs[1].measures):
+            self.dict_check(
+                m_serial.markets[self.test_adopt_scheme]["competed"]["master_mseg"],
+                m_parallel.markets[self.test_adopt_scheme]["competed"]["master_mseg"])
+            self.dict_check(
+                m_serial.markets[self.test_adopt_scheme]["competed"]["mseg_out_break"]["energy"],
+                m_parallel.markets[self.test_adopt_scheme]["competed"]["mseg_out_break"][
+                    "energy"])
+
 
 class ComCompeteTest(unittest.TestCase, CommonMethods, Constants):
     """Test 'compete_com_primary' and 'secondary_adj' functions.
@@ -27754,6 +28163,532 @@ class ComCompeteTest(unittest.TestCase, CommonMethods, Constants):
                     "competed"]["mseg_out_break"]["energy"])
 
 
+class MktShareSolverTest(unittest.TestCase, Constants):
+    """Test the operation of the 'res_mkt_fracs' and 'com_mkt_fracs' functions.
+
+    Verify that market shares calculated across dense arrays of competing
+    measure costs match those of the per-measure, per-year calculations the
+    functions replace, given sample costs that include point values, arrays,
+    missing (None) values, tied costs, and years off the market, and
+    commercial operating costs with and without discount rate levels.
+
+    Attributes:
+        handyvars (object): Useful variables across the class.
+        n_meas (int): Number of sample competing measures.
+        n_samples (int): Number of sampled values in sample cost arrays.
+        yrs_on_mkt (list): Sample years on the market for each measure.
+        years_on_mkt_all (numpy.ndarray): Sample years in which any measure
+            is on the market.
+        adopt_scheme (string): Sample consumer adoption scheme.
+        mseg_key (tuple): Sample competed microsegment key.
+        a_run (object): Sample analysis engine object.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """Define objects/variables for use across all class functions."""
+        cls.handyvars = run.UsefulVars(Constants.HANDYFILES, NullOpts().opts,
+                                       brkout="basic", regions="AIA",
+                                       state_appl_regs=None, codes=None, bps=None, exog_rates=False)
+        cls.handyvars.aeo_years = [str(yr) for yr in range(2009, 2019)]
+        cls.n_meas, cls.n_samples = 4, 5
+        yrs = cls.handyvars.aeo_years
+        # Measures enter and exit the market in different years; no measure is
+        # on the market in the first and last years
+        cls.yrs_on_mkt = [yrs[1:-1], yrs[1:5], yrs[3:-1], yrs[2:7]]
+        cls.years_on_mkt_all = numpy.unique([yr for x in cls.yrs_on_mkt for yr in x])
+        cls.adopt_scheme = "Technical potential"
+        cls.mseg_key = ("primary", "AIA_CZ1", "assembly", "electricity", "heating",
+                        "supply", "ASHP", "existing")
+        cls.a_run = run.Engine(
+            cls.handyvars, base_args, [], energy_out=[
+                "fossil_equivalent", "NA", "NA", "NA", "NA"], brkout="basic")
+
+    def sample_value(self, rng, sampled, val_fn):
+        """Draw a sample cost value that is missing, a point value, or an array."""
+        draw = rng.random()
+        if draw < 0.1:
+            return None
+        elif sampled and draw < 0.6:
+            return numpy.array([val_fn() for n in range(self.n_samples)])
+        else:
+            return val_fn()
+
+    def sample_measures(self, choice_params):
+        """Set up competing measures with the given competed choice parameters."""
+        return [SimpleNamespace(markets={self.adopt_scheme: {"competed": {"mseg_adjust": {
+            "competed choice parameters": {str(self.mseg_key): x}}}}}) for x in choice_params]
+
+    def res_mkt_fracs_legacy(self, measures_adj, mseg_key, adopt_scheme, unit_cost_s_in,
+                             unit_cost_e_in, yrs_on_mkt, years_on_mkt_all):
+        """Calculate residential market shares with the per-measure, per-year
+        loops formerly in 'compete_res_primary' (copied without changes)."""
+        # Initialize list of dicts that each store the annual market fractions
+        # captured by competing measures; also initialize a dict that sums
+        # market fractions by year across competing measures (used to normalize
+        # the measure market fractions such that they all sum to 1)
+        mkt_fracs = [{} for meas in range(0, len(measures_adj))]
+        mkt_fracs_tot = dict.fromkeys(self.handyvars.aeo_years, 0)
+
+        # Loop through competing measures and calculate market shares for
+        # each based on their annualized capital and operating costs
+        for ind, m in enumerate(measures_adj):
+            # Set measure markets and market adjustment information
+
+            # Loop through all years in time horizon
+            for yr in self.handyvars.aeo_years:
+                # Ensure measure is on the market in given year
+                if yr in yrs_on_mkt[ind]:
+                    # Set measure capital and operating cost inputs. * Note:
+                    # operating cost is set to just energy costs (for now), but
+                    # could be expanded to include maintenance and carbon costs
+
+                    # Set capital cost (handle as numpy array or point value)
+                    if isinstance(unit_cost_s_in[ind][yr], numpy.ndarray):
+                        cap_cost = numpy.zeros(len(unit_cost_s_in[ind][yr]))
+                        for i in range(0, len(unit_cost_s_in[ind][yr])):
+                            cap_cost[i] = unit_cost_s_in[ind][yr][i]
+                    else:
+                        cap_cost = unit_cost_s_in[ind][yr]
+                    # Set operating cost (handle as numpy array or point value)
+                    if isinstance(unit_cost_e_in[ind][yr], numpy.ndarray):
+                        op_cost = numpy.zeros(len(unit_cost_e_in[ind][yr]))
+                        for i in range(0, len(unit_cost_e_in[ind][yr])):
+                            op_cost[i] = unit_cost_e_in[ind][yr][i]
+                    else:
+                        op_cost = unit_cost_e_in[ind][yr]
+
+                    # Calculate measure market fraction using log-linear
+                    # regression equation that takes capital/operating
+                    # costs as inputs
+
+                    # Handle case where cost is None
+                    try:
+                        # Calculate weighted sum of incremental capital and
+                        # operating costs
+                        sum_wt = cap_cost * \
+                            m.markets[adopt_scheme]["competed"][
+                                "mseg_adjust"]["competed choice parameters"][
+                                str(mseg_key)]["b1"][yr] + op_cost * \
+                            m.markets[adopt_scheme]["competed"]["mseg_adjust"][
+                                "competed choice parameters"][
+                                str(mseg_key)]["b2"][yr]
+
+                        # Guard against cases with very low weighted sums of
+                        # incremental capital and operating costs
+                        if not isinstance(sum_wt, numpy.ndarray) and \
+                                sum_wt < -500:
+                            sum_wt = -500
+                        elif isinstance(sum_wt, numpy.ndarray) and any([
+                                x < -500 for x in sum_wt]):
+                            sum_wt = [-500 if x < -500 else x for x in sum_wt]
+
+                        # Calculate market fraction
+                        mkt_fracs[ind][yr] = numpy.exp(sum_wt)
+                    except TypeError:
+                        mkt_fracs[ind][yr] = 0
+
+                    # Add calculated market fraction to mkt fraction sum
+                    mkt_fracs_tot[yr] = \
+                        mkt_fracs_tot[yr] + mkt_fracs[ind][yr]
+
+        # Loop through competing measures to normalize their calculated
+        # market shares to the total market share sum; use normalized
+        # market shares to make adjustments to each measure's master
+        # microsegment values
+        for ind, m in enumerate(measures_adj):
+            # Calculate annual market share fraction for the measure and
+            # adjust measure's master microsegment values accordingly
+            for yr in self.handyvars.aeo_years:
+                # Ensure measure is on the market in given year; if not,
+                # the measure either splits the market with other
+                # competing measures if none of those measures is on
+                # the market either, or else has a market share of zero
+                if yr in yrs_on_mkt[ind]:
+                    if ((not isinstance(mkt_fracs_tot[yr], numpy.ndarray) and
+                         mkt_fracs_tot[yr] != 0) or (
+                        isinstance(mkt_fracs_tot[yr], numpy.ndarray) and all(
+                            mkt_fracs_tot[yr] != 0))):
+                        mkt_fracs[ind][yr] = \
+                            mkt_fracs[ind][yr] / mkt_fracs_tot[yr]
+                    else:
+                        mkt_fracs[ind][yr] = 1 / len(measures_adj)
+                elif yr not in years_on_mkt_all:
+                    mkt_fracs[ind][yr] = 1 / len(measures_adj)
+                else:
+                    mkt_fracs[ind][yr] = 0
+
+        return mkt_fracs
+
+    def com_mkt_fracs_legacy(self, measures_adj, mseg_key, adopt_scheme, unit_cost_s_in,
+                             unit_cost_e_in, yrs_on_mkt, years_on_mkt_all,
+                             op_cost_rate_bins):
+        """Calculate commercial market shares with the per-measure, per-year
+        loops formerly in 'compete_com_primary' (copied without changes)."""
+        # Initialize list of dicts that each store the annual market fractions
+        # captured by competing measures; also initialize a dict that records
+        # the total annualized capital + operating costs for each measure
+        # and discount rate level (used to choose which measure is adopted
+        # under each discount rate level)
+        mkt_fracs = [{} for meas in range(0, len(measures_adj))]
+        tot_cost = [{} for meas in range(0, len(measures_adj))]
+
+        # Initialize a flag that indicates whether any competing measures
+        # have arrays of annualized capital and/or operating costs rather
+        # than point values (resultant of distributions on measure inputs),
+        # for each year in the range above
+        length_array = numpy.repeat(0, len(self.handyvars.aeo_years))
+
+        # Loop through all years in time horizon
+        for ind_l, yr in enumerate(self.handyvars.aeo_years):
+            # Determine whether any of the competing measures have
+            # arrays of annualized capital and/or operating costs for
+            # the given year; if so, find the array length. * Note: all
+            # array lengths should be equal to the 'nsamples' variable
+            # defined in 'ecm_prep.py'
+            if any([isinstance(x[yr], numpy.ndarray) or
+                    isinstance(y[yr], numpy.ndarray) for
+                    x, y in zip(unit_cost_s_in, unit_cost_e_in)]) is True:
+                length_array[ind_l] = next(
+                    (len(x[yr]) or len(y[yr]) for x, y in
+                     zip(unit_cost_s_in, unit_cost_e_in) if isinstance(
+                        x[yr], numpy.ndarray) or isinstance(
+                            y[yr], numpy.ndarray)),
+                    length_array[ind_l])
+
+        # Loop through competing measures and calculate market shares for
+        # each based on their annualized capital and operating costs
+        for ind, m in enumerate(measures_adj):
+            # Set measure markets and market adjustment information
+            # Loop through all years in time horizon
+            for ind_l, yr in enumerate(self.handyvars.aeo_years):
+                # Ensure measure is on the market in given year
+                if yr in yrs_on_mkt[ind]:
+                    # Set measure capital and operating cost inputs. * Note:
+                    # operating cost is set to just energy costs (for now), but
+                    # could be expanded to include maintenance and carbon costs
+
+                    # Handle cases where capital and/or operating cost inputs
+                    # are specified as arrays for at least one of the competing
+                    # measures. In this case, the capital and operating costs
+                    # for all measures must be formatted consistently as arrays
+                    # of the same length
+                    if length_array[ind_l] > 0:
+                        cap_cost, op_cost = ([
+                            {} for n in range(length_array[ind_l])] for
+                            n in range(2))
+                        for i in range(length_array[ind_l]):
+                            # Set capital cost input array
+                            if isinstance(
+                                    unit_cost_s_in[ind][yr], numpy.ndarray):
+                                cap_cost[i] = unit_cost_s_in[ind][yr][i]
+                            else:
+                                cap_cost[i] = unit_cost_s_in[ind][yr]
+                            # Set operating cost input array
+                            if isinstance(
+                                    unit_cost_e_in[ind][yr], numpy.ndarray):
+                                op_cost[i] = unit_cost_e_in[ind][yr][i]
+                            else:
+                                op_cost[i] = unit_cost_e_in[ind][yr]
+                        # Sum capital and operating cost arrays and add to the
+                        # total cost dict entry for the given measure
+                        tot_cost[ind][yr] = [
+                            [] for n in range(length_array[ind_l])]
+                        # Handle case where cost is None
+                        try:
+                            for c_l in range(0, len(tot_cost[ind][yr])):
+                                for dr in sorted(cap_cost[c_l].keys()):
+                                    if op_cost_rate_bins:
+                                        tot_cost[ind][yr][c_l].append(
+                                            cap_cost[c_l][dr] + op_cost[c_l][dr])
+                                    else:
+                                        tot_cost[ind][yr][c_l].append(
+                                            cap_cost[c_l][dr] + op_cost[c_l])
+                        except AttributeError:
+                            pass
+                    # Handle cases where capital and/or operating cost inputs
+                    # are specified as point values for all competing measures
+                    else:
+                        # Set capital cost point value
+                        cap_cost = unit_cost_s_in[ind][yr]
+                        # Set operating cost point value
+                        op_cost = unit_cost_e_in[ind][yr]
+
+                        # Sum capital and operating cost point values and add
+                        # to the total cost dict entry for the given measure
+                        tot_cost[ind][yr] = []
+                        # Handle case where cost is None
+                        try:
+                            for dr in sorted(cap_cost.keys()):
+                                if op_cost_rate_bins:
+                                    tot_cost[ind][yr].append(
+                                        cap_cost[dr] + op_cost[dr])
+                                else:
+                                    tot_cost[ind][yr].append(cap_cost[dr] + op_cost)
+                        except AttributeError:
+                            pass
+
+        # Loop through competing measures and use total annualized capital
+        # + operating costs to determine the overall share of the market
+        # that is captured by each measure; use market shares to make
+        # adjustments to each measure's master microsegment values
+        for ind, m in enumerate(measures_adj):
+            # Calculate annual market share fraction for the measure and
+            # adjust measure's master microsegment values accordingly
+
+            # Loop through all years in time horizon
+            for ind_l, yr in enumerate(self.handyvars.aeo_years):
+                # Ensure measure is on the market in given year; if not,
+                # the measure either splits the market with other
+                # competing measures if none of those measures is on
+                # the market either, or else has a market share of zero
+                if yr in yrs_on_mkt[ind]:
+                    # Set the fractions of commericial adopters who fall into
+                    # each discount rate category for this particular
+                    # microsegment
+                    mkt_dists = m.markets[adopt_scheme]["competed"][
+                        "mseg_adjust"]["competed choice parameters"][
+                            str(mseg_key)]["rate distribution"][yr]
+                    # For each discount rate category, find which measure has
+                    # the lowest annualized cost and assign that measure the
+                    # share of commercial market adopters defined for that
+                    # category above
+
+                    # Handle cases where capital and/or operating cost inputs
+                    # are specified as lists for at least one of the competing
+                    # measures.
+                    if length_array[ind_l] > 0 and len(
+                            tot_cost[ind][yr][0]) != 0:
+                        mkt_fracs[ind][yr] = [
+                            [] for n in range(length_array[ind_l])]
+                        for c_l in range(length_array[ind_l]):
+                            for ind2, dr in enumerate(
+                                    tot_cost[ind][yr][c_l]):
+                                # Find the lowest annualized cost for the
+                                # set of competing measures/discount bin
+                                min_val = min([
+                                    tot_cost[x][yr][c_l][ind2] for x in
+                                    range(0, len(measures_adj)) if
+                                    (yr in tot_cost[x].keys() and
+                                     len(tot_cost[x][yr][0]) != 0)])
+                                # Determine how many competing measures
+                                # have the lowest annualized cost under
+                                # the given discount rate bin
+                                min_val_ecms = [
+                                    x for x in range(0, len(measures_adj)) if
+                                    (yr in tot_cost[x].keys() and
+                                     len(tot_cost[x][yr][0]) != 0) and
+                                    tot_cost[x][yr][c_l][ind2] == min_val]
+                                # If the current measure has the lowest
+                                # annualized cost, assign it appropriate
+                                # market share for current discount rate
+                                # category being looped through, divided by
+                                # total number of competing measures that
+                                # share the lowest annualized cost
+                                if tot_cost[ind][yr][c_l][ind2] == min_val:
+                                    mkt_fracs[ind][yr][c_l].append(
+                                        mkt_dists[ind2] /
+                                        len(min_val_ecms))
+                                # Otherwise, set its market share for that
+                                # discount rate bin to zero
+                                else:
+                                    mkt_fracs[ind][yr][c_l].append(0)
+                            mkt_fracs[ind][yr][c_l] = sum(
+                                mkt_fracs[ind][yr][c_l])
+                        # Convert market fractions list to numpy array for
+                        # use in compete_adj function below
+                        mkt_fracs[ind][yr] = numpy.array(
+                            mkt_fracs[ind][yr])
+                    # Handle cases where capital and/or operating cost inputs
+                    # are specified as point values for all competing measures
+                    elif length_array[ind_l] == 0:
+                        if len(tot_cost[ind][yr]) != 0:
+                            mkt_fracs[ind][yr] = []
+                            for ind2, dr in enumerate(tot_cost[ind][yr]):
+                                # Find the lowest annualized cost for the given
+                                # set of competing measures and discount bin
+                                min_val = min([
+                                    tot_cost[x][yr][ind2] for x in
+                                    range(0, len(measures_adj)) if (
+                                        yr in tot_cost[x].keys() and
+                                        len(tot_cost[x][yr]) != 0)])
+                                # Determine how many of the competing measures
+                                # have the lowest annualized cost under
+                                # the given discount rate bin
+                                min_val_ecms = [
+                                    x for x in range(0, len(measures_adj)) if
+                                    (yr in tot_cost[x].keys() and
+                                     len(tot_cost[x][yr]) != 0) and
+                                    tot_cost[x][yr][ind2] == min_val]
+                                # If the current measure has the lowest
+                                # annualized cost, assign it the appropriate
+                                # market share for the current discount rate
+                                # category being looped through, divided by the
+                                # total number of competing measures that share
+                                # the lowest annualized cost
+                                if tot_cost[ind][yr][ind2] == min_val:
+                                    mkt_fracs[ind][yr].append(
+                                        mkt_dists[ind2] / len(min_val_ecms))
+                                # Otherwise, set its market share for that
+                                # discount rate bin to zero
+                                else:
+                                    mkt_fracs[ind][yr].append(0)
+                            mkt_fracs[ind][yr] = sum(mkt_fracs[ind][yr])
+                        else:
+                            mkt_fracs[ind][yr] = 0
+                    else:
+                        mkt_fracs[ind][yr] = 0
+                elif yr not in years_on_mkt_all:
+                    if len(measures_adj) > 1:
+                        mkt_fracs[ind][yr] = 1 / len(measures_adj)
+                    else:
+                        mkt_fracs[ind][yr] = 0
+                else:
+                    mkt_fracs[ind][yr] = 0
+
+        return mkt_fracs
+
+    def check_mkt_fracs(self, mkt_fracs, mkt_fracs_legacy):
+        """Check that market shares are identical in value and format."""
+        for fracs, fracs_legacy in zip(mkt_fracs, mkt_fracs_legacy):
+            self.assertEqual(fracs.keys(), fracs_legacy.keys())
+            for yr in fracs.keys():
+                self.assertEqual(isinstance(fracs[yr], numpy.ndarray),
+                                 isinstance(fracs_legacy[yr], numpy.ndarray))
+                numpy.testing.assert_array_equal(fracs[yr], fracs_legacy[yr])
+
+    def test_res_mkt_fracs(self):
+        """Test residential market shares against per-measure calculations."""
+        rng = numpy.random.default_rng(0)
+        for sampled in [False, True]:
+            for trial in range(20):
+                # Round costs to produce ties across measures
+                unit_cost_s_in, unit_cost_e_in = ([{
+                    yr: self.sample_value(rng, sampled, lambda: round(rng.uniform(0, 20), 0))
+                    for yr in self.handyvars.aeo_years} for m in range(self.n_meas)]
+                    for n in range(2))
+                choice_params = [{b: {yr: rng.uniform(-0.5, -0.01) for yr in
+                                      self.handyvars.aeo_years} for b in ["b1", "b2"]}
+                                 for m in range(self.n_meas)]
+                # Ensure low weighted sums of costs are guarded against
+                choice_params[0]["b1"][self.handyvars.aeo_years[2]] = -100
+                self.check_mkt_fracs(
+                    self.a_run.res_mkt_fracs(
+                        unit_cost_s_in, unit_cost_e_in, choice_params,
+                        self.yrs_on_mkt, self.years_on_mkt_all),
+                    self.res_mkt_fracs_legacy(
+                        self.sample_measures(choice_params), self.mseg_key,
+                        self.adopt_scheme, unit_cost_s_in, unit_cost_e_in,
+                        self.yrs_on_mkt, self.years_on_mkt_all))
+
+    def test_com_mkt_fracs(self):
+        """Test commercial market shares against per-measure calculations."""
+        rng = numpy.random.default_rng(0)
+        rate_keys = ["rate " + str(ind + 1) for ind in range(
+            len(self.handyvars.com_timeprefs["rates"]))]
+        for op_cost_rate_bins, sampled in itertools.product([True, False], [False, True]):
+            # Operating costs are broken out by discount rate level or are
+            # given as a single value
+            if op_cost_rate_bins:
+                def op_cost_fn():
+                    return {k: round(rng.uniform(0, 10), 0) for k in rate_keys}
+            else:
+                def op_cost_fn():
+                    return round(rng.uniform(0, 10), 0)
+            for trial in range(20):
+                # Round costs to produce ties across measures
+                unit_cost_s_in = [{
+                    yr: self.sample_value(rng, sampled, lambda: {
+                        k: round(rng.uniform(0, 10), 0) for k in rate_keys})
+                    for yr in self.handyvars.aeo_years} for m in range(self.n_meas)]
+                unit_cost_e_in = [{
+                    yr: self.sample_value(rng, sampled, op_cost_fn)
+                    for yr in self.handyvars.aeo_years} for m in range(self.n_meas)]
+                # With discount rate levels, operating costs are only missing
+                # where capital costs are; otherwise, they are never missing
+                for x, y in zip(unit_cost_s_in, unit_cost_e_in):
+                    for yr in self.handyvars.aeo_years:
+                        if y[yr] is None:
+                            y[yr] = op_cost_fn()
+                        if x[yr] is None and op_cost_rate_bins:
+                            y[yr] = None
+                        elif isinstance(y[yr], numpy.ndarray) and not isinstance(
+                                x[yr], numpy.ndarray):
+                            y[yr] = y[yr][0]
+                rate_dists = [{yr: list(rng.dirichlet(numpy.ones(len(rate_keys)))) for
+                               yr in self.handyvars.aeo_years} for m in range(self.n_meas)]
+                with self.subTest(op_cost_rate_bins=op_cost_rate_bins, sampled=sampled,
+                                  trial=trial):
+                    self.check_mkt_fracs(
+                        self.a_run.com_mkt_fracs(
+                            unit_cost_s_in, unit_cost_e_in, rate_dists,
+                            self.yrs_on_mkt, self.years_on_mkt_all, op_cost_rate_bins),
+                        self.com_mkt_fracs_legacy(
+                            self.sample_measures(
+                                [{"rate distribution": x} for x in rate_dists]),
+                            self.mseg_key, self.adopt_scheme, unit_cost_s_in,
+                            unit_cost_e_in, self.yrs_on_mkt, self.years_on_mkt_all,
+                            op_cost_rate_bins))
+
+
+class ContribMsegIndexTest(unittest.TestCase, CommonMethods, Constants):
+    """Test the operation of the 'index_contrib_msegs' function.
+
+    Verify that the function correctly maps each contributing microsegment
+    to the measures that pertain to it, and that the index is reused across
+    competition inputs with unchanged contributing microsegments.
+
+    Attributes:
+        a_run (object): Sample analysis engine object.
+        mkts_adj (list): Sample competition adjustment data by measure.
+        ok_msegs (list): Sorted contributing microsegment keys.
+        ok_inds (dict): Measure indices for each contributing microsegment.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """Define objects/variables for use across all class functions."""
+        handyvars = run.UsefulVars(Constants.HANDYFILES, NullOpts().opts,
+                                   brkout="basic", regions="AIA",
+                                   state_appl_regs=None, codes=None, bps=None, exog_rates=False)
+        sample_measure = CommonTestMeasures().sample_measure
+        measure_list = [run.Measure(handyvars, **sample_measure) for n in range(3)]
+        cls.a_run = run.Engine(
+            handyvars, base_args, measure_list, energy_out=[
+                "fossil_equivalent", "NA", "NA", "NA", "NA"], brkout="basic")
+        msu_p1, msu_p2, msu_s1 = [str(x) for x in [
+            ('primary', 'AIA_CZ1', 'single family home', 'electricity',
+             'heating', 'supply', 'ASHP', 'existing'),
+            ('primary', 'AIA_CZ1', 'single family home', 'electricity',
+             'cooling', 'supply', 'ASHP', 'existing'),
+            ('secondary', 'AIA_CZ1', 'single family home', 'electricity',
+             'lighting', 'general service (LED)', 'existing')]]
+        cls.mkts_adj = [
+            {"contributing mseg keys and values": {msu_p1: {}, msu_s1: {}}},
+            {"contributing mseg keys and values": {msu_p2: {}}},
+            {"contributing mseg keys and values": {
+                msu_s1: {}, msu_p2: {}, msu_p1: {}}}]
+        cls.ok_msegs = [msu_p2, msu_p1, msu_s1]
+        cls.ok_inds = {msu_p1: [0, 2], msu_p2: [1, 2], msu_s1: [0, 2]}
+
+    def test_index(self):
+        """Test for correct function output given valid input."""
+        msegs, inds = self.a_run.index_contrib_msegs(self.mkts_adj)
+        self.assertEqual(msegs, self.ok_msegs)
+        self.assertEqual(inds, self.ok_inds)
+        # Index is reused for unchanged contributing microsegments
+        mkts_adj_copy = copy.deepcopy(self.mkts_adj)
+        msegs_reuse, inds_reuse = self.a_run.index_contrib_msegs(mkts_adj_copy)
+        self.assertEqual(msegs_reuse, self.ok_msegs)
+        self.assertIs(inds_reuse, inds)
+        # Index is rebuilt when a measure's contributing microsegments change
+        del mkts_adj_copy[2]["contributing mseg keys and values"][
+            self.ok_msegs[1]]
+        msegs_new, inds_new = self.a_run.index_contrib_msegs(mkts_adj_copy)
+        self.assertEqual(msegs_new, self.ok_msegs)
+        self.assertEqual(inds_new[self.ok_msegs[1]], [0])
+
+
 class NumpyConversionTest(unittest.TestCase, CommonMethods, Constants):
     """Test the operation of the 'convert_to_numpy' function.
 
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+
+""" Tests for shared input/output and data helpers """
+
+# Import code to be tested
+from scout.utils import JsonIO, MyEncoder, CompDataIO, StageProfiler, KeyValTree, \
+    SectorShapesIO, MsegKey
+
+# Import needed packages
+import unittest
+import numpy
+import os
+import json
+import tempfile
+from ast import literal_eval
+from pathlib import Path
+
+
+class JsonIOTest(unittest.TestCase):
+    """Test the record-at-a-time JSON writer and reader.
+
+    Verify that streamed output is byte-identical to a whole-document dump,
+    that records are rounded as they are written, and that records are read
+    back one at a time regardless of how the file is chunked.
+    """
+
+    data = {
+        "ECM 1": {"name": "ECM 1", "markets": {"2024": 1.123456789, "2025": [1, {"a": "x\ny"}]},
+                  "remove": False, "climate_zone": [], "shares": numpy.array([0.5, 1.5])},
+        "ECM \u00e9 2": {"name": "ECM \u00e9 2", "markets": {}, "remove": True, "n": -1e-07},
+        "ECM 3": 12345678}
+
+    def test_dump_round_trip(self):
+        """Test for identical output and round trip of dict and list data."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            whole, stream = Path(tmp_dir, "whole.json"), Path(tmp_dir, "stream.json")
+            for data in [self.data, list(self.data.values()), {}, []]:
+                JsonIO.dump_json(data, whole)
+                JsonIO.dump_json_stream(data, stream)
+                self.assertEqual(whole.read_bytes(), stream.read_bytes())
+                # Small chunks split records, keys, and numbers across reads
+                for chunk_size in [1, 7, 1 << 16]:
+                    records = list(JsonIO.iter_json_records(stream, chunk_size))
+                    if isinstance(data, dict):
+                        self.assertEqual(dict(records), JsonIO.load_json(whole))
+                    else:
+                        self.assertEqual(records, JsonIO.load_json(whole))
+
+    def test_dump_precision(self):
+        """Test for rounding of records as they are written."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            whole, stream = Path(tmp_dir, "whole.json"), Path(tmp_dir, "stream.json")
+            data = json.loads(json.dumps(self.data, cls=MyEncoder))
+            JsonIO.dump_json_stream(data, stream, precision=6)
+            # Written and in-memory data are both rounded
+            self.assertEqual(data["ECM 1"]["markets"]["2024"], 1.123457)
+            self.assertEqual(data["ECM \u00e9 2"]["n"], -0.0)
+            JsonIO.dump_json(data, whole)
+            self.assertEqual(whole.read_bytes(), stream.read_bytes())
+
+    def test_read_errors(self):
+        """Test for errors reading truncated or malformed files."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            stream = Path(tmp_dir, "stream.json")
+            JsonIO.dump_json_stream(self.data, stream)
+            text = stream.read_text()
+            for bad in [text[:-5], text[:-1], "", "1", '{"a" 1}', "[1 2]"]:
+                stream.write_text(bad)
+                with self.assertRaisesRegex(ValueError, "Error reading in"):
+                    list(JsonIO.iter_json_records(stream, 7))
+
+
+class MsegKeyTest(unittest.TestCase):
+    """Test the parsing of microsegment key chain strings.
+
+    Verify that parsed key chains equal the tuples given by literal_eval
+    (and convert back to the same strings) and that named fields are read
+    from the right positions for primary and secondary microsegments in
+    residential and commercial buildings, with and without technology types.
+    """
+
+    # Key chain strings with expected mseg type, residential flag, tech type, and technology
+    keys = [
+        ("('primary', 'AIA_CZ1', 'single family home', 'electricity', 'heating', 'supply', "
+         "'ASHP', 'existing')", "primary", True, "supply", "ASHP"),
+        ("('primary', 'AIA_CZ2', 'mobile home', 'natural gas', 'cooling', 'demand', "
+         "'windows solar', 'new')", "primary", True, "demand", "windows solar"),
+        ("('primary', 'AIA_CZ3', 'assembly', 'electricity', 'lighting', "
+         "'T5 F28', 'new')", "primary", False, None, "T5 F28"),
+        ("('secondary', 'AIA_CZ4', 'large office', 'electricity', 'heating', 'demand', "
+         "'lighting gain', 'existing')", "secondary", False, "demand", "lighting gain"),
+        ("('secondary', 'AIA_CZ5', 'multi family home', 'electricity', 'cooling', 'supply', "
+         "None, 'existing')", "secondary", True, "supply", None),
+        ("('primary', 'NWPP', 'education', 'distillate', 'water heating', None, 'new')",
+         "primary", False, None, None)]
+
+    def test_round_trip(self):
+        """Test for parsed key chains that match literal_eval and convert back to strings."""
+        for key_str, *_ in self.keys:
+            with self.subTest(key=key_str):
+                key = MsegKey.from_str(key_str)
+                self.assertEqual(key, literal_eval(key_str))
+                self.assertIsInstance(key, tuple)
+                self.assertEqual(str(tuple(key)), key_str)
+                self.assertEqual(hash(key), hash(literal_eval(key_str)))
+                # Repeated parses return the same object
+                self.assertIs(MsegKey.from_str(key_str), key)
+
+    def test_fields(self):
+        """Test for named fields of key chains."""
+        for key_str, mseg_type, residential, tech_type, technology in self.keys:
+            with self.subTest(key=key_str):
+                key, key_tuple = MsegKey.from_str(key_str), literal_eval(key_str)
+                self.assertEqual(key.mseg_type, mseg_type)
+                self.assertEqual(key.residential, residential)
+                self.assertEqual(key.tech_type, tech_type)
+                self.assertEqual(key.technology, technology)
+                self.assertEqual([key.region, key.bldg_type, key.fuel_type, key.end_use,
+                                  key.structure_type],
+                                 [key_tuple[x] for x in [1, 2, 3, 4, -1]])
+
+
+class CompDataIOTest(unittest.TestCase):
+    """Test the per-measure competition data files written by ecm_prep.
+
+    Verify that measure data are read back in either format, that existing
+    data are converted to a newly selected format, and that folders that
+    have not changed since their last conversion are not scanned again.
+    """
+
+    def test_convert(self):
+        """Test for correct conversion of measure data between formats."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            folder = Path(tmp_dir)
+            CompDataIO.dump({"ECM 1": [1, 2]}, folder, "ECM 1")
+            CompDataIO.dump({"ECM 2": [3, 4]}, folder, "ECM 2", "pkl")
+            # Data for a measure written in another format replace the existing data
+            CompDataIO.dump({"ECM 2": [5, 6]}, folder, "ECM 2", "pkl.gz")
+            self.assertEqual(CompDataIO.load(folder, "ECM 2"), {"ECM 2": [5, 6]})
+            self.assertFalse((folder / "ECM 2.pkl").exists())
+            # All data are converted to the selected format
+            self.assertEqual(CompDataIO.convert(folder, "pkl"), 2)
+            self.assertEqual(sorted(x.name for x in folder.iterdir() if x.suffix == ".pkl"),
+                             ["ECM 1.pkl", "ECM 2.pkl"])
+            self.assertEqual(CompDataIO.load(folder, "ECM 1"), {"ECM 1": [1, 2]})
+            # Unchanged folders are not scanned again
+            (folder / "ECM 3.pkl.gz").write_bytes(b"not pickled data")
+            stamp = (folder / CompDataIO.format_file).stat().st_mtime_ns
+            os.utime(folder, ns=(stamp, stamp))
+            self.assertEqual(CompDataIO.convert(folder, "pkl"), 0)
+            # Data added to the folder are converted
+            (folder / "ECM 3.pkl.gz").unlink()
+            CompDataIO.dump({"ECM 3": [7, 8]}, folder, "ECM 3")
+            os.utime(folder, ns=(stamp + 1, stamp + 1))
+            self.assertEqual(CompDataIO.convert(folder, "pkl"), 1)
+            self.assertEqual(CompDataIO.load(folder, "ECM 3"), {"ECM 3": [7, 8]})
+            # Folders are scanned again when a different format is selected
+            self.assertEqual(CompDataIO.convert(folder, "pkl.gz"), 3)
+
+
+class StageProfilerTest(unittest.TestCase):
+    """Test the stage timings recorded by 'StageProfiler'.
+
+    Verify that stages are only recorded when profiling is enabled, that stage timings
+    recorded in other processes are merged into the totals, and that the profile is
+    written out as JSON and CSV.
+    """
+
+    def test_profiler(self):
+        """Test for correct recorded stages and written profile."""
+        profiler = StageProfiler()
+        # Disabled profiler records nothing
+        with profiler.stage("compete_measures"):
+            pass
+        profiler.count("measures", 2)
+        self.assertEqual(profiler.stats(), {"stages": {}, "counts": {}})
+        # Enabled profiler records calls, wall time, and per-item wall time
+        profiler.reset(True)
+        for adopt_scheme in ["Technical potential", "Max adoption potential"]:
+            with profiler.stage("compete_measures", adopt_scheme):
+                pass
+        profiler.count("measures", 2)
+        stage = profiler.stages["compete_measures"]
+        self.assertEqual(stage["calls"], 2)
+        self.assertEqual(sorted(stage["items"].keys()), [
+            "Max adoption potential", "Technical potential"])
+        self.assertAlmostEqual(stage["wall_time"], sum(stage["items"].values()))
+        # Stage timings from another process are added to the totals
+        worker_stats = {
+            "stages": {"compete_measures": {
+                "calls": 1, "wall_time": 5.0, "max_wall_time": 5.0, "peak_memory": None,
+                "items": {"Technical potential": 5.0}}},
+            "counts": {"measures": 1}}
+        profiler.merge(worker_stats)
+        self.assertEqual(stage["calls"], 3)
+        self.assertEqual(stage["max_wall_time"], 5.0)
+        self.assertGreaterEqual(stage["items"]["Technical potential"], 5.0)
+        self.assertEqual(profiler.counts["measures"], 3)
+        # Profile is written to JSON and CSV files
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            profile_out = Path(tmp_dir) / "run_profile.json"
+            profiler.write(profile_out)
+            with open(profile_out, "r") as f:
+                report = json.load(f)
+            self.assertEqual(report["counts"], {"measures": 3})
+            self.assertEqual(report["stages"]["compete_measures"]["calls"], 3)
+            csv_lines = profile_out.with_suffix(".csv").read_text().splitlines()
+            self.assertEqual(csv_lines[0].split(",")[0], "stage")
+            self.assertEqual(csv_lines[1].split(",")[:2], ["compete_measures", "3"])
+
+
+class KeyValTreeTest(unittest.TestCase):
+    """Test the flattened addition of nested data dicts by 'KeyValTree'.
+
+    Verify that summing dicts through the tree yields the same nested dict as
+    summing the dicts key by key, for both numeric and sampled (array) values.
+    """
+
+    def test_sum(self):
+        """Test for correct summed values and rebuilt dict structure."""
+        dicts = [{
+            "stock": {"total": {"all": {"2024": 1.0 * n, "2025": 2.0 * n}}},
+            "lifetime": {"baseline": {"2024": 10, "2025": 12}, "measure": 5},
+            "sub-market scaling": 1} for n in range(1, 4)]
+        expected = {
+            "stock": {"total": {"all": {"2024": 6.0, "2025": 12.0}}},
+            "lifetime": {"baseline": {"2024": 30, "2025": 36}, "measure": 15}}
+        # Numeric values; only the top-level keys given are included
+        tree = KeyValTree(dicts[0], keys=["stock", "lifetime"])
+        for d in dicts[1:]:
+            tree.add(d)
+        summed = tree.to_dict()
+        self.assertEqual(summed, expected)
+        # Integer values that are only added to other integers remain integers
+        self.assertIsInstance(summed["lifetime"]["measure"], int)
+        self.assertIsInstance(summed["stock"]["total"]["all"]["2024"], float)
+        # Keys are rebuilt in their original order
+        self.assertEqual(list(summed.keys()), ["stock", "lifetime"])
+        self.assertEqual(list(summed["lifetime"].keys()), ["baseline", "measure"])
+        # Empty values are replaced by the values added to them
+        dicts[0]["lifetime"]["measure"] = None
+        tree = KeyValTree(dicts[0], keys=["stock", "lifetime"])
+        for d in dicts[1:]:
+            tree.add(d)
+        self.assertEqual(tree.to_dict()["lifetime"]["measure"], 10)
+        dicts[0]["lifetime"]["measure"] = 5
+        # Mix of numbers and arrays of sampled values
+        dicts[0]["stock"]["total"]["all"]["2024"] = numpy.array([1.0, 2.0])
+        tree = KeyValTree(dicts[0], keys=["stock", "lifetime"])
+        for d in dicts[1:]:
+            tree.add(d)
+        summed = tree.to_dict()
+        numpy.testing.assert_array_equal(
+            summed["stock"]["total"]["all"]["2024"], [6.0, 7.0])
+        self.assertEqual(summed["lifetime"], expected["lifetime"])
+        # Original dict values are not modified by the summation
+        numpy.testing.assert_array_equal(
+            dicts[0]["stock"]["total"]["all"]["2024"], [1.0, 2.0])
+        # Dicts missing any of the tree's key paths cannot be added
+        with self.assertRaises(KeyError):
+            tree.add({"stock": {"total": {}}, "lifetime": dicts[1]["lifetime"]})
+
+
+class SectorShapesIOTest(unittest.TestCase):
+    """Test the binary store of measure sector shapes written by ecm_prep.
+
+    Verify that sector shapes are read back as written, that measures prepared
+    again replace their previously stored shapes, and that the store is
+    compacted and exported to JSON.
+    """
+
+    @staticmethod
+    def shapes(name, scale, adopt_schemes=("Technical potential",)):
+        """Generate sector shapes for a measure across two regions and years."""
+        return {"name": name, **{a_s: {reg: {yr: {
+            "baseline": numpy.arange(8760) * scale,
+            "efficient": numpy.arange(8760) * scale / 2} for yr in ["2030", "2050"]}
+            for reg in ["ERCOT", "PJME"]} for a_s in adopt_schemes}}
+
+    def test_store(self):
+        """Test for correct stored, replaced, and exported sector shapes."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            store = Path(tmp_dir) / "ecm_prep_shapes.bin"
+            SectorShapesIO.dump([self.shapes("ECM 1", 1, (
+                "Technical potential", "Max adoption potential")),
+                self.shapes("ECM 2", 2)], store)
+            self.assertEqual(SectorShapesIO.load_index(store)["blocks"], 12)
+            loaded = SectorShapesIO.load(store, names=["ECM 2"])
+            self.assertEqual(len(loaded), 1)
+            numpy.testing.assert_array_equal(
+                loaded[0]["Technical potential"]["PJME"]["2050"]["efficient"],
+                numpy.arange(8760))
+            # Appended shapes replace previous shapes for the same adoption scenario
+            SectorShapesIO.dump([self.shapes("ECM 1", 3)], store)
+            self.assertEqual(SectorShapesIO.load_index(store)["blocks"], 16)
+            loaded = {m["name"]: m for m in SectorShapesIO.load(store)}
+            numpy.testing.assert_array_equal(
+                loaded["ECM 1"]["Technical potential"]["ERCOT"]["2030"]["baseline"],
+                numpy.arange(8760) * 3)
+            numpy.testing.assert_array_equal(
+                loaded["ECM 1"]["Max adoption potential"]["ERCOT"]["2030"]["baseline"],
+                numpy.arange(8760))
+            # Store is compacted once unreferenced blocks outnumber referenced blocks
+            for scale in [4, 5, 6]:
+                SectorShapesIO.dump([self.shapes("ECM 2", scale)], store)
+            self.assertEqual(SectorShapesIO.load_index(store)["blocks"], 12)
+            self.assertEqual(store.stat().st_size, 12 * 2 * 8760 * 8)
+            numpy.testing.assert_array_equal(SectorShapesIO.load(store, names=["ECM 2"])[0][
+                "Technical potential"]["ERCOT"]["2030"]["baseline"], numpy.arange(8760) * 6)
+            # Bytes left past the indexed blocks by an interrupted write are discarded
+            # before new blocks are appended
+            with open(store, "ab") as f:
+                f.write(b"\x00" * 100)
+            SectorShapesIO.dump([self.shapes("ECM 1", 7)], store)
+            self.assertEqual(store.stat().st_size, 16 * 2 * 8760 * 8)
+            numpy.testing.assert_array_equal(SectorShapesIO.load(store, names=["ECM 1"])[0][
+                "Technical potential"]["PJME"]["2050"]["efficient"], numpy.arange(8760) * 3.5)
+            # Stored shapes are exported to JSON
+            SectorShapesIO.to_json(store, store.with_suffix(".json"))
+            with open(store.with_suffix(".json"), "r") as f:
+                exported = json.load(f)
+            self.assertEqual([m["name"] for m in exported], ["ECM 1", "ECM 2"])
+            self.assertEqual(len(exported[0]["Max adoption potential"]["PJME"]["2050"][
+                "efficient"]), 8760)
+
+
+# Offer external code execution (include all lines below this point in all
+# test files)
+def main():
+    """Trigger default behavior of running all test fixtures in the file."""
+    unittest.main()
+
+
+if __name__ == "__main__":
+    main()